@@ -4,11 +4,16 @@ Mantém comentários em Português do Brasil e aplica SOLID delegando responsabi
 para módulos de configuração, autenticação, Graph e armazenamento.
 """
 
+import argparse
+from dataclasses import replace
 from pathlib import Path
 from getpass import getpass
 
+from backup.cas import verificar_blobs
 from backup.config import carregar_configuracao
-from backup.runner import executar_backup
+from backup.restauracao import OpcoesRestauracao, restaurar
+from backup.retencao import podar
+from backup.runner import executar_backup, mesclar_shards
 from backup.storage.local import ArmazenamentoLocal
 from backup.storage.s3 import ArmazenamentoS3
 from backup.storage.azure_blob import ArmazenamentoAzureBlob
@@ -17,18 +22,28 @@ from backup.storage.azure_blob import ArmazenamentoAzureBlob
 def selecionar_armazenamento(cfg) -> object:
     """Seleciona o backend de armazenamento conforme configuração."""
     if cfg.backup_backend == "local":
-        return ArmazenamentoLocal(cfg.backup_dir)
+        return ArmazenamentoLocal(cfg.backup_dir, indice_hashes=cfg.indice_hashes)
     elif cfg.backup_backend == "s3":
         return ArmazenamentoS3(
             nome_bucket=cfg.s3.bucket_name or "",
             regiao=cfg.s3.region_name,
             chave_acesso_id=cfg.s3.aws_access_key_id,
             chave_secreta=cfg.s3.aws_secret_access_key,
+            tamanho_parte_mb=cfg.s3.tamanho_parte_mb,
+            concorrencia_upload=cfg.s3.concorrencia_upload,
+            limiar_multipart_mb=cfg.s3.limiar_multipart_mb,
+            limiar_spool_mb=cfg.s3.limiar_spool_mb,
+            diretorio_spool=cfg.s3.diretorio_spool,
         )
     elif cfg.backup_backend == "azure_blob":
         return ArmazenamentoAzureBlob(
             connection_string=cfg.azure_blob.connection_string or "",
             container_name=cfg.azure_blob.container_name or "",
+            tamanho_bloco_mb=cfg.azure_blob.tamanho_bloco_mb,
+            concorrencia_upload=cfg.azure_blob.concorrencia_upload,
+            limiar_upload_unico_mb=cfg.azure_blob.limiar_upload_unico_mb,
+            limiar_spool_mb=cfg.azure_blob.limiar_spool_mb,
+            diretorio_spool=cfg.azure_blob.diretorio_spool,
         )
     else:
         raise ValueError(f"Backend desconhecido: {cfg.backup_backend}")
@@ -106,7 +121,108 @@ def _escrever_toml_interativo(caminho: Path) -> None:
     print(f"Credenciais salvas em: {caminho}")
 
 
+def _ler_argumentos(argv=None) -> argparse.Namespace:
+    """Argumentos opcionais de linha de comando (shards, poda e restauração)."""
+    parser = argparse.ArgumentParser(description="Backup diário do SharePoint via Microsoft Graph")
+    parser.add_argument(
+        "--shard", metavar="INDICE/TOTAL",
+        help="executa apenas um shard (ex.: 0/4) e grava o manifesto parcial no diretório de estado",
+    )
+    parser.add_argument(
+        "--mesclar-shards", metavar="TOTAL", type=int,
+        help="mescla os manifestos parciais dos TOTAL shards do dia no estado global",
+    )
+    parser.add_argument(
+        "--atualizar-metadados", "--refresh-metadata", dest="atualizar_metadados", action="store_true",
+        help="ignora o cache de sites, drives e raízes e o regrava ao final da execução",
+    )
+    parser.add_argument(
+        "--podar", action="store_true",
+        help="remove snapshots e apagados expirados conforme a política [retencao] e encerra",
+    )
+    parser.add_argument(
+        "--simular", action="store_true",
+        help="com --podar, apenas informa o que seria removido e quantos bytes seriam liberados",
+    )
+    parser.add_argument(
+        "--verificar", action="store_true",
+        help="modo deduplicado: confere tamanho e hash de cada blob e encerra (código 1 se houver divergências)",
+    )
+    parser.add_argument(
+        "--restaurar", metavar="ID_DRIVE",
+        help="restaura um snapshot para o drive ID_DRIVE do SharePoint e encerra",
+    )
+    parser.add_argument("--data", metavar="YYYY-MM-DD",
+                        help="com --restaurar, usa o snapshot mais recente até esta data (padrão: o último)")
+    parser.add_argument("--site", help="com --restaurar, apenas arquivos deste site (nome da pasta ou ID)")
+    parser.add_argument("--caminho", metavar="PADRAO",
+                        help="com --restaurar, prefixo ou glob do caminho no snapshot (ex.: 'Site/Drive/docs/*.xlsx')")
+    parser.add_argument("--pasta-destino", default="", help="com --restaurar, pasta do drive que recebe os arquivos")
+    parser.add_argument("--manter-estrutura", action="store_true",
+                        help="com --restaurar, mantém 'Site/Drive/' no caminho de destino")
+    return parser.parse_args(argv)
+
+
+def _executar_poda(cfg, armazenamento, simular: bool) -> None:
+    """Executa a poda protegendo o último snapshot registrado no estado local e imprime o resumo."""
+    caminho_ultimo = Path(cfg.diretorio_estado) / "latest_snapshot.txt"
+    protegidas = [caminho_ultimo.read_text(encoding="utf-8").strip()] if caminho_ultimo.exists() else []
+    resultado = podar(cfg, armazenamento, simular=simular, bases_protegidas=protegidas)
+    acao = "Seriam removidos" if resultado.simulacao else "Removidos"
+    print(f"{acao}: {len(resultado.snapshots_removidos)} snapshot(s) {resultado.snapshots_removidos}, "
+          f"{len(resultado.apagados_removidos)} prefixo(s) de apagados {resultado.apagados_removidos}, "
+          f"{resultado.arquivos} arquivo(s), {resultado.blobs} blob(s) órfão(s).")
+    print(f"Espaço {'a liberar' if resultado.simulacao else 'liberado'}: "
+          f"{resultado.bytes_recuperaveis} bytes ({resultado.bytes_recuperaveis / 1024 ** 3:.2f} GiB).")
+
+
+def _executar_verificacao(cfg, armazenamento) -> None:
+    """Confere os blobs do modo deduplicado e encerra com código 1 se algum divergir."""
+    if cfg.modo_snapshot != "deduplicado":
+        print("A verificação confere os blobs do modo deduplicado; modo_snapshot atual: completo.")
+        return
+    resultado = verificar_blobs(armazenamento)
+    print(f"Blobs: {resultado.blobs}, hashes conferidos: {resultado.hashes_conferidos}, "
+          f"divergentes: {len(resultado.divergentes)}.")
+    for chave in resultado.divergentes:
+        print(f"  divergente: {chave}")
+    if resultado.divergentes:
+        raise SystemExit(1)
+
+
+def _executar_restauracao(cfg, armazenamento, args) -> None:
+    """Restaura o snapshot selecionado e imprime o resumo com a vazão."""
+    opcoes = OpcoesRestauracao(
+        drive_destino=args.restaurar,
+        data=args.data,
+        site=args.site,
+        caminho=args.caminho,
+        pasta_destino=args.pasta_destino,
+        manter_estrutura=args.manter_estrutura,
+    )
+    resultado = restaurar(cfg, armazenamento, opcoes)
+    print(f"Snapshot {resultado.data}: {resultado.arquivos_total} arquivo(s) selecionado(s), "
+          f"{resultado.bytes_total / 1024 ** 3:.2f} GiB.")
+    print(f"Enviados: {resultado.arquivos} arquivo(s), {resultado.bytes} bytes em {resultado.segundos:.1f} s "
+          f"({resultado.vazao_mb_s:.1f} MB/s); {resultado.pulados} já restaurado(s) anteriormente.")
+
+
+def _aplicar_argumentos(cfg, args):
+    """Sobrepõe na configuração os parâmetros de shard e de cache informados na linha de comando."""
+    if args.shard:
+        indice, _, total = args.shard.partition("/")
+        cfg = replace(cfg, indice_shard=int(indice), total_shards=int(total or cfg.total_shards))
+        if not 0 <= cfg.indice_shard < cfg.total_shards:
+            raise ValueError(f"Shard inválido: {args.shard}")
+    if args.mesclar_shards:
+        cfg = replace(cfg, total_shards=args.mesclar_shards, indice_shard=None)
+    if args.atualizar_metadados:
+        cfg = replace(cfg, atualizar_metadados=True)
+    return cfg
+
+
 def main():
+    args = _ler_argumentos()
     caminho_interativo = Path("credenciais/credentials.toml")
 
     try:
@@ -130,16 +246,31 @@ def main():
         else:
             raise
 
+    cfg = _aplicar_argumentos(cfg, args)
+    if args.podar:
+        _executar_poda(cfg, armazenamento, args.simular)
+        return
+    if args.restaurar:
+        _executar_restauracao(cfg, armazenamento, args)
+        return
+    if args.verificar:
+        _executar_verificacao(cfg, armazenamento)
+        return
+    if args.mesclar_shards:
+        mesclar_shards(cfg, armazenamento)
+        return
+
     try:
-        executar_backup(cfg, armazenamento)
+        executar_backup(cfg, armazenamento, selecionar_armazenamento)
     except Exception as e:
         print(f"Erro durante a execução do backup: {e}")
         resp = input("Deseja reconfigurar e tentar novamente? (s/n): ").strip().lower()
         if resp in {"s", "sim", "y", "yes"}:
             _escrever_toml_interativo(caminho_interativo)
             cfg = carregar_configuracao(caminho_interativo)
+            cfg = _aplicar_argumentos(cfg, args)
             armazenamento = selecionar_armazenamento(cfg)
-            executar_backup(cfg, armazenamento)
+            executar_backup(cfg, armazenamento, selecionar_armazenamento)
         else:
             raise
 
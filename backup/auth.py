@@ -1,21 +1,70 @@
+import threading
+import time
+from typing import Callable, Optional
+
 import msal
 
 # Comentários em Português do Brasil
 # Este módulo lida com autenticação no Microsoft Graph usando MSAL.
 
+ESCOPOS_GRAPH = ["https://graph.microsoft.com/.default"]
+
+
+class ProvedorToken:
+    """Fornece tokens de acesso do Graph para execuções longas e concorrentes.
+
+    Mantém a aplicação MSAL (e seu cache de tokens) durante toda a execução, serve o token
+    da memória e o renova antes de expirar. É seguro para uso compartilhado entre workers;
+    chamar a instância retorna o token atual.
+    """
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str,
+                 margem_renovacao: float = 300.0, relogio: Callable[[], float] = time.monotonic,
+                 app: Optional[msal.ConfidentialClientApplication] = None):
+        self.margem_renovacao = margem_renovacao
+        self._relogio = relogio
+        self._app = app or msal.ConfidentialClientApplication(
+            client_id=client_id,
+            authority=f"https://login.microsoftonline.com/{tenant_id}",
+            client_credential=client_secret,
+        )
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expira_em = 0.0
+
+    def _adquirir(self) -> None:
+        """Obtém um token via MSAL (que consulta o próprio cache antes de ir à rede)."""
+        result = self._app.acquire_token_for_client(scopes=ESCOPOS_GRAPH)
+        if "access_token" not in result:
+            raise RuntimeError(f"Falha ao obter token: {result}")
+        self._token = result["access_token"]
+        self._expira_em = self._relogio() + float(result.get("expires_in", 3600))
+
+    def obter(self) -> str:
+        """Retorna o token em memória, renovando-o se estiver a menos da margem de expirar."""
+        with self._lock:
+            if self._token is None or self._relogio() >= self._expira_em - self.margem_renovacao:
+                self._adquirir()
+            return self._token
+
+    def invalidar(self) -> None:
+        """Descarta o token atual (ex.: após 401) para que a próxima chamada obtenha um novo."""
+        with self._lock:
+            self._token = None
+            self._expira_em = 0.0
+            # Remove também do cache MSAL; caso contrário ele devolveria o mesmo token
+            remover = getattr(self._app, "remove_tokens_for_client", None)
+            if remover:
+                remover()
+
+    def __call__(self) -> str:
+        return self.obter()
+
 
 def obter_token(tenant_id: str, client_id: str, client_secret: str) -> str:
     """Obtém um token de acesso do Microsoft Graph via fluxo de aplicativo confidencial.
 
-    Utiliza o escopo '.default' que corresponde às permissões concedidas ao app.
+    Utiliza o escopo '.default' que corresponde às permissões concedidas ao app. Para
+    execuções longas prefira ProvedorToken, que renova o token automaticamente.
     """
-    authority = f"https://login.microsoftonline.com/{tenant_id}"
-    app = msal.ConfidentialClientApplication(
-        client_id=client_id,
-        authority=authority,
-        client_credential=client_secret,
-    )
-    result = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in result:
-        raise RuntimeError(f"Falha ao obter token: {result}")
-    return result["access_token"]
\ No newline at end of file
+    return ProvedorToken(tenant_id, client_id, client_secret).obter()
@@ -0,0 +1,268 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import runner
+from .config import ConfigAplicativo, ConfigMetricas
+from .graph_sintetico import DISTRIBUICOES, GraphSintetico, ParametrosArvore
+from .storage.base import BackendArmazenamento
+from .storage.local import ArmazenamentoLocal
+
+try:
+    import resource
+except ImportError:  # Windows: pico de RSS via psutil, se instalado
+    resource = None
+
+# Comentários em Português do Brasil
+# Benchmark do backup: executa 'executar_backup' contra o Graph sintético e os backends local,
+# S3 (moto) e Azure Blob (Azurite), medindo itens/s, MB/s e pico de RSS. Cada backend roda em
+# um processo novo (o pico de RSS não se mistura) com uma execução completa seguida de uma
+# incremental (nada alterado). Uma linha de base gravada com '--saida' permite falhar quando
+# houver regressão acima da tolerância.
+#
+#   python -m backup.benchmark --backends local,s3 --sites 2 --drives 2 --saida base.json
+#   python -m backup.benchmark --backends local,s3 --sites 2 --drives 2 --linha-base base.json
+
+BACKENDS = ("local", "s3", "azure_blob")
+# Conta de desenvolvimento padrão do Azurite (pública, documentada pela Microsoft)
+AZURITE_PADRAO = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+# Datas fixas: a execução incremental reaproveita o snapshot do "dia anterior"
+DATAS_EXECUCOES = {"completa": "2024-01-01", "incremental": "2024-01-02"}
+
+
+@dataclass
+class OpcoesBenchmark:
+    """Parâmetros do backup medido (iguais para todos os backends)."""
+
+    concorrencia: int = 8
+    tamanho_fila: int = 64
+    modo_delta: bool = False
+    modo_snapshot: str = "completo"
+    motor: str = "threads"
+    azurite: str = AZURITE_PADRAO
+
+
+@dataclass
+class ResultadoBenchmark:
+    """Medidas de uma execução; 'erro' preenchido quando o backend não pôde ser usado."""
+
+    backend: str
+    execucao: str
+    itens: int = 0
+    bytes: int = 0
+    segundos: float = 0.0
+    itens_por_s: float = 0.0
+    mb_por_s: float = 0.0
+    pico_rss_mb: Optional[float] = None
+    requisicoes_graph: int = 0
+    erro: Optional[str] = None
+    latencias: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+def pico_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo atual (None se não houver como medir)."""
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KiB, macOS em bytes
+        return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+
+
+def _executar_backend(backend: str, parametros: ParametrosArvore, opcoes: OpcoesBenchmark,
+                      diretorio: Path) -> List[ResultadoBenchmark]:
+    """Cria o backend (com o simulador, quando houver) e mede as duas execuções."""
+    if backend == "local":
+        return _medir_execucoes(backend, ArmazenamentoLocal(str(diretorio / "backups")), parametros, opcoes, diretorio)
+    if backend == "s3":
+        # Dependência opcional: pip install "moto[s3]"
+        import boto3
+        try:
+            from moto import mock_aws
+        except ImportError:
+            from moto import mock_s3 as mock_aws
+        from .storage.s3 import ArmazenamentoS3
+
+        for variavel in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            os.environ.setdefault(variavel, "benchmark")
+        with mock_aws():
+            boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="benchmark")
+            armazenamento = ArmazenamentoS3(nome_bucket="benchmark", regiao="us-east-1")
+            return _medir_execucoes(backend, armazenamento, parametros, opcoes, diretorio)
+    if backend == "azure_blob":
+        # Requer o Azurite em execução (ex.: docker run -p 10000:10000 mcr.microsoft.com/azure-storage/azurite)
+        from azure.storage.blob import BlobServiceClient
+        from .storage.azure_blob import ArmazenamentoAzureBlob
+
+        nome_container = f"benchmark-{uuid.uuid4().hex[:12]}"
+        servico = BlobServiceClient.from_connection_string(opcoes.azurite)
+        servico.create_container(nome_container)
+        try:
+            armazenamento = ArmazenamentoAzureBlob(connection_string=opcoes.azurite, container_name=nome_container)
+            return _medir_execucoes(backend, armazenamento, parametros, opcoes, diretorio)
+        finally:
+            servico.delete_container(nome_container)
+    raise ValueError(f"Backend desconhecido: {backend}")
+
+
+def _medir_execucoes(backend: str, armazenamento: BackendArmazenamento, parametros: ParametrosArvore,
+                     opcoes: OpcoesBenchmark, diretorio: Path) -> List[ResultadoBenchmark]:
+    """Execução completa e incremental com o Graph sintético no lugar do módulo graph."""
+    cfg = ConfigAplicativo(
+        tenant_id="benchmark", client_id="benchmark", client_secret="benchmark",
+        backup_backend=backend, backup_dir=str(diretorio / "backups"),
+        diretorio_estado=str(diretorio / "state"), sites=[],
+        concorrencia=opcoes.concorrencia, tamanho_fila=opcoes.tamanho_fila,
+        modo_delta=opcoes.modo_delta, modo_snapshot=opcoes.modo_snapshot, motor=opcoes.motor,
+        metricas=ConfigMetricas(progresso="desligado"),
+    )
+    originais = (runner.graph, runner.ProvedorToken, runner._data_execucao)
+    runner.ProvedorToken = lambda tenant, client, secret: "TOKEN-SINTETICO"
+    resultados: List[ResultadoBenchmark] = []
+    try:
+        for execucao, data in DATAS_EXECUCOES.items():
+            sintetico = GraphSintetico(parametros)
+            runner.graph = sintetico
+            runner._data_execucao = lambda d=data: d
+            inicio = time.perf_counter()
+            runner.executar_backup(cfg, armazenamento)
+            segundos = time.perf_counter() - inicio
+            resumo = json.loads((Path(cfg.diretorio_estado) / runner.NOME_RESUMO).read_text(encoding="utf-8"))
+            metricas = resumo["metricas"]
+            resultados.append(ResultadoBenchmark(
+                backend=backend, execucao=execucao,
+                itens=metricas["itens_concluidos"], bytes=metricas["bytes_baixados"],
+                segundos=round(segundos, 3),
+                itens_por_s=round(metricas["itens_concluidos"] / segundos, 1),
+                mb_por_s=round(metricas["bytes_baixados"] / (1024 * 1024) / segundos, 2),
+                pico_rss_mb=pico_rss_mb(),
+                requisicoes_graph=sintetico.estatisticas()["requisicoes"],
+                latencias=resumo.get("latencias", {}),
+            ))
+    finally:
+        runner.graph, runner.ProvedorToken, runner._data_execucao = originais
+    return resultados
+
+
+def executar_benchmark(backend: str, parametros: ParametrosArvore,
+                       opcoes: Optional[OpcoesBenchmark] = None) -> List[ResultadoBenchmark]:
+    """Mede um backend no processo atual; falhas ao preparar o backend viram 'erro' no resultado."""
+    opcoes = opcoes or OpcoesBenchmark()
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as tmp:
+        try:
+            return _executar_backend(backend, parametros, opcoes, Path(tmp))
+        except ImportError as e:
+            erro = f"dependência ausente: {e.name}"
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+    return [ResultadoBenchmark(backend=backend, execucao=execucao, erro=erro) for execucao in DATAS_EXECUCOES]
+
+
+def comparar_com_linha_base(resultados: List[ResultadoBenchmark], linha_base: List[Dict],
+                            tolerancia: float) -> List[str]:
+    """Regressões acima da tolerância (fração) em itens/s, MB/s e pico de RSS."""
+    base = {(r["backend"], r["execucao"]): r for r in linha_base if not r.get("erro")}
+    regressoes = []
+    for r in resultados:
+        anterior = base.get((r.backend, r.execucao))
+        if r.erro or anterior is None:
+            continue
+        for campo in ("itens_por_s", "mb_por_s"):
+            if anterior[campo] and getattr(r, campo) < anterior[campo] * (1 - tolerancia):
+                regressoes.append(f"{r.backend}/{r.execucao}: {campo} {getattr(r, campo)} < {anterior[campo]}")
+        if anterior.get("pico_rss_mb") and r.pico_rss_mb and r.pico_rss_mb > anterior["pico_rss_mb"] * (1 + tolerancia):
+            regressoes.append(f"{r.backend}/{r.execucao}: pico_rss_mb {r.pico_rss_mb} > {anterior['pico_rss_mb']}")
+    return regressoes
+
+
+def _imprimir_tabela(resultados: List[ResultadoBenchmark]) -> None:
+    print(f"{'backend':<11} {'execução':<12} {'itens':>8} {'MB':>9} {'s':>8} {'itens/s':>9} "
+          f"{'MB/s':>8} {'RSS MB':>8} {'req. Graph':>10}")
+    for r in resultados:
+        if r.erro:
+            print(f"{r.backend:<11} {r.execucao:<12} ignorado ({r.erro})")
+            continue
+        print(f"{r.backend:<11} {r.execucao:<12} {r.itens:>8} {r.bytes / (1024 * 1024):>9.1f} {r.segundos:>8.2f} "
+              f"{r.itens_por_s:>9.1f} {r.mb_por_s:>8.2f} {r.pico_rss_mb or 0:>8.1f} {r.requisicoes_graph:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do backup contra um Graph sintético")
+    parser.add_argument("--backends", default="local", help=f"Lista separada por vírgulas: {', '.join(BACKENDS)}")
+    parser.add_argument("--sites", type=int, default=1)
+    parser.add_argument("--drives", type=int, default=2, help="Drives por site")
+    parser.add_argument("--profundidade", type=int, default=2)
+    parser.add_argument("--pastas", type=int, default=4, help="Subpastas por pasta")
+    parser.add_argument("--arquivos", type=int, default=50, help="Arquivos por pasta")
+    parser.add_argument("--distribuicao", choices=sorted(DISTRIBUICOES), default="lognormal")
+    parser.add_argument("--tamanho-medio-kb", type=int, default=64)
+    parser.add_argument("--pagina", type=int, default=200, help="Itens por página das listagens")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latência de cada requisição simulada")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração das requisições respondidas com 429")
+    parser.add_argument("--retry-after-ms", type=float, default=0.0)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--delta", action="store_true", help="Usa o modo delta")
+    parser.add_argument("--motor", choices=["threads", "asyncio"], default="threads",
+                        help="Motor da varredura (asyncio: listagens concorrentes no laço de eventos)")
+    parser.add_argument("--deduplicado", action="store_true", help="Usa o modo de snapshot deduplicado")
+    parser.add_argument("--azurite", default=os.environ.get("AZURITE_CONNECTION_STRING", AZURITE_PADRAO),
+                        help="Connection string do Azurite")
+    parser.add_argument("--saida", help="Grava os resultados em JSON (linha de base)")
+    parser.add_argument("--linha-base", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Regressão tolerada (fração, padrão 0.2)")
+    args = parser.parse_args(argv)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    desconhecidos = set(backends) - set(BACKENDS)
+    if desconhecidos:
+        parser.error(f"backend desconhecido: {', '.join(sorted(desconhecidos))}")
+    parametros = ParametrosArvore(
+        sites=args.sites, drives_por_site=args.drives, profundidade=args.profundidade,
+        pastas_por_pasta=args.pastas, arquivos_por_pasta=args.arquivos, distribuicao=args.distribuicao,
+        tamanho_medio=args.tamanho_medio_kb * 1024, tamanho_pagina=args.pagina,
+        latencia_s=args.latencia_ms / 1000, taxa_throttling=args.taxa_429, retry_after_s=args.retry_after_ms / 1000,
+    )
+    opcoes = OpcoesBenchmark(concorrencia=args.concorrencia, modo_delta=args.delta,
+                             modo_snapshot="deduplicado" if args.deduplicado else "completo", motor=args.motor,
+                             azurite=args.azurite)
+    print(f"Árvore: {parametros.total_arquivos} arquivos em {parametros.sites * parametros.drives_por_site} drives")
+
+    resultados: List[ResultadoBenchmark] = []
+    contexto = multiprocessing.get_context("spawn")
+    for backend in backends:
+        # Processo novo por backend: o pico de RSS de um não contamina o outro
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+            resultados.extend(executor.submit(executar_benchmark, backend, parametros, opcoes).result())
+    _imprimir_tabela(resultados)
+
+    if args.saida:
+        Path(args.saida).write_text(json.dumps([asdict(r) for r in resultados], indent=2, ensure_ascii=False),
+                                    encoding="utf-8")
+    if args.linha_base:
+        linha_base = json.loads(Path(args.linha_base).read_text(encoding="utf-8"))
+        regressoes = comparar_com_linha_base(resultados, linha_base, args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}", file=sys.stderr)
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import base64
+import codecs
+import hashlib
+import json
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from .manifesto import ArmazemManifesto, iterar_entradas
+from .pacotes import PREFIXO_PACOTES, abrir_conteudo
+from .storage.base import BackendArmazenamento
+
+# Comentários em Português do Brasil
+# Armazenamento endereçado por conteúdo (modo deduplicado): cada conteúdo é gravado uma única
+# vez em 'blobs/', com chave derivada do hash, e cada snapshot diário passa a ser apenas um
+# manifesto que aponta para esses blobs.
+
+NOME_MANIFESTO_CAS = "manifesto_cas.jsonl"
+# Formato anterior (um único objeto JSON), ainda lido na restauração e na retenção
+NOME_MANIFESTO_CAS_LEGADO = "manifesto_cas.json"
+_TAMANHO_BLOCO_LEITURA = 1024 * 1024
+
+# Ordem de preferência dos hashes devolvidos pelo Graph em driveItem.file.hashes
+HASHES_PREFERIDOS = ("sha256Hash", "quickXorHash", "sha1Hash")
+
+
+def _hash_para_hex(nome_hash: str, valor: str) -> str:
+    """Normaliza o hash para hexadecimal minúsculo (quickXorHash vem em base64)."""
+    if nome_hash == "quickXorHash":
+        return base64.b64decode(valor).hex()
+    return valor.lower()
+
+
+def chave_blob(algoritmo: str, hash_hex: str, tamanho: Optional[int] = None) -> str:
+    """Monta a chave do blob; o tamanho entra na chave para blindar hashes não criptográficos."""
+    sufixo = f"-{tamanho}" if tamanho is not None else ""
+    return f"{algoritmo}/{hash_hex[:2]}/{hash_hex}{sufixo}"
+
+
+def chave_blob_do_item(item: Dict) -> Optional[str]:
+    """Deriva a chave do blob a partir dos hashes informados pelo Graph; None se não houver."""
+    hashes = (item.get("file") or {}).get("hashes") or {}
+    for nome_hash in HASHES_PREFERIDOS:
+        valor = hashes.get(nome_hash)
+        if valor:
+            algoritmo = nome_hash.replace("Hash", "").lower()
+            return chave_blob(algoritmo, _hash_para_hex(nome_hash, valor), item.get("size"))
+    return None
+
+
+def gravar_blob_calculando_hash(armazenamento: BackendArmazenamento, stream) -> str:
+    """Grava um conteúdo sem hash conhecido: calcula sha256 em disco temporário e grava se novo."""
+    sha = hashlib.sha256()
+    tamanho = 0
+    with tempfile.TemporaryFile() as tmp:
+        while True:
+            chunk = stream.read(1024 * 1024)
+            if not chunk:
+                break
+            sha.update(chunk)
+            tamanho += len(chunk)
+            tmp.write(chunk)
+        chave = chave_blob("sha256", sha.hexdigest(), tamanho)
+        base_blobs = armazenamento.obter_base_blobs()
+        if not armazenamento.existe(base_blobs, chave):
+            tmp.seek(0)
+            armazenamento.escrever_stream(base_blobs, chave, tmp)
+    return chave
+
+
+def salvar_manifesto(armazenamento: BackendArmazenamento, base: str,
+                     entradas: Union[Dict[str, Dict], ArmazemManifesto]) -> None:
+    """Grava no backend o manifesto (id do item -> entrada com 'path' e 'blob') de um snapshot.
+
+    O manifesto é JSONL, uma linha {"id": ..., "entrada": ...} por item, montado em arquivo
+    temporário sem serializar tudo em memória. Um manifesto JSON antigo na mesma base é removido.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        for id_item, entrada in iterar_entradas(entradas):
+            linha = json.dumps({"id": id_item, "entrada": entrada}, ensure_ascii=False)
+            tmp.write(linha.encode("utf-8") + b"\n")
+        tamanho = tmp.tell()
+        tmp.seek(0)
+        armazenamento.escrever_stream(base, NOME_MANIFESTO_CAS, tmp, tamanho)
+    if armazenamento.existe(base, NOME_MANIFESTO_CAS_LEGADO):
+        armazenamento.apagar(base, NOME_MANIFESTO_CAS_LEGADO)
+
+
+def existe_manifesto(armazenamento: BackendArmazenamento, base: str) -> bool:
+    """Indica se a base tem manifesto deduplicado (JSONL ou no formato JSON antigo)."""
+    return (armazenamento.existe(base, NOME_MANIFESTO_CAS)
+            or armazenamento.existe(base, NOME_MANIFESTO_CAS_LEGADO))
+
+
+def _itens_jsonl(stream) -> Iterator[Tuple[str, Dict]]:
+    """Lê o manifesto JSONL linha a linha, em blocos."""
+    resto = b""
+    while True:
+        bloco = stream.read(_TAMANHO_BLOCO_LEITURA)
+        if not bloco:
+            break
+        linhas = (resto + bloco).split(b"\n")
+        resto = linhas.pop()
+        for linha in linhas:
+            if linha.strip():
+                registro = json.loads(linha)
+                yield registro["id"], registro["entrada"]
+    if resto.strip():
+        registro = json.loads(resto)
+        yield registro["id"], registro["entrada"]
+
+
+def _itens_json_legado(stream) -> Iterator[Tuple[str, Dict]]:
+    """Lê o manifesto JSON antigo ({id: entrada, ...}) par a par, sem montar o dicionário."""
+    decodificador = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    texto, pos, fim = "", 0, False
+
+    def carregar() -> None:
+        nonlocal texto, pos, fim
+        if fim:
+            raise ValueError("Manifesto CAS truncado")
+        bloco = stream.read(_TAMANHO_BLOCO_LEITURA)
+        fim = not bloco
+        texto = texto[pos:] + utf8.decode(bloco, final=fim)
+        pos = 0
+
+    def simbolo() -> str:
+        """Próximo caractere que não é espaço (sem consumi-lo)."""
+        nonlocal pos
+        while True:
+            while pos < len(texto) and texto[pos].isspace():
+                pos += 1
+            if pos < len(texto):
+                return texto[pos]
+            carregar()
+
+    def valor():
+        nonlocal pos
+        simbolo()
+        while True:
+            try:
+                objeto, fim_valor = decodificador.raw_decode(texto, pos)
+                # Valor colado ao fim do bloco pode estar incompleto (ex.: número partido)
+                if fim_valor < len(texto) or fim:
+                    pos = fim_valor
+                    return objeto
+            except json.JSONDecodeError:
+                if fim:
+                    raise
+            carregar()
+
+    if simbolo() != "{":
+        raise ValueError("Manifesto CAS inválido: esperado um objeto JSON")
+    pos += 1
+    if simbolo() == "}":
+        return
+    while True:
+        id_item = valor()
+        if simbolo() != ":":
+            raise ValueError("Manifesto CAS inválido: esperado ':'")
+        pos += 1
+        yield id_item, valor()
+        separador = simbolo()
+        pos += 1
+        if separador == "}":
+            return
+        if separador != ",":
+            raise ValueError("Manifesto CAS inválido: esperado ',' ou '}'")
+
+
+def iterar_manifesto(armazenamento: BackendArmazenamento, base: str) -> Iterator[Tuple[str, Dict]]:
+    """Percorre os pares (id, entrada) do manifesto de um snapshot deduplicado; vazio se não existir.
+
+    Lê em stream, sem carregar o manifesto inteiro em memória; snapshots gravados antes do
+    formato JSONL ('manifesto_cas.json') também são lidos assim.
+    """
+    if armazenamento.existe(base, NOME_MANIFESTO_CAS):
+        nome, leitor = NOME_MANIFESTO_CAS, _itens_jsonl
+    elif armazenamento.existe(base, NOME_MANIFESTO_CAS_LEGADO):
+        nome, leitor = NOME_MANIFESTO_CAS_LEGADO, _itens_json_legado
+    else:
+        return
+    stream = armazenamento.ler_stream(base, nome)
+    try:
+        yield from leitor(stream)
+    finally:
+        fechar = getattr(stream, "close", None)
+        if fechar:
+            fechar()
+
+
+def restaurar_snapshot(armazenamento: BackendArmazenamento, base_snapshot: str,
+                       destino: BackendArmazenamento, base_destino: str) -> int:
+    """Reconstrói a árvore de arquivos de um snapshot deduplicado em outro backend/base.
+
+    Lê o manifesto do snapshot e copia cada blob (ou membro de segmento empacotado) para
+    'base_destino/<path>'. Retorna o número de arquivos restaurados.
+    """
+    total = 0
+    for _, entrada in iterar_manifesto(armazenamento, base_snapshot):
+        caminho = entrada.get("path")
+        if not entrada.get("blob") or not caminho:
+            continue
+        stream = abrir_conteudo(armazenamento, entrada)
+        try:
+            destino.escrever_stream(base_destino, caminho, stream)
+        finally:
+            fechar = getattr(stream, "close", None)
+            if fechar:
+                fechar()
+        total += 1
+    return total
+
+
+@dataclass
+class ResultadoVerificacao:
+    blobs: int = 0
+    # Blobs sha256 cujo hash foi conferido (no backend local, pelo índice de hashes)
+    hashes_conferidos: int = 0
+    divergentes: List[str] = field(default_factory=list)
+
+
+def verificar_blobs(armazenamento: BackendArmazenamento) -> ResultadoVerificacao:
+    """Confere cada blob com a própria chave: o tamanho e, nas chaves sha256, o hash do conteúdo.
+
+    O hash vem de 'hash_conteudo' (índice do backend local: só arquivos ausentes do índice ou
+    com tamanho ou mtime alterados são relidos); backends sem índice são conferidos apenas pelo
+    tamanho. Segmentos empacotados e temporários de gravações interrompidas são ignorados.
+    """
+    resultado = ResultadoVerificacao()
+    base_blobs = armazenamento.obter_base_blobs()
+    for chave, tamanho in armazenamento.listar_prefixo_com_tamanho(base_blobs):
+        algoritmo, _, resto = chave.partition("/")
+        if algoritmo == PREFIXO_PACOTES or not resto or chave.endswith(".tmp"):
+            continue
+        resultado.blobs += 1
+        hash_hex, _, sufixo = resto.rpartition("/")[2].partition("-")
+        if sufixo and sufixo != str(tamanho):
+            resultado.divergentes.append(chave)
+            continue
+        if algoritmo == "sha256":
+            calculado = armazenamento.hash_conteudo(base_blobs, chave, recalcular=True)
+            if calculado is None:
+                continue
+            resultado.hashes_conferidos += 1
+            if calculado != hash_hex:
+                resultado.divergentes.append(chave)
+    return resultado
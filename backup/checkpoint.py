@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+# Comentários em Português do Brasil
+# Journal de checkpoint: registro append-only dos itens já gravados no snapshot corrente.
+# Se a execução for interrompida, uma nova execução sobre o mesmo snapshot pula esses itens.
+
+NOME_JOURNAL = "journal.jsonl"
+
+
+def gravar_texto_atomico(caminho: Path, texto: str) -> None:
+    """Grava o arquivo em um temporário e renomeia, evitando arquivos truncados em caso de falha."""
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(texto)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+class JournalExecucao:
+    """Registra, em modo append-only e seguro entre threads, os itens concluídos da execução.
+
+    A primeira linha identifica o snapshot ao qual o journal pertence; cada linha seguinte
+    contém o ID do item e sua entrada de manifesto (caminho e tags). Os dados são enviados
+    ao disco (fsync) a cada 'intervalo_sync' registros.
+    """
+
+    def __init__(self, diretorio_estado: Path, base_snapshot: str, intervalo_sync: int = 50,
+                 nome_arquivo: str = NOME_JOURNAL):
+        self.caminho = diretorio_estado / nome_arquivo
+        self.base_snapshot = base_snapshot
+        self.intervalo_sync = max(1, int(intervalo_sync))
+        self._lock = threading.Lock()
+        self._arquivo = None
+        self._pendentes_sync = 0
+
+    def carregar(self) -> Dict[str, Dict]:
+        """Retorna os itens concluídos por uma execução anterior do mesmo snapshot.
+
+        Journals de outro snapshot são descartados; uma última linha truncada (queda durante a
+        escrita) é ignorada.
+        """
+        concluidos: Dict[str, Dict] = {}
+        if not self.caminho.exists():
+            return concluidos
+        with open(self.caminho, encoding="utf-8") as f:
+            cabecalho: Optional[Dict] = None
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue
+                if cabecalho is None:
+                    cabecalho = registro
+                    if cabecalho.get("base_snapshot") != self.base_snapshot:
+                        return {}
+                    continue
+                if registro.get("id") and isinstance(registro.get("entrada"), dict):
+                    concluidos[registro["id"]] = registro["entrada"]
+        return concluidos
+
+    def abrir(self, continuar: bool) -> None:
+        """Abre o journal para escrita; sem 'continuar' recomeça com um novo cabeçalho."""
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        if continuar and self.caminho.exists():
+            self._arquivo = open(self.caminho, "a", encoding="utf-8")
+            return
+        self._arquivo = open(self.caminho, "w", encoding="utf-8")
+        self._arquivo.write(json.dumps({"base_snapshot": self.base_snapshot}, ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+
+    def registrar(self, id_item: str, entrada: Dict) -> None:
+        """Acrescenta um item concluído ao journal."""
+        linha = json.dumps({"id": id_item, "entrada": entrada}, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._arquivo is None:
+                return
+            self._arquivo.write(linha)
+            self._arquivo.flush()
+            self._pendentes_sync += 1
+            if self._pendentes_sync >= self.intervalo_sync:
+                os.fsync(self._arquivo.fileno())
+                self._pendentes_sync = 0
+
+    def fechar(self) -> None:
+        """Sincroniza e fecha o journal mantendo-o em disco (execução interrompida)."""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+                self._arquivo.close()
+                self._arquivo = None
+
+    def concluir(self) -> None:
+        """Fecha e remove o journal após o estado final ter sido salvo."""
+        self.fechar()
+        if self.caminho.exists():
+            self.caminho.unlink()
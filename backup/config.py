@@ -23,12 +23,103 @@ class ConfigS3:
     region_name: Optional[str] = None
     aws_access_key_id: Optional[str] = None
     aws_secret_access_key: Optional[str] = None
+    # Upload multipart: tamanho da parte, partes em paralelo por arquivo e limiar para multipart
+    tamanho_parte_mb: int = 8
+    concorrencia_upload: int = 4
+    limiar_multipart_mb: int = 8
+    # Arquivos >= limiar vão para disco antes do upload em partes paralelas (0 desativa)
+    limiar_spool_mb: int = 0
+    diretorio_spool: Optional[str] = None
 
 
 @dataclass
 class ConfigAzureBlob:
     connection_string: Optional[str] = None
     container_name: Optional[str] = None
+    # Upload em blocos: tamanho do bloco, blocos em paralelo por arquivo e limite do envio único
+    tamanho_bloco_mb: int = 8
+    concorrencia_upload: int = 4
+    limiar_upload_unico_mb: int = 64
+    # Arquivos >= limiar vão para disco antes do envio de blocos em paralelo (0 desativa)
+    limiar_spool_mb: int = 0
+    diretorio_spool: Optional[str] = None
+
+
+@dataclass
+class ConfigGraph:
+    # Pool de conexões HTTP e política de retentativas do cliente Graph
+    tamanho_pool: int = 16
+    max_tentativas: int = 6
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+    # Teto opcional do Retry-After enviado pelo Graph, em segundos (0 = respeita o valor inteiro)
+    retry_after_max: float = 0.0
+    timeout_conexao: float = 10.0
+    timeout_leitura: float = 300.0
+    # Requisições agrupadas por chamada POST /$batch (1 desativa o agrupamento; máximo 20)
+    tamanho_lote: int = 20
+    # Arquivos >= limiar são baixados em faixas (Range) paralelas via downloadUrl (0 desativa)
+    limiar_download_paralelo_mb: int = 256
+    tamanho_faixa_mb: int = 16
+    conexoes_por_arquivo: int = 4
+    # Restauração: arquivos acima do limiar usam sessão de upload em fragmentos (múltiplos de 320 KiB)
+    limiar_sessao_upload_mb: int = 4
+    tamanho_fragmento_upload_mb: int = 10
+    # Motor asyncio: pastas listadas ao mesmo tempo e conexões simultâneas por host
+    listagens_simultaneas: int = 32
+    conexoes_por_host: int = 32
+    # Limitador adaptativo (AIMD) compartilhado por todas as chamadas, em requisições/s:
+    # começa em taxa_inicial, cai pela metade a cada throttling e sobe até taxa_maxima (0 desativa)
+    taxa_inicial: float = 20.0
+    taxa_minima: float = 1.0
+    taxa_maxima: float = 200.0
+    # Cache de sites, drives e raízes em <diretorio_estado>/cache_metadados.json: validade em horas
+    # (0 desativa; sorteada entre 75% e 100%, então a execução diária seguinte sempre o aproveita)
+    # e intervalo em dias entre renovações completas (0 desativa)
+    cache_metadados_horas: float = 72.0
+    cache_metadados_renovacao_dias: float = 7.0
+
+
+@dataclass
+class ConfigRetencao:
+    # Snapshots mantidos pela poda: últimos N dias, N semanas e N meses (0 desativa cada regra)
+    diarios: int = 0
+    semanais: int = 0
+    mensais: int = 0
+    # Prefixos deleted/YYYY-MM-DD mais antigos que N dias são removidos (0 mantém todos)
+    dias_apagados: int = 0
+
+
+@dataclass
+class ConfigFiltros:
+    # Globs sobre 'Site/Drive/caminho' (com '/') ou sobre o nome (sem '/'), sem diferenciar maiúsculas.
+    # Pastas excluídas não são listadas; inclusões (se houver) restringem apenas os arquivos
+    incluir: List[str] = field(default_factory=list)
+    excluir: List[str] = field(default_factory=list)
+    # Arquivos maiores que o limite são ignorados (0 = sem limite)
+    tamanho_maximo_mb: int = 0
+
+
+@dataclass
+class ConfigEmpacotamento:
+    # Modo deduplicado: conteúdos até limiar_kb vão para segmentos tar de tamanho_segmento_mb
+    # em vez de um objeto cada (0 desativa); compressão de cada membro: nenhuma | gzip | zstd
+    limiar_kb: int = 0
+    tamanho_segmento_mb: int = 64
+    compressao: str = "gzip"
+
+
+@dataclass
+class ConfigMetricas:
+    # Exibição do progresso: auto (barra em terminal; fora dele, só o arquivo de resumo) | barra |
+    # json (resumo também no stdout) | desligado
+    progresso: str = "auto"
+    intervalo_s: float = 2.0
+    # Saídas opcionais para o Prometheus: arquivo do textfile collector e URL do Pushgateway
+    arquivo_prometheus: Optional[str] = None
+    pushgateway_url: Optional[str] = None
+    # Perfilador da execução: desligado | cprofile | pyinstrument (relatório em <diretorio_estado>/perfil)
+    perfil: str = "desligado"
 
 
 @dataclass
@@ -41,12 +132,42 @@ class ConfigAplicativo:
     # Parâmetros de backup
     backup_backend: str = "local"  # valores: local | s3 | azure_blob
     backup_dir: str = "backups"
+    # Backend local: índice de hashes em <backup_dir>/indice_hashes.sqlite (deduplicação e verificação)
+    indice_hashes: bool = True
     snapshot_diario: bool = True
     sites: List[str] = field(default_factory=list)
+    # Modo incremental via consultas delta do Graph (/drives/{id}/root/delta)
+    modo_delta: bool = False
+    # Reaproveita arquivos inalterados (cTag/eTag/size) do snapshot anterior sem novo download
+    pular_inalterados: bool = True
+    # Formato do snapshot: completo (cópia de cada arquivo por dia) | deduplicado (blobs por hash + manifesto)
+    modo_snapshot: str = "completo"
+    # Checkpoint: fsync do journal de itens concluídos a cada N registros
+    intervalo_checkpoint: int = 50
+    # Transferências concorrentes: número de workers e tamanho máximo da fila (contrapressão)
+    concorrencia: int = 4
+    tamanho_fila: int = 64
+    # Motor da varredura: threads (listagens em $batch numa thread) | asyncio (listagens concorrentes
+    # num laço de eventos; cliente httpx, ver [graph] listagens_simultaneas e conexoes_por_host)
+    motor: str = "threads"
+    # Diretório do estado local (manifesto, deltaLinks, journal, manifestos parciais dos shards)
+    diretorio_estado: str = "state"
+    # Shards: divisão por site ou drive entre processos locais ou entre máquinas
+    shard_por: str = "site"  # valores: site | drive
+    processos: int = 1
+    total_shards: int = 1
+    indice_shard: Optional[int] = None
+    # Ignora o cache de metadados nesta execução e o regrava (app.py --atualizar-metadados)
+    atualizar_metadados: bool = False
 
     # Backends externos
     s3: ConfigS3 = field(default_factory=ConfigS3)
     azure_blob: ConfigAzureBlob = field(default_factory=ConfigAzureBlob)
+    graph: ConfigGraph = field(default_factory=ConfigGraph)
+    retencao: ConfigRetencao = field(default_factory=ConfigRetencao)
+    filtros: ConfigFiltros = field(default_factory=ConfigFiltros)
+    empacotamento: ConfigEmpacotamento = field(default_factory=ConfigEmpacotamento)
+    metricas: ConfigMetricas = field(default_factory=ConfigMetricas)
 
 
 def carregar_configuracao(path: Path = Path("credentials.toml")) -> ConfigAplicativo:
@@ -65,6 +186,24 @@ def carregar_configuracao(path: Path = Path("credentials.toml")) -> ConfigAplica
         backup_dir = os.environ.get("BACKUP_DIR", "backups")
         snap_env = (os.environ.get("SNAPSHOT_DIARIO", "true") or "true").strip().lower()
         snapshot_diario = snap_env not in {"false", "0", "no", "n"}
+        delta_env = (os.environ.get("MODO_DELTA", "false") or "false").strip().lower()
+        modo_delta = delta_env in {"true", "1", "yes", "y", "sim", "s"}
+        hashes_env = (os.environ.get("INDICE_HASHES", "true") or "true").strip().lower()
+        indice_hashes = hashes_env not in {"false", "0", "no", "n"}
+        pular_env = (os.environ.get("PULAR_INALTERADOS", "true") or "true").strip().lower()
+        pular_inalterados = pular_env not in {"false", "0", "no", "n"}
+        modo_snapshot = (os.environ.get("MODO_SNAPSHOT", "completo") or "completo").strip().lower()
+        concorrencia = int(os.environ.get("CONCORRENCIA", "4") or "4")
+        tamanho_fila = int(os.environ.get("TAMANHO_FILA", "64") or "64")
+        motor = (os.environ.get("MOTOR", "threads") or "threads").strip().lower()
+        diretorio_estado = os.environ.get("DIRETORIO_ESTADO", "state") or "state"
+        shard_por = (os.environ.get("SHARD_POR", "site") or "site").strip().lower()
+        processos = int(os.environ.get("PROCESSOS", "1") or "1")
+        total_shards = int(os.environ.get("TOTAL_SHARDS", "1") or "1")
+        indice_env = (os.environ.get("INDICE_SHARD") or "").strip()
+        indice_shard = int(indice_env) if indice_env else None
+        atualizar_env = (os.environ.get("ATUALIZAR_METADADOS", "false") or "false").strip().lower()
+        atualizar_metadados = atualizar_env in {"true", "1", "yes", "y", "sim", "s"}
 
         sites_raw = (os.environ.get("SITES") or "").strip()
         sites = [s.strip() for s in sites_raw.split(",") if s.strip()] if sites_raw else []
@@ -81,16 +220,83 @@ def carregar_configuracao(path: Path = Path("credentials.toml")) -> ConfigAplica
             "container_name": os.environ.get("AZURE_CONTAINER_NAME"),
         }
 
+        # Ajustes opcionais de upload: só entram quando definidos, preservando os defaults
+        for secao, prefixo, campos in (
+            (s3, "S3_", ("tamanho_parte_mb", "concorrencia_upload", "limiar_multipart_mb", "limiar_spool_mb")),
+            (azure_blob, "AZURE_", ("tamanho_bloco_mb", "concorrencia_upload", "limiar_upload_unico_mb", "limiar_spool_mb")),
+        ):
+            for campo in campos:
+                valor = os.environ.get(prefixo + campo.upper())
+                if valor:
+                    secao[campo] = int(valor)
+
+        graph = {}
+        if os.environ.get("GRAPH_TAMANHO_POOL"):
+            graph["tamanho_pool"] = int(os.environ["GRAPH_TAMANHO_POOL"])
+        if os.environ.get("GRAPH_MAX_TENTATIVAS"):
+            graph["max_tentativas"] = int(os.environ["GRAPH_MAX_TENTATIVAS"])
+        for campo in ("retry_after_max", "taxa_inicial", "taxa_minima", "taxa_maxima", "cache_metadados_horas",
+                      "cache_metadados_renovacao_dias"):
+            valor = os.environ.get("GRAPH_" + campo.upper())
+            if valor:
+                graph[campo] = float(valor)
+
+        retencao = {}
+        for campo in ("diarios", "semanais", "mensais", "dias_apagados"):
+            valor = os.environ.get("RETENCAO_" + campo.upper())
+            if valor:
+                retencao[campo] = int(valor)
+
+        filtros: Dict = {}
+        for campo in ("incluir", "excluir"):
+            valor = (os.environ.get("FILTROS_" + campo.upper()) or "").strip()
+            if valor:
+                filtros[campo] = [p.strip() for p in valor.split(",") if p.strip()]
+        if os.environ.get("FILTROS_TAMANHO_MAXIMO_MB"):
+            filtros["tamanho_maximo_mb"] = int(os.environ["FILTROS_TAMANHO_MAXIMO_MB"])
+
+        empacotamento: Dict = {}
+        for campo in ("limiar_kb", "tamanho_segmento_mb"):
+            valor = os.environ.get("EMPACOTAMENTO_" + campo.upper())
+            if valor:
+                empacotamento[campo] = int(valor)
+        if os.environ.get("EMPACOTAMENTO_COMPRESSAO"):
+            empacotamento["compressao"] = os.environ["EMPACOTAMENTO_COMPRESSAO"]
+
+        metricas = {}
+        for campo in ("progresso", "arquivo_prometheus", "pushgateway_url", "perfil"):
+            valor = os.environ.get("METRICAS_" + campo.upper())
+            if valor:
+                metricas[campo] = valor
+
         return {
             "tenant_id": tenant_id,
             "client_id": client_id,
             "client_secret": client_secret,
             "backup_backend": backup_backend,
             "backup_dir": backup_dir,
+            "indice_hashes": indice_hashes,
             "snapshot_diario": snapshot_diario,
+            "modo_delta": modo_delta,
+            "pular_inalterados": pular_inalterados,
+            "modo_snapshot": modo_snapshot,
+            "concorrencia": concorrencia,
+            "tamanho_fila": tamanho_fila,
+            "motor": motor,
+            "diretorio_estado": diretorio_estado,
+            "shard_por": shard_por,
+            "processos": processos,
+            "total_shards": total_shards,
+            "indice_shard": indice_shard,
+            "atualizar_metadados": atualizar_metadados,
             "sites": sites,
             "s3": s3,
             "azure_blob": azure_blob,
+            "graph": graph,
+            "retencao": retencao,
+            "filtros": filtros,
+            "empacotamento": empacotamento,
+            "metricas": metricas,
         }
 
     if path.exists():
@@ -106,11 +312,52 @@ def carregar_configuracao(path: Path = Path("credentials.toml")) -> ConfigAplica
     # Defaults e construção
     backup_backend = data.get("backup_backend", "local")
     backup_dir = data.get("backup_dir", "backups")
+    indice_hashes = bool(data.get("indice_hashes", True))
     snapshot_diario = bool(data.get("snapshot_diario", True))
+    modo_delta = bool(data.get("modo_delta", False))
+    pular_inalterados = bool(data.get("pular_inalterados", True))
+    modo_snapshot = str(data.get("modo_snapshot", "completo")).strip().lower()
+    if modo_snapshot not in {"completo", "deduplicado"}:
+        raise ValueError(f"modo_snapshot inválido: {modo_snapshot}")
+    intervalo_checkpoint = max(1, int(data.get("intervalo_checkpoint", 50)))
+    concorrencia = max(1, int(data.get("concorrencia", 4)))
+    tamanho_fila = max(1, int(data.get("tamanho_fila", 64)))
+    motor = str(data.get("motor", "threads")).strip().lower()
+    if motor not in {"threads", "asyncio"}:
+        raise ValueError(f"motor inválido: {motor}")
     sites = data.get("sites", []) or []
+    diretorio_estado = str(data.get("diretorio_estado", "state") or "state")
+    shard_por = str(data.get("shard_por", "site")).strip().lower()
+    if shard_por not in {"site", "drive"}:
+        raise ValueError(f"shard_por inválido: {shard_por}")
+    processos = max(1, int(data.get("processos", 1)))
+    total_shards = max(1, int(data.get("total_shards", 1)))
+    indice_shard = data.get("indice_shard")
+    if indice_shard is not None:
+        indice_shard = int(indice_shard)
+        if not 0 <= indice_shard < total_shards:
+            raise ValueError(f"indice_shard deve estar entre 0 e {total_shards - 1}: {indice_shard}")
+    atualizar_metadados = bool(data.get("atualizar_metadados", False))
 
     s3cfg = ConfigS3(**data.get("s3", {}))
     azcfg = ConfigAzureBlob(**data.get("azure_blob", {}))
+    graphcfg = ConfigGraph(**data.get("graph", {}))
+    graphcfg.tamanho_lote = max(1, min(20, int(graphcfg.tamanho_lote)))
+    retencaocfg = ConfigRetencao(**data.get("retencao", {}))
+    filtroscfg = ConfigFiltros(**data.get("filtros", {}))
+    empacotamentocfg = ConfigEmpacotamento(**data.get("empacotamento", {}))
+    empacotamentocfg.compressao = str(empacotamentocfg.compressao).strip().lower()
+    if empacotamentocfg.compressao not in {"nenhuma", "gzip", "zstd"}:
+        raise ValueError(f"compressao inválida: {empacotamentocfg.compressao}")
+    if empacotamentocfg.limiar_kb > 0 and modo_snapshot != "deduplicado":
+        raise ValueError("empacotamento requer modo_snapshot = \"deduplicado\"")
+    metricascfg = ConfigMetricas(**data.get("metricas", {}))
+    metricascfg.progresso = str(metricascfg.progresso).strip().lower()
+    if metricascfg.progresso not in {"auto", "barra", "json", "desligado"}:
+        raise ValueError(f"progresso inválido: {metricascfg.progresso}")
+    metricascfg.perfil = str(metricascfg.perfil).strip().lower()
+    if metricascfg.perfil not in {"desligado", "cprofile", "pyinstrument"}:
+        raise ValueError(f"perfil inválido: {metricascfg.perfil}")
 
     return ConfigAplicativo(
         tenant_id=data["tenant_id"],
@@ -118,8 +365,27 @@ def carregar_configuracao(path: Path = Path("credentials.toml")) -> ConfigAplica
         client_secret=data["client_secret"],
         backup_backend=backup_backend,
         backup_dir=backup_dir,
+        indice_hashes=indice_hashes,
         snapshot_diario=snapshot_diario,
+        modo_delta=modo_delta,
+        pular_inalterados=pular_inalterados,
+        modo_snapshot=modo_snapshot,
+        intervalo_checkpoint=intervalo_checkpoint,
+        concorrencia=concorrencia,
+        tamanho_fila=tamanho_fila,
+        motor=motor,
+        diretorio_estado=diretorio_estado,
+        shard_por=shard_por,
+        processos=processos,
+        total_shards=total_shards,
+        indice_shard=indice_shard,
+        atualizar_metadados=atualizar_metadados,
         sites=sites,
         s3=s3cfg,
         azure_blob=azcfg,
+        graph=graphcfg,
+        retencao=retencaocfg,
+        filtros=filtroscfg,
+        empacotamento=empacotamentocfg,
+        metricas=metricascfg,
     )
\ No newline at end of file
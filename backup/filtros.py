@@ -0,0 +1,80 @@
+import fnmatch
+from typing import Iterable, List, Optional
+
+# Comentários em Português do Brasil
+# Filtros da varredura: globs de inclusão/exclusão e tamanho máximo dos arquivos. Pastas
+# excluídas são podadas antes da listagem dos filhos, de modo que a subárvore inteira não
+# custa listagem nem transferência. A comparação ignora maiúsculas/minúsculas, como o
+# SharePoint.
+
+
+def _normalizar(padroes: Iterable[str], podar_sufixo: bool = False) -> List[str]:
+    """Padrões em minúsculas e sem barras nas pontas.
+
+    Com 'podar_sufixo' (exclusões) o sufixo '/**' ou '/*' é removido: a pasta já basta, pois é
+    podada antes da listagem. Inclusões mantêm o glob, que é comparado com o caminho do arquivo.
+    """
+    normalizados = []
+    for padrao in padroes:
+        padrao = padrao.strip().replace("\\", "/").strip("/").lower()
+        while podar_sufixo and (padrao.endswith("/**") or padrao.endswith("/*")):
+            padrao = padrao.rsplit("/", 1)[0]
+        if padrao:
+            normalizados.append(padrao)
+    return normalizados
+
+
+def _corresponde(caminho: str, padroes: List[str], ancestrais: bool = False) -> bool:
+    """Padrões com '/' valem para o caminho 'Site/Drive/...'; os demais, para o nome.
+
+    Com 'ancestrais' os padrões com '/' também valem para as pastas do caminho (inclusão de
+    'Site/Drive/docs' abrange os arquivos dentro dela).
+    """
+    caminho = caminho.lower()
+    partes = caminho.split("/")
+    nome = partes[-1]
+    caminhos = ["/".join(partes[:fim]) for fim in range(len(partes), 0, -1)] if ancestrais else [caminho]
+    return any(
+        any(fnmatch.fnmatchcase(c, p) for c in caminhos) if "/" in p else fnmatch.fnmatchcase(nome, p)
+        for p in padroes
+    )
+
+
+class FiltroItens:
+    """Decide quais pastas são percorridas e quais arquivos entram no backup.
+
+    Caminhos são relativos ao snapshot ('Site/Drive/pasta/arquivo.ext'). Exclusões valem para
+    pastas e arquivos; inclusões, quando existem, apenas para arquivos (uma pasta pode conter
+    arquivos incluídos em qualquer nível).
+    """
+
+    def __init__(self, incluir: Iterable[str] = (), excluir: Iterable[str] = (),
+                 tamanho_maximo: Optional[int] = None):
+        self.incluir = _normalizar(incluir)
+        self.excluir = _normalizar(excluir, podar_sufixo=True)
+        self.tamanho_maximo = tamanho_maximo or None
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.incluir or self.excluir or self.tamanho_maximo)
+
+    def pasta_excluida(self, caminho: str) -> bool:
+        """Pasta que não deve ser listada (nem seus descendentes)."""
+        return bool(self.excluir) and _corresponde(caminho, self.excluir)
+
+    def arquivo_incluido(self, caminho: str, tamanho: Optional[int]) -> bool:
+        """Arquivo de uma pasta já aceita: regras de exclusão, inclusão e tamanho máximo."""
+        if self.tamanho_maximo and (tamanho or 0) > self.tamanho_maximo:
+            return False
+        if self.excluir and _corresponde(caminho, self.excluir):
+            return False
+        return not self.incluir or _corresponde(caminho, self.incluir, ancestrais=True)
+
+    def caminho_incluido(self, caminho: str, tamanho: Optional[int]) -> bool:
+        """Como 'arquivo_incluido', verificando também as pastas ancestrais (modo delta, em que
+        o feed traz o drive inteiro e não há listagem a podar)."""
+        partes = caminho.split("/")
+        for fim in range(1, len(partes)):
+            if self.pasta_excluida("/".join(partes[:fim])):
+                return False
+        return self.arquivo_incluido(caminho, tamanho)
@@ -1,29 +1,245 @@
-from typing import Dict, List, Optional
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from .limitador import LimitadorAdaptativo
 
 # Comentários em Português do Brasil
 # Este módulo encapsula chamadas ao Microsoft Graph para SharePoint.
 
 GRAPH_URL_BASE = "https://graph.microsoft.com/v1.0"
 
+# Status transitórios em que o Graph pede nova tentativa (throttling e indisponibilidade)
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+# Limite de requisições por chamada JSON batching (POST /$batch)
+TAMANHO_MAXIMO_LOTE = 20
+
+# Upload: PUT simples até este tamanho; acima dele, sessão de upload em fragmentos
+LIMITE_UPLOAD_SIMPLES = 4 * 1024 * 1024
+# Fragmentos de uma sessão de upload precisam ser múltiplos de 320 KiB (máximo de 60 MiB)
+MULTIPLO_FRAGMENTO_UPLOAD = 320 * 1024
+MAXIMO_FRAGMENTO_UPLOAD = 60 * 1024 * 1024
+
+# Token fixo (str) ou provedor chamável (ex.: auth.ProvedorToken) consultado a cada requisição
+FonteToken = Union[str, Callable[[], str]]
+
+
+def resolver_token(token: FonteToken) -> str:
+    """Retorna o token a usar nesta requisição, consultando o provedor quando houver."""
+    return token() if callable(token) else token
+
+
+def segundos_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """Valor do cabeçalho Retry-After (segundos ou data HTTP) em segundos; None se ausente ou inválido."""
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        try:
+            data = parsedate_to_datetime(retry_after)
+            return max(0.0, (data - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+def _limitar_retry_after(segundos: float, retry_after_max: float) -> float:
+    """Retry-After integral; 'retry_after_max' > 0 impõe um teto explícito (0 = sem teto)."""
+    return min(segundos, retry_after_max) if retry_after_max > 0 else segundos
+
+
+def calcular_espera(retry_after: Optional[str], tentativa: int, backoff_base: float, backoff_max: float,
+                    retry_after_max: float = 0.0) -> float:
+    """Espera antes da próxima tentativa: Retry-After (segundos ou data HTTP), respeitado por
+    inteiro, ou backoff exponencial com jitter limitado a 'backoff_max'."""
+    segundos = segundos_retry_after(retry_after)
+    if segundos is not None:
+        return _limitar_retry_after(segundos, retry_after_max)
+    teto = min(backoff_max, backoff_base * (2 ** tentativa))
+    # Full jitter: espalha as retentativas de workers concorrentes
+    return random.uniform(0, teto)
+
+
+def informar_limitador(limitador: Optional[LimitadorAdaptativo], status: int, retry_after: Optional[str],
+                       retry_after_max: float = 0.0) -> None:
+    """Repassa ao limitador o resultado de uma requisição: throttling (429, ou 503 com Retry-After,
+    como o SharePoint responde) reduz a taxa; respostas sem erro transitório permitem aumentá-la."""
+    if limitador is None:
+        return
+    segundos = segundos_retry_after(retry_after)
+    if status == 429 or (status == 503 and segundos is not None):
+        pausa = _limitar_retry_after(segundos, retry_after_max) if segundos is not None else None
+        limitador.registrar_throttling(pausa)
+    elif status not in STATUS_RETENTAVEIS:
+        limitador.registrar_sucesso()
+
+
+class ClienteGraph:
+    """Cliente HTTP do Graph com sessão compartilhada, pool de conexões e retentativas.
+
+    Reutiliza conexões TLS (keep-alive), respeita o cabeçalho Retry-After em respostas de
+    throttling e aplica backoff exponencial com jitter nos demais erros transitórios. Com um
+    'limitador', cada tentativa aguarda sua vez no balde de fichas compartilhado.
+    """
+
+    def __init__(self, tamanho_pool: int = 16, max_tentativas: int = 6, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, timeout_conexao: float = 10.0, timeout_leitura: float = 300.0,
+                 dormir: Callable[[float], None] = time.sleep, limitador: Optional[LimitadorAdaptativo] = None,
+                 retry_after_max: float = 0.0):
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self._dormir = dormir
+        self.limitador = limitador
+        # Contadores de requisições, retentativas e throttling (429), lidos pelas métricas da execução
+        self._contadores: Dict[str, int] = {"requisicoes": 0, "retentativas": 0, "throttling": 0}
+        self._lock_contadores = threading.Lock()
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=0)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+        # Respostas JSON comprimidas; downloads pedem 'identity' (ver obter_stream)
+        self.sessao.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def contar(self, nome: str) -> None:
+        with self._lock_contadores:
+            self._contadores[nome] = self._contadores.get(nome, 0) + 1
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Cópia dos contadores de requisições, retentativas e respostas 429 (e do limitador, se houver)."""
+        with self._lock_contadores:
+            dados = dict(self._contadores)
+        if self.limitador is not None:
+            dados.update(self.limitador.estatisticas())
+        return dados
+
+    def _aguardar_vez(self, custo: float = 1.0) -> None:
+        if self.limitador is not None:
+            espera = self.limitador.reservar(custo)
+            if espera > 0:
+                self._dormir(espera)
+
+    def _tempo_espera(self, resposta: Optional[requests.Response], tentativa: int) -> float:
+        """Calcula a espera antes da próxima tentativa: Retry-After ou backoff exponencial com jitter."""
+        retry_after = resposta.headers.get("Retry-After") if resposta is not None else None
+        return calcular_espera(retry_after, tentativa, self.backoff_base, self.backoff_max, self.retry_after_max)
+
+    def requisitar(self, metodo: str, url: str, token: Optional[FonteToken], params: Optional[Dict] = None,
+                   stream: bool = False, headers: Optional[Dict] = None,
+                   json: Optional[Dict] = None, data: Optional[bytes] = None, custo: float = 1.0) -> requests.Response:
+        """Requisição com retentativas; lança requests.HTTPError em status não transitório ou esgotadas as tentativas.
+
+        Com 'token' None a requisição vai sem Authorization (URLs pré-autenticadas de download).
+        'custo' é o número de fichas do limitador consumidas por tentativa (sub-requisições do $batch).
+        """
+        cabecalhos = dict(headers or {})
+        token_renovado = False
+        for tentativa in range(self.max_tentativas):
+            ultima = tentativa == self.max_tentativas - 1
+            # O provedor é consultado a cada tentativa: tokens renovados entram em vigor imediatamente
+            if token is not None:
+                cabecalhos["Authorization"] = f"Bearer {resolver_token(token)}"
+            self._aguardar_vez(custo)
+            self.contar("requisicoes")
+            try:
+                r = self.sessao.request(metodo, url, headers=cabecalhos, params=params, json=json,
+                                        data=data, stream=stream, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if ultima:
+                    raise
+                self.contar("retentativas")
+                self._dormir(self._tempo_espera(None, tentativa))
+                continue
+            informar_limitador(self.limitador, r.status_code, r.headers.get("Retry-After"), self.retry_after_max)
+            if r.status_code == 401 and not token_renovado and not ultima and hasattr(token, "invalidar"):
+                # Token expirado ou revogado: renova uma vez e repete
+                token_renovado = True
+                r.close()
+                token.invalidar()
+                continue
+            if r.status_code in STATUS_RETENTAVEIS and not ultima:
+                self.contar("retentativas")
+                if r.status_code == 429:
+                    self.contar("throttling")
+                espera = self._tempo_espera(r, tentativa)
+                r.close()
+                self._dormir(espera)
+                continue
+            r.raise_for_status()
+            return r
+        raise RuntimeError("Tentativas esgotadas")  # inalcançável: a última tentativa retorna ou lança
 
-def graph_obter_json(url: str, token: str, params: Optional[Dict] = None) -> Dict:
+    def obter(self, url: str, token: FonteToken, params: Optional[Dict] = None, stream: bool = False,
+              headers: Optional[Dict] = None) -> requests.Response:
+        """GET com retentativas."""
+        return self.requisitar("GET", url, token, params=params, stream=stream, headers=headers)
+
+    def postar_json(self, url: str, token: FonteToken, corpo: Dict, custo: float = 1.0) -> Dict:
+        """POST com corpo JSON retornando o JSON da resposta (usado pelo $batch, que só contém GETs)."""
+        r = self.requisitar("POST", url, token, json=corpo, custo=custo)
+        return r.json()
+
+    def obter_json(self, url: str, token: FonteToken, params: Optional[Dict] = None) -> Dict:
+        """GET retornando o corpo JSON."""
+        r = self.obter(url, token, params=params)
+        return r.json()
+
+    def obter_stream(self, url: str, token: FonteToken) -> requests.Response:
+        """GET em stream para conteúdo binário, sem compressão de transporte.
+
+        O runner grava 'resp.raw' diretamente, que não decodifica Content-Encoding.
+        """
+        return self.obter(url, token, stream=True, headers={"Accept-Encoding": "identity"})
+
+
+_cliente_padrao: Optional[ClienteGraph] = None
+_lock_cliente = threading.Lock()
+
+
+def configurar_cliente(cliente: ClienteGraph) -> None:
+    """Define o cliente compartilhado usado pelas funções deste módulo."""
+    global _cliente_padrao
+    with _lock_cliente:
+        _cliente_padrao = cliente
+
+
+def obter_cliente() -> ClienteGraph:
+    """Retorna o cliente compartilhado, criando um com valores padrão se necessário."""
+    global _cliente_padrao
+    with _lock_cliente:
+        if _cliente_padrao is None:
+            _cliente_padrao = ClienteGraph()
+        return _cliente_padrao
+
+
+def estatisticas() -> Dict[str, int]:
+    """Contadores do cliente compartilhado (requisições, retentativas, throttling)."""
+    return obter_cliente().estatisticas()
+
+
+def graph_obter_json(url: str, token: FonteToken, params: Optional[Dict] = None) -> Dict:
     """Chamada GET ao Graph retornando JSON; lança erro em status inválido."""
-    headers = {"Authorization": f"Bearer {token}"}
-    r = requests.get(url, headers=headers, params=params)
-    r.raise_for_status()
-    return r.json()
+    return obter_cliente().obter_json(url, token, params=params)
 
 
-def graph_obter_stream(url: str, token: str) -> requests.Response:
+def graph_obter_stream(url: str, token: FonteToken) -> requests.Response:
     """Chamada GET ao Graph com stream para download de conteúdo binário."""
-    headers = {"Authorization": f"Bearer {token}"}
-    r = requests.get(url, headers=headers, stream=True)
-    r.raise_for_status()
-    return r
+    return obter_cliente().obter_stream(url, token)
 
 
-def resolver_sites(token: str, sites_cfg: List[str]) -> List[Dict]:
+def resolver_sites(token: FonteToken, sites_cfg: List[str]) -> List[Dict]:
     """Resolve sites a partir de IDs ou resource paths; se vazio, usa root."""
     resolved: List[Dict] = []
     if sites_cfg:
@@ -36,13 +252,13 @@ def resolver_sites(token: str, sites_cfg: List[str]) -> List[Dict]:
     return resolved
 
 
-def listar_drives_do_site(site_id: str, token: str) -> List[Dict]:
+def listar_drives_do_site(site_id: str, token: FonteToken) -> List[Dict]:
     """Lista drives (bibliotecas) de um site SharePoint."""
     data = graph_obter_json(f"{GRAPH_URL_BASE}/sites/{site_id}/drives", token)
     return data.get("value", [])
 
 
-def listar_filhos_paginado(drive_id: str, item_id: str, token: str):
+def listar_filhos_paginado(drive_id: str, item_id: str, token: FonteToken):
     """Itera itens filhos de um item via paginação do Graph."""
     next_url = f"{GRAPH_URL_BASE}/drives/{drive_id}/items/{item_id}/children"
     while next_url:
@@ -52,13 +268,357 @@ def listar_filhos_paginado(drive_id: str, item_id: str, token: str):
         next_url = data.get("@odata.nextLink")
 
 
-def obter_id_raiz_do_drive(drive_id: str, token: str) -> str:
+def _caminho_relativo_graph(url: str) -> str:
+    """Converte uma URL absoluta do Graph (ex.: @odata.nextLink) no caminho relativo exigido pelo $batch."""
+    if url.startswith(GRAPH_URL_BASE):
+        return url[len(GRAPH_URL_BASE):]
+    return url
+
+
+def _iterar_lote(pendentes: Deque[Tuple[str, str]], token: FonteToken,
+                 tamanho_lote: int = TAMANHO_MAXIMO_LOTE) -> Iterator[Tuple[str, Dict]]:
+    """Executa GETs agrupados em chamadas POST /$batch, gerando (chave, corpo JSON).
+
+    'pendentes' contém pares (chave, caminho relativo) e pode receber novos itens durante a
+    iteração (ex.: nextLink de uma página). Sub-respostas com throttling ou erro transitório
+    voltam para a fila e são repetidas após a espera indicada em Retry-After.
+    """
+    cliente = obter_cliente()
+    tamanho_lote = max(1, min(int(tamanho_lote), TAMANHO_MAXIMO_LOTE))
+    tentativas: Dict[str, int] = {}
+    while pendentes:
+        lote = [pendentes.popleft() for _ in range(min(tamanho_lote, len(pendentes)))]
+        if len(lote) == 1:
+            # Uma única requisição não compensa o envelope do $batch
+            chave, caminho = lote[0]
+            yield chave, graph_obter_json(f"{GRAPH_URL_BASE}{caminho}", token)
+            continue
+        corpo = {"requests": [{"id": str(i), "method": "GET", "url": caminho}
+                              for i, (_, caminho) in enumerate(lote)]}
+        # O Graph contabiliza cada sub-requisição no throttling: o lote consome uma ficha por item
+        data = cliente.postar_json(f"{GRAPH_URL_BASE}/$batch", token, corpo, custo=len(lote))
+        respostas = {r.get("id"): r for r in data.get("responses", [])}
+        espera = 0.0
+        for i, (chave, caminho) in enumerate(lote):
+            resp = respostas.get(str(i)) or {}
+            status = int(resp.get("status") or 0)
+            if status:
+                informar_limitador(cliente.limitador, status, (resp.get("headers") or {}).get("Retry-After"),
+                                   cliente.retry_after_max)
+            if not resp or status in STATUS_RETENTAVEIS:
+                n = tentativas[caminho] = tentativas.get(caminho, 0) + 1
+                if n >= cliente.max_tentativas:
+                    raise requests.HTTPError(f"Sub-requisição do $batch falhou ({status}): {caminho}")
+                cliente.contar("retentativas")
+                if status == 429:
+                    cliente.contar("throttling")
+                # Retry-After em segundos ou data HTTP; ausente ou inválido, backoff com jitter
+                retry_after = (resp.get("headers") or {}).get("Retry-After")
+                espera = max(espera, calcular_espera(retry_after, n, cliente.backoff_base, cliente.backoff_max,
+                                                     cliente.retry_after_max))
+                pendentes.append((chave, caminho))
+                continue
+            if status >= 400:
+                raise requests.HTTPError(f"Sub-requisição do $batch falhou ({status}): {caminho} {resp.get('body')}")
+            yield chave, resp.get("body") or {}
+        if espera:
+            cliente._dormir(espera)
+
+
+def listar_filhos_em_lote(drive_id: str, item_ids: List[str], token: FonteToken,
+                          tamanho_lote: int = TAMANHO_MAXIMO_LOTE) -> Iterator[Tuple[str, Dict]]:
+    """Itera (id_pasta, filho) listando várias pastas por chamada $batch, seguindo a paginação."""
+    pendentes: Deque[Tuple[str, str]] = deque(
+        (item_id, f"/drives/{drive_id}/items/{item_id}/children") for item_id in item_ids
+    )
+    for item_id, data in _iterar_lote(pendentes, token, tamanho_lote):
+        for entry in data.get("value", []):
+            yield item_id, entry
+        next_url = data.get("@odata.nextLink")
+        if next_url:
+            pendentes.append((item_id, _caminho_relativo_graph(next_url)))
+
+
+def obter_itens_em_lote(caminhos: Dict[str, str], token: FonteToken,
+                        tamanho_lote: int = TAMANHO_MAXIMO_LOTE) -> Dict[str, Dict]:
+    """Obtém metadados de vários recursos (chave -> caminho relativo) agrupados em chamadas $batch."""
+    pendentes: Deque[Tuple[str, str]] = deque(caminhos.items())
+    return dict(_iterar_lote(pendentes, token, tamanho_lote))
+
+
+def obter_ids_raiz_em_lote(drive_ids: List[str], token: FonteToken,
+                           tamanho_lote: int = TAMANHO_MAXIMO_LOTE) -> Dict[str, str]:
+    """Obtém o ID do item raiz de vários drives com chamadas $batch."""
+    itens = obter_itens_em_lote({d: f"/drives/{d}/root" for d in drive_ids}, token, tamanho_lote)
+    return {d: item.get("id") for d, item in itens.items()}
+
+
+def obter_id_raiz_do_drive(drive_id: str, token: FonteToken) -> str:
     """Obtém o ID do item raiz de um drive."""
     root = graph_obter_json(f"{GRAPH_URL_BASE}/drives/{drive_id}/root", token)
     return root.get("id")
 
 
-def baixar_stream_conteudo_item(drive_id: str, item_id: str, token: str) -> requests.Response:
+def baixar_stream_conteudo_item(drive_id: str, item_id: str, token: FonteToken) -> requests.Response:
     """Obtém stream de conteúdo do item para download."""
     content_url = f"{GRAPH_URL_BASE}/drives/{drive_id}/items/{item_id}/content"
-    return graph_obter_stream(content_url, token)
\ No newline at end of file
+    return graph_obter_stream(content_url, token)
+
+
+def listar_delta_paginado(drive_id: str, token: FonteToken, delta_link: Optional[str] = None):
+    """Itera páginas da consulta delta do drive.
+
+    Sem 'delta_link' enumera o drive inteiro; com ele retorna apenas itens adicionados,
+    alterados ou apagados desde a consulta anterior. A última página traz '@odata.deltaLink'.
+    """
+    next_url = delta_link or f"{GRAPH_URL_BASE}/drives/{drive_id}/root/delta"
+    while next_url:
+        data = graph_obter_json(next_url, token)
+        yield data
+        next_url = data.get("@odata.nextLink")
+
+
+def obter_url_download(drive_id: str, item_id: str, token: FonteToken) -> str:
+    """Obtém a URL pré-autenticada (@microsoft.graph.downloadUrl) do conteúdo do item."""
+    item = graph_obter_json(
+        f"{GRAPH_URL_BASE}/drives/{drive_id}/items/{item_id}",
+        token,
+        params={"$select": "id,size,@microsoft.graph.downloadUrl"},
+    )
+    url = item.get("@microsoft.graph.downloadUrl")
+    if not url:
+        raise RuntimeError(f"Item sem downloadUrl: {item_id}")
+    return url
+
+
+class FaixaRecusada(IOError):
+    """O servidor não atendeu o Range: status diferente de 206 ou Content-Range inesperado."""
+
+
+def _faixa_confere(content_range: Optional[str], inicio: int, fim: int, tamanho: int) -> bool:
+    """Content-Range 'bytes inicio-fim/total' da faixa pedida (total igual ao tamanho ou '*')."""
+    unidade, _, resto = (content_range or "").strip().partition(" ")
+    faixa, _, total = resto.partition("/")
+    return unidade.lower() == "bytes" and faixa == f"{inicio}-{fim}" and total in {str(tamanho), "*"}
+
+
+class DownloadEmFaixas:
+    """Download de um arquivo grande em faixas de bytes (Range) buscadas em paralelo.
+
+    Expõe 'raw' com read(n) entregando os bytes em ordem, como requests.Response.raw, para
+    ser gravado diretamente pelo backend. No máximo 'conexoes + 1' faixas ficam em memória.
+    As retentativas de cada faixa são as do ClienteGraph; se a URL pré-autenticada expirar
+    (401/403/404), ela é resolvida novamente uma vez. Se o servidor não atender o Range, o
+    restante do arquivo é lido num stream único.
+    """
+
+    def __init__(self, resolver_url: Callable[[], str], tamanho: int,
+                 tamanho_faixa: int = 16 * 1024 * 1024, conexoes: int = 4,
+                 cliente: Optional[ClienteGraph] = None):
+        self._resolver_url = resolver_url
+        self._url = resolver_url()
+        self._lock_url = threading.Lock()
+        self._cliente = cliente or obter_cliente()
+        self.tamanho = int(tamanho)
+        self._faixas = [(inicio, min(inicio + tamanho_faixa, self.tamanho) - 1)
+                        for inicio in range(0, self.tamanho, max(1, int(tamanho_faixa)))]
+        self._janela = max(1, int(conexoes)) + 1
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(conexoes)), thread_name_prefix="faixa")
+        self._futuros: Deque[Future] = deque()
+        self._proxima = 0
+        self._buffer = memoryview(b"")
+        self._entregues = 0
+        # Resposta do stream único, quando o servidor recusa as faixas
+        self._stream: Optional[requests.Response] = None
+        self._preencher()
+
+    @property
+    def raw(self) -> "DownloadEmFaixas":
+        return self
+
+    def _preencher(self) -> None:
+        while len(self._futuros) < self._janela and self._proxima < len(self._faixas):
+            inicio, fim = self._faixas[self._proxima]
+            self._futuros.append(self._executor.submit(self._baixar_faixa, inicio, fim))
+            self._proxima += 1
+
+    def _renovar_url(self, url_usada: str) -> None:
+        with self._lock_url:
+            # Outra faixa pode já ter renovado a URL
+            if self._url == url_usada:
+                self._url = self._resolver_url()
+
+    def _baixar_faixa(self, inicio: int, fim: int) -> bytes:
+        cabecalhos = {"Range": f"bytes={inicio}-{fim}", "Accept-Encoding": "identity"}
+        for renovada in (False, True):
+            url = self._url
+            try:
+                r = self._cliente.requisitar("GET", url, None, headers=cabecalhos, stream=True)
+            except requests.HTTPError as e:
+                if not renovada and e.response is not None and e.response.status_code in {401, 403, 404}:
+                    self._renovar_url(url)
+                    continue
+                raise
+            with r:
+                # Status e Content-Range conferidos antes de ler o corpo: um 200 traria o arquivo inteiro
+                if r.status_code != 206 or not _faixa_confere(r.headers.get("Content-Range"), inicio, fim,
+                                                              self.tamanho):
+                    raise FaixaRecusada(f"Faixa {inicio}-{fim} recusada: status {r.status_code}, "
+                                        f"Content-Range {r.headers.get('Content-Range')!r}")
+                dados = r.content
+            if len(dados) != fim - inicio + 1:
+                raise IOError(f"Faixa {inicio}-{fim} incompleta: {len(dados)} bytes")
+            return dados
+        raise RuntimeError("Tentativas esgotadas")  # inalcançável: a segunda tentativa retorna ou lança
+
+    def _abrir_stream_unico(self) -> None:
+        """Descarta as faixas pendentes e segue num GET sem Range, pulando os bytes já entregues."""
+        self._cancelar_faixas()
+        self._stream = self._cliente.requisitar("GET", self._url, None, stream=True,
+                                                headers={"Accept-Encoding": "identity"})
+        restante = self._entregues
+        while restante > 0:
+            pulados = self._stream.raw.read(min(restante, 1024 * 1024))
+            if not pulados:
+                raise IOError(f"Stream terminou antes do byte {self._entregues}")
+            restante -= len(pulados)
+
+    def _proximo_bloco(self) -> bytes:
+        if self._stream is not None:
+            return self._stream.raw.read(1024 * 1024)
+        if not self._futuros:
+            return b""
+        try:
+            dados = self._futuros.popleft().result()
+        except FaixaRecusada:
+            self._abrir_stream_unico()
+            return self._proximo_bloco()
+        self._preencher()
+        return dados
+
+    def read(self, n: int = -1) -> bytes:
+        saida = bytearray()
+        while n < 0 or len(saida) < n:
+            if not self._buffer:
+                dados = self._proximo_bloco()
+                if not dados:
+                    break
+                self._buffer = memoryview(dados)
+            quantidade = len(self._buffer) if n < 0 else min(n - len(saida), len(self._buffer))
+            saida += self._buffer[:quantidade]
+            self._buffer = self._buffer[quantidade:]
+            self._entregues += quantidade
+        return bytes(saida)
+
+    def _cancelar_faixas(self) -> None:
+        for futuro in self._futuros:
+            futuro.cancel()
+        self._futuros.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        self._cancelar_faixas()
+        if self._stream is not None:
+            self._stream.close()
+
+
+def baixar_em_faixas_paralelas(drive_id: str, item_id: str, token: FonteToken, tamanho: int,
+                               tamanho_faixa: int = 16 * 1024 * 1024, conexoes: int = 4) -> DownloadEmFaixas:
+    """Baixa um arquivo grande via downloadUrl com várias faixas de bytes em paralelo."""
+    return DownloadEmFaixas(lambda: obter_url_download(drive_id, item_id, token), tamanho, tamanho_faixa, conexoes)
+
+
+def _url_por_caminho(drive_id: str, caminho: str) -> str:
+    """URL do item endereçado pelo caminho relativo à raiz do drive (sintaxe root:/caminho:)."""
+    return f"{GRAPH_URL_BASE}/drives/{drive_id}/root:/{quote(caminho.strip('/'))}:"
+
+
+def _ler_exato(stream: BinaryIO, tamanho: int) -> bytes:
+    """Lê até 'tamanho' bytes, repetindo leituras curtas (streams de rede) até o fim do conteúdo."""
+    partes = bytearray()
+    while len(partes) < tamanho:
+        dados = stream.read(tamanho - len(partes))
+        if not dados:
+            break
+        partes += dados
+    return bytes(partes)
+
+
+def enviar_conteudo_simples(drive_id: str, caminho: str, dados: bytes, token: FonteToken) -> Dict:
+    """Cria ou substitui um arquivo pequeno com um único PUT de conteúdo; retorna o driveItem."""
+    r = obter_cliente().requisitar(
+        "PUT", f"{_url_por_caminho(drive_id, caminho)}/content", token,
+        data=dados, headers={"Content-Type": "application/octet-stream"},
+    )
+    return r.json()
+
+
+def criar_sessao_upload(drive_id: str, caminho: str, token: FonteToken) -> str:
+    """Cria uma sessão de upload (substituindo o arquivo existente) e retorna a uploadUrl."""
+    corpo = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+    data = obter_cliente().postar_json(f"{_url_por_caminho(drive_id, caminho)}/createUploadSession", token, corpo)
+    return data["uploadUrl"]
+
+
+def ajustar_tamanho_fragmento(tamanho: int) -> int:
+    """Arredonda o fragmento para o múltiplo de 320 KiB exigido pelo Graph, entre 320 KiB e 60 MiB."""
+    tamanho = min(int(tamanho), MAXIMO_FRAGMENTO_UPLOAD)
+    return max(1, tamanho // MULTIPLO_FRAGMENTO_UPLOAD) * MULTIPLO_FRAGMENTO_UPLOAD
+
+
+def _enviar_fragmento(cliente: ClienteGraph, url_sessao: str, dados: bytes, inicio: int,
+                      total: int) -> Optional[requests.Response]:
+    """Envia um fragmento da sessão; None se o servidor já o havia recebido (resposta 416)."""
+    fim = inicio + len(dados) - 1
+    try:
+        # A uploadUrl é pré-autenticada: o fragmento vai sem Authorization
+        return cliente.requisitar("PUT", url_sessao, None, data=dados,
+                                  headers={"Content-Range": f"bytes {inicio}-{fim}/{total}"})
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 416:
+            raise
+    # Uma tentativa anterior chegou ao servidor: confirma pelos intervalos ainda esperados
+    status = cliente.requisitar("GET", url_sessao, None).json()
+    faltantes = [int(faixa.split("-")[0]) for faixa in status.get("nextExpectedRanges", [])]
+    if faltantes and min(faltantes) <= fim:
+        raise IOError(f"Sessão de upload fora de sequência: esperado {min(faltantes)}, enviado {inicio}")
+    return None
+
+
+def enviar_por_sessao(drive_id: str, caminho: str, stream: BinaryIO, tamanho: int, token: FonteToken,
+                      tamanho_fragmento: int = 10 * 1024 * 1024) -> Dict:
+    """Envia um arquivo grande em fragmentos sequenciais de uma sessão de upload.
+
+    Cada fragmento é repetido isoladamente em falhas transitórias; em erro definitivo a sessão
+    é cancelada. Retorna o driveItem criado (vazio se o último fragmento já havia sido aceito).
+    """
+    cliente = obter_cliente()
+    url_sessao = criar_sessao_upload(drive_id, caminho, token)
+    fragmento = ajustar_tamanho_fragmento(tamanho_fragmento)
+    enviado = 0
+    resposta: Optional[requests.Response] = None
+    try:
+        while enviado < tamanho:
+            dados = _ler_exato(stream, min(fragmento, tamanho - enviado))
+            if not dados:
+                raise IOError(f"Conteúdo terminou em {enviado} de {tamanho} bytes: {caminho}")
+            resposta = _enviar_fragmento(cliente, url_sessao, dados, enviado, tamanho)
+            enviado += len(dados)
+    except BaseException:
+        try:
+            cliente.requisitar("DELETE", url_sessao, None)
+        except requests.RequestException:
+            pass
+        raise
+    return resposta.json() if resposta is not None and resposta.content else {}
+
+
+def enviar_arquivo(drive_id: str, caminho: str, stream: BinaryIO, tamanho: int, token: FonteToken,
+                   limiar_sessao: int = LIMITE_UPLOAD_SIMPLES, tamanho_fragmento: int = 10 * 1024 * 1024) -> Dict:
+    """Grava o conteúdo em 'caminho' do drive: PUT simples até 'limiar_sessao', sessão de upload acima."""
+    if tamanho <= limiar_sessao:
+        dados = _ler_exato(stream, tamanho)
+        if len(dados) != tamanho:
+            raise IOError(f"Conteúdo com {len(dados)} de {tamanho} bytes: {caminho}")
+        return enviar_conteudo_simples(drive_id, caminho, dados, token)
+    return enviar_por_sessao(drive_id, caminho, stream, tamanho, token, tamanho_fragmento)
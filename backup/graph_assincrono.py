@@ -0,0 +1,313 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from . import graph
+from .graph import (GRAPH_URL_BASE, STATUS_RETENTAVEIS, FonteToken, calcular_espera, informar_limitador,
+                    resolver_token)
+from .limitador import LimitadorAdaptativo
+
+try:
+    import httpx
+except ImportError:  # httpx é opcional: só o motor asyncio com o Graph real precisa dele
+    httpx = None
+
+# Comentários em Português do Brasil
+# Graph assíncrono para o motor asyncio do runner. O cliente nativo (httpx) mantém milhares de
+# listagens e downloads em andamento numa única thread, limitando as conexões simultâneas por
+# host (graph.microsoft.com e os hosts de download do SharePoint) com semáforos. GraphEmThreads
+# oferece a mesma interface sobre qualquer implementação síncrona (módulo graph, graph_mock,
+# graph_sintetico), executando as chamadas em threads.
+
+
+class RespostaAssincrona:
+    """Resposta em stream que devolve a vaga do semáforo do host ao ser fechada."""
+
+    def __init__(self, resposta: Any, semaforo: asyncio.Semaphore):
+        self.resposta = resposta
+        self.status_code = resposta.status_code
+        self._semaforo = semaforo
+        self._fechada = False
+
+    def iterar_bytes(self, tamanho_bloco: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        return self.resposta.aiter_bytes(tamanho_bloco)
+
+    async def fechar(self) -> None:
+        if not self._fechada:
+            self._fechada = True
+            try:
+                await self.resposta.aclose()
+            finally:
+                self._semaforo.release()
+
+
+class ClienteGraphAssincrono:
+    """Equivalente assíncrono de graph.ClienteGraph: mesma política de retentativas e contadores.
+
+    Cada host tem um semáforo com 'conexoes_por_host' vagas; uma resposta em stream ocupa a
+    vaga até ser fechada. O 'limitador' é o mesmo do cliente síncrono da execução, de modo que
+    os dois respeitam uma única taxa.
+    """
+
+    def __init__(self, conexoes_por_host: int = 32, max_tentativas: int = 6, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, timeout_conexao: float = 10.0, timeout_leitura: float = 300.0,
+                 transporte: Any = None, dormir=asyncio.sleep, limitador: Optional[LimitadorAdaptativo] = None,
+                 retry_after_max: float = 0.0):
+        if httpx is None:
+            raise ImportError("O motor asyncio requer httpx: pip install httpx", name="httpx")
+        self.conexoes_por_host = max(1, int(conexoes_por_host))
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self._dormir = dormir
+        self.limitador = limitador
+        self._semaforos: Dict[str, asyncio.Semaphore] = {}
+        self._contadores: Dict[str, int] = {"requisicoes": 0, "retentativas": 0, "throttling": 0}
+        # Redirecionamentos não são seguidos automaticamente: o de /content é resolvido por
+        # GraphAssincrono.abrir_download, para que o download ocupe a vaga do host final
+        self.cliente = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout_leitura, connect=timeout_conexao),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=self.conexoes_por_host),
+            headers={"Accept-Encoding": "gzip, deflate"}, follow_redirects=False, transport=transporte,
+        )
+
+    def contar(self, nome: str) -> None:
+        # Apenas a thread do laço de eventos altera os contadores
+        self._contadores[nome] = self._contadores.get(nome, 0) + 1
+
+    def estatisticas(self) -> Dict[str, int]:
+        return dict(self._contadores)
+
+    def _semaforo(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaforo = self._semaforos.get(host)
+        if semaforo is None:
+            semaforo = self._semaforos[host] = asyncio.Semaphore(self.conexoes_por_host)
+        return semaforo
+
+    async def requisitar(self, metodo: str, url: str, token: Optional[FonteToken], params: Optional[Dict] = None,
+                         headers: Optional[Dict] = None, stream: bool = False) -> Any:
+        """Requisição com retentativas; lança requests.HTTPError (como o cliente síncrono) em
+        status não transitório ou esgotadas as tentativas. Com 'stream' retorna RespostaAssincrona."""
+        cabecalhos = dict(headers or {})
+        token_renovado = False
+        semaforo = self._semaforo(url)
+        for tentativa in range(self.max_tentativas):
+            ultima = tentativa == self.max_tentativas - 1
+            if token is not None:
+                cabecalhos["Authorization"] = f"Bearer {resolver_token(token)}"
+            if self.limitador is not None:
+                espera = self.limitador.reservar()
+                if espera > 0:
+                    await self._dormir(espera)
+            self.contar("requisicoes")
+            await semaforo.acquire()
+            try:
+                r = await self.cliente.send(self.cliente.build_request(metodo, url, headers=cabecalhos, params=params),
+                                            stream=True)
+            except httpx.TransportError:
+                semaforo.release()
+                if ultima:
+                    raise
+                self.contar("retentativas")
+                await self._dormir(calcular_espera(None, tentativa, self.backoff_base, self.backoff_max))
+                continue
+            informar_limitador(self.limitador, r.status_code, r.headers.get("Retry-After"), self.retry_after_max)
+            if stream and r.status_code < 400:
+                return RespostaAssincrona(r, semaforo)
+            try:
+                await r.aread()
+            finally:
+                await r.aclose()
+                semaforo.release()
+            if r.status_code == 401 and not token_renovado and not ultima and hasattr(token, "invalidar"):
+                token_renovado = True
+                token.invalidar()
+                continue
+            if r.status_code in STATUS_RETENTAVEIS and not ultima:
+                self.contar("retentativas")
+                if r.status_code == 429:
+                    self.contar("throttling")
+                await self._dormir(calcular_espera(r.headers.get("Retry-After"), tentativa,
+                                                   self.backoff_base, self.backoff_max, self.retry_after_max))
+                continue
+            if r.status_code >= 400:
+                raise requests.HTTPError(f"{r.status_code} {r.reason_phrase}: {url}", response=r)
+            return r
+        raise RuntimeError("Tentativas esgotadas")  # inalcançável: a última tentativa retorna ou lança
+
+    async def obter_json(self, url: str, token: FonteToken, params: Optional[Dict] = None) -> Dict:
+        return (await self.requisitar("GET", url, token, params=params)).json()
+
+    async def fechar(self) -> None:
+        await self.cliente.aclose()
+
+
+class GraphAssincrono:
+    """Funções do módulo graph usadas pela varredura, como corrotinas sobre ClienteGraphAssincrono."""
+
+    def __init__(self, cliente: ClienteGraphAssincrono):
+        self.cliente = cliente
+
+    async def resolver_sites(self, token: FonteToken, sites_cfg: List[str]) -> List[Dict]:
+        caminhos = list(sites_cfg) if sites_cfg else ["root"]
+        return list(await asyncio.gather(*(self.cliente.obter_json(f"{GRAPH_URL_BASE}/sites/{s}", token)
+                                           for s in caminhos)))
+
+    async def listar_drives_do_site(self, site_id: str, token: FonteToken) -> List[Dict]:
+        dados = await self.cliente.obter_json(f"{GRAPH_URL_BASE}/sites/{site_id}/drives", token)
+        return dados.get("value", [])
+
+    async def obter_id_raiz_do_drive(self, drive_id: str, token: FonteToken) -> str:
+        return (await self.cliente.obter_json(f"{GRAPH_URL_BASE}/drives/{drive_id}/root", token)).get("id")
+
+    async def listar_filhos_paginado(self, drive_id: str, item_id: str, token: FonteToken) -> AsyncIterator[Dict]:
+        proxima = f"{GRAPH_URL_BASE}/drives/{drive_id}/items/{item_id}/children"
+        while proxima:
+            dados = await self.cliente.obter_json(proxima, token)
+            for item in dados.get("value", []):
+                yield item
+            proxima = dados.get("@odata.nextLink")
+
+    async def listar_delta_paginado(self, drive_id: str, token: FonteToken,
+                                    delta_link: Optional[str] = None) -> AsyncIterator[Dict]:
+        proxima = delta_link or f"{GRAPH_URL_BASE}/drives/{drive_id}/root/delta"
+        while proxima:
+            dados = await self.cliente.obter_json(proxima, token)
+            yield dados
+            proxima = dados.get("@odata.nextLink")
+
+    async def abrir_download(self, drive_id: str, item_id: str, token: FonteToken) -> RespostaAssincrona:
+        """Stream do conteúdo. /content responde 302 para a URL pré-autenticada do SharePoint: a
+        vaga de graph.microsoft.com é devolvida antes de abrir o download, que ocupa a do host
+        final (sem o Authorization, que não vale para outro host)."""
+        url = f"{GRAPH_URL_BASE}/drives/{drive_id}/items/{item_id}/content"
+        cabecalhos = {"Accept-Encoding": "identity"}
+        resposta = await self.cliente.requisitar("GET", url, token, headers=cabecalhos, stream=True)
+        if not resposta.resposta.is_redirect:
+            return resposta
+        destino = urljoin(url, resposta.resposta.headers["Location"])
+        await resposta.fechar()
+        return await self.cliente.requisitar("GET", destino, None, headers=cabecalhos, stream=True)
+
+    def estatisticas(self) -> Dict[str, int]:
+        return self.cliente.estatisticas()
+
+    async def fechar(self) -> None:
+        await self.cliente.fechar()
+
+
+class GraphEmThreads:
+    """Interface de GraphAssincrono sobre uma implementação síncrona, com as chamadas em threads.
+
+    Listagens são lidas por inteiro na thread (uma pasta ou um feed delta por vez), evitando uma
+    troca de thread por item.
+    """
+
+    def __init__(self, api_sincrona: Any):
+        self.api = api_sincrona
+
+    async def resolver_sites(self, token: FonteToken, sites_cfg: List[str]) -> List[Dict]:
+        return await asyncio.to_thread(self.api.resolver_sites, token, sites_cfg)
+
+    async def listar_drives_do_site(self, site_id: str, token: FonteToken) -> List[Dict]:
+        return await asyncio.to_thread(self.api.listar_drives_do_site, site_id, token)
+
+    async def obter_id_raiz_do_drive(self, drive_id: str, token: FonteToken) -> str:
+        return await asyncio.to_thread(self.api.obter_id_raiz_do_drive, drive_id, token)
+
+    async def listar_filhos_paginado(self, drive_id: str, item_id: str, token: FonteToken) -> AsyncIterator[Dict]:
+        for item in await asyncio.to_thread(lambda: list(self.api.listar_filhos_paginado(drive_id, item_id, token))):
+            yield item
+
+    async def listar_delta_paginado(self, drive_id: str, token: FonteToken,
+                                    delta_link: Optional[str] = None) -> AsyncIterator[Dict]:
+        paginas = await asyncio.to_thread(lambda: list(self.api.listar_delta_paginado(drive_id, token, delta_link)))
+        for pagina in paginas:
+            yield pagina
+
+    async def fechar(self) -> None:
+        return None
+
+
+class LeitorPonte:
+    """Stream síncrono (read(n)) sobre uma RespostaAssincrona, para os workers de transferência.
+
+    Cada bloco é buscado no laço de eventos; o backend grava na thread do worker como faria
+    com requests.Response.raw.
+    """
+
+    def __init__(self, resposta: RespostaAssincrona, laco: asyncio.AbstractEventLoop):
+        self._resposta = resposta
+        self._laco = laco
+        self._blocos = resposta.iterar_bytes()
+        self._buffer = b""
+        self._fim = False
+
+    def _proximo_bloco(self) -> bytes:
+        async def proximo() -> bytes:
+            try:
+                return await self._blocos.__anext__()
+            except StopAsyncIteration:
+                return b""
+        return asyncio.run_coroutine_threadsafe(proximo(), self._laco).result()
+
+    def read(self, n: int = -1) -> bytes:
+        partes = [self._buffer]
+        tamanho = len(self._buffer)
+        while not self._fim and (n < 0 or tamanho < n):
+            bloco = self._proximo_bloco()
+            if not bloco:
+                self._fim = True
+                break
+            partes.append(bloco)
+            tamanho += len(bloco)
+        dados = b"".join(partes)
+        if n < 0:
+            self._buffer = b""
+            return dados
+        self._buffer = dados[n:]
+        return dados[:n]
+
+    @property
+    def raw(self) -> "LeitorPonte":
+        return self
+
+    def close(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._resposta.fechar(), self._laco).result()
+
+
+class PonteDownloads:
+    """Downloads usados pelos workers (threads) no motor asyncio com o cliente nativo.
+
+    O stream único passa pelo cliente assíncrono; arquivos acima do limiar de faixas paralelas
+    continuam com graph.baixar_em_faixas_paralelas (cliente síncrono configurado pelo runner).
+    """
+
+    def __init__(self, api: GraphAssincrono, laco: asyncio.AbstractEventLoop):
+        self._api = api
+        self._laco = laco
+
+    def baixar_stream_conteudo_item(self, drive_id: str, item_id: str, token: FonteToken) -> LeitorPonte:
+        resposta = asyncio.run_coroutine_threadsafe(self._api.abrir_download(drive_id, item_id, token), self._laco)
+        return LeitorPonte(resposta.result(), self._laco)
+
+    def baixar_em_faixas_paralelas(self, *args, **kwargs):
+        return graph.baixar_em_faixas_paralelas(*args, **kwargs)
+
+
+def criar_graph_assincrono(cfg_graph, limitador: Optional[LimitadorAdaptativo] = None) -> GraphAssincrono:
+    """Cliente nativo configurado a partir de ConfigGraph (com o limitador compartilhado da execução)."""
+    return GraphAssincrono(ClienteGraphAssincrono(
+        conexoes_por_host=cfg_graph.conexoes_por_host,
+        max_tentativas=cfg_graph.max_tentativas,
+        backoff_base=cfg_graph.backoff_base,
+        backoff_max=cfg_graph.backoff_max,
+        retry_after_max=cfg_graph.retry_after_max,
+        timeout_conexao=cfg_graph.timeout_conexao,
+        timeout_leitura=cfg_graph.timeout_leitura,
+        limitador=limitador,
+    ))
@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from io import BytesIO
 
 # Comentários em Português do Brasil
@@ -6,6 +6,18 @@ from io import BytesIO
 # sem realizar chamadas reais ao Microsoft Graph.
 
 
+# Arquivo mock com os campos de versão usados para detectar alterações
+ARQUIVO_MOCK = {
+    "id": "file-1",
+    "name": "relatorio.txt",
+    "file": {"hashes": {"quickXorHash": "TJZ20HK/f2oFCO+ZXN3eFTH+EBs="}},
+    "size": 31,
+    "cTag": "ctag-mock-1",
+    "eTag": "etag-mock-1",
+    "lastModifiedDateTime": "2024-01-01T00:00:00Z",
+}
+
+
 class RespostaMock:
     """Objeto mínimo com atributo .raw compatível com requests.Response.raw."""
 
@@ -13,6 +25,11 @@ class RespostaMock:
         self.raw = BytesIO(dados)
 
 
+def configurar_cliente(cliente) -> None:
+    """No mock não há cliente HTTP; apenas aceita a configuração."""
+    return None
+
+
 def resolver_sites(token: str, sites_cfg: List[str]) -> List[Dict]:
     """Retorna uma lista com um site mock, ignorando token e sites_cfg."""
     return [{"id": "site-mock", "name": "SiteMock"}]
@@ -33,10 +50,60 @@ def listar_filhos_paginado(drive_id: str, item_id: str, token: str):
     if item_id == "root-mock":
         yield {"id": "folder-docs", "name": "docs", "folder": {"childCount": 1}}
     elif item_id == "folder-docs":
-        yield {"id": "file-1", "name": "relatorio.txt"}
+        yield dict(ARQUIVO_MOCK)
+
+
+def listar_delta_paginado(drive_id: str, token: str, delta_link: Optional[str] = None):
+    """Gera páginas delta mock: enumeração completa sem link e nenhuma alteração com link."""
+    if delta_link:
+        yield {"value": [], "@odata.deltaLink": "delta-mock-2"}
+        return
+    yield {
+        "value": [
+            {"id": "root-mock", "name": "root", "root": {}, "folder": {"childCount": 1}},
+            {"id": "folder-docs", "name": "docs", "folder": {"childCount": 1},
+             "parentReference": {"id": "root-mock"}},
+            dict(ARQUIVO_MOCK, parentReference={"id": "folder-docs"}),
+        ],
+        "@odata.deltaLink": "delta-mock-1",
+    }
+
+
+def listar_filhos_em_lote(drive_id: str, item_ids: List[str], token: str, tamanho_lote: int = 20):
+    """Gera pares (id_pasta, filho) reutilizando a listagem mock por pasta."""
+    for item_id in item_ids:
+        for filho in listar_filhos_paginado(drive_id, item_id, token):
+            yield item_id, filho
+
+
+def obter_ids_raiz_em_lote(drive_ids: List[str], token: str, tamanho_lote: int = 20) -> Dict[str, str]:
+    """Retorna o ID raiz mock para cada drive informado."""
+    return {d: obter_id_raiz_do_drive(d, token) for d in drive_ids}
+
+
+def baixar_em_faixas_paralelas(drive_id: str, item_id: str, token: str, tamanho: int,
+                               tamanho_faixa: int = 16 * 1024 * 1024, conexoes: int = 4) -> RespostaMock:
+    """No mock o download em faixas devolve o mesmo conteúdo do stream único."""
+    return baixar_stream_conteudo_item(drive_id, item_id, token)
 
 
 def baixar_stream_conteudo_item(drive_id: str, item_id: str, token: str) -> RespostaMock:
     """Retorna stream de bytes estático para o arquivo mock."""
     conteudo = b"Conteudo de teste do relatorio."
-    return RespostaMock(conteudo)
\ No newline at end of file
+    return RespostaMock(conteudo)
+
+# Conteúdo recebido pelos uploads mock: (id do drive, caminho) -> bytes
+ARQUIVOS_ENVIADOS: Dict[Tuple[str, str], bytes] = {}
+
+
+def enviar_arquivo(drive_id: str, caminho: str, stream, tamanho: int, token: str,
+                   limiar_sessao: int = 4 * 1024 * 1024, tamanho_fragmento: int = 10 * 1024 * 1024) -> Dict:
+    """Registra o conteúdo enviado em ARQUIVOS_ENVIADOS em vez de chamar o Graph."""
+    dados = stream.read()
+    ARQUIVOS_ENVIADOS[(drive_id, caminho)] = dados
+    return {"id": f"enviado-{len(ARQUIVOS_ENVIADOS)}", "name": caminho.rsplit("/", 1)[-1], "size": len(dados)}
+
+
+def estatisticas() -> Dict[str, int]:
+    """No mock não há requisições HTTP a contar."""
+    return {}
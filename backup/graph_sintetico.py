@@ -0,0 +1,285 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Comentários em Português do Brasil
+# Graph sintético para testes de desempenho: substitui o módulo graph no runner (como o
+# graph_mock) e gera, de forma determinística e sem guardar a árvore em memória, N sites com
+# M drives, pastas com profundidade e fan-out configuráveis, tamanhos de arquivo por
+# distribuição, paginação e latência/429 injetados em cada requisição simulada.
+
+DISTRIBUICOES = {"fixo", "uniforme", "lognormal"}
+TAMANHO_BLOCO_CONTEUDO = 64 * 1024
+
+
+@dataclass
+class ParametrosArvore:
+    """Forma da árvore gerada e comportamento simulado do serviço."""
+
+    sites: int = 1
+    drives_por_site: int = 1
+    # Níveis de pastas abaixo da raiz e subpastas por pasta
+    profundidade: int = 2
+    pastas_por_pasta: int = 3
+    arquivos_por_pasta: int = 10
+    # Tamanho dos arquivos: 'fixo' (sempre o médio), 'uniforme' (0 a 2x o médio) ou
+    # 'lognormal' (muitos pequenos e poucos grandes, como em bibliotecas reais)
+    distribuicao: str = "lognormal"
+    tamanho_medio: int = 64 * 1024
+    tamanho_maximo: int = 256 * 1024 * 1024
+    # Itens por página nas listagens (o Graph usa 200 por padrão)
+    tamanho_pagina: int = 200
+    # Latência de cada requisição simulada e fração delas respondida com 429
+    latencia_s: float = 0.0
+    taxa_throttling: float = 0.0
+    retry_after_s: float = 0.0
+    semente: int = 0
+
+    def __post_init__(self):
+        if self.distribuicao not in DISTRIBUICOES:
+            raise ValueError(f"distribuição inválida: {self.distribuicao}")
+
+    @property
+    def pastas_por_drive(self) -> int:
+        """Pastas de cada drive, sem contar a raiz."""
+        return sum(self.pastas_por_pasta ** n for n in range(1, self.profundidade + 1))
+
+    @property
+    def arquivos_por_drive(self) -> int:
+        return (self.pastas_por_drive + 1) * self.arquivos_por_pasta
+
+    @property
+    def total_arquivos(self) -> int:
+        return self.sites * self.drives_por_site * self.arquivos_por_drive
+
+
+class StreamSintetico:
+    """Conteúdo determinístico de 'tamanho' bytes gerado sob demanda (memória constante)."""
+
+    def __init__(self, semente: str, tamanho: int, inicio: int = 0):
+        bloco = hashlib.sha256(semente.encode("utf-8")).digest()
+        self._bloco = (bloco * (TAMANHO_BLOCO_CONTEUDO // len(bloco) + 1))[:TAMANHO_BLOCO_CONTEUDO]
+        self._posicao = inicio
+        self._fim = tamanho
+
+    def read(self, n: int = -1) -> bytes:
+        restante = self._fim - self._posicao
+        if restante <= 0:
+            return b""
+        n = restante if n is None or n < 0 else min(n, restante)
+        partes = []
+        while n > 0:
+            deslocamento = self._posicao % TAMANHO_BLOCO_CONTEUDO
+            parte = self._bloco[deslocamento:deslocamento + n]
+            partes.append(parte)
+            self._posicao += len(parte)
+            n -= len(parte)
+        return b"".join(partes)
+
+    def close(self) -> None:
+        return None
+
+
+class RespostaSintetica:
+    """Objeto mínimo com atributo .raw compatível com requests.Response.raw."""
+
+    def __init__(self, raw: StreamSintetico):
+        self.raw = raw
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+class GraphSintetico:
+    """Mesmas funções do módulo graph usadas pelo runner, sobre uma árvore gerada.
+
+    IDs codificam a posição do item ('pasta:<drive>:0.2.1', 'arq:<drive>:0.2:7'), de modo que
+    listagens e downloads são calculados a partir do ID. 'geracao' entra em cTag/eTag: uma nova
+    geração faz todos os arquivos parecerem alterados.
+    """
+
+    def __init__(self, parametros: Optional[ParametrosArvore] = None, geracao: int = 1,
+                 dormir=time.sleep):
+        self.p = parametros or ParametrosArvore()
+        self.geracao = geracao
+        self._dormir = dormir
+        self._aleatorio = random.Random(self.p.semente)
+        self._lock = threading.Lock()
+        self._contadores = {"requisicoes": 0, "retentativas": 0, "throttling": 0}
+        self.bytes_enviados = 0
+
+    # --- Serviço simulado ---
+
+    def _requisitar(self) -> None:
+        """Uma requisição ao serviço: latência e, com a taxa configurada, 429 + nova tentativa."""
+        with self._lock:
+            self._contadores["requisicoes"] += 1
+            throttling = self.p.taxa_throttling > 0 and self._aleatorio.random() < self.p.taxa_throttling
+            if throttling:
+                self._contadores["throttling"] += 1
+                self._contadores["retentativas"] += 1
+                self._contadores["requisicoes"] += 1
+        if self.p.latencia_s > 0:
+            self._dormir(self.p.latencia_s)
+        if throttling:
+            self._dormir(self.p.retry_after_s + self.p.latencia_s)
+
+    def configurar_cliente(self, cliente) -> None:
+        """Sem cliente HTTP: a configuração é aceita e ignorada."""
+        return None
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._contadores)
+
+    # --- Árvore ---
+
+    def _tamanho(self, id_arquivo: str) -> int:
+        aleatorio = random.Random(f"{self.p.semente}:{id_arquivo}")
+        media = max(0, self.p.tamanho_medio)
+        if self.p.distribuicao == "fixo":
+            tamanho = media
+        elif self.p.distribuicao == "uniforme":
+            tamanho = int(aleatorio.uniform(0, 2 * media))
+        else:
+            # Mediana em 1/4 da média: sigma tal que exp(mu + sigma²/2) = média
+            sigma = math.sqrt(2 * math.log(4))
+            tamanho = int(aleatorio.lognormvariate(math.log(max(1, media) / 4), sigma))
+        return max(0, min(tamanho, self.p.tamanho_maximo))
+
+    def _arquivo(self, id_drive: str, caminho: str, indice: int) -> Dict:
+        id_arquivo = f"arq:{id_drive}:{caminho}:{indice}"
+        return {
+            "id": id_arquivo,
+            "name": f"arquivo-{indice:05d}.bin",
+            "file": {},
+            "size": self._tamanho(id_arquivo),
+            "cTag": f"ctag-{self.geracao}",
+            "eTag": f"etag-{self.geracao}",
+            "lastModifiedDateTime": "2024-01-01T00:00:00Z",
+        }
+
+    def _filhos(self, id_pasta: str) -> Iterator[Dict]:
+        """Filhos de uma pasta (ou raiz): subpastas e depois arquivos."""
+        _, id_drive, caminho = id_pasta.split(":", 2)
+        nivel = len(caminho.split(".")) if caminho else 0
+        if nivel < self.p.profundidade:
+            for i in range(self.p.pastas_por_pasta):
+                sub = f"{caminho}.{i}" if caminho else str(i)
+                yield {"id": f"pasta:{id_drive}:{sub}", "name": f"pasta-{i:03d}",
+                       "folder": {"childCount": self.p.pastas_por_pasta + self.p.arquivos_por_pasta}}
+        for i in range(self.p.arquivos_por_pasta):
+            yield self._arquivo(id_drive, caminho, i)
+
+    def _paginar(self, itens: Iterator[Dict]) -> Iterator[List[Dict]]:
+        """Agrupa em páginas; cada página custa uma requisição."""
+        pagina: List[Dict] = []
+        primeira = True
+        for item in itens:
+            pagina.append(item)
+            if len(pagina) >= max(1, self.p.tamanho_pagina):
+                primeira = False
+                self._requisitar()
+                yield pagina
+                pagina = []
+        if pagina or primeira:
+            self._requisitar()
+            yield pagina
+
+    # --- Funções equivalentes às do módulo graph ---
+
+    def resolver_sites(self, token, sites_cfg: List[str]) -> List[Dict]:
+        """Todos os sites gerados ou, com 'sites_cfg', apenas os nomes listados."""
+        self._requisitar()
+        sites = [{"id": f"site-{i:03d}", "name": f"Site{i:03d}"} for i in range(self.p.sites)]
+        if sites_cfg:
+            nomes = set(sites_cfg)
+            sites = [s for s in sites if s["name"] in nomes or s["id"] in nomes]
+        return sites
+
+    def listar_drives_do_site(self, site_id: str, token) -> List[Dict]:
+        self._requisitar()
+        indice = site_id.rsplit("-", 1)[-1]
+        return [{"id": f"drive-{indice}-{j:03d}", "name": f"Documentos{j:03d}"}
+                for j in range(self.p.drives_por_site)]
+
+    def obter_id_raiz_do_drive(self, drive_id: str, token) -> str:
+        self._requisitar()
+        return f"pasta:{drive_id}:"
+
+    def obter_ids_raiz_em_lote(self, drive_ids: List[str], token, tamanho_lote: int = 20) -> Dict[str, str]:
+        for _ in range(0, len(drive_ids), max(1, tamanho_lote)):
+            self._requisitar()
+        return {d: f"pasta:{d}:" for d in drive_ids}
+
+    def listar_filhos_paginado(self, drive_id: str, item_id: str, token) -> Iterator[Dict]:
+        for pagina in self._paginar(self._filhos(item_id)):
+            yield from pagina
+
+    def listar_filhos_em_lote(self, drive_id: str, item_ids: List[str], token,
+                              tamanho_lote: int = 20) -> Iterator[Tuple[str, Dict]]:
+        """Um $batch por lote de pastas; páginas seguintes de cada pasta custam uma requisição."""
+        for i in range(0, len(item_ids), max(1, tamanho_lote)):
+            self._requisitar()
+            for item_id in item_ids[i:i + max(1, tamanho_lote)]:
+                for n, filho in enumerate(self._filhos(item_id)):
+                    if n and n % max(1, self.p.tamanho_pagina) == 0:
+                        self._requisitar()
+                    yield item_id, filho
+
+    def _itens_delta(self, drive_id: str) -> Iterator[Dict]:
+        """Enumeração completa do drive em ordem de pais antes de filhos."""
+        raiz = f"pasta:{drive_id}:"
+        yield {"id": raiz, "name": "root", "root": {}, "folder": {}}
+        pendentes = [raiz]
+        while pendentes:
+            id_pasta = pendentes.pop()
+            for filho in self._filhos(id_pasta):
+                if filho.get("folder") is not None:
+                    pendentes.append(filho["id"])
+                yield dict(filho, parentReference={"id": id_pasta})
+
+    def listar_delta_paginado(self, drive_id: str, token, delta_link: Optional[str] = None):
+        """Sem link: enumeração completa paginada. Com link da mesma geração: nenhuma alteração;
+        de outra geração: todos os arquivos voltam como alterados."""
+        link = f"delta:{drive_id}:{self.geracao}"
+        if delta_link == link:
+            self._requisitar()
+            yield {"value": [], "@odata.deltaLink": link}
+            return
+        anterior: Optional[List[Dict]] = None
+        for pagina in self._paginar(self._itens_delta(drive_id)):
+            if anterior is not None:
+                yield {"value": anterior, "@odata.nextLink": f"{link}:proxima"}
+            anterior = pagina
+        yield {"value": anterior or [], "@odata.deltaLink": link}
+
+    def baixar_stream_conteudo_item(self, drive_id: str, item_id: str, token) -> RespostaSintetica:
+        self._requisitar()
+        return RespostaSintetica(StreamSintetico(item_id, self._tamanho(item_id)))
+
+    def baixar_em_faixas_paralelas(self, drive_id: str, item_id: str, token, tamanho: int,
+                                   tamanho_faixa: int = 16 * 1024 * 1024, conexoes: int = 4) -> RespostaSintetica:
+        """Uma requisição por faixa; o conteúdo é o mesmo do stream único."""
+        for _ in range(max(0, math.ceil(tamanho / max(1, tamanho_faixa)) - 1)):
+            self._requisitar()
+        return self.baixar_stream_conteudo_item(drive_id, item_id, token)
+
+    def enviar_arquivo(self, drive_id: str, caminho: str, stream, tamanho: int, token,
+                       limiar_sessao: int = 4 * 1024 * 1024, tamanho_fragmento: int = 10 * 1024 * 1024) -> Dict:
+        """Consome o stream (uma requisição por fragmento acima do limiar) e descarta o conteúdo."""
+        enviados = 0
+        tamanho_leitura = tamanho_fragmento if tamanho > limiar_sessao else max(1, tamanho)
+        while True:
+            self._requisitar()
+            dados = stream.read(tamanho_leitura)
+            enviados += len(dados)
+            if len(dados) < tamanho_leitura:
+                break
+        with self._lock:
+            self.bytes_enviados += enviados
+        return {"id": f"enviado:{caminho}", "name": caminho.rsplit("/", 1)[-1], "size": enviados}
@@ -0,0 +1,228 @@
+import cProfile
+import functools
+import math
+import pstats
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator
+
+# Comentários em Português do Brasil
+# Instrumentação de tempos: histogramas de latência por operação (p50/p95/p99), um proxy que
+# mede cada chamada feita a um objeto (módulo graph, backend de armazenamento, provedor de
+# token) e o perfilador opcional (cProfile ou pyinstrument) de uma execução.
+
+# Buckets em escala logarítmica (razão 2^(1/8), erro relativo abaixo de 9%) a partir de 1 µs:
+# memória constante por operação, independente do número de chamadas
+RAZAO_BUCKET = 2 ** 0.125
+LATENCIA_MINIMA = 1e-6
+
+MODOS_PERFIL = {"desligado", "cprofile", "pyinstrument"}
+
+
+class HistogramaLatencia:
+    """Contagem, soma, máximo e distribuição aproximada das latências de uma operação."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self._buckets: Dict[int, int] = {}
+
+    def registrar(self, segundos: float) -> None:
+        segundos = max(0.0, segundos)
+        indice = int(math.log(max(segundos, LATENCIA_MINIMA) / LATENCIA_MINIMA, RAZAO_BUCKET))
+        self._buckets[indice] = self._buckets.get(indice, 0) + 1
+        self.chamadas += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+
+    def percentil(self, p: float) -> float:
+        """Limite superior do bucket que contém o percentil 'p' (limitado ao máximo observado)."""
+        if not self.chamadas:
+            return 0.0
+        alvo = max(1, math.ceil(self.chamadas * p / 100.0))
+        acumulado = 0
+        for indice in sorted(self._buckets):
+            acumulado += self._buckets[indice]
+            if acumulado >= alvo:
+                return min(LATENCIA_MINIMA * RAZAO_BUCKET ** (indice + 1), self.maximo)
+        return self.maximo
+
+    def resumo(self) -> Dict[str, float]:
+        ms = 1000.0
+        return {
+            "chamadas": self.chamadas,
+            "total_s": round(self.total, 3),
+            "media_ms": round(self.total / self.chamadas * ms, 3) if self.chamadas else 0.0,
+            "p50_ms": round(self.percentil(50) * ms, 3),
+            "p95_ms": round(self.percentil(95) * ms, 3),
+            "p99_ms": round(self.percentil(99) * ms, 3),
+            "max_ms": round(self.maximo * ms, 3),
+        }
+
+
+class RegistroTempos:
+    """Histogramas de latência por nome de operação, seguros entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas: Dict[str, HistogramaLatencia] = {}
+
+    def registrar(self, nome: str, segundos: float) -> None:
+        with self._lock:
+            histograma = self._histogramas.get(nome)
+            if histograma is None:
+                histograma = self._histogramas[nome] = HistogramaLatencia()
+            histograma.registrar(segundos)
+
+    @contextmanager
+    def medir(self, nome: str) -> Iterator[None]:
+        """Mede o bloco (inclusive quando ele termina com exceção)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio)
+
+    def resumo(self) -> Dict[str, Dict[str, float]]:
+        """Resumo por operação, da que consumiu mais tempo total para a que consumiu menos."""
+        with self._lock:
+            resumos = {nome: h.resumo() for nome, h in self._histogramas.items()}
+        return dict(sorted(resumos.items(), key=lambda par: -par[1]["total_s"]))
+
+
+def _gerador_medido(gerador: Iterator, registro: RegistroTempos, nome: str, decorrido: float) -> Iterator:
+    """Repassa os itens do gerador somando apenas o tempo gasto dentro dele (não no consumidor)."""
+    try:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(gerador)
+            except StopIteration:
+                return
+            finally:
+                decorrido += time.perf_counter() - inicio
+            yield item
+    finally:
+        gerador.close()
+        registro.registrar(nome, decorrido)
+
+
+async def _corrotina_medida(corrotina: Awaitable, registro: RegistroTempos, nome: str, inicio: float) -> Any:
+    """Aguarda a corrotina medindo do momento da chamada até o resultado (inclui esperas em semáforos)."""
+    try:
+        return await corrotina
+    finally:
+        registro.registrar(nome, time.perf_counter() - inicio)
+
+
+async def _gerador_assincrono_medido(gerador: AsyncIterator, registro: RegistroTempos, nome: str) -> AsyncIterator:
+    """Como '_gerador_medido', para geradores assíncronos (tempo até cada item ficar pronto)."""
+    decorrido = 0.0
+    try:
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = await gerador.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                decorrido += time.perf_counter() - inicio
+            yield item
+    finally:
+        await gerador.aclose()
+        registro.registrar(nome, decorrido)
+
+
+class ProxyMedido:
+    """Encaminha atributos ao objeto original, medindo cada chamada como '<prefixo>.<método>'.
+
+    Geradores retornados (ex.: listagens paginadas) são medidos pelo tempo gasto em sua
+    iteração e corrotinas até o resultado (motor asyncio). Chamar o próprio proxy (ex.:
+    provedor de token) é medido como '<prefixo>'.
+    """
+
+    def __init__(self, alvo: Any, registro: RegistroTempos, prefixo: str):
+        self._alvo = alvo
+        self._registro = registro
+        self._prefixo = prefixo
+        self._envolvidos: Dict[str, Callable] = {}
+
+    def _medir(self, nome: str, funcao: Callable, *args, **kwargs) -> Any:
+        inicio = time.perf_counter()
+        try:
+            resultado = funcao(*args, **kwargs)
+        except BaseException:
+            self._registro.registrar(nome, time.perf_counter() - inicio)
+            raise
+        if isinstance(resultado, types.CoroutineType):
+            return _corrotina_medida(resultado, self._registro, nome, inicio)
+        if isinstance(resultado, types.AsyncGeneratorType):
+            return _gerador_assincrono_medido(resultado, self._registro, nome)
+        decorrido = time.perf_counter() - inicio
+        if isinstance(resultado, types.GeneratorType):
+            return _gerador_medido(resultado, self._registro, nome, decorrido)
+        self._registro.registrar(nome, decorrido)
+        return resultado
+
+    def __getattr__(self, nome: str) -> Any:
+        valor = getattr(self._alvo, nome)
+        if nome.startswith("_") or not callable(valor):
+            return valor
+        envolvido = self._envolvidos.get(nome)
+        if envolvido is None:
+            envolvido = functools.partial(self._medir, f"{self._prefixo}.{nome}", valor)
+            self._envolvidos[nome] = envolvido
+        return envolvido
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._medir(self._prefixo, self._alvo, *args, **kwargs)
+
+
+def envolver(alvo: Any, registro: RegistroTempos, prefixo: str) -> Any:
+    """Proxy medido para 'alvo'; valores não chamáveis (ex.: token fixo em str) são devolvidos como estão."""
+    if isinstance(alvo, (str, bytes)) or alvo is None:
+        return alvo
+    return ProxyMedido(alvo, registro, prefixo)
+
+
+@contextmanager
+def perfilar(modo: str, diretorio: Path, sufixo: str = "") -> Iterator[None]:
+    """Executa o bloco sob cProfile ou pyinstrument e grava o relatório em 'diretorio'.
+
+    Os dois perfiladores acompanham apenas a thread que chama (varredura e finalização); o
+    tempo dos workers aparece nos histogramas de latência. Com 'concorrencia = 1' o perfil
+    cobre também as transferências de forma sequencial.
+    """
+    if modo not in MODOS_PERFIL:
+        raise ValueError(f"perfil inválido: {modo}")
+    if modo == "desligado":
+        yield
+        return
+    diretorio.mkdir(parents=True, exist_ok=True)
+    base = diretorio / f"perfil-{datetime.now().strftime('%Y%m%d-%H%M%S')}{sufixo}"
+    if modo == "cprofile":
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            perfil.dump_stats(str(base) + ".prof")
+            with open(str(base) + ".txt", "w", encoding="utf-8") as f:
+                pstats.Stats(perfil, stream=f).sort_stats("cumulative").print_stats(40)
+        return
+    # Dependência opcional: pip install pyinstrument
+    from pyinstrument import Profiler
+
+    perfilador = Profiler()
+    perfilador.start()
+    try:
+        yield
+    finally:
+        perfilador.stop()
+        Path(str(base) + ".html").write_text(perfilador.output_html(), encoding="utf-8")
@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Comentários em Português do Brasil
+# Limitador de taxa adaptativo compartilhado por todas as chamadas ao Graph (cliente síncrono,
+# downloads em faixas e cliente assíncrono). O SharePoint aplica throttling por aplicativo e por
+# tenant: em vez de cada requisição repetir por conta própria (tempestade de 429), um balde de
+# fichas central controla o ritmo. A taxa segue AIMD: cai pela metade a cada episódio de
+# throttling (com pausa global pelo Retry-After) e sobe aos poucos enquanto as respostas vêm
+# limpas e o limite é o gargalo.
+
+
+class LimitadorAdaptativo:
+    """Balde de fichas com taxa (requisições/s) ajustada por AIMD; seguro entre threads.
+
+    'reservar' não bloqueia: retorna a espera, para que o cliente síncrono durma e o
+    assíncrono aguarde no laço de eventos. O balde acumula até um segundo de fichas (rajada).
+    """
+
+    def __init__(self, taxa_inicial: float = 20.0, taxa_minima: float = 1.0, taxa_maxima: float = 200.0,
+                 fator_reducao: float = 0.5, incremento: float = 2.0, intervalo_aumento: float = 1.0,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.taxa_minima = max(0.01, float(taxa_minima))
+        self.taxa_maxima = max(self.taxa_minima, float(taxa_maxima))
+        self.fator_reducao = min(max(float(fator_reducao), 0.01), 1.0)
+        self.incremento = max(0.0, float(incremento))
+        self.intervalo_aumento = max(0.0, float(intervalo_aumento))
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._taxa = min(max(float(taxa_inicial), self.taxa_minima), self.taxa_maxima)
+        agora = relogio()
+        self._fichas = self._capacidade()
+        # Instante até o qual as fichas já foram contabilizadas; fica no futuro durante uma pausa
+        self._reabastecido_em = agora
+        self._ultimo_ajuste = agora
+        self._ultima_reducao: Optional[float] = None
+        # Houve espera desde o último ajuste: só então aumentar a taxa faz diferença
+        self._limitou = False
+        self._contadores: Dict[str, int] = {"reducoes_taxa": 0, "aumentos_taxa": 0}
+
+    def _capacidade(self) -> float:
+        return max(1.0, self._taxa)
+
+    def _reabastecer(self, agora: float) -> None:
+        if agora > self._reabastecido_em:
+            self._fichas = min(self._capacidade(), self._fichas + (agora - self._reabastecido_em) * self._taxa)
+            self._reabastecido_em = agora
+
+    @property
+    def taxa_atual(self) -> float:
+        with self._lock:
+            return self._taxa
+
+    def reservar(self, custo: float = 1.0) -> float:
+        """Consome 'custo' fichas e retorna os segundos a esperar antes de enviar a requisição."""
+        with self._lock:
+            agora = self._relogio()
+            self._reabastecer(agora)
+            self._fichas -= custo
+            espera = max(0.0, self._reabastecido_em - agora) + max(0.0, -self._fichas) / self._taxa
+            if espera > 0:
+                self._limitou = True
+            return espera
+
+    def registrar_sucesso(self) -> None:
+        """Resposta sem throttling: aumento aditivo, no máximo um por 'intervalo_aumento'."""
+        with self._lock:
+            agora = self._relogio()
+            if not self._limitou or agora - self._ultimo_ajuste < self.intervalo_aumento:
+                return
+            if self._taxa < self.taxa_maxima:
+                self._taxa = min(self.taxa_maxima, self._taxa + self.incremento)
+                self._contadores["aumentos_taxa"] += 1
+            self._ultimo_ajuste = agora
+            self._limitou = False
+
+    def registrar_throttling(self, retry_after: Optional[float] = None) -> None:
+        """Resposta 429 (ou 503 com Retry-After): redução multiplicativa e pausa global.
+
+        Requisições já em andamento costumam receber 429 juntas; a taxa é reduzida uma vez por
+        episódio (intervalo mínimo entre reduções), mas todas estendem a pausa.
+        """
+        with self._lock:
+            agora = self._relogio()
+            self._reabastecer(agora)
+            carencia = max(self.intervalo_aumento, retry_after or 0.0)
+            if self._ultima_reducao is None or agora - self._ultima_reducao >= carencia:
+                self._taxa = max(self.taxa_minima, self._taxa * self.fator_reducao)
+                self._ultima_reducao = agora
+                self._contadores["reducoes_taxa"] += 1
+            # Sem rajada ao fim da pausa: o balde recomeça vazio
+            self._fichas = min(self._fichas, 0.0)
+            if retry_after:
+                self._reabastecido_em = max(self._reabastecido_em, agora + retry_after)
+            # O intervalo limpo para voltar a aumentar conta a partir do fim da pausa
+            self._ultimo_ajuste = max(agora, self._reabastecido_em)
+            self._limitou = False
+
+    def estatisticas(self) -> Dict[str, float]:
+        """Taxa atual e quantidade de ajustes, lidos pelas métricas da execução."""
+        with self._lock:
+            return {"taxa_limite": round(self._taxa, 2), **self._contadores}
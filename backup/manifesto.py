@@ -0,0 +1,183 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+# Comentários em Português do Brasil
+# Manifesto (id do item -> entrada) persistido em SQLite e indexado pelo ID. Permite gravar um
+# item por vez durante a varredura, consultar itens do snapshot anterior sem carregar tudo em
+# memória e detectar apagados com um anti-join no próprio banco.
+
+NOME_MANIFESTO = "latest_manifest.sqlite"
+# Formato antigo (JSON único); importado uma vez para o SQLite quando encontrado
+NOME_MANIFESTO_LEGADO = "latest_manifest.json"
+
+
+class ArmazemManifesto:
+    """Manifesto em SQLite, seguro entre threads, com commits a cada 'intervalo_commit' gravações.
+
+    Cada linha guarda o ID do item, o drive (para o modo delta) e a entrada serializada em JSON.
+    Use caminho None para um manifesto vazio em memória.
+    """
+
+    def __init__(self, caminho: Optional[Path] = None, intervalo_commit: int = 1000):
+        self.caminho = Path(caminho) if caminho is not None else None
+        self.intervalo_commit = max(1, int(intervalo_commit))
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        if self.caminho is not None:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._conexao = sqlite3.connect(str(self.caminho) if self.caminho else ":memory:", check_same_thread=False)
+        # A atomicidade do estado vem do rename do arquivo completo; o journal do SQLite fica em memória
+        self._conexao.execute("PRAGMA journal_mode=MEMORY")
+        self._conexao.execute("PRAGMA synchronous=OFF")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS itens (id TEXT PRIMARY KEY, drive_id TEXT, entrada TEXT NOT NULL)"
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS itens_por_drive ON itens (drive_id)")
+        self._conexao.commit()
+
+    def gravar(self, id_item: str, entrada: Dict) -> None:
+        """Insere ou substitui a entrada de um item."""
+        dados = json.dumps(entrada, ensure_ascii=False)
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO itens (id, drive_id, entrada) VALUES (?, ?, ?)",
+                (id_item, entrada.get("driveId"), dados),
+            )
+            self._pendentes += 1
+            if self._pendentes >= self.intervalo_commit:
+                self._conexao.commit()
+                self._pendentes = 0
+
+    def obter(self, id_item: Optional[str]) -> Optional[Dict]:
+        """Retorna a entrada do item ou None."""
+        if not id_item:
+            return None
+        with self._lock:
+            linha = self._conexao.execute("SELECT entrada FROM itens WHERE id = ?", (id_item,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def __contains__(self, id_item: str) -> bool:
+        with self._lock:
+            return self._conexao.execute("SELECT 1 FROM itens WHERE id = ?", (id_item,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM itens").fetchone()[0]
+
+    def _iterar(self, sql: str, parametros: Tuple = ()) -> Iterator[Tuple[str, Dict]]:
+        """Percorre o resultado em blocos, sem manter o lock entre um bloco e outro."""
+        with self._lock:
+            self._conexao.commit()
+            cursor = self._conexao.cursor()
+            cursor.execute(sql, parametros)
+        try:
+            while True:
+                with self._lock:
+                    linhas = cursor.fetchmany(1000)
+                if not linhas:
+                    return
+                for id_item, dados in linhas:
+                    yield id_item, json.loads(dados)
+        finally:
+            with self._lock:
+                cursor.close()
+
+    def itens(self) -> Iterator[Tuple[str, Dict]]:
+        """Itera (id, entrada) em ordem de ID."""
+        return self._iterar("SELECT id, entrada FROM itens ORDER BY id")
+
+    def itens_do_drive(self, id_drive: str) -> Iterator[Tuple[str, Dict]]:
+        """Itera (id, entrada) dos itens de um drive (índice por drive_id)."""
+        return self._iterar("SELECT id, entrada FROM itens WHERE drive_id = ? ORDER BY id", (id_drive,))
+
+    def ausentes_em(self, outro: "ArmazemManifesto") -> Iterator[Tuple[str, Dict]]:
+        """Itens deste manifesto cujo ID não existe em 'outro' (anti-join entre os dois bancos)."""
+        if outro.caminho is None:
+            raise ValueError("O manifesto comparado precisa estar em arquivo")
+        outro.confirmar()
+        with self._lock:
+            self._conexao.execute("ATTACH DATABASE ? AS outro", (str(outro.caminho),))
+        try:
+            yield from self._iterar(
+                "SELECT a.id, a.entrada FROM itens AS a "
+                "WHERE NOT EXISTS (SELECT 1 FROM outro.itens AS b WHERE b.id = a.id) ORDER BY a.id"
+            )
+        finally:
+            with self._lock:
+                self._conexao.execute("DETACH DATABASE outro")
+
+    def importar(self, caminho_origem: Path) -> None:
+        """Copia (INSERT OR REPLACE) todos os itens de outro arquivo de manifesto SQLite."""
+        with self._lock:
+            self._conexao.commit()
+            self._conexao.execute("ATTACH DATABASE ? AS origem", (str(caminho_origem),))
+            try:
+                self._conexao.execute("INSERT OR REPLACE INTO itens SELECT id, drive_id, entrada FROM origem.itens")
+                self._conexao.commit()
+            finally:
+                self._conexao.execute("DETACH DATABASE origem")
+
+    def confirmar(self) -> None:
+        """Efetiva no arquivo as gravações pendentes."""
+        with self._lock:
+            self._conexao.commit()
+            self._pendentes = 0
+
+    def fechar(self) -> None:
+        """Efetiva as gravações e fecha a conexão."""
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.commit()
+                self._conexao.close()
+                self._conexao = None
+
+
+def criar_manifesto_novo(caminho: Path) -> ArmazemManifesto:
+    """Cria um manifesto vazio no caminho, descartando restos de uma execução interrompida."""
+    for sufixo in ("", "-journal"):
+        resto = Path(str(caminho) + sufixo)
+        if resto.exists():
+            resto.unlink()
+    return ArmazemManifesto(caminho)
+
+
+def publicar_manifesto(manifesto: ArmazemManifesto, destino: Path) -> None:
+    """Fecha o manifesto e o move de forma atômica para 'destino'."""
+    manifesto.fechar()
+    if manifesto.caminho is None:
+        raise ValueError("Manifesto em memória não pode ser publicado")
+    with open(manifesto.caminho, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(manifesto.caminho, destino)
+    manifesto.caminho = destino
+
+
+def abrir_manifesto_anterior(diretorio_estado: Path) -> ArmazemManifesto:
+    """Abre o manifesto da última execução; migra o formato JSON antigo se for o que existir."""
+    caminho = diretorio_estado / NOME_MANIFESTO
+    legado = diretorio_estado / NOME_MANIFESTO_LEGADO
+    if caminho.exists():
+        return ArmazemManifesto(caminho)
+    if not legado.exists():
+        return ArmazemManifesto(None)
+    try:
+        dados: Dict[str, Dict] = json.loads(legado.read_text(encoding="utf-8"))
+    except Exception:
+        return ArmazemManifesto(None)
+    temporario = criar_manifesto_novo(diretorio_estado / (NOME_MANIFESTO + ".tmp"))
+    for id_item, entrada in dados.items():
+        temporario.gravar(id_item, entrada)
+    publicar_manifesto(temporario, caminho)
+    legado.unlink()
+    return ArmazemManifesto(caminho)
+
+
+def iterar_entradas(entradas: Union[Dict[str, Dict], ArmazemManifesto]) -> Iterable[Tuple[str, Dict]]:
+    """Normaliza um dicionário ou um ArmazemManifesto em pares (id, entrada)."""
+    if isinstance(entradas, ArmazemManifesto):
+        return entradas.itens()
+    return entradas.items()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .checkpoint import gravar_texto_atomico
+
+# Comentários em Português do Brasil
+# Cache persistente dos metadados da varredura: sites resolvidos, drives de cada site e ID da
+# raiz de cada drive. Num tenant grande essas chamadas somam milhares de requisições antes do
+# primeiro arquivo. As entradas ficam num JSON no diretório de estado, com validade própria
+# (sorteada entre 75% e 100% do TTL, para que a renovação se espalhe pelas execuções em vez de
+# acontecer toda no mesmo dia). Entradas vencidas são descartadas ao salvar. A cada
+# 'renovacao_completa_s' o arquivo inteiro é descartado e tudo é resolvido de novo, de modo que
+# nenhuma entrada sobrevive indefinidamente por renovações parciais. O cache só é gravado
+# ao fim de uma execução bem-sucedida; após uma falha ele é apagado, e a execução seguinte
+# resolve tudo novamente (um drive removido, por exemplo, não fica preso no cache).
+
+NOME_CACHE = "cache_metadados.json"
+VERSAO_CACHE = 1
+# Campos guardados de cada site e drive (os usados pela varredura)
+CAMPOS_SITE = ("id", "name", "displayName", "webUrl")
+CAMPOS_DRIVE = ("id", "name", "driveType")
+
+
+def _resumir(objeto: Dict, campos) -> Dict:
+    return {c: objeto[c] for c in campos if c in objeto}
+
+
+def _chave_sites(sites_cfg: List[str]) -> str:
+    """Os sites resolvidos ficam numa entrada por lista configurada: mudar a lista (ou o shard) a renova."""
+    return "sites:" + hashlib.sha1("\n".join(sites_cfg or []).encode("utf-8")).hexdigest()
+
+
+class CacheMetadados:
+    """Entradas chave -> valor com expiração, persistidas em JSON; seguro entre threads.
+
+    'renovar=True' (app.py --atualizar-metadados) ignora as entradas gravadas: tudo é resolvido
+    de novo e o arquivo é regravado ao final. O mesmo acontece quando a última renovação completa
+    tem mais de 'renovacao_completa_s' segundos (0 desativa).
+    """
+
+    def __init__(self, caminho: Path, validade_s: float, renovar: bool = False, max_entradas: int = 200_000,
+                 renovacao_completa_s: float = 0.0, relogio: Callable[[], float] = time.time,
+                 sortear: Callable[[], float] = random.random):
+        self.caminho = Path(caminho)
+        self.validade_s = float(validade_s)
+        self.max_entradas = max(1, int(max_entradas))
+        self.renovacao_completa_s = float(renovacao_completa_s)
+        self._relogio = relogio
+        self._sortear = sortear
+        self._lock = threading.Lock()
+        # chave -> {"valor": ..., "expira_em": timestamp}
+        self._entradas: Dict[str, Dict] = {}
+        # Início do ciclo atual: a última vez em que o cache foi montado do zero
+        self.renovado_em = relogio()
+        self._contadores: Dict[str, int] = {"cache_metadados_acertos": 0, "cache_metadados_falhas": 0}
+        if not renovar:
+            self._carregar()
+
+    def _carregar(self) -> None:
+        """Lê o arquivo; ausente, corrompido ou de outra versão equivale a um cache vazio."""
+        try:
+            dados = json.loads(self.caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(dados, dict) or dados.get("versao") != VERSAO_CACHE:
+            return
+        agora = self._relogio()
+        renovado_em = dados.get("renovado_em", 0)
+        if self.renovacao_completa_s > 0 and agora - renovado_em >= self.renovacao_completa_s:
+            return
+        self.renovado_em = renovado_em
+        self._entradas = {k: e for k, e in (dados.get("entradas") or {}).items()
+                          if isinstance(e, dict) and e.get("expira_em", 0) > agora}
+
+    def obter(self, chave: str) -> Optional[Any]:
+        """Valor ainda válido da chave, ou None."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada["expira_em"] > self._relogio():
+                self._contadores["cache_metadados_acertos"] += 1
+                return entrada["valor"]
+            self._contadores["cache_metadados_falhas"] += 1
+            return None
+
+    def gravar(self, chave: str, valor: Any) -> None:
+        with self._lock:
+            validade = self.validade_s * (0.75 + 0.25 * self._sortear())
+            self._entradas[chave] = {"valor": valor, "expira_em": self._relogio() + validade}
+
+    def salvar(self) -> None:
+        """Grava as entradas válidas; acima de 'max_entradas' saem as que vencem primeiro."""
+        with self._lock:
+            agora = self._relogio()
+            validas = sorted(((k, e) for k, e in self._entradas.items() if e["expira_em"] > agora),
+                             key=lambda par: par[1]["expira_em"], reverse=True)[:self.max_entradas]
+            self._entradas = dict(validas)
+            texto = json.dumps({"versao": VERSAO_CACHE, "renovado_em": self.renovado_em, "entradas": self._entradas},
+                               ensure_ascii=False)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        gravar_texto_atomico(self.caminho, texto)
+
+    def invalidar(self) -> None:
+        """Descarta as entradas e apaga o arquivo (execução com falha)."""
+        with self._lock:
+            self._entradas.clear()
+        self.caminho.unlink(missing_ok=True)
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._contadores)
+
+
+class GraphComCache:
+    """Proxy da API síncrona do Graph que responde sites, drives e raízes pelo cache.
+
+    As demais funções (listagens, delta, downloads) são repassadas sem alteração.
+    """
+
+    def __init__(self, api: Any, cache: CacheMetadados):
+        self._api = api
+        self._cache = cache
+
+    def resolver_sites(self, token, sites_cfg: List[str]) -> List[Dict]:
+        chave = _chave_sites(sites_cfg)
+        sites = self._cache.obter(chave)
+        if sites is None:
+            sites = [_resumir(s, CAMPOS_SITE) for s in self._api.resolver_sites(token, sites_cfg)]
+            self._cache.gravar(chave, sites)
+        return sites
+
+    def listar_drives_do_site(self, site_id: str, token) -> List[Dict]:
+        drives = self._cache.obter(f"drives:{site_id}")
+        if drives is None:
+            drives = [_resumir(d, CAMPOS_DRIVE) for d in self._api.listar_drives_do_site(site_id, token)]
+            self._cache.gravar(f"drives:{site_id}", drives)
+        return drives
+
+    def obter_id_raiz_do_drive(self, drive_id: str, token) -> str:
+        id_raiz = self._cache.obter(f"raiz:{drive_id}")
+        if id_raiz is None:
+            id_raiz = self._api.obter_id_raiz_do_drive(drive_id, token)
+            self._cache.gravar(f"raiz:{drive_id}", id_raiz)
+        return id_raiz
+
+    def obter_ids_raiz_em_lote(self, drive_ids: List[str], token, tamanho_lote: int = 20) -> Dict[str, str]:
+        raizes = {d: self._cache.obter(f"raiz:{d}") for d in drive_ids}
+        faltantes = [d for d, id_raiz in raizes.items() if id_raiz is None]
+        if faltantes:
+            for drive_id, id_raiz in self._api.obter_ids_raiz_em_lote(faltantes, token, tamanho_lote).items():
+                if id_raiz:
+                    raizes[drive_id] = id_raiz
+                    self._cache.gravar(f"raiz:{drive_id}", id_raiz)
+        return {d: r for d, r in raizes.items() if r}
+
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self._api, nome)
+
+
+class GraphAssincronoComCache:
+    """Equivalente de GraphComCache para a interface assíncrona (GraphAssincrono/GraphEmThreads)."""
+
+    def __init__(self, api: Any, cache: CacheMetadados):
+        self._api = api
+        self._cache = cache
+
+    async def resolver_sites(self, token, sites_cfg: List[str]) -> List[Dict]:
+        chave = _chave_sites(sites_cfg)
+        sites = self._cache.obter(chave)
+        if sites is None:
+            sites = [_resumir(s, CAMPOS_SITE) for s in await self._api.resolver_sites(token, sites_cfg)]
+            self._cache.gravar(chave, sites)
+        return sites
+
+    async def listar_drives_do_site(self, site_id: str, token) -> List[Dict]:
+        drives = self._cache.obter(f"drives:{site_id}")
+        if drives is None:
+            drives = [_resumir(d, CAMPOS_DRIVE) for d in await self._api.listar_drives_do_site(site_id, token)]
+            self._cache.gravar(f"drives:{site_id}", drives)
+        return drives
+
+    async def obter_id_raiz_do_drive(self, drive_id: str, token) -> str:
+        id_raiz = self._cache.obter(f"raiz:{drive_id}")
+        if id_raiz is None:
+            id_raiz = await self._api.obter_id_raiz_do_drive(drive_id, token)
+            self._cache.gravar(f"raiz:{drive_id}", id_raiz)
+        return id_raiz
+
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self._api, nome)
@@ -0,0 +1,253 @@
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+import requests
+
+from .checkpoint import gravar_texto_atomico
+from .instrumentacao import RegistroTempos
+
+try:
+    from tqdm import tqdm
+except ImportError:  # tqdm é opcional: sem ele não há barra de progresso
+    tqdm = None
+
+# Comentários em Português do Brasil
+# Métricas de uma execução (contadores, vazão, ETA, profundidade das filas e latências por
+# operação). Um monitor em thread própria exibe o progresso no terminal (tqdm) ou, em execução
+# não interativa, grava apenas o resumo JSON ao final; opcionalmente mantém um arquivo no
+# formato texto do Prometheus (textfile collector) e envia as métricas a um Pushgateway.
+
+PREFIXO_PROMETHEUS = "sharepoint_backup"
+
+# Contadores conhecidos; outros nomes também são aceitos por 'incrementar'
+CONTADORES = (
+    "itens_descobertos",     # arquivos enfileirados pela varredura
+    "bytes_descobertos",     # soma dos tamanhos informados pelo Graph
+    "itens_concluidos",
+    "bytes_concluidos",      # tamanho dos itens concluídos (baixados ou reaproveitados)
+    "arquivos_baixados",
+    "arquivos_reaproveitados",
+    "arquivos_deduplicados", # baixados com conteúdo idêntico ao anterior e vinculados a ele (índice de hashes)
+    "arquivos_retomados",    # concluídos por uma execução interrompida (journal)
+    "arquivos_filtrados",    # fora do backup pelos filtros de inclusão/exclusão e tamanho
+    "bytes_baixados",        # bytes efetivamente lidos do Graph
+)
+
+
+class LeitorContado:
+    """Envolve um stream ('raw') somando os bytes lidos na métrica indicada.
+
+    O tempo de cada leitura entra na latência 'graph.leitura_bloco': a soma separa o tempo de
+    download do tempo de gravação no backend, que consome o stream.
+    """
+
+    def __init__(self, stream: BinaryIO, metricas: "MetricasExecucao", nome: str = "bytes_baixados"):
+        self._stream = stream
+        self._metricas = metricas
+        self._nome = nome
+
+    def read(self, n: int = -1) -> bytes:
+        inicio = time.perf_counter()
+        dados = self._stream.read(n)
+        self._metricas.tempos.registrar("graph.leitura_bloco", time.perf_counter() - inicio)
+        if dados:
+            self._metricas.incrementar(self._nome, len(dados))
+        return dados
+
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self._stream, nome)
+
+
+class MetricasExecucao:
+    """Contadores seguros entre threads e medidores (funções consultadas a cada leitura)."""
+
+    def __init__(self, relogio: Callable[[], float] = time.monotonic):
+        self._relogio = relogio
+        self._inicio = relogio()
+        self.inicio_utc = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, int] = {nome: 0 for nome in CONTADORES}
+        self._medidores: Dict[str, Callable[[], float]] = {}
+        # Latências por operação (chamadas ao Graph, ao backend e fases da execução)
+        self.tempos = RegistroTempos()
+        # A ETA só é calculada quando a varredura terminou e o total é conhecido
+        self.varredura_concluida = False
+
+    def incrementar(self, nome: str, quantidade: int = 1) -> None:
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + quantidade
+
+    def registrar_medidor(self, nome: str, funcao: Callable[[], float]) -> None:
+        """Registra um valor instantâneo (ex.: profundidade da fila), lido a cada instantâneo."""
+        with self._lock:
+            self._medidores[nome] = funcao
+
+    def contar_leitura(self, stream: BinaryIO) -> LeitorContado:
+        """Stream que soma os bytes lidos em 'bytes_baixados'."""
+        return LeitorContado(stream, self)
+
+    def instantaneo(self) -> Dict[str, Any]:
+        """Contadores, medidores e valores derivados (taxas e ETA) no momento atual."""
+        with self._lock:
+            dados: Dict[str, Any] = dict(self._contadores)
+            medidores = dict(self._medidores)
+        for nome, funcao in medidores.items():
+            try:
+                dados[nome] = funcao()
+            except Exception:
+                dados[nome] = None
+        segundos = max(self._relogio() - self._inicio, 1e-9)
+        dados["segundos"] = round(segundos, 3)
+        dados["itens_por_s"] = round(dados["itens_concluidos"] / segundos, 3)
+        dados["mb_por_s"] = round(dados["bytes_baixados"] / (1024 * 1024) / segundos, 3)
+        dados["eta_s"] = None
+        restante = dados["bytes_descobertos"] - dados["bytes_concluidos"]
+        if self.varredura_concluida and dados["bytes_concluidos"] > 0:
+            dados["eta_s"] = round(max(0, restante) * segundos / dados["bytes_concluidos"], 1)
+        return dados
+
+
+def texto_prometheus(dados: Dict[str, Any], rotulos: Optional[Dict[str, str]] = None,
+                     latencias: Optional[Dict[str, Dict[str, float]]] = None) -> str:
+    """Formata o instantâneo (e as latências, como 'summary') no formato texto do Prometheus."""
+    rotulos_txt = ",".join(f'{k}="{v}"' for k, v in sorted((rotulos or {}).items()))
+    sufixo = f"{{{rotulos_txt}}}" if rotulos_txt else ""
+    linhas = []
+    for nome, valor in sorted(dados.items()):
+        if isinstance(valor, bool):
+            valor = int(valor)
+        if not isinstance(valor, (int, float)):
+            continue
+        if nome in CONTADORES:
+            metrica, tipo = f"{PREFIXO_PROMETHEUS}_{nome}_total", "counter"
+        else:
+            metrica, tipo = f"{PREFIXO_PROMETHEUS}_{nome}", "gauge"
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        linhas.append(f"{metrica}{sufixo} {valor}")
+    if latencias:
+        metrica = f"{PREFIXO_PROMETHEUS}_latencia_segundos"
+        linhas.append(f"# TYPE {metrica} summary")
+        for operacao, resumo in sorted(latencias.items()):
+            base = ",".join(filter(None, [rotulos_txt, f'operacao="{operacao}"']))
+            for quantil, chave in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                linhas.append(f'{metrica}{{{base},quantile="{quantil}"}} {resumo[chave] / 1000}')
+            linhas.append(f"{metrica}_sum{{{base}}} {resumo['total_s']}")
+            linhas.append(f"{metrica}_count{{{base}}} {resumo['chamadas']}")
+    return "\n".join(linhas) + "\n"
+
+
+class MonitorExecucao:
+    """Thread que atualiza a exibição do progresso e as saídas para o Prometheus periodicamente.
+
+    Modos de 'progresso': 'barra' (tqdm no stderr), 'json' (apenas o resumo JSON, também
+    impresso no stdout), 'desligado' (apenas o arquivo de resumo) e 'auto' (barra se o
+    stderr for um terminal, senão desligado: o stdout só recebe o resumo quando pedido). O
+    resumo é sempre gravado em 'arquivo_resumo'.
+    """
+
+    def __init__(self, metricas: MetricasExecucao, arquivo_resumo: Path, progresso: str = "auto",
+                 intervalo: float = 2.0, arquivo_prometheus: Optional[str] = None,
+                 pushgateway_url: Optional[str] = None, job: str = PREFIXO_PROMETHEUS,
+                 rotulos: Optional[Dict[str, str]] = None):
+        if progresso == "auto":
+            progresso = "barra" if sys.stderr.isatty() else "desligado"
+        self.metricas = metricas
+        self.arquivo_resumo = Path(arquivo_resumo)
+        self.progresso = progresso
+        self.intervalo = max(0.1, float(intervalo))
+        self.arquivo_prometheus = Path(arquivo_prometheus) if arquivo_prometheus else None
+        self.pushgateway_url = pushgateway_url.rstrip("/") if pushgateway_url else None
+        self.job = job
+        self.rotulos = dict(rotulos or {})
+        self._parar = threading.Event()
+        self._barra = None
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self) -> "MonitorExecucao":
+        if self.progresso == "barra" and tqdm is not None:
+            self._barra = tqdm(total=0, unit="B", unit_scale=True, unit_divisor=1024,
+                               desc="Backup", file=sys.stderr, dynamic_ncols=True)
+        self._thread = threading.Thread(target=self._executar, name="monitor-execucao", daemon=True)
+        self._thread.start()
+        return self
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self._publicar(self.metricas.instantaneo())
+
+    def _publicar(self, dados: Dict[str, Any]) -> None:
+        """Atualiza a barra e as saídas do Prometheus; falhas aqui nunca interrompem o backup."""
+        if self._barra is not None:
+            self._barra.total = max(dados["bytes_descobertos"], dados["bytes_concluidos"])
+            self._barra.n = dados["bytes_concluidos"]
+            self._barra.set_postfix(
+                itens=f"{dados['itens_concluidos']}/{dados['itens_descobertos']}",
+                arq_s=dados["itens_por_s"], mb_s=dados["mb_por_s"],
+                retent=dados.get("graph_retentativas", 0), t429=dados.get("graph_throttling", 0),
+                req_s=dados.get("graph_taxa_limite"), fila=dados.get("fila_transferencia"), refresh=False,
+            )
+            self._barra.refresh()
+        texto = None
+        if self.arquivo_prometheus or self.pushgateway_url:
+            dados = dict(dados, ultima_atualizacao_timestamp=round(time.time(), 3))
+            texto = texto_prometheus(dados, self.rotulos, self.metricas.tempos.resumo())
+        if self.arquivo_prometheus and texto:
+            try:
+                self.arquivo_prometheus.parent.mkdir(parents=True, exist_ok=True)
+                gravar_texto_atomico(self.arquivo_prometheus, texto)
+            except OSError:
+                pass
+        if self.pushgateway_url and texto:
+            url = f"{self.pushgateway_url}/metrics/job/{self.job}"
+            for chave, valor in sorted(self.rotulos.items()):
+                url += f"/{chave}/{valor.replace('/', '-')}"
+            try:
+                requests.put(url, data=texto.encode("utf-8"), timeout=10)
+            except requests.RequestException:
+                pass
+
+    def finalizar(self, erro: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Para a thread, publica os valores finais e grava o resumo JSON da execução."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        dados = self.metricas.instantaneo()
+        dados["sucesso"] = erro is None
+        self._publicar(dados)
+        latencias = self.metricas.tempos.resumo()
+        if self._barra is not None:
+            self._barra.close()
+            _imprimir_latencias(latencias)
+        resumo = {
+            "inicio": self.metricas.inicio_utc.isoformat(),
+            "fim": datetime.now(timezone.utc).isoformat(),
+            "sucesso": erro is None,
+            "erro": f"{type(erro).__name__}: {erro}" if erro is not None else None,
+            **self.rotulos,
+            "metricas": {k: v for k, v in dados.items() if k != "sucesso"},
+            "latencias": latencias,
+        }
+        texto = json.dumps(resumo, indent=2, ensure_ascii=False)
+        try:
+            self.arquivo_resumo.parent.mkdir(parents=True, exist_ok=True)
+            gravar_texto_atomico(self.arquivo_resumo, texto)
+        except OSError:
+            pass
+        if self.progresso == "json":
+            print(json.dumps(resumo, ensure_ascii=False))
+        return resumo
+
+
+def _imprimir_latencias(latencias: Dict[str, Dict[str, float]], limite: int = 15) -> None:
+    """Tabela das operações que mais consumiram tempo (modo interativo)."""
+    if not latencias:
+        return
+    print(f"{'operação':<44} {'chamadas':>9} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for nome, r in list(latencias.items())[:limite]:
+        print(f"{nome:<44} {r['chamadas']:>9} {r['total_s']:>9.1f} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}", file=sys.stderr)
@@ -0,0 +1,185 @@
+import gzip
+import io
+import tarfile
+import tempfile
+import threading
+import uuid
+from typing import BinaryIO, Dict, Optional, Set, Tuple
+
+from .storage.base import BackendArmazenamento
+
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional: só a compressão "zstd" precisa dele
+    zstandard = None
+
+# Comentários em Português do Brasil
+# Empacotamento de arquivos pequenos (modo deduplicado). Em bibliotecas com milhões de arquivos
+# pequenos, um objeto por conteúdo significa milhões de PUTs por snapshot. Conteúdos até o
+# limiar são agrupados em segmentos tar de tamanho fixo em 'blobs/pacotes/'; cada membro é
+# comprimido individualmente, de modo que a entrada do manifesto (segmento, deslocamento e
+# tamanho) basta para ler um único arquivo com uma leitura por faixa. Os segmentos continuam
+# extraíveis com qualquer ferramenta tar.
+
+PREFIXO_PACOTES = "pacotes"
+COMPRESSOES = ("nenhuma", "gzip", "zstd")
+_SUFIXOS = {"nenhuma": "", "gzip": ".gz", "zstd": ".zst"}
+# Blocos do formato tar: o conteúdo de cada membro é completado até múltiplo de 512 bytes
+_BLOCO_TAR = 512
+
+
+def comprimir(dados: bytes, compressao: str) -> bytes:
+    if compressao == "gzip":
+        # mtime fixo: o mesmo conteúdo gera sempre os mesmos bytes
+        return gzip.compress(dados, mtime=0)
+    if compressao == "zstd":
+        return zstandard.ZstdCompressor().compress(dados)
+    return dados
+
+
+def descomprimir(dados: bytes, compressao: str) -> bytes:
+    if compressao == "gzip":
+        return gzip.decompress(dados)
+    if compressao == "zstd":
+        if zstandard is None:
+            raise ImportError("Segmento comprimido com zstd: pip install zstandard", name="zstandard")
+        return zstandard.ZstdDecompressor().decompress(dados)
+    return dados
+
+
+class _Segmento:
+    """Segmento tar em construção, num arquivo temporário em disco."""
+
+    def __init__(self, chave: str):
+        self.chave = chave
+        self.arquivo = tempfile.TemporaryFile()
+        self.tar = tarfile.open(fileobj=self.arquivo, mode="w", format=tarfile.PAX_FORMAT)
+        self.membros = 0
+
+    @property
+    def tamanho(self) -> int:
+        return self.tar.offset
+
+    def adicionar(self, nome: str, dados: bytes) -> int:
+        """Acrescenta um membro e retorna o deslocamento do seu conteúdo no segmento."""
+        info = tarfile.TarInfo(nome)
+        info.size = len(dados)
+        self.tar.addfile(info, io.BytesIO(dados))
+        self.membros += 1
+        blocos = -(-len(dados) // _BLOCO_TAR)
+        return self.tar.offset - blocos * _BLOCO_TAR
+
+    def fechar(self) -> int:
+        """Grava o fim do arquivo tar e retorna o tamanho final."""
+        self.tar.close()
+        tamanho = self.arquivo.tell()
+        self.arquivo.seek(0)
+        return tamanho
+
+
+class EmpacotadorSegmentos:
+    """Agrupa conteúdos pequenos em segmentos; seguro para os workers do PoolTransferencia.
+
+    'adicionar' retorna o localizador gravado na entrada do manifesto. O segmento é enviado ao
+    backend quando atinge 'tamanho_segmento' (pelo worker que o completou, fora do lock) ou em
+    'finalizar'; o manifesto só é publicado depois disso. Conteúdos repetidos na execução são
+    gravados uma vez.
+    """
+
+    def __init__(self, armazenamento: BackendArmazenamento, limiar: int, tamanho_segmento: int,
+                 compressao: str = "gzip"):
+        if compressao not in COMPRESSOES:
+            raise ValueError(f"compressao inválida: {compressao}")
+        if compressao == "zstd" and zstandard is None:
+            raise ImportError("A compressão zstd requer zstandard: pip install zstandard", name="zstandard")
+        self.armazenamento = armazenamento
+        self.limiar = int(limiar)
+        self.tamanho_segmento = max(1, int(tamanho_segmento))
+        self.compressao = compressao
+        self._lock = threading.Lock()
+        self._atual: Optional[_Segmento] = None
+        # chave do blob -> (segmento, deslocamento, tamanho armazenado); tuplas ocupam menos memória
+        self._indice: Dict[str, Tuple[str, int, int]] = {}
+        self.segmentos_enviados = 0
+
+    def aceita(self, tamanho: Optional[int]) -> bool:
+        """Indica se um conteúdo deste tamanho vai para um segmento."""
+        return tamanho is not None and tamanho <= self.limiar
+
+    def _localizador(self, posicao: Tuple[str, int, int]) -> Dict:
+        segmento, deslocamento, tamanho = posicao
+        return {"segmento": segmento, "offset": deslocamento, "tamanho": tamanho, "compressao": self.compressao}
+
+    def localizar(self, chave: str) -> Optional[Dict]:
+        """Localizador de um conteúdo já empacotado nesta execução; None se ainda não foi."""
+        with self._lock:
+            posicao = self._indice.get(chave)
+        return self._localizador(posicao) if posicao else None
+
+    def adicionar(self, chave: str, dados: bytes) -> Dict:
+        """Empacota o conteúdo do blob 'chave' e retorna o seu localizador."""
+        armazenado = comprimir(dados, self.compressao)
+        cheio: Optional[_Segmento] = None
+        with self._lock:
+            posicao = self._indice.get(chave)
+            if posicao is None:
+                if self._atual is None:
+                    self._atual = _Segmento(f"{PREFIXO_PACOTES}/{uuid.uuid4().hex}.tar")
+                deslocamento = self._atual.adicionar(chave + _SUFIXOS[self.compressao], armazenado)
+                posicao = self._indice[chave] = (self._atual.chave, deslocamento, len(armazenado))
+                if self._atual.tamanho >= self.tamanho_segmento:
+                    cheio, self._atual = self._atual, None
+        if cheio is not None:
+            self._enviar(cheio)
+        return self._localizador(posicao)
+
+    def _enviar(self, segmento: _Segmento) -> None:
+        try:
+            tamanho = segmento.fechar()
+            self.armazenamento.escrever_stream(self.armazenamento.obter_base_blobs(), segmento.chave,
+                                               segmento.arquivo, tamanho)
+        finally:
+            segmento.arquivo.close()
+        with self._lock:
+            self.segmentos_enviados += 1
+
+    def finalizar(self) -> None:
+        """Envia o segmento em construção; chamado após as transferências, antes de publicar o manifesto."""
+        with self._lock:
+            segmento, self._atual = self._atual, None
+        if segmento is not None:
+            self._enviar(segmento)
+
+    def descartar(self) -> None:
+        """Descarta o segmento em construção (execução interrompida)."""
+        with self._lock:
+            segmento, self._atual = self._atual, None
+        if segmento is not None:
+            segmento.arquivo.close()
+
+
+def ler_membro(armazenamento: BackendArmazenamento, pacote: Dict) -> BinaryIO:
+    """Conteúdo de um arquivo empacotado, lido do segmento com uma leitura por faixa."""
+    if int(pacote["tamanho"]) <= 0:
+        return io.BytesIO(b"")
+    dados = armazenamento.ler_faixa(armazenamento.obter_base_blobs(), pacote["segmento"],
+                                    int(pacote["offset"]), int(pacote["tamanho"]))
+    return io.BytesIO(descomprimir(dados, pacote.get("compressao", "nenhuma")))
+
+
+def abrir_conteudo(armazenamento: BackendArmazenamento, entrada: Dict) -> BinaryIO:
+    """Stream do conteúdo de uma entrada de manifesto deduplicado (segmento ou objeto em blobs/)."""
+    if entrada.get("pacote"):
+        return ler_membro(armazenamento, entrada["pacote"])
+    return armazenamento.ler_stream(armazenamento.obter_base_blobs(), entrada["blob"])
+
+
+def segmentos_ausentes(armazenamento: BackendArmazenamento, entradas: Dict[str, Dict]) -> Set[str]:
+    """Segmentos referenciados pelas entradas que não existem no backend.
+
+    Uma execução interrompida registra no journal itens de segmentos que não chegaram a ser
+    enviados; a retomada baixa esses itens novamente.
+    """
+    segmentos = {e["pacote"]["segmento"] for e in entradas.values() if e.get("pacote")}
+    base_blobs = armazenamento.obter_base_blobs()
+    return {s for s in segmentos if not armazenamento.existe(base_blobs, s)}
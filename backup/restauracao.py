@@ -0,0 +1,204 @@
+import fnmatch
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from . import cas, graph, pacotes
+from .checkpoint import JournalExecucao
+from .config import ConfigAplicativo
+from .graph import FonteToken
+from .retencao import datas_existentes
+from .runner import configurar_graph
+from .storage.base import BackendArmazenamento
+from .transferencia import PoolTransferencia
+
+# Comentários em Português do Brasil
+# Restauração de um snapshot (ponto no tempo) para um drive do SharePoint. Lê o manifesto do
+# snapshot (no modo completo, a própria listagem do prefixo), aplica os filtros e envia os
+# arquivos em paralelo: PUT simples para os pequenos e sessões de upload para os grandes. Um
+# journal no diretório de estado permite retomar uma restauração interrompida.
+
+NOME_JOURNAL_RESTAURACAO = "journal-restauracao.jsonl"
+
+# (caminho no snapshot, base de leitura, chave de leitura, tamanho, id do site, localizador no
+# segmento empacotado)
+EntradaSnapshot = Tuple[str, str, str, Optional[int], Optional[str], Optional[Dict]]
+
+
+@dataclass
+class OpcoesRestauracao:
+    """O que restaurar e para onde."""
+
+    drive_destino: str
+    # Snapshot restaurado: o mais recente até esta data (YYYY-MM-DD); None usa o mais recente
+    data: Optional[str] = None
+    # Filtros: nome do site (ou ID, no modo deduplicado) e glob/prefixo do caminho 'Site/Drive/...'
+    site: Optional[str] = None
+    caminho: Optional[str] = None
+    # Pasta do drive de destino que recebe os arquivos ('' = raiz)
+    pasta_destino: str = ""
+    # Mantém 'Site/Drive/' no caminho de destino (necessário quando a seleção abrange vários drives)
+    manter_estrutura: bool = False
+
+
+@dataclass
+class ResultadoRestauracao:
+    """Resumo de uma restauração, com a vazão medida nos envios."""
+
+    data: str
+    arquivos_total: int = 0
+    bytes_total: int = 0
+    arquivos: int = 0
+    bytes: int = 0
+    # Arquivos já enviados por uma execução interrompida (journal)
+    pulados: int = 0
+    segundos: float = 0.0
+
+    @property
+    def vazao_mb_s(self) -> float:
+        return self.bytes / (1024 * 1024) / self.segundos if self.segundos > 0 else 0.0
+
+
+def _resolver_data(armazenamento: BackendArmazenamento, data: Optional[str]) -> str:
+    """Data do snapshot mais recente até 'data' (ponto no tempo); sem 'data', o mais recente."""
+    candidatas = sorted(d for d in datas_existentes(armazenamento, armazenamento.obter_base_snapshot)
+                        if data is None or d <= data)
+    if not candidatas:
+        raise FileNotFoundError(f"Nenhum snapshot até {data}" if data else "Nenhum snapshot encontrado")
+    return candidatas[-1]
+
+
+def _entradas_snapshot(armazenamento: BackendArmazenamento, base: str,
+                       deduplicado: bool) -> Iterator[EntradaSnapshot]:
+    """Itera os arquivos do snapshot: pelo manifesto (deduplicado) ou pela listagem do prefixo."""
+    if deduplicado:
+        base_blobs = armazenamento.obter_base_blobs()
+        for _, entrada in cas.iterar_manifesto(armazenamento, base):
+            if entrada.get("blob") and entrada.get("path"):
+                yield (entrada["path"], base_blobs, entrada["blob"], entrada.get("size"), entrada.get("siteId"),
+                       entrada.get("pacote"))
+        return
+    for caminho, tamanho in armazenamento.listar_prefixo_com_tamanho(base):
+        yield caminho, base, caminho, tamanho, None, None
+
+
+def _selecionada(caminho: str, id_site: Optional[str], opcoes: OpcoesRestauracao) -> bool:
+    """Aplica os filtros de site e caminho; itens fora de 'Site/Drive/' são ignorados."""
+    partes = caminho.split("/")
+    if len(partes) < 3:
+        return False
+    if opcoes.site and opcoes.site.lower() not in {partes[0].lower(), (id_site or "").lower()}:
+        return False
+    if opcoes.caminho:
+        padrao = opcoes.caminho.strip("/")
+        if any(c in padrao for c in "*?["):
+            return fnmatch.fnmatchcase(caminho, padrao)
+        return caminho == padrao or caminho.startswith(padrao + "/")
+    return True
+
+
+def _caminho_destino(caminho: str, opcoes: OpcoesRestauracao) -> str:
+    """Caminho no drive de destino: sem 'Site/Drive/' (salvo 'manter_estrutura'), sob 'pasta_destino'."""
+    partes = caminho.split("/")
+    relativo = partes if opcoes.manter_estrutura else partes[2:]
+    return "/".join([p for p in opcoes.pasta_destino.split("/") if p] + relativo)
+
+
+def _restaurar_arquivo(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento, token: FonteToken,
+                       drive_destino: str, base: str, chave: str, tamanho: Optional[int], destino: str,
+                       pacote: Optional[Dict] = None) -> int:
+    """Tarefa dos workers: lê o objeto do backend (ou o membro do segmento, por faixa) e o envia
+    ao drive; retorna os bytes enviados."""
+    limiar = cfg.graph.limiar_sessao_upload_mb * 1024 * 1024
+    fragmento = max(1, cfg.graph.tamanho_fragmento_upload_mb) * 1024 * 1024
+    stream = pacotes.ler_membro(armazenamento, pacote) if pacote else armazenamento.ler_stream(base, chave)
+    try:
+        if tamanho is not None:
+            graph.enviar_arquivo(drive_destino, destino, stream, tamanho, token, limiar, fragmento)
+            return tamanho
+        # Tamanho desconhecido: passa por disco para informar o total à sessão de upload
+        with tempfile.TemporaryFile() as tmp:
+            shutil.copyfileobj(stream, tmp, 1024 * 1024)
+            tamanho = tmp.tell()
+            tmp.seek(0)
+            graph.enviar_arquivo(drive_destino, destino, tmp, tamanho, token, limiar, fragmento)
+        return tamanho
+    finally:
+        fechar = getattr(stream, "close", None)
+        if fechar:
+            fechar()
+
+
+def restaurar(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento, opcoes: OpcoesRestauracao,
+              token: Optional[FonteToken] = None) -> ResultadoRestauracao:
+    """Restaura os arquivos selecionados do snapshot para 'opcoes.drive_destino'.
+
+    Arquivos existentes no destino são substituídos. Uma execução interrompida deixa o journal
+    no diretório de estado e a próxima, com as mesmas opções de destino, pula o que já foi
+    enviado. Sem 'token' o cliente Graph e o provedor de token são criados a partir de 'cfg'.
+    """
+    data = _resolver_data(armazenamento, opcoes.data)
+    base = armazenamento.obter_base_snapshot(data)
+    # O manifesto deduplicado é relido em stream a cada passagem, sem ficar em memória
+    deduplicado = cas.existe_manifesto(armazenamento, base)
+
+    def selecao() -> Iterator[EntradaSnapshot]:
+        for entrada in _entradas_snapshot(armazenamento, base, deduplicado):
+            if _selecionada(entrada[0], entrada[4], opcoes):
+                yield entrada
+
+    # Primeira passagem: totais para o relatório e verificação de colisões entre drives
+    resultado = ResultadoRestauracao(data=data)
+    drives: Set[str] = set()
+    for caminho, _, _, tamanho, _, _ in selecao():
+        drives.add("/".join(caminho.split("/")[:2]))
+        resultado.arquivos_total += 1
+        resultado.bytes_total += tamanho or 0
+    if len(drives) > 1 and not opcoes.manter_estrutura:
+        raise ValueError(f"A seleção abrange {len(drives)} drives ({', '.join(sorted(drives))}); "
+                         "filtre por site/caminho ou use manter_estrutura")
+    if not resultado.arquivos_total:
+        return resultado
+
+    token = token if token is not None else configurar_graph(cfg)
+    identidade = f"{base} -> {opcoes.drive_destino}:/{opcoes.pasta_destino.strip('/')}"
+    journal = JournalExecucao(Path(cfg.diretorio_estado), identidade, cfg.intervalo_checkpoint,
+                              nome_arquivo=NOME_JOURNAL_RESTAURACAO)
+    concluidos = journal.carregar()
+    journal.abrir(continuar=bool(concluidos))
+    lock = threading.Lock()
+
+    def concluir(destino: str, enviados: int) -> None:
+        journal.registrar(destino, {"size": enviados})
+        with lock:
+            resultado.arquivos += 1
+            resultado.bytes += enviados
+
+    inicio = time.monotonic()
+    pool = PoolTransferencia(cfg.concorrencia, cfg.tamanho_fila, ao_concluir=concluir)
+    try:
+        try:
+            for caminho, base_leitura, chave, tamanho, _, pacote in selecao():
+                destino = _caminho_destino(caminho, opcoes)
+                anterior = concluidos.get(destino)
+                if anterior is not None and (tamanho is None or anterior.get("size") == tamanho):
+                    resultado.pulados += 1
+                    continue
+                pool.enviar(destino, _restaurar_arquivo, cfg, armazenamento, token, opcoes.drive_destino,
+                            base_leitura, chave, tamanho, destino, pacote)
+        except BaseException:
+            pool.cancelar()
+            raise
+        pool.finalizar()
+    except BaseException:
+        # Mantém o journal para que a próxima execução continue de onde parou
+        journal.fechar()
+        raise
+    finally:
+        resultado.segundos = time.monotonic() - inicio
+    journal.concluir()
+    return resultado
@@ -0,0 +1,166 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import cas
+from .config import ConfigAplicativo, ConfigRetencao
+from .storage.base import BackendArmazenamento
+
+# Comentários em Português do Brasil
+# Política de retenção (diária/semanal/mensal) e poda dos prefixos snapshots/YYYY-MM-DD e
+# deleted/YYYY-MM-DD expirados. A remoção usa as operações em lote dos backends; no modo
+# simulação apenas informa o que seria removido e quantos bytes seriam liberados.
+
+FORMATO_DATA = "%Y-%m-%d"
+# Caminhos enviados por chamada de apagar_lote (o backend divide em blocos paralelos)
+TAMANHO_BLOCO_PODA = 10000
+
+
+@dataclass
+class ResultadoPoda:
+    """Resumo de uma poda (ou simulação)."""
+
+    simulacao: bool
+    snapshots_removidos: List[str] = field(default_factory=list)
+    apagados_removidos: List[str] = field(default_factory=list)
+    arquivos: int = 0
+    bytes_recuperaveis: int = 0
+    # Modo deduplicado: blobs que deixaram de ser referenciados por algum manifesto retido
+    blobs: int = 0
+
+
+def _converter_data(valor: str) -> Optional[date]:
+    try:
+        return datetime.strptime(valor, FORMATO_DATA).date()
+    except ValueError:
+        return None
+
+
+def datas_retidas(datas: Iterable[str], politica: ConfigRetencao) -> Set[str]:
+    """Datas (YYYY-MM-DD) de snapshot mantidas pela política.
+
+    Mantém as N mais recentes (diários), a mais recente de cada uma das N últimas semanas ISO
+    (semanais) e de cada um dos N últimos meses (mensais). O snapshot mais recente é sempre
+    mantido, pois serve de base para o próximo backup. Sem nenhuma regra ativa, mantém tudo.
+    """
+    validas = sorted((d for d in set(datas) if _converter_data(d)), reverse=True)
+    if not validas or not (politica.diarios or politica.semanais or politica.mensais):
+        return set(validas)
+    manter = {validas[0]}
+    manter.update(validas[:max(0, politica.diarios)])
+    periodos: Tuple[Tuple[int, Callable[[date], tuple]], ...] = (
+        (politica.semanais, lambda d: tuple(d.isocalendar()[:2])),
+        (politica.mensais, lambda d: (d.year, d.month)),
+    )
+    for quantidade, periodo in periodos:
+        vistos: Set[tuple] = set()
+        for valor in validas:
+            chave = periodo(_converter_data(valor))
+            if chave in vistos:
+                continue
+            if len(vistos) >= quantidade:
+                break
+            vistos.add(chave)
+            manter.add(valor)
+    return manter
+
+
+def _raiz(obter_base: Callable[[str], str]) -> str:
+    """Prefixo comum das bases por data (ex.: 'snapshots'), derivado do próprio backend."""
+    exemplo = "0000-00-00"
+    return obter_base(exemplo)[: -len(exemplo)].rstrip("/\\")
+
+
+def datas_existentes(armazenamento: BackendArmazenamento, obter_base: Callable[[str], str]) -> List[str]:
+    """Datas (YYYY-MM-DD) com prefixo no backend, ex.: datas_existentes(arm, arm.obter_base_snapshot)."""
+    return [d for d in armazenamento.listar_subdiretorios(_raiz(obter_base)) if _converter_data(d)]
+
+
+def _itens_das_bases(armazenamento: BackendArmazenamento, bases: List[str]) -> Iterator[Tuple[str, str, int]]:
+    for base in bases:
+        for caminho, tamanho in armazenamento.listar_prefixo_com_tamanho(base):
+            yield base, caminho, tamanho
+
+
+def _blobs_referenciados(armazenamento: BackendArmazenamento, bases: Iterable[str]) -> Set[str]:
+    referenciados: Set[str] = set()
+    for base in bases:
+        for _, entrada in cas.iterar_manifesto(armazenamento, base):
+            if entrada.get("blob"):
+                referenciados.add(entrada["blob"])
+            # Segmento empacotado: mantido enquanto algum membro for referenciado
+            if entrada.get("pacote"):
+                referenciados.add(entrada["pacote"]["segmento"])
+    return referenciados
+
+
+def _apagar_em_blocos(armazenamento: BackendArmazenamento, base: str, caminhos: Iterable[str]) -> None:
+    bloco: List[str] = []
+    for caminho in caminhos:
+        bloco.append(caminho)
+        if len(bloco) >= TAMANHO_BLOCO_PODA:
+            armazenamento.apagar_lote(base, bloco)
+            bloco = []
+    if bloco:
+        armazenamento.apagar_lote(base, bloco)
+
+
+def podar(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento, simular: bool = False,
+          hoje: Optional[date] = None, bases_protegidas: Iterable[str] = ()) -> ResultadoPoda:
+    """Remove (ou, com 'simular', apenas contabiliza) snapshots e apagados expirados.
+
+    'bases_protegidas' (ex.: o último snapshot registrado no estado local) nunca são removidas.
+    No modo deduplicado também remove os blobs sem referência nos manifestos retidos; não
+    execute a poda ao mesmo tempo que um backup.
+    """
+    hoje = hoje or datetime.now(timezone.utc).date()
+    protegidas = set(bases_protegidas)
+    resultado = ResultadoPoda(simulacao=simular)
+
+    datas_snapshot = datas_existentes(armazenamento, armazenamento.obter_base_snapshot)
+    retidas = datas_retidas(datas_snapshot, cfg.retencao)
+    for data_str in sorted(datas_snapshot):
+        if data_str not in retidas and armazenamento.obter_base_snapshot(data_str) not in protegidas:
+            resultado.snapshots_removidos.append(data_str)
+
+    datas_apagados = datas_existentes(armazenamento, armazenamento.obter_base_apagados)
+    if cfg.retencao.dias_apagados > 0:
+        limite = hoje - timedelta(days=cfg.retencao.dias_apagados)
+        resultado.apagados_removidos = sorted(d for d in datas_apagados if _converter_data(d) < limite)
+
+    bases = [armazenamento.obter_base_snapshot(d) for d in resultado.snapshots_removidos]
+    bases += [armazenamento.obter_base_apagados(d) for d in resultado.apagados_removidos]
+
+    # Contabiliza antes de apagar (com hardlinks só conta o conteúdo sem outros links)
+    contagem = [0]
+
+    def contar(itens: Iterator[Tuple[str, str, int]]) -> Iterator[Tuple[str, str, int]]:
+        for item in itens:
+            contagem[0] += 1
+            yield item
+
+    resultado.bytes_recuperaveis = armazenamento.bytes_recuperaveis(contar(_itens_das_bases(armazenamento, bases)))
+    resultado.arquivos = contagem[0]
+
+    blobs_orfaos: List[str] = []
+    if cfg.modo_snapshot == "deduplicado":
+        retidos = [armazenamento.obter_base_snapshot(d) for d in datas_snapshot if d not in resultado.snapshots_removidos]
+        retidos += [armazenamento.obter_base_apagados(d) for d in datas_apagados if d not in resultado.apagados_removidos]
+        referenciados = _blobs_referenciados(armazenamento, retidos)
+        for chave, tamanho in armazenamento.listar_prefixo_com_tamanho(armazenamento.obter_base_blobs()):
+            if chave not in referenciados:
+                blobs_orfaos.append(chave)
+                resultado.bytes_recuperaveis += tamanho
+        resultado.blobs = len(blobs_orfaos)
+
+    if simular:
+        return resultado
+
+    for base in bases:
+        _apagar_em_blocos(armazenamento, base, armazenamento.listar_prefixo(base))
+        armazenamento.remover_diretorios_vazios(base)
+    if blobs_orfaos:
+        base_blobs = armazenamento.obter_base_blobs()
+        _apagar_em_blocos(armazenamento, base_blobs, blobs_orfaos)
+        armazenamento.remover_diretorios_vazios(base_blobs)
+    return resultado
@@ -1,118 +1,1087 @@
+import asyncio
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
 
 from .config import ConfigAplicativo
-from .auth import obter_token
-from . import graph
+from .auth import ProvedorToken
+from . import cas, graph, graph_assincrono, metadados, pacotes, shards
+from .graph import ClienteGraph, FonteToken
 from .storage.base import BackendArmazenamento
+from .transferencia import PoolTransferencia
+from .checkpoint import JournalExecucao, gravar_texto_atomico
+from .filtros import FiltroItens
+from .instrumentacao import envolver, perfilar
+from .limitador import LimitadorAdaptativo
+from .metricas import MetricasExecucao, MonitorExecucao
+from .manifesto import (ArmazemManifesto, NOME_MANIFESTO, abrir_manifesto_anterior, criar_manifesto_novo,
+                        publicar_manifesto)
 
 # Comentários em Português do Brasil
 # Este módulo orquestra o processo de backup, mantendo estado e separando responsabilidades.
 
 
 def carregar_estado_anterior(diretorio_estado: Path) -> Dict:
-    """Carrega o manifesto e informações do snapshot anterior do diretório de estado local."""
-    caminho_manifesto = diretorio_estado / "latest_manifest.json"
+    """Carrega o manifesto e informações do snapshot anterior do diretório de estado local.
+
+    O manifesto é um ArmazemManifesto (SQLite) consultado por ID, sem ser carregado em memória.
+    """
     caminho_snapshot = diretorio_estado / "latest_snapshot.txt"
-    manifesto_anterior: Dict = {}
+    caminho_delta = diretorio_estado / "latest_delta.json"
+    manifesto_anterior = abrir_manifesto_anterior(diretorio_estado)
     base_snapshot_anterior: str | None = None
-    if caminho_manifesto.exists():
-        try:
-            manifesto_anterior = __import__("json").loads(caminho_manifesto.read_text(encoding="utf-8"))
-        except Exception:
-            manifesto_anterior = {}
+    estado_delta: Dict = {}
     if caminho_snapshot.exists():
         base_snapshot_anterior = caminho_snapshot.read_text(encoding="utf-8").strip()
-    return {"manifesto": manifesto_anterior, "base_snapshot": base_snapshot_anterior}
+    if caminho_delta.exists():
+        try:
+            estado_delta = __import__("json").loads(caminho_delta.read_text(encoding="utf-8"))
+        except Exception:
+            estado_delta = {}
+    return {"manifesto": manifesto_anterior, "base_snapshot": base_snapshot_anterior, "delta": estado_delta}
+
 
+def salvar_estado_atual(diretorio_estado: Path, manifesto: ArmazemManifesto, base_snapshot: str,
+                        estado_delta: Optional[Dict] = None) -> None:
+    """Salva manifesto atual, base de snapshot e (no modo delta) os deltaLinks por drive.
 
-def salvar_estado_atual(diretorio_estado: Path, manifesto: Dict, base_snapshot: str) -> None:
-    """Salva manifesto atual e base de snapshot no diretório de estado local."""
+    Cada arquivo é gravado de forma atômica (temporário + rename); o manifesto já foi gravado
+    item a item durante a execução e apenas é movido para o lugar do anterior.
+    """
     diretorio_estado.mkdir(parents=True, exist_ok=True)
-    (diretorio_estado / "latest_manifest.json").write_text(
-        __import__("json").dumps(manifesto, indent=2, ensure_ascii=False), encoding="utf-8"
+    publicar_manifesto(manifesto, diretorio_estado / NOME_MANIFESTO)
+    gravar_texto_atomico(diretorio_estado / "latest_snapshot.txt", base_snapshot)
+    if estado_delta is not None:
+        gravar_texto_atomico(
+            diretorio_estado / "latest_delta.json",
+            __import__("json").dumps(estado_delta, indent=2, ensure_ascii=False),
+        )
+
+
+# Manifesto da execução em andamento (movido para NOME_MANIFESTO ao salvar o estado)
+NOME_MANIFESTO_EM_CONSTRUCAO = "manifesto_atual.sqlite"
+# Junção temporária dos itens apagados do dia no modo deduplicado
+NOME_APAGADOS_CAS_TEMPORARIO = "apagados_cas.sqlite"
+# Itens apagados copiados por chamada de copiar_lote
+TAMANHO_BLOCO_APAGADOS = 1000
+# Resumo JSON (métricas) da última execução, no diretório de estado
+NOME_RESUMO = "resumo_execucao.json"
+
+# Campos do driveItem usados para detectar se o conteúdo mudou desde o snapshot anterior
+CAMPOS_VERSAO = ("cTag", "eTag", "size", "lastModifiedDateTime")
+
+
+@dataclass
+class ContextoExecucao:
+    """Parâmetros compartilhados pelas tarefas de uma execução de backup."""
+
+    armazenamento: BackendArmazenamento
+    token: FonteToken
+    base_snapshot: str
+    base_snapshot_anterior: Optional[str] = None
+    pular_inalterados: bool = True
+    # Modo deduplicado: conteúdo em blobs endereçados por hash e snapshot apenas como manifesto
+    deduplicado: bool = False
+    # Checkpoint: itens concluídos por uma execução interrompida do mesmo snapshot e journal atual
+    concluidos: Dict[str, Dict] = field(default_factory=dict)
+    journal: Optional[JournalExecucao] = None
+    # Download em faixas paralelas para arquivos grandes (limiar em bytes; 0 desativa)
+    limiar_download_paralelo: int = 0
+    tamanho_faixa: int = 16 * 1024 * 1024
+    conexoes_por_arquivo: int = 4
+    # Filtros de inclusão/exclusão e tamanho máximo (None = tudo entra no backup)
+    filtro: Optional[FiltroItens] = None
+    # Contadores de progresso e vazão da execução
+    metricas: Optional[MetricasExecucao] = None
+    # API do Graph usada pela varredura e pelos workers (o módulo graph, ou um proxy que mede as chamadas)
+    api_graph: Any = None
+    # Modo deduplicado com empacotamento: conteúdos pequenos vão para segmentos tar
+    empacotador: Optional[pacotes.EmpacotadorSegmentos] = None
+    # Cache persistente de sites, drives e raízes (None = desativado)
+    cache_metadados: Optional[metadados.CacheMetadados] = None
+
+
+def _metadados_versao(item: Dict) -> Dict:
+    """Extrai do item do Graph os campos de versão gravados no manifesto."""
+    return {k: item.get(k) for k in CAMPOS_VERSAO if item.get(k) is not None}
+
+
+def _resumo_item(item: Dict) -> Dict:
+    """Reduz o item do Graph aos campos de versão e hashes usados pelas tarefas de arquivo."""
+    resumo = _metadados_versao(item)
+    hashes = (item.get("file") or {}).get("hashes")
+    if hashes:
+        resumo["file"] = {"hashes": hashes}
+    return resumo
+
+
+def _mesma_versao(anterior: Optional[Dict], metadados: Dict) -> bool:
+    """Indica se o item tem a mesma versão registrada no manifesto anterior.
+
+    Prioriza o cTag (muda apenas com o conteúdo); sem ele usa o eTag. O tamanho também
+    precisa coincidir quando disponível. Sem tags não é possível afirmar que nada mudou.
+    """
+    if not anterior:
+        return False
+    if metadados.get("cTag") and anterior.get("cTag"):
+        mesma_versao = metadados["cTag"] == anterior["cTag"]
+    elif metadados.get("eTag") and anterior.get("eTag"):
+        mesma_versao = metadados["eTag"] == anterior["eTag"]
+    else:
+        return False
+    if "size" in metadados and "size" in anterior and metadados["size"] != anterior["size"]:
+        return False
+    return mesma_versao
+
+
+def _item_inalterado(anterior: Optional[Dict], caminho_rel: str, metadados: Dict) -> bool:
+    """Indica se o item tem o mesmo caminho e a mesma versão registrados no manifesto anterior."""
+    return bool(anterior) and anterior.get("path") == caminho_rel and _mesma_versao(anterior, metadados)
+
+
+def _entrada_manifesto(caminho_rel: str, id_drive: str, id_site: str, nome: str,
+                       id_pai: Optional[str], metadados: Dict) -> Dict:
+    """Monta a entrada de manifesto de um arquivo."""
+    entrada = {
+        "path": caminho_rel,
+        "driveId": id_drive,
+        "siteId": id_site,
+        "name": nome,
+    }
+    if id_pai is not None:
+        entrada["parentId"] = id_pai
+    entrada.update(metadados)
+    return entrada
+
+
+def _contar(ctx: ContextoExecucao, nome: str, quantidade: int = 1) -> None:
+    if ctx.metricas is not None:
+        ctx.metricas.incrementar(nome, quantidade)
+
+
+def _medir(ctx: ContextoExecucao, nome: str) -> ContextManager[None]:
+    """Mede o bloco no histograma de latência 'nome' quando há métricas."""
+    return ctx.metricas.tempos.medir(nome) if ctx.metricas is not None else nullcontext()
+
+
+def _conteudo(ctx: ContextoExecucao, resp):
+    """Stream do download, contando os bytes lidos quando há métricas."""
+    return ctx.metricas.contar_leitura(resp.raw) if ctx.metricas is not None else resp.raw
+
+
+def _fechar_resposta(resp) -> None:
+    """Fecha a resposta de download, devolvendo a conexão ao pool da sessão."""
+    fechar = getattr(resp, "close", None)
+    if fechar:
+        fechar()
+
+
+def _abrir_download(ctx: ContextoExecucao, id_drive: str, id_item: str, tamanho: Optional[int]):
+    """Abre o download do conteúdo: faixas paralelas acima do limiar, stream único abaixo dele."""
+    if ctx.limiar_download_paralelo and tamanho is not None and tamanho >= ctx.limiar_download_paralelo:
+        return ctx.api_graph.baixar_em_faixas_paralelas(
+            id_drive, id_item, ctx.token, tamanho, ctx.tamanho_faixa, ctx.conexoes_por_arquivo
+        )
+    return ctx.api_graph.baixar_stream_conteudo_item(id_drive, id_item, ctx.token)
+
+
+def _gravar_blob(ctx: ContextoExecucao, id_drive: str, id_item: str, item: Dict,
+                 metadados: Dict, anterior: Optional[Dict]) -> Tuple[str, Optional[Dict]]:
+    """Garante o conteúdo do item no repositório de blobs e retorna (chave do blob, localizador
+    no segmento empacotado ou None).
+
+    Reaproveita o blob do manifesto anterior se a versão não mudou (mesmo que o item tenha
+    sido movido) e evita o download quando o hash informado pelo Graph já está armazenado.
+    Conteúdos empacotáveis não consultam o backend: a deduplicação vale dentro da execução.
+    """
+    if ctx.pular_inalterados and anterior and anterior.get("blob") and _mesma_versao(anterior, metadados):
+        _contar(ctx, "arquivos_reaproveitados")
+        return anterior["blob"], anterior.get("pacote")
+    base_blobs = ctx.armazenamento.obter_base_blobs()
+    chave = cas.chave_blob_do_item(item)
+    empacotar = ctx.empacotador is not None and ctx.empacotador.aceita(metadados.get("size"))
+    if chave and empacotar:
+        pacote = ctx.empacotador.localizar(chave)
+        if pacote is not None:
+            _contar(ctx, "arquivos_reaproveitados")
+            return chave, pacote
+    elif chave and ctx.armazenamento.existe(base_blobs, chave):
+        _contar(ctx, "arquivos_reaproveitados")
+        return chave, None
+    _contar(ctx, "arquivos_baixados")
+    resp = _abrir_download(ctx, id_drive, id_item, metadados.get("size"))
+    try:
+        if empacotar:
+            dados = _ler_tudo(_conteudo(ctx, resp))
+            # Sem hash do Graph: a chave vem do sha256 do conteúdo, como em gravar_blob_calculando_hash
+            chave = chave or cas.chave_blob("sha256", hashlib.sha256(dados).hexdigest(), len(dados))
+            return chave, ctx.empacotador.adicionar(chave, dados)
+        if chave:
+            ctx.armazenamento.escrever_stream(base_blobs, chave, _conteudo(ctx, resp), metadados.get("size"))
+            return chave, None
+        # Sem hash do Graph: calcula sha256 durante a leitura
+        return cas.gravar_blob_calculando_hash(ctx.armazenamento, _conteudo(ctx, resp)), None
+    finally:
+        _fechar_resposta(resp)
+
+
+def _ler_tudo(stream) -> bytes:
+    """Lê um stream pequeno inteiro, em blocos (o 'raw' do requests não aceita read(-1) em todas as versões)."""
+    partes = []
+    while True:
+        bloco = stream.read(1024 * 1024)
+        if not bloco:
+            return b"".join(partes)
+        partes.append(bloco)
+
+
+def _materializar_arquivo(ctx: ContextoExecucao, id_site: str, id_drive: str, id_item: str, nome: str,
+                          caminho_rel: str, id_pai: Optional[str], item: Dict,
+                          anterior: Optional[Dict]) -> Dict:
+    """Materializa um arquivo no snapshot atual e retorna sua entrada de manifesto.
+
+    Arquivos inalterados desde o snapshot anterior são reaproveitados com uma operação barata
+    do backend (hardlink, cópia no servidor); os demais são baixados do Graph. No modo
+    deduplicado o conteúdo vai para o repositório de blobs.
+    """
+    metadados = _metadados_versao(item)
+    entrada = _entrada_manifesto(caminho_rel, id_drive, id_site, nome, id_pai, metadados)
+    if ctx.deduplicado:
+        entrada["blob"], pacote = _gravar_blob(ctx, id_drive, id_item, item, metadados, anterior)
+        if pacote is not None:
+            entrada["pacote"] = pacote
+        return entrada
+    if ctx.pular_inalterados and ctx.base_snapshot_anterior and _item_inalterado(anterior, caminho_rel, metadados):
+        if ctx.base_snapshot_anterior == ctx.base_snapshot:
+            # Mesmo snapshot (nova execução no mesmo dia): o arquivo já está gravado
+            _contar(ctx, "arquivos_reaproveitados")
+            return entrada
+        try:
+            ctx.armazenamento.vincular(ctx.base_snapshot_anterior, caminho_rel, ctx.base_snapshot)
+            _contar(ctx, "arquivos_reaproveitados")
+            return entrada
+        except Exception:
+            # Origem ausente ou falha no backend: segue para o download
+            pass
+    hash_anterior = _hash_anterior(ctx, caminho_rel, anterior)
+    sha256_graph = ((item.get("file") or {}).get("hashes") or {}).get("sha256Hash")
+    if hash_anterior and sha256_graph and sha256_graph.lower() == hash_anterior:
+        # Tags mudaram mas o conteúdo é o mesmo do snapshot anterior: reaproveita sem download
+        try:
+            ctx.armazenamento.vincular(ctx.base_snapshot_anterior, caminho_rel, ctx.base_snapshot)
+            _contar(ctx, "arquivos_reaproveitados")
+            return entrada
+        except Exception:
+            pass
+    _contar(ctx, "arquivos_baixados")
+    resp = _abrir_download(ctx, id_drive, id_item, metadados.get("size"))
+    try:
+        ctx.armazenamento.escrever_stream(ctx.base_snapshot, caminho_rel, _conteudo(ctx, resp), metadados.get("size"))
+    finally:
+        _fechar_resposta(resp)
+    if hash_anterior and ctx.armazenamento.hash_conteudo(ctx.base_snapshot, caminho_rel) == hash_anterior:
+        # Conteúdo baixado idêntico ao anterior: compartilha o arquivo em vez de ocupar espaço de novo
+        ctx.armazenamento.vincular(ctx.base_snapshot_anterior, caminho_rel, ctx.base_snapshot)
+        _contar(ctx, "arquivos_deduplicados")
+    return entrada
+
+
+def _hash_anterior(ctx: ContextoExecucao, caminho_rel: str, anterior: Optional[Dict]) -> Optional[str]:
+    """sha256 do arquivo no snapshot anterior (mesmo caminho), quando o backend o conhece sem
+    reler o arquivo (índice de hashes do backend local); None nos demais casos."""
+    if not (ctx.base_snapshot_anterior and ctx.base_snapshot_anterior != ctx.base_snapshot
+            and anterior and anterior.get("path") == caminho_rel):
+        return None
+    return ctx.armazenamento.hash_conteudo(ctx.base_snapshot_anterior, caminho_rel)
+
+
+def _processar_arquivo(ctx: ContextoExecucao, id_site: str, id_drive: str, id_item: str, nome: str,
+                       caminho_rel: str, id_pai: Optional[str], item: Dict,
+                       anterior: Optional[Dict]) -> Dict:
+    """Tarefa executada pelos workers do PoolTransferencia para cada arquivo.
+
+    Pula itens já concluídos por uma execução interrompida do mesmo snapshot (mesmo caminho e
+    versão) e registra no journal os itens materializados agora.
+    """
+    concluido = ctx.concluidos.get(id_item)
+    if concluido and concluido.get("path") == caminho_rel and _mesma_versao(concluido, _metadados_versao(item)):
+        _contar(ctx, "arquivos_retomados")
+        entrada = concluido
+    else:
+        with _medir(ctx, "arquivo.processar"):
+            entrada = _materializar_arquivo(ctx, id_site, id_drive, id_item, nome, caminho_rel, id_pai, item, anterior)
+        if ctx.journal is not None:
+            ctx.journal.registrar(id_item, entrada)
+    _contar(ctx, "itens_concluidos")
+    _contar(ctx, "bytes_concluidos", item.get("size") or 0)
+    return entrada
+
+
+def _enfileirar_arquivo(ctx: ContextoExecucao, pool: PoolTransferencia, id_item: str, item: Dict, *args) -> None:
+    """Envia o arquivo ao pool de transferência, contabilizando-o nas métricas da varredura."""
+    _contar(ctx, "itens_descobertos")
+    _contar(ctx, "bytes_descobertos", item.get("size") or 0)
+    # Tempo em que a varredura ficou bloqueada pela fila cheia (workers como gargalo)
+    with _medir(ctx, "fase.espera_fila"):
+        pool.enviar(id_item, _processar_arquivo, ctx, *args)
+
+
+def _arquivo_filtrado(ctx: ContextoExecucao, caminho_rel: str, item: Dict, verificar_pastas: bool = False) -> bool:
+    """True se o arquivo fica fora do backup pelos filtros; 'verificar_pastas' também testa as
+    pastas ancestrais (no modo delta elas não passaram pela poda da listagem)."""
+    if ctx.filtro is None:
+        return False
+    if verificar_pastas:
+        incluido = ctx.filtro.caminho_incluido(caminho_rel, item.get("size"))
+    else:
+        incluido = ctx.filtro.arquivo_incluido(caminho_rel, item.get("size"))
+    if not incluido:
+        _contar(ctx, "arquivos_filtrados")
+    return not incluido
+
+
+def _ler_paginas_delta(api_graph, id_drive: str, token: FonteToken,
+                      delta_link: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+    """Lê todas as páginas delta e retorna os itens e o novo deltaLink."""
+    itens: List[Dict] = []
+    novo_link: Optional[str] = None
+    for pagina in api_graph.listar_delta_paginado(id_drive, token, delta_link):
+        itens.extend(pagina.get("value", []))
+        novo_link = pagina.get("@odata.deltaLink") or novo_link
+    return itens, novo_link
+
+
+def _coletar_delta(api_graph, id_drive: str, token: FonteToken,
+                   delta_link: Optional[str]) -> Tuple[List[Dict], Optional[str], bool]:
+    """Coleta alterações do drive; se o deltaLink expirou (410 Gone) refaz a enumeração completa.
+
+    Retorna (itens, novo_delta_link, enumeracao_completa).
+    """
+    if not delta_link:
+        itens, novo_link = _ler_paginas_delta(api_graph, id_drive, token, None)
+        return itens, novo_link, True
+    try:
+        itens, novo_link = _ler_paginas_delta(api_graph, id_drive, token, delta_link)
+        return itens, novo_link, False
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 410:
+            itens, novo_link = _ler_paginas_delta(api_graph, id_drive, token, None)
+            return itens, novo_link, True
+        raise
+
+
+def _resolver_caminho_pasta(pastas: Dict[str, Dict], id_pasta: Optional[str]) -> Optional[Path]:
+    """Monta o caminho relativo de uma pasta subindo pelos pais; None se a cadeia estiver quebrada."""
+    partes: List[str] = []
+    visitados: Set[str] = set()
+    atual = id_pasta
+    while atual:
+        if atual in visitados:
+            return None
+        visitados.add(atual)
+        pasta = pastas.get(atual)
+        if pasta is None:
+            return None
+        if pasta.get("root"):
+            return Path(*reversed(partes)) if partes else Path("")
+        partes.append(pasta.get("name") or "")
+        atual = pasta.get("parentId")
+    return None
+
+
+def _processar_drive_delta(ctx: ContextoExecucao, pool: PoolTransferencia,
+                           id_site: str, nome_site: str, id_drive: str, nome_drive: str,
+                           estado_drive: Dict, manifesto_anterior: ArmazemManifesto,
+                           ids_apagados: Set[str]) -> Dict:
+    """Processa um drive no modo delta, enfileirando apenas itens novos ou alterados no pool.
+
+    Itens inalterados são reaproveitados do snapshot anterior; itens apagados (ou cuja pasta
+    foi apagada) vão para 'ids_apagados'. Retorna o novo estado delta do drive.
+    """
+    link_anterior = estado_drive.get("deltaLink") if ctx.base_snapshot_anterior else None
+    itens, novo_link, completo = _coletar_delta(ctx.api_graph, id_drive, ctx.token, link_anterior)
+    estado, arquivos = _planejar_delta(ctx, id_site, nome_site, id_drive, nome_drive, estado_drive,
+                                       manifesto_anterior, ids_apagados, itens, novo_link, completo)
+    for argumentos in arquivos:
+        _enfileirar_arquivo(ctx, pool, *argumentos)
+    return estado
+
+
+def _planejar_delta(ctx: ContextoExecucao, id_site: str, nome_site: str, id_drive: str, nome_drive: str,
+                    estado_drive: Dict, manifesto_anterior: ArmazemManifesto, ids_apagados: Set[str],
+                    itens: List[Dict], novo_link: Optional[str], completo: bool) -> Tuple[Dict, List[Tuple]]:
+    """Aplica o feed delta ao estado do drive (sem E/S ao Graph).
+
+    Retorna o novo estado delta e os argumentos de '_enfileirar_arquivo' de cada arquivo a
+    materializar; usada pelos dois motores (threads e asyncio).
+    """
+    pastas: Dict[str, Dict] = {} if completo else dict(estado_drive.get("pastas", {}))
+
+    # Aplica alterações na ordem do feed: a última ocorrência de um item prevalece
+    alterados: Dict[str, Dict] = {}
+    removidos: Set[str] = set()
+    for item in itens:
+        id_item = item.get("id")
+        if item.get("deleted") is not None:
+            pastas.pop(id_item, None)
+            alterados.pop(id_item, None)
+            removidos.add(id_item)
+            continue
+        removidos.discard(id_item)
+        id_pai = (item.get("parentReference") or {}).get("id")
+        if item.get("root") is not None:
+            pastas[id_item] = {"name": "", "parentId": None, "root": True}
+        elif item.get("folder") is not None:
+            pastas[id_item] = {"name": item.get("name"), "parentId": id_pai}
+        else:
+            alterados[id_item] = {"name": item.get("name"), "parentId": id_pai,
+                                  "item": _resumo_item(item)}
+
+    prefixo = Path(nome_site) / nome_drive
+
+    # Itens do manifesto anterior que não vieram no feed: mantidos, movidos ou apagados
+    for id_item, info in manifesto_anterior.itens_do_drive(id_drive):
+        if id_item in alterados:
+            continue
+        if completo or id_item in removidos:
+            ids_apagados.add(id_item)
+            continue
+        if _resolver_caminho_pasta(pastas, info.get("parentId")) is None:
+            # Pasta ancestral apagada: o item deixa de existir
+            ids_apagados.add(id_item)
+            continue
+        # Mantido (mesmo caminho) ou movido junto com uma pasta ancestral renomeada
+        alterados[id_item] = {"name": info.get("name"), "parentId": info.get("parentId"),
+                              "item": info}
+
+    arquivos: List[Tuple] = []
+    for id_item, dados in alterados.items():
+        pasta = _resolver_caminho_pasta(pastas, dados.get("parentId"))
+        if pasta is None:
+            continue
+        caminho_rel = str(prefixo / pasta / dados.get("name")).replace("\\", "/")
+        if _arquivo_filtrado(ctx, caminho_rel, dados["item"], verificar_pastas=True):
+            continue
+        arquivos.append((id_item, dados["item"], id_site, id_drive, id_item, dados.get("name"),
+                         caminho_rel, dados.get("parentId"), dados["item"], manifesto_anterior.obter(id_item)))
+
+    return {"deltaLink": novo_link, "pastas": pastas}, arquivos
+
+
+def _data_execucao() -> str:
+    """Data (UTC) que identifica o snapshot da execução."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def criar_limitador(cfg: ConfigAplicativo) -> Optional[LimitadorAdaptativo]:
+    """Limitador de taxa compartilhado pelas chamadas ao Graph da execução (None se desativado)."""
+    if cfg.graph.taxa_inicial <= 0:
+        return None
+    return LimitadorAdaptativo(cfg.graph.taxa_inicial, cfg.graph.taxa_minima, cfg.graph.taxa_maxima)
+
+
+def configurar_graph(cfg: ConfigAplicativo) -> FonteToken:
+    """Configura o cliente Graph compartilhado e retorna o provedor de token."""
+    # Cliente Graph compartilhado: pool dimensionado para os workers de transferência
+    graph.configurar_cliente(ClienteGraph(
+        tamanho_pool=max(cfg.graph.tamanho_pool, cfg.concorrencia * cfg.graph.conexoes_por_arquivo + 2),
+        max_tentativas=cfg.graph.max_tentativas,
+        backoff_base=cfg.graph.backoff_base,
+        backoff_max=cfg.graph.backoff_max,
+        retry_after_max=cfg.graph.retry_after_max,
+        timeout_conexao=cfg.graph.timeout_conexao,
+        timeout_leitura=cfg.graph.timeout_leitura,
+        limitador=criar_limitador(cfg),
+    ))
+
+    # Autenticação: o provedor renova o token durante execuções longas e é compartilhado pelos workers
+    return ProvedorToken(cfg.tenant_id, cfg.client_id, cfg.client_secret)
+
+
+def _criar_contexto(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento, base_snapshot: str,
+                    base_snapshot_anterior: Optional[str]) -> ContextoExecucao:
+    """Configura o cliente Graph e o provedor de token e monta o contexto da execução."""
+    token = configurar_graph(cfg)
+    filtro = FiltroItens(cfg.filtros.incluir, cfg.filtros.excluir, cfg.filtros.tamanho_maximo_mb * 1024 * 1024)
+
+    return ContextoExecucao(
+        armazenamento=armazenamento,
+        token=token,
+        base_snapshot=base_snapshot,
+        base_snapshot_anterior=base_snapshot_anterior,
+        pular_inalterados=cfg.pular_inalterados,
+        deduplicado=cfg.modo_snapshot == "deduplicado",
+        limiar_download_paralelo=cfg.graph.limiar_download_paralelo_mb * 1024 * 1024,
+        tamanho_faixa=max(1, cfg.graph.tamanho_faixa_mb) * 1024 * 1024,
+        conexoes_por_arquivo=max(1, cfg.graph.conexoes_por_arquivo),
+        api_graph=graph,
+        filtro=filtro if filtro.ativo else None,
     )
-    (diretorio_estado / "latest_snapshot.txt").write_text(base_snapshot, encoding="utf-8")
 
 
-def executar_backup(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento) -> None:
-    """Executa o processo de backup completo, criando snapshot e movendo apagados."""
-    # Autenticação
-    token = obter_token(cfg.tenant_id, cfg.client_id, cfg.client_secret)
+def executar_backup(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento,
+                    fabrica_armazenamento: Optional[Callable[[ConfigAplicativo], BackendArmazenamento]] = None) -> None:
+    """Executa o processo de backup completo, criando snapshot e movendo apagados.
+
+    Com 'indice_shard' definido executa apenas aquele shard (ver 'executar_shard'); com
+    'processos' > 1 divide o trabalho entre processos locais e mescla os parciais ao final.
+    'fabrica_armazenamento' (função de módulo, serializável) recria o backend em cada processo;
+    sem ela o próprio 'armazenamento' é enviado aos processos.
+    """
+    if cfg.indice_shard is not None:
+        executar_shard(cfg, armazenamento)
+        return
+    if cfg.processos > 1:
+        _executar_em_processos(cfg, armazenamento, fabrica_armazenamento)
+        return
+
+    hoje = _data_execucao()
+    dir_estado = Path(cfg.diretorio_estado)
+    estado_anterior = carregar_estado_anterior(dir_estado)
+    manifesto_anterior: ArmazemManifesto = estado_anterior["manifesto"]
+    try:
+        ctx = _criar_contexto(cfg, armazenamento, armazenamento.obter_base_snapshot(hoje),
+                              estado_anterior.get("base_snapshot"))
+
+        # Manifesto da execução atual: gravado item a item pelos workers
+        manifesto = criar_manifesto_novo(dir_estado / NOME_MANIFESTO_EM_CONSTRUCAO)
+        _varrer_com_checkpoint(
+            cfg, ctx, JournalExecucao(dir_estado, ctx.base_snapshot, cfg.intervalo_checkpoint),
+            manifesto, manifesto_anterior, estado_anterior.get("delta", {}), 0, 1,
+            finalizar=lambda m, e, a: _finalizar_execucao(
+                cfg, armazenamento, dir_estado, ctx.base_snapshot, ctx.base_snapshot_anterior,
+                armazenamento.obter_base_apagados(hoje), manifesto_anterior, m, e, a,
+            ),
+        )
+    finally:
+        # Já fechado por _finalizar_execucao no sucesso; após uma falha, fecha aqui
+        manifesto_anterior.fechar()
+
+
+def executar_shard(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento) -> None:
+    """Executa somente o shard 'indice_shard' de 'total_shards', gravando um manifesto parcial.
+
+    Não detecta apagados nem altera o estado global: isso é feito por 'mesclar_shards' quando
+    todos os shards do dia tiverem terminado.
+    """
+    indice, total = int(cfg.indice_shard or 0), max(1, cfg.total_shards)
+    hoje = _data_execucao()
+    dir_estado = Path(cfg.diretorio_estado)
+    estado_anterior = carregar_estado_anterior(dir_estado)
+    ctx = _criar_contexto(cfg, armazenamento, armazenamento.obter_base_snapshot(hoje),
+                          estado_anterior.get("base_snapshot"))
+    journal = JournalExecucao(dir_estado, ctx.base_snapshot, cfg.intervalo_checkpoint,
+                              nome_arquivo=shards.nome_journal(indice, total))
+    manifesto_anterior: ArmazemManifesto = estado_anterior["manifesto"]
+    try:
+        _varrer_com_checkpoint(
+            cfg, ctx, journal, shards.criar_manifesto_parcial(dir_estado, hoje, indice, total),
+            manifesto_anterior, estado_anterior.get("delta", {}), indice, total,
+            finalizar=lambda m, e, a: shards.salvar_parcial(dir_estado, hoje, indice, total, ctx.base_snapshot, m, e, a),
+        )
+    finally:
+        manifesto_anterior.fechar()
 
-    # Datas e bases
-    hoje = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    base_snapshot = armazenamento.obter_base_snapshot(hoje)
-    base_apagados = armazenamento.obter_base_apagados(hoje)
 
-    # Estado anterior
-    dir_estado = Path("state")
+def mesclar_shards(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento) -> None:
+    """Mescla os manifestos parciais do dia, trata os apagados e salva o estado global."""
+    total = max(1, cfg.total_shards)
+    hoje = _data_execucao()
+    dir_estado = Path(cfg.diretorio_estado)
     estado_anterior = carregar_estado_anterior(dir_estado)
-    manifesto_anterior: Dict = estado_anterior.get("manifesto", {})
-    base_snapshot_anterior: str | None = estado_anterior.get("base_snapshot")
+    base_snapshot = armazenamento.obter_base_snapshot(hoje)
+    manifesto = criar_manifesto_novo(dir_estado / NOME_MANIFESTO_EM_CONSTRUCAO)
+    try:
+        estado_delta, ids_apagados_delta = shards.carregar_parciais(dir_estado, hoje, total, base_snapshot, manifesto)
+    except Exception:
+        manifesto.fechar()
+        estado_anterior["manifesto"].fechar()
+        raise
+    _finalizar_execucao(
+        cfg, armazenamento, dir_estado, base_snapshot, estado_anterior.get("base_snapshot"),
+        armazenamento.obter_base_apagados(hoje), estado_anterior["manifesto"],
+        manifesto, estado_delta, ids_apagados_delta,
+    )
+    shards.remover_parciais(dir_estado, hoje)
+
+
+def _executar_em_processos(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento,
+                           fabrica_armazenamento: Optional[Callable[[ConfigAplicativo], BackendArmazenamento]]) -> None:
+    """Distribui os shards entre 'cfg.processos' processos locais e mescla os parciais."""
+    total = cfg.processos
+    origem = fabrica_armazenamento or armazenamento
+    with ProcessPoolExecutor(max_workers=total) as executor:
+        futuros = [
+            executor.submit(_executar_shard_em_processo, replace(cfg, indice_shard=i, total_shards=total, processos=1), origem)
+            for i in range(total)
+        ]
+        for futuro in futuros:
+            # Propaga a primeira falha; parciais dos shards concluídos permanecem para nova tentativa
+            futuro.result()
+    mesclar_shards(replace(cfg, total_shards=total, indice_shard=None), armazenamento)
+
+
+def _executar_shard_em_processo(cfg: ConfigAplicativo, origem) -> None:
+    """Ponto de entrada de cada processo do pool: recria o backend se recebeu uma fábrica."""
+    armazenamento = origem if isinstance(origem, BackendArmazenamento) else origem(cfg)
+    executar_shard(cfg, armazenamento)
+
+
+def _varrer_com_checkpoint(cfg: ConfigAplicativo, ctx: ContextoExecucao, journal: JournalExecucao,
+                           manifesto: ArmazemManifesto, manifesto_anterior: ArmazemManifesto,
+                           estado_delta_anterior: Dict, indice_shard: int, total_shards: int,
+                           finalizar: Callable[[ArmazemManifesto, Dict, Set[str]], object]):
+    """Varre com o journal aberto e chama 'finalizar(manifesto, estado_delta, ids_apagados_delta)'.
+
+    Em caso de falha o journal é mantido para que a próxima execução continue de onde parou;
+    após 'finalizar' ele é removido.
+    """
+    # Checkpoint: retoma o journal de uma execução interrompida sobre o mesmo snapshot
+    ctx.concluidos = journal.carregar()
+    if ctx.concluidos:
+        # Itens de segmentos que não chegaram a ser enviados são baixados de novo
+        ausentes = pacotes.segmentos_ausentes(ctx.armazenamento, ctx.concluidos)
+        ctx.concluidos = {k: v for k, v in ctx.concluidos.items()
+                          if (v.get("pacote") or {}).get("segmento") not in ausentes}
+    journal.abrir(continuar=bool(ctx.concluidos))
+    ctx.journal = journal
+    ctx.metricas = MetricasExecucao()
+    # Latência de cada chamada ao Graph, ao backend de armazenamento e ao provedor de token
+    tempos = ctx.metricas.tempos
+    ctx.api_graph = envolver(ctx.api_graph or graph, tempos, "graph")
+    ctx.armazenamento = envolver(ctx.armazenamento, tempos, "armazenamento")
+    ctx.token = envolver(ctx.token, tempos, "auth.token")
+    if cfg.graph.cache_metadados_horas > 0:
+        # Fora do proxy de medição: as latências do Graph contam apenas as chamadas realmente feitas
+        nome_cache = metadados.NOME_CACHE if total_shards <= 1 else shards.nome_cache_metadados(indice_shard, total_shards)
+        ctx.cache_metadados = metadados.CacheMetadados(
+            Path(cfg.diretorio_estado) / nome_cache, cfg.graph.cache_metadados_horas * 3600,
+            renovar=cfg.atualizar_metadados, renovacao_completa_s=cfg.graph.cache_metadados_renovacao_dias * 86400,
+        )
+        ctx.api_graph = metadados.GraphComCache(ctx.api_graph, ctx.cache_metadados)
+        for nome in ctx.cache_metadados.estatisticas():
+            ctx.metricas.registrar_medidor(nome, lambda nome=nome: ctx.cache_metadados.estatisticas()[nome])
+    if ctx.deduplicado and cfg.empacotamento.limiar_kb > 0:
+        ctx.empacotador = pacotes.EmpacotadorSegmentos(
+            ctx.armazenamento, cfg.empacotamento.limiar_kb * 1024,
+            cfg.empacotamento.tamanho_segmento_mb * 1024 * 1024, cfg.empacotamento.compressao,
+        )
+        ctx.metricas.registrar_medidor("segmentos_enviados", lambda: ctx.empacotador.segmentos_enviados)
+    monitor = _criar_monitor(cfg, ctx.metricas, indice_shard, total_shards).iniciar()
+    sufixo = f"-shard-{indice_shard:03d}" if total_shards > 1 else ""
+    try:
+        with perfilar(cfg.metricas.perfil, Path(cfg.diretorio_estado) / "perfil", sufixo):
+            varrer = _varrer_assincrono if cfg.motor == "asyncio" else _varrer
+            resultado = varrer(cfg, ctx, manifesto, manifesto_anterior, estado_delta_anterior,
+                               indice_shard, total_shards)
+            if ctx.empacotador is not None:
+                # O manifesto só é publicado com todos os segmentos que ele referencia gravados
+                with tempos.medir("fase.segmentos"):
+                    ctx.empacotador.finalizar()
+            with tempos.medir("fase.finalizacao"):
+                finalizar(*resultado)
+    except BaseException as e:
+        # Mantém o journal para que a próxima execução continue de onde parou
+        journal.fechar()
+        if ctx.empacotador is not None:
+            ctx.empacotador.descartar()
+        if ctx.cache_metadados is not None:
+            # Metadados desatualizados podem ser a causa da falha: a próxima execução resolve tudo de novo
+            ctx.cache_metadados.invalidar()
+        monitor.finalizar(e)
+        raise
+    journal.concluir()
+    if ctx.cache_metadados is not None:
+        try:
+            ctx.cache_metadados.salvar()
+        except OSError:
+            pass
+    monitor.finalizar()
+    return resultado
+
+
+def _criar_monitor(cfg: ConfigAplicativo, metricas: MetricasExecucao, indice_shard: int,
+                   total_shards: int) -> MonitorExecucao:
+    """Monitor de progresso; em shards o resumo e o arquivo do Prometheus levam o índice do shard."""
+    nome_resumo = NOME_RESUMO
+    arquivo_prometheus = cfg.metricas.arquivo_prometheus
+    rotulos: Dict[str, str] = {}
+    if total_shards > 1:
+        nome_resumo = shards.nome_resumo(indice_shard, total_shards)
+        rotulos["shard"] = f"{indice_shard}/{total_shards}"
+        if arquivo_prometheus:
+            caminho = Path(arquivo_prometheus)
+            arquivo_prometheus = str(caminho.with_name(f"{caminho.stem}-shard-{indice_shard:03d}{caminho.suffix}"))
+    return MonitorExecucao(
+        metricas, Path(cfg.diretorio_estado) / nome_resumo, progresso=cfg.metricas.progresso,
+        intervalo=cfg.metricas.intervalo_s, arquivo_prometheus=arquivo_prometheus,
+        pushgateway_url=cfg.metricas.pushgateway_url, rotulos=rotulos,
+    )
+
+
+def _registrar_medidores(metricas: MetricasExecucao, pool: PoolTransferencia,
+                         estatisticas_extras: Optional[Callable[[], Dict[str, int]]] = None) -> None:
+    """Profundidade da fila de transferência e contadores do cliente Graph (retentativas, 429).
+
+    'estatisticas_extras' soma os contadores de outro cliente (o assíncrono, no motor asyncio).
+    """
+    metricas.registrar_medidor("fila_transferencia", pool.fila.qsize)
+    metricas.registrar_medidor("fila_capacidade", lambda: pool.fila.maxsize)
+    for nome in ("requisicoes", "retentativas", "throttling"):
+        metricas.registrar_medidor(f"graph_{nome}", lambda n=nome: graph.estatisticas().get(n, 0) + (
+            estatisticas_extras().get(n, 0) if estatisticas_extras else 0))
+    # Taxa atual do limitador adaptativo (requisições/s); ausente quando desativado
+    metricas.registrar_medidor("graph_taxa_limite", lambda: graph.estatisticas().get("taxa_limite"))
 
-    # Resolver sites e iniciar manifesto
-    sites = graph.resolver_sites(token, cfg.sites)
-    manifesto: Dict[str, Dict] = {}
 
+def _varrer(cfg: ConfigAplicativo, ctx: ContextoExecucao, manifesto: ArmazemManifesto,
+            manifesto_anterior: ArmazemManifesto, estado_delta_anterior: Dict, indice_shard: int = 0,
+            total_shards: int = 1) -> Tuple[ArmazemManifesto, Dict[str, Dict], Set[str]]:
+    """Varre os sites e drives do shard e materializa os arquivos no snapshot.
+
+    As entradas concluídas pelos workers são gravadas diretamente em 'manifesto'.
+
+    Retorna (manifesto, estado_delta, ids_apagados_delta); os apagados só vêm preenchidos no
+    modo delta, em que o próprio feed informa as remoções.
+    """
+    api_graph = ctx.api_graph or graph
+    por_drive = cfg.shard_por == "drive"
+
+    # Resolver sites (apenas os do shard, na divisão por site) e iniciar manifesto
+    sites_cfg = cfg.sites if por_drive else shards.filtrar_sites(cfg.sites, indice_shard, total_shards)
+    sites = api_graph.resolver_sites(ctx.token, sites_cfg) if sites_cfg is not None else []
+    estado_delta: Dict[str, Dict] = {}
+    ids_apagados_delta: Set[str] = set()
+
+    # Workers de transferência: esta thread varre o Graph e alimenta a fila limitada
+    pool = PoolTransferencia(cfg.concorrencia, cfg.tamanho_fila, ao_concluir=manifesto.gravar)
+    if ctx.metricas is not None:
+        _registrar_medidores(ctx.metricas, pool)
+    try:
+        with _medir(ctx, "fase.varredura"):
+            _varrer_sites(cfg, ctx, pool, api_graph, sites, manifesto_anterior, estado_delta_anterior,
+                          estado_delta, ids_apagados_delta, indice_shard, total_shards)
+    except BaseException:
+        pool.cancelar()
+        raise
+    if ctx.metricas is not None:
+        ctx.metricas.varredura_concluida = True
+    with _medir(ctx, "fase.transferencias_pendentes"):
+        pool.finalizar()
+    manifesto.confirmar()
+    return manifesto, estado_delta, ids_apagados_delta
+
+
+def _varrer_sites(cfg: ConfigAplicativo, ctx: ContextoExecucao, pool: PoolTransferencia, api_graph,
+                  sites: List[Dict], manifesto_anterior: ArmazemManifesto, estado_delta_anterior: Dict,
+                  estado_delta: Dict[str, Dict], ids_apagados_delta: Set[str], indice_shard: int,
+                  total_shards: int) -> None:
+    """Percorre os drives dos sites enfileirando os arquivos no pool (modo delta ou completo)."""
+    armazenamento = ctx.armazenamento
+    token = ctx.token
+    base_snapshot = ctx.base_snapshot
+    por_drive = cfg.shard_por == "drive"
     for site in sites:
         id_site = site.get("id")
         nome_site = site.get("name") or site.get("displayName") or id_site
+        if ctx.filtro is not None and ctx.filtro.pasta_excluida(nome_site):
+            continue
 
-        drives = graph.listar_drives_do_site(id_site, token)
+        drives = api_graph.listar_drives_do_site(id_site, token)
+        if por_drive:
+            drives = [d for d in drives if shards.pertence_ao_shard(d.get("id") or "", indice_shard, total_shards)]
+        if ctx.filtro is not None:
+            drives = [d for d in drives
+                      if not ctx.filtro.pasta_excluida(f"{nome_site}/{d.get('name') or d.get('id')}")]
+        ids_raiz: Dict[str, str] = {}
+        if not cfg.modo_delta and drives:
+            # Raízes de todos os drives do site em poucas chamadas $batch
+            ids_raiz = api_graph.obter_ids_raiz_em_lote(
+                [d.get("id") for d in drives], token, cfg.graph.tamanho_lote
+            )
         for d in drives:
             id_drive = d.get("id")
             nome_drive = d.get("name") or id_drive
 
-            id_raiz = graph.obter_id_raiz_do_drive(id_drive, token)
+            if cfg.modo_delta:
+                estado_delta[id_drive] = _processar_drive_delta(
+                    ctx, pool, id_site, nome_site, id_drive, nome_drive,
+                    estado_delta_anterior.get(id_drive, {}), manifesto_anterior, ids_apagados_delta,
+                )
+                continue
 
-            for entrada in graph.listar_filhos_paginado(id_drive, id_raiz, token):
-                # Processa recursivamente pastas e arquivos
-                pilha = [(entrada, Path(""))]
-                while pilha:
-                    atual, rel = pilha.pop()
+            # Percurso em largura: pastas pendentes são listadas em lotes ($batch)
+            pendentes = deque([(ids_raiz.get(id_drive) or api_graph.obter_id_raiz_do_drive(id_drive, token), Path(""))])
+            while pendentes:
+                lote = [pendentes.popleft() for _ in range(min(cfg.graph.tamanho_lote, len(pendentes)))]
+                rel_por_pasta = dict(lote)
+                for id_pasta, atual in api_graph.listar_filhos_em_lote(
+                    id_drive, list(rel_por_pasta), token, cfg.graph.tamanho_lote
+                ):
                     nome = atual.get("name")
                     eh_pasta = atual.get("folder") is not None
                     id_item = atual.get("id")
 
-                    rel_atual = rel / nome
+                    rel_atual = rel_por_pasta[id_pasta] / nome
                     rel_completo = Path(nome_site) / nome_drive / rel_atual
+                    caminho_rel = str(rel_completo).replace("\\", "/")
 
                     if eh_pasta:
+                        # Pasta excluída: podada antes de listar os filhos (sem listagem nem transferência)
+                        if ctx.filtro is not None and ctx.filtro.pasta_excluida(caminho_rel):
+                            continue
                         # Em backends locais podemos garantir diretório; nos demais é no-op
-                        armazenamento.garantir_diretorio(base_snapshot, str(rel_completo))
-                        # Empilha filhos da pasta
-                        for filho in graph.listar_filhos_paginado(id_drive, id_item, token):
-                            pilha.append((filho, rel_atual))
-                    else:
-                        # Download e gravação do arquivo
-                        resp = graph.baixar_stream_conteudo_item(id_drive, id_item, token)
-                        armazenamento.escrever_stream(base_snapshot, str(rel_completo).replace("\\", "/"), resp.raw)
-                        manifesto[id_item] = {
-                            "path": str(rel_completo).replace("\\", "/"),
-                            "driveId": id_drive,
-                            "siteId": id_site,
-                            "name": nome,
-                        }
-
-    # Detecta itens apagados comparando IDs do manifesto anterior com o atual
-    ids_anteriores = set(manifesto_anterior.keys())
-    ids_novos = set(manifesto.keys())
-    ids_apagados = ids_anteriores - ids_novos
-
-    if base_snapshot_anterior:
-        for id_item in ids_apagados:
-            info = manifesto_anterior.get(id_item)
-            if not info:
+                        if not ctx.deduplicado:
+                            armazenamento.garantir_diretorio(base_snapshot, str(rel_completo))
+                        # Pasta entra na fila para listagem no próximo lote
+                        pendentes.append((id_item, rel_atual))
+                    elif not _arquivo_filtrado(ctx, caminho_rel, atual):
+                        # Reaproveitamento ou download e gravação ficam a cargo dos workers
+                        _enfileirar_arquivo(
+                            ctx, pool, id_item, atual, id_site, id_drive, id_item, nome,
+                            caminho_rel, None, atual, manifesto_anterior.obter(id_item),
+                        )
+
+
+def _varrer_assincrono(cfg: ConfigAplicativo, ctx: ContextoExecucao, manifesto: ArmazemManifesto,
+                       manifesto_anterior: ArmazemManifesto, estado_delta_anterior: Dict, indice_shard: int = 0,
+                       total_shards: int = 1) -> Tuple[ArmazemManifesto, Dict[str, Dict], Set[str]]:
+    """Mesmo contrato de '_varrer', com o motor asyncio (executa o laço de eventos até o fim)."""
+    return asyncio.run(_varrer_async(cfg, ctx, manifesto, manifesto_anterior, estado_delta_anterior,
+                                     indice_shard, total_shards))
+
+
+async def _varrer_async(cfg: ConfigAplicativo, ctx: ContextoExecucao, manifesto: ArmazemManifesto,
+                        manifesto_anterior: ArmazemManifesto, estado_delta_anterior: Dict, indice_shard: int,
+                        total_shards: int) -> Tuple[ArmazemManifesto, Dict[str, Dict], Set[str]]:
+    """Varredura no laço de eventos: 'listagens_simultaneas' pastas (ou feeds delta) em andamento.
+
+    Os arquivos seguem para o mesmo PoolTransferencia do motor de threads (gravação no backend,
+    reaproveitamento, journal). Com o módulo graph real as listagens e os downloads usam o
+    cliente httpx; com outra implementação (mock, sintético) as chamadas vão para threads.
+    """
+    nativo = graph is graph_assincrono.graph
+    estatisticas_extras = None
+    if nativo:
+        # Mesmo limitador do cliente síncrono (downloads em faixas): uma única taxa para a execução
+        api_nativa = graph_assincrono.criar_graph_assincrono(cfg.graph, graph.obter_cliente().limitador)
+        estatisticas_extras = api_nativa.estatisticas
+        ponte = graph_assincrono.PonteDownloads(api_nativa, asyncio.get_running_loop())
+        api = api_nativa
+        if ctx.metricas is not None:
+            api = envolver(api_nativa, ctx.metricas.tempos, "graph")
+            ponte = envolver(ponte, ctx.metricas.tempos, "graph")
+        if ctx.cache_metadados is not None:
+            api = metadados.GraphAssincronoComCache(api, ctx.cache_metadados)
+        # Os workers baixam pela ponte: o conteúdo chega pelo cliente assíncrono
+        ctx = replace(ctx, api_graph=ponte)
+    else:
+        api = graph_assincrono.GraphEmThreads(ctx.api_graph or graph)
+    por_drive = cfg.shard_por == "drive"
+    sites_cfg = cfg.sites if por_drive else shards.filtrar_sites(cfg.sites, indice_shard, total_shards)
+    estado_delta: Dict[str, Dict] = {}
+    ids_apagados_delta: Set[str] = set()
+
+    pool = PoolTransferencia(cfg.concorrencia, cfg.tamanho_fila, ao_concluir=manifesto.gravar)
+    if ctx.metricas is not None:
+        _registrar_medidores(ctx.metricas, pool, estatisticas_extras)
+    try:
+        try:
+            sites = await api.resolver_sites(ctx.token, sites_cfg) if sites_cfg is not None else []
+            with _medir(ctx, "fase.varredura"):
+                await _varrer_sites_async(cfg, ctx, pool, api, sites, manifesto_anterior, estado_delta_anterior,
+                                          estado_delta, ids_apagados_delta, indice_shard, total_shards)
+        except BaseException:
+            # Os workers podem estar aguardando a ponte de downloads: cancela fora do laço
+            await asyncio.to_thread(pool.cancelar)
+            raise
+        if ctx.metricas is not None:
+            ctx.metricas.varredura_concluida = True
+        with _medir(ctx, "fase.transferencias_pendentes"):
+            await asyncio.to_thread(pool.finalizar)
+    finally:
+        await api.fechar()
+    manifesto.confirmar()
+    return manifesto, estado_delta, ids_apagados_delta
+
+
+async def _varrer_sites_async(cfg: ConfigAplicativo, ctx: ContextoExecucao, pool: PoolTransferencia, api,
+                              sites: List[Dict], manifesto_anterior: ArmazemManifesto, estado_delta_anterior: Dict,
+                              estado_delta: Dict[str, Dict], ids_apagados_delta: Set[str], indice_shard: int,
+                              total_shards: int) -> None:
+    """Equivalente assíncrono de '_varrer_sites': uma fila de pastas consumida por N tarefas."""
+    token = ctx.token
+    por_drive = cfg.shard_por == "drive"
+    sites = [s for s in sites if ctx.filtro is None
+             or not ctx.filtro.pasta_excluida(s.get("name") or s.get("displayName") or s.get("id"))]
+    drives_por_site = await asyncio.gather(*(api.listar_drives_do_site(s.get("id"), token) for s in sites))
+
+    # (id_site, nome_site, id_drive, nome_drive, id_pasta, caminho relativo ao drive)
+    pastas: asyncio.Queue = asyncio.Queue()
+    tarefas_delta = []
+    for site, drives in zip(sites, drives_por_site):
+        id_site = site.get("id")
+        nome_site = site.get("name") or site.get("displayName") or id_site
+        if por_drive:
+            drives = [d for d in drives if shards.pertence_ao_shard(d.get("id") or "", indice_shard, total_shards)]
+        if ctx.filtro is not None:
+            drives = [d for d in drives
+                      if not ctx.filtro.pasta_excluida(f"{nome_site}/{d.get('name') or d.get('id')}")]
+        if cfg.modo_delta:
+            tarefas_delta += [asyncio.ensure_future(_processar_drive_delta_async(
+                ctx, pool, api, id_site, nome_site, d.get("id"), d.get("name") or d.get("id"),
+                estado_delta_anterior, estado_delta, manifesto_anterior, ids_apagados_delta,
+            )) for d in drives]
+            continue
+        raizes = await asyncio.gather(*(api.obter_id_raiz_do_drive(d.get("id"), token) for d in drives))
+        for d, id_raiz in zip(drives, raizes):
+            pastas.put_nowait((id_site, nome_site, d.get("id"), d.get("name") or d.get("id"), id_raiz, Path("")))
+
+    async def consumir() -> None:
+        while True:
+            pasta = await pastas.get()
+            try:
+                await _listar_pasta_async(ctx, pool, api, pasta, pastas, manifesto_anterior)
+            finally:
+                pastas.task_done()
+
+    consumidores = [asyncio.ensure_future(consumir()) for _ in range(max(1, cfg.graph.listagens_simultaneas))]
+    await _aguardar_tarefas([asyncio.ensure_future(pastas.join()), *tarefas_delta], consumidores)
+
+
+async def _aguardar_tarefas(obrigatorias: List[asyncio.Future], auxiliares: List[asyncio.Future]) -> None:
+    """Aguarda as tarefas obrigatórias; a primeira falha (de qualquer tarefa) cancela as demais e é relançada."""
+    pendentes = set(obrigatorias) | set(auxiliares)
+    try:
+        while any(not t.done() for t in obrigatorias):
+            concluidas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+            # Consulta a exceção de todas as concluídas (não só a primeira): falhas simultâneas
+            # não viram avisos "Task exception was never retrieved"
+            erros = [t.exception() for t in concluidas if not t.cancelled()]
+            erros = [e for e in erros if e is not None]
+            if erros:
+                raise erros[0]
+    finally:
+        for tarefa in pendentes:
+            tarefa.cancel()
+        await asyncio.gather(*pendentes, return_exceptions=True)
+
+
+async def _listar_pasta_async(ctx: ContextoExecucao, pool: PoolTransferencia, api, pasta: Tuple,
+                              pastas: asyncio.Queue, manifesto_anterior: ArmazemManifesto) -> None:
+    """Lista uma pasta: subpastas voltam para a fila e arquivos seguem para o pool de transferência."""
+    id_site, nome_site, id_drive, nome_drive, id_pasta, rel_pasta = pasta
+    async for atual in api.listar_filhos_paginado(id_drive, id_pasta, ctx.token):
+        nome = atual.get("name")
+        id_item = atual.get("id")
+        rel_atual = rel_pasta / nome
+        caminho_rel = str(Path(nome_site) / nome_drive / rel_atual).replace("\\", "/")
+        if atual.get("folder") is not None:
+            if ctx.filtro is not None and ctx.filtro.pasta_excluida(caminho_rel):
                 continue
-            caminho_rel = info.get("path")
-            if caminho_rel:
-                try:
-                    armazenamento.copiar(base_snapshot_anterior, caminho_rel, base_apagados)
-                except Exception:
-                    # Não interromper se falhar a cópia de algum item
-                    pass
-
-    # Salva estado atual
-    salvar_estado_atual(dir_estado, manifesto, base_snapshot)
\ No newline at end of file
+            if not ctx.deduplicado:
+                await asyncio.to_thread(ctx.armazenamento.garantir_diretorio, ctx.base_snapshot, caminho_rel)
+            pastas.put_nowait((id_site, nome_site, id_drive, nome_drive, id_item, rel_atual))
+        elif not _arquivo_filtrado(ctx, caminho_rel, atual):
+            # Fila cheia bloqueia uma thread auxiliar, não o laço de eventos
+            await asyncio.to_thread(_enfileirar_arquivo, ctx, pool, id_item, atual, id_site, id_drive, id_item,
+                                    nome, caminho_rel, None, atual, manifesto_anterior.obter(id_item))
+
+
+async def _processar_drive_delta_async(ctx: ContextoExecucao, pool: PoolTransferencia, api, id_site: str,
+                                       nome_site: str, id_drive: str, nome_drive: str, estado_delta_anterior: Dict,
+                                       estado_delta: Dict[str, Dict], manifesto_anterior: ArmazemManifesto,
+                                       ids_apagados: Set[str]) -> None:
+    """Equivalente assíncrono de '_processar_drive_delta' (drives processados em paralelo)."""
+    estado_drive = estado_delta_anterior.get(id_drive, {})
+    link_anterior = estado_drive.get("deltaLink") if ctx.base_snapshot_anterior else None
+    itens, novo_link, completo = await _coletar_delta_async(api, id_drive, ctx.token, link_anterior)
+    estado, arquivos = _planejar_delta(ctx, id_site, nome_site, id_drive, nome_drive, estado_drive,
+                                       manifesto_anterior, ids_apagados, itens, novo_link, completo)
+    for argumentos in arquivos:
+        await asyncio.to_thread(_enfileirar_arquivo, ctx, pool, *argumentos)
+    estado_delta[id_drive] = estado
+
+
+async def _coletar_delta_async(api, id_drive: str, token: FonteToken,
+                               delta_link: Optional[str]) -> Tuple[List[Dict], Optional[str], bool]:
+    """Como '_coletar_delta': enumeração completa sem link ou com o deltaLink expirado (410)."""
+    async def ler(link: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        itens: List[Dict] = []
+        novo_link: Optional[str] = None
+        async for pagina in api.listar_delta_paginado(id_drive, token, link):
+            itens.extend(pagina.get("value", []))
+            novo_link = pagina.get("@odata.deltaLink") or novo_link
+        return itens, novo_link
+
+    if not delta_link:
+        return (*await ler(None), True)
+    try:
+        return (*await ler(delta_link), False)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 410:
+            return (*await ler(None), True)
+        raise
+
+
+def _itens_apagados(cfg: ConfigAplicativo, manifesto_anterior: ArmazemManifesto, manifesto: ArmazemManifesto,
+                    ids_apagados_delta: Set[str]) -> Iterator[Tuple[str, Dict]]:
+    """Itera (id, entrada anterior) dos itens que deixaram de existir desde o snapshot anterior."""
+    if cfg.modo_delta:
+        # No modo delta as remoções vêm diretamente do feed do Graph
+        for id_item in sorted(ids_apagados_delta):
+            info = manifesto_anterior.obter(id_item)
+            if info:
+                yield id_item, info
+        return
+    # Anti-join no SQLite entre o manifesto anterior e o atual (sem montar conjuntos em memória)
+    yield from manifesto_anterior.ausentes_em(manifesto)
+
+
+def _finalizar_execucao(cfg: ConfigAplicativo, armazenamento: BackendArmazenamento, dir_estado: Path,
+                        base_snapshot: str, base_snapshot_anterior: Optional[str], base_apagados: str,
+                        manifesto_anterior: ArmazemManifesto, manifesto: ArmazemManifesto,
+                        estado_delta: Dict[str, Dict], ids_apagados_delta: Set[str]) -> None:
+    """Trata os itens apagados desde o snapshot anterior e salva o estado global."""
+    if cfg.modo_snapshot == "deduplicado":
+        # Snapshot deduplicado é apenas um manifesto apontando para blobs
+        cas.salvar_manifesto(armazenamento, base_snapshot, manifesto)
+        # Apagados de execuções anteriores no mesmo dia somados aos novos num SQLite temporário,
+        # sem carregar o manifesto de apagados em memória
+        caminho_apagados = dir_estado / NOME_APAGADOS_CAS_TEMPORARIO
+        apagados = criar_manifesto_novo(caminho_apagados)
+        try:
+            for id_item, info in cas.iterar_manifesto(armazenamento, base_apagados):
+                apagados.gravar(id_item, info)
+            novos = 0
+            for id_item, info in _itens_apagados(cfg, manifesto_anterior, manifesto, ids_apagados_delta):
+                if info.get("blob"):
+                    apagados.gravar(id_item, info)
+                    novos += 1
+            if novos:
+                cas.salvar_manifesto(armazenamento, base_apagados, apagados)
+        finally:
+            apagados.fechar()
+            caminho_apagados.unlink(missing_ok=True)
+    elif base_snapshot_anterior:
+        caminhos_apagados: List[str] = []
+        for _, info in _itens_apagados(cfg, manifesto_anterior, manifesto, ids_apagados_delta):
+            if info.get("path"):
+                caminhos_apagados.append(info["path"])
+            if len(caminhos_apagados) >= TAMANHO_BLOCO_APAGADOS:
+                armazenamento.copiar_lote(base_snapshot_anterior, caminhos_apagados, base_apagados)
+                caminhos_apagados = []
+        # Cópias no servidor executadas em lote; 'copiar' não interrompe se algum item falhar
+        armazenamento.copiar_lote(base_snapshot_anterior, caminhos_apagados, base_apagados)
+
+    # O manifesto anterior precisa estar fechado antes de ser substituído pelo atual
+    manifesto_anterior.fechar()
+    # Fora do modo delta grava estado vazio, invalidando deltaLinks de execuções anteriores
+    salvar_estado_atual(dir_estado, manifesto, base_snapshot, estado_delta)
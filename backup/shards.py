@@ -0,0 +1,123 @@
+import json
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .checkpoint import gravar_texto_atomico
+from .manifesto import ArmazemManifesto, criar_manifesto_novo, publicar_manifesto
+
+# Comentários em Português do Brasil
+# Divisão do trabalho em shards (por site ou por drive). Cada shard roda em um processo ou
+# em uma máquina diferente e grava um manifesto parcial no diretório de estado; ao final os
+# parciais são mesclados no estado global (detecção de apagados e o manifesto SQLite
+# latest_manifest.sqlite).
+
+
+def pertence_ao_shard(chave: str, indice: int, total: int) -> bool:
+    """Atribuição determinística (crc32) de uma chave a um dos 'total' shards."""
+    if total <= 1:
+        return True
+    return zlib.crc32(chave.encode("utf-8")) % total == indice
+
+
+def filtrar_sites(sites_cfg: List[str], indice: int, total: int) -> Optional[List[str]]:
+    """Sites configurados que cabem ao shard, ou None se o shard não tiver nenhum.
+
+    Sem lista configurada (apenas o site raiz) todo o trabalho fica com o shard 0.
+    """
+    if total <= 1:
+        return list(sites_cfg)
+    if not sites_cfg:
+        return [] if indice == 0 else None
+    return [s for s in sites_cfg if pertence_ao_shard(s, indice, total)] or None
+
+
+def nome_journal(indice: int, total: int) -> str:
+    """Journal de checkpoint próprio de cada shard, para que não compartilhem o arquivo."""
+    return f"journal-shard-{indice:03d}-de-{total:03d}.jsonl"
+
+
+def nome_cache_metadados(indice: int, total: int) -> str:
+    """Cache de metadados (sites, drives e raízes) próprio de cada shard."""
+    return f"cache_metadados-shard-{indice:03d}-de-{total:03d}.json"
+
+
+def nome_resumo(indice: int, total: int) -> str:
+    """Resumo (métricas) da execução de cada shard."""
+    return f"resumo-shard-{indice:03d}-de-{total:03d}.json"
+
+
+def _diretorio_parciais(diretorio_estado: Path, data_str: str) -> Path:
+    return diretorio_estado / "shards" / data_str
+
+
+def _nome_parcial(indice: int, total: int) -> str:
+    return f"parcial-{indice:03d}-de-{total:03d}"
+
+
+def criar_manifesto_parcial(diretorio_estado: Path, data_str: str, indice: int, total: int) -> ArmazemManifesto:
+    """Cria o manifesto (SQLite) em que o shard grava seus itens; só é publicado ao final."""
+    nome = _nome_parcial(indice, total) + ".sqlite.tmp"
+    return criar_manifesto_novo(_diretorio_parciais(diretorio_estado, data_str) / nome)
+
+
+def salvar_parcial(diretorio_estado: Path, data_str: str, indice: int, total: int, base_snapshot: str,
+                   manifesto: ArmazemManifesto, estado_delta: Dict[str, Dict], ids_apagados: Set[str]) -> Path:
+    """Publica o manifesto parcial do shard e grava seus metadados.
+
+    O arquivo de metadados (.json) é gravado por último, de forma atômica, e marca o shard
+    como concluído.
+    """
+    diretorio = _diretorio_parciais(diretorio_estado, data_str)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    nome = _nome_parcial(indice, total)
+    publicar_manifesto(manifesto, diretorio / (nome + ".sqlite"))
+    dados = {
+        "base_snapshot": base_snapshot,
+        "indice": indice,
+        "total": total,
+        "delta": estado_delta,
+        "apagados": sorted(ids_apagados),
+    }
+    caminho = diretorio / (nome + ".json")
+    gravar_texto_atomico(caminho, json.dumps(dados, ensure_ascii=False))
+    return caminho
+
+
+def carregar_parciais(diretorio_estado: Path, data_str: str, total: int, base_snapshot: str,
+                      manifesto: ArmazemManifesto) -> Tuple[Dict[str, Dict], Set[str]]:
+    """Mescla em 'manifesto' os manifestos parciais de todos os shards da data.
+
+    Lança FileNotFoundError se algum shard ainda não terminou (parcial ausente) e ValueError se
+    um parcial pertence a outro snapshot. Retorna (estado_delta, ids_apagados_delta).
+    """
+    diretorio = _diretorio_parciais(diretorio_estado, data_str)
+    faltantes = [i for i in range(total) if not (diretorio / (_nome_parcial(i, total) + ".json")).exists()]
+    if faltantes:
+        raise FileNotFoundError(f"Shards sem manifesto parcial em {data_str}: {faltantes}")
+    estado_delta: Dict[str, Dict] = {}
+    ids_apagados: Set[str] = set()
+    for indice in range(total):
+        nome = _nome_parcial(indice, total)
+        dados = json.loads((diretorio / (nome + ".json")).read_text(encoding="utf-8"))
+        if dados.get("base_snapshot") != base_snapshot:
+            raise ValueError(f"Manifesto parcial {nome} pertence a outro snapshot: {dados.get('base_snapshot')}")
+        manifesto.importar(diretorio / (nome + ".sqlite"))
+        estado_delta.update(dados.get("delta", {}))
+        ids_apagados.update(dados.get("apagados", []))
+    # Um item movido entre drives de shards diferentes aparece como apagado em um e presente em outro
+    ids_apagados = {id_item for id_item in ids_apagados if id_item not in manifesto}
+    return estado_delta, ids_apagados
+
+
+def remover_parciais(diretorio_estado: Path, data_str: str) -> None:
+    """Remove os parciais da data após a mesclagem no estado global."""
+    diretorio = _diretorio_parciais(diretorio_estado, data_str)
+    if not diretorio.exists():
+        return
+    for caminho in diretorio.glob("parcial-*"):
+        caminho.unlink()
+    try:
+        diretorio.rmdir()
+    except OSError:
+        pass
@@ -1,14 +1,44 @@
-from azure.storage.blob import BlobServiceClient
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock, BlobServiceClient
 
 from .base import BackendArmazenamento
+from .spool import spool_em_disco
+
+MB = 1024 * 1024
+# Limite de blocos de um block blob
+MAXIMO_BLOCOS_AZURE = 50000
+# Uma requisição de lote (Blob Batch) aceita até 256 sub-requisições
+MAXIMO_BLOBS_EXCLUSAO = 256
+# A partir de quantos caminhos na mesma "pasta" o existe_lote lista a pasta em vez de consultar cada blob
+LIMIAR_LISTAGEM_EXISTE = 32
 
 # Comentários em Português do Brasil
 # Implementação de backend para Azure Blob Storage usando connection string.
 
 
 class ArmazenamentoAzureBlob(BackendArmazenamento):
-    def __init__(self, connection_string: str, container_name: str):
-        self.servico = BlobServiceClient.from_connection_string(connection_string)
+    def __init__(self, connection_string: str, container_name: str,
+                 tamanho_bloco_mb: int = 8, concorrencia_upload: int = 4,
+                 limiar_upload_unico_mb: int = 64, limiar_spool_mb: int = 0,
+                 diretorio_spool: Optional[str] = None):
+        self.tamanho_bloco = max(1, int(tamanho_bloco_mb)) * MB
+        self.limiar_upload_unico = max(1, int(limiar_upload_unico_mb)) * MB
+        self.concorrencia_upload = max(1, int(concorrencia_upload))
+        # Arquivos a partir deste tamanho vão para disco antes do upload (0 desativa)
+        self.limiar_spool = int(limiar_spool_mb) * MB if limiar_spool_mb else 0
+        self.diretorio_spool = diretorio_spool
+        self.concorrencia_lote = max(self.concorrencia_lote, self.concorrencia_upload * 2)
+        self.servico = BlobServiceClient.from_connection_string(
+            connection_string,
+            max_block_size=self.tamanho_bloco,
+            max_single_put_size=self.limiar_upload_unico,
+        )
         self.container = self.servico.get_container_client(container_name)
         # Garante existência do container (não lança se já existir)
         try:
@@ -22,20 +52,145 @@ class ArmazenamentoAzureBlob(BackendArmazenamento):
     def obter_base_apagados(self, data_str: str) -> str:
         return f"deleted/{data_str}"
 
-    def escrever_stream(self, base: str, caminho_relativo: str, stream) -> None:
+    def obter_base_blobs(self) -> str:
+        return "blobs"
+
+    def escrever_stream(self, base: str, caminho_relativo: str, stream, tamanho: Optional[int] = None) -> None:
         nome_blob = f"{base}/{caminho_relativo}".replace("\\", "/")
         blob = self.container.get_blob_client(nome_blob)
-        blob.upload_blob(data=stream, overwrite=True)
+        if self.limiar_spool and tamanho is not None and tamanho >= self.limiar_spool:
+            with spool_em_disco(stream, self.diretorio_spool) as caminho_tmp:
+                self._enviar_blocos_paralelos(blob, caminho_tmp)
+            return
+        # Acima de max_single_put_size o SDK lê blocos em sequência e os envia em paralelo
+        blob.upload_blob(data=stream, overwrite=True, max_concurrency=self.concorrencia_upload)
+
+    def _enviar_blocos_paralelos(self, blob, caminho_arquivo: str) -> None:
+        """Envia um arquivo local como blocos preparados (stage_block) em paralelo e confirma a lista.
+
+        Cada bloco lê sua própria faixa do arquivo, podendo ser repetido isoladamente pela
+        política de retentativas do SDK.
+        """
+        tamanho = os.path.getsize(caminho_arquivo)
+        if tamanho <= self.limiar_upload_unico:
+            with open(caminho_arquivo, "rb") as f:
+                blob.upload_blob(data=f, overwrite=True)
+            return
+        tamanho_bloco = max(self.tamanho_bloco, math.ceil(tamanho / MAXIMO_BLOCOS_AZURE))
+        ids_blocos = [f"{i:08d}" for i in range(math.ceil(tamanho / tamanho_bloco))]
+
+        def enviar_bloco(indice: int) -> None:
+            with open(caminho_arquivo, "rb") as f:
+                f.seek(indice * tamanho_bloco)
+                dados = f.read(tamanho_bloco)
+            blob.stage_block(block_id=ids_blocos[indice], data=dados, length=len(dados))
+
+        with ThreadPoolExecutor(max_workers=self.concorrencia_upload) as executor:
+            list(executor.map(enviar_bloco, range(len(ids_blocos))))
+        blob.commit_block_list([BlobBlock(block_id=b) for b in ids_blocos])
+
+    def ler_stream(self, base: str, caminho_relativo: str):
+        nome_blob = f"{base}/{caminho_relativo}".replace("\\", "/")
+        # StorageStreamDownloader expõe read(n) e baixa em partes sob demanda
+        return self.container.get_blob_client(nome_blob).download_blob()
+
+    def ler_faixa(self, base: str, caminho_relativo: str, inicio: int, tamanho: int) -> bytes:
+        nome_blob = f"{base}/{caminho_relativo}".replace("\\", "/")
+        return self.container.get_blob_client(nome_blob).download_blob(offset=inicio, length=tamanho).readall()
+
+    def existe(self, base: str, caminho_relativo: str) -> bool:
+        nome_blob = f"{base}/{caminho_relativo}".replace("\\", "/")
+        return self.container.get_blob_client(nome_blob).exists()
+
+    def _copiar_no_servidor(self, blob_origem: str, blob_destino: str) -> None:
+        """Cópia assíncrona no servidor (Copy Blob) dentro da mesma conta, aguardando a conclusão.
+
+        O conteúdo não trafega pelo runner; a própria credencial da conta autoriza a origem.
+        """
+        src_blob = self.container.get_blob_client(blob_origem)
+        dst_blob = self.container.get_blob_client(blob_destino)
+        copia = dst_blob.start_copy_from_url(src_blob.url)
+        status = copia.get("copy_status")
+        espera = 0.2
+        while status == "pending":
+            time.sleep(espera)
+            espera = min(espera * 2, 5.0)
+            status = dst_blob.get_blob_properties().copy.status
+        if status != "success":
+            raise RuntimeError(f"Cópia de blob não concluída ({status}): {blob_origem}")
+
+    def vincular(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
+        blob_origem = f"{base_origem}/{caminho_relativo}".replace("\\", "/")
+        blob_destino = f"{base_destino}/{caminho_relativo}".replace("\\", "/")
+        # Erros (ex.: origem ausente) são propagados ao chamador
+        self._copiar_no_servidor(blob_origem, blob_destino)
 
     def copiar(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
         blob_origem = f"{base_origem}/{caminho_relativo}".replace("\\", "/")
         blob_destino = f"{base_destino}/{caminho_relativo}".replace("\\", "/")
-        src_blob = self.container.get_blob_client(blob_origem)
-        dst_blob = self.container.get_blob_client(blob_destino)
         try:
-            # Sem URL pública/SAS, usamos download e reupload como fallback
-            dados = src_blob.download_blob().readall()
-            dst_blob.upload_blob(dados, overwrite=True)
+            self._copiar_no_servidor(blob_origem, blob_destino)
         except Exception:
             # Se não existir ou falhar, não interrompe o fluxo
-            pass
\ No newline at end of file
+            pass
+
+    def apagar(self, base: str, caminho_relativo: str) -> None:
+        nome_blob = f"{base}/{caminho_relativo}".replace("\\", "/")
+        try:
+            self.container.get_blob_client(nome_blob).delete_blob()
+        except ResourceNotFoundError:
+            pass
+
+    def listar_prefixo_com_tamanho(self, base: str, prefixo_relativo: str = "") -> Iterator[Tuple[str, int]]:
+        raiz = base.replace("\\", "/").rstrip("/") + "/"
+        prefixo = raiz + prefixo_relativo.replace("\\", "/").lstrip("/")
+        # list_blobs pagina automaticamente (até 5000 blobs por página)
+        for blob in self.container.list_blobs(name_starts_with=prefixo):
+            yield blob.name[len(raiz):], blob.size or 0
+
+    def listar_subdiretorios(self, base: str) -> List[str]:
+        raiz = base.replace("\\", "/").rstrip("/") + "/"
+        return sorted(
+            item.name[len(raiz):].rstrip("/")
+            for item in self.container.walk_blobs(name_starts_with=raiz, delimiter="/")
+            if item.name.endswith("/")
+        )
+
+    def existe_lote(self, base: str, caminhos_relativos: Iterable[str]) -> Set[str]:
+        # Pastas com muitos caminhos consultados são listadas sem recursão; as demais são
+        # consultadas blob a blob em paralelo (implementação padrão)
+        grupos: Dict[str, List[str]] = {}
+        for caminho in caminhos_relativos:
+            pasta = caminho.replace("\\", "/").rpartition("/")[0]
+            grupos.setdefault(pasta, []).append(caminho)
+        existentes: Set[str] = set()
+        avulsos: List[str] = []
+        raiz = base.replace("\\", "/").rstrip("/") + "/"
+        for pasta, caminhos in grupos.items():
+            if len(caminhos) < LIMIAR_LISTAGEM_EXISTE:
+                avulsos.extend(caminhos)
+                continue
+            prefixo = raiz + (pasta + "/" if pasta else "")
+            listados = {
+                item.name[len(raiz):]
+                for item in self.container.walk_blobs(name_starts_with=prefixo, delimiter="/")
+                if not item.name.endswith("/")
+            }
+            existentes.update(c for c in caminhos if c.replace("\\", "/") in listados)
+        if avulsos:
+            existentes |= super().existe_lote(base, avulsos)
+        return existentes
+
+    def apagar_lote(self, base: str, caminhos_relativos: Iterable[str]) -> None:
+        nomes = [f"{base}/{c}".replace("\\", "/") for c in caminhos_relativos]
+
+        def apagar_bloco(lote: List[str]) -> None:
+            respostas = self.container.delete_blobs(*lote, raise_on_any_failure=False)
+            # Blob inexistente (404) não é erro; demais falhas são propagadas
+            falhas = [r for r in respostas if r.status_code not in (200, 202, 404)]
+            if falhas:
+                raise RuntimeError(f"Falha ao apagar {len(falhas)} blob(s) (HTTP {falhas[0].status_code})")
+
+        # Blocos de até 256 blobs enviados em paralelo
+        lotes = [nomes[i:i + MAXIMO_BLOBS_EXCLUSAO] for i in range(0, len(nomes), MAXIMO_BLOBS_EXCLUSAO)]
+        self._executar_em_paralelo(apagar_bloco, lotes)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
 
 # Comentários em Português do Brasil
 # Interface de backend de armazenamento seguindo o princípio de inversão de dependência (SOLID).
@@ -8,6 +9,9 @@ from typing import Optional
 class BackendArmazenamento(ABC):
     """Define operações mínimas de um backend de armazenamento para snapshots e itens apagados."""
 
+    # Número de operações simultâneas usadas pelas implementações padrão das operações em lote
+    concorrencia_lote: int = 8
+
     @abstractmethod
     def obter_base_snapshot(self, data_str: str) -> str:
         """Retorna o caminho/base (prefixo) do snapshot para a data indicada."""
@@ -19,8 +23,17 @@ class BackendArmazenamento(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def escrever_stream(self, base: str, caminho_relativo: str, stream) -> None:
-        """Grava um arquivo a partir de um stream binário no caminho base+relativo."""
+    def obter_base_blobs(self) -> str:
+        """Retorna o caminho/base (prefixo) do repositório de blobs endereçados por conteúdo."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def escrever_stream(self, base: str, caminho_relativo: str, stream, tamanho: Optional[int] = None) -> None:
+        """Grava um arquivo a partir de um stream binário no caminho base+relativo.
+
+        'tamanho' (bytes), quando conhecido, permite ao backend escolher a estratégia de upload
+        (envio único, partes paralelas ou spool em disco).
+        """
         raise NotImplementedError
 
     @abstractmethod
@@ -28,7 +41,117 @@ class BackendArmazenamento(ABC):
         """Copia um arquivo interno do backend de origem para destino mantendo o caminho relativo."""
         raise NotImplementedError
 
+    @abstractmethod
+    def ler_stream(self, base: str, caminho_relativo: str):
+        """Abre para leitura o arquivo em base+relativo, retornando um objeto com read(n)."""
+        raise NotImplementedError
+
+    def ler_faixa(self, base: str, caminho_relativo: str, inicio: int, tamanho: int) -> bytes:
+        """Lê 'tamanho' bytes a partir de 'inicio' (membro de um segmento empacotado).
+
+        Backends com leitura por faixa nativa (seek, GET com Range) sobrescrevem; a implementação
+        padrão lê o objeto desde o início e descarta os bytes anteriores.
+        """
+        stream = self.ler_stream(base, caminho_relativo)
+        try:
+            restante = inicio
+            while restante > 0:
+                descartado = stream.read(min(restante, 1024 * 1024))
+                if not descartado:
+                    break
+                restante -= len(descartado)
+            return stream.read(tamanho)
+        finally:
+            fechar = getattr(stream, "close", None)
+            if fechar:
+                fechar()
+
+    def hash_conteudo(self, base: str, caminho_relativo: str, recalcular: bool = False) -> Optional[str]:
+        """sha256 (hexadecimal) do arquivo em base+relativo, se o backend o conhece sem baixar o objeto.
+
+        O backend local mantém um índice de hashes; os remotos retornam None (calcular exigiria
+        ler o objeto inteiro) e o chamador recorre a tamanho e tags. Com 'recalcular', o backend
+        local relê os arquivos ausentes do índice ou alterados desde o registro (verificação).
+        """
+        return None
+
+    @abstractmethod
+    def existe(self, base: str, caminho_relativo: str) -> bool:
+        """Indica se existe um arquivo em base+relativo."""
+        raise NotImplementedError
+
+    def vincular(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
+        """Materializa no destino um arquivo já gravado na origem sem trafegar o conteúdo.
+
+        Usado para reaproveitar arquivos inalterados entre snapshots. Backends sobrescrevem com a
+        operação mais barata disponível (hardlink, cópia no servidor). Deve lançar exceção se a
+        origem não existir, para que o chamador faça o download normalmente.
+        """
+        # Implementação padrão: cópia interna do backend
+        self.copiar(base_origem, caminho_relativo, base_destino)
+
     def garantir_diretorio(self, base: str, diretorio_relativo: Optional[str] = None) -> None:
         """Alguns backends não possuem diretórios reais; no local é necessário criar."""
         # Método opcional; implementação padrão não faz nada.
-        return None
\ No newline at end of file
+        return None
+
+    def apagar(self, base: str, caminho_relativo: str) -> None:
+        """Remove o arquivo em base+relativo; não falha se ele não existir."""
+        raise NotImplementedError
+
+    def listar_prefixo_com_tamanho(self, base: str, prefixo_relativo: str = "") -> Iterator[Tuple[str, int]]:
+        """Lista (recursivamente) pares (caminho relativo a 'base', tamanho em bytes) sob o prefixo."""
+        raise NotImplementedError
+
+    def listar_prefixo(self, base: str, prefixo_relativo: str = "") -> Iterator[str]:
+        """Lista (recursivamente) os caminhos relativos a 'base' dos arquivos sob o prefixo."""
+        for caminho, _ in self.listar_prefixo_com_tamanho(base, prefixo_relativo):
+            yield caminho
+
+    def listar_subdiretorios(self, base: str) -> List[str]:
+        """Nomes dos "diretórios" (prefixos) imediatamente abaixo de 'base'."""
+        nomes = set()
+        for caminho in self.listar_prefixo(base):
+            primeiro, separador, _ = caminho.partition("/")
+            if separador:
+                nomes.add(primeiro)
+        return sorted(nomes)
+
+    def bytes_recuperaveis(self, itens: Iterable[Tuple[str, str, int]]) -> int:
+        """Bytes liberados ao apagar os itens (base, caminho, tamanho) informados.
+
+        Backends com conteúdo compartilhado entre arquivos (hardlinks) sobrescrevem.
+        """
+        return sum(tamanho for _, _, tamanho in itens)
+
+    def remover_diretorios_vazios(self, base: str) -> None:
+        """Remove diretórios que ficaram vazios sob 'base'; no-op em backends sem diretórios."""
+        return None
+
+    # Operações em lote: a implementação padrão executa a operação unitária em paralelo;
+    # backends com API nativa (listagem paginada, exclusão em lote) sobrescrevem.
+
+    def _executar_em_paralelo(self, funcao: Callable, itens: Iterable) -> List:
+        """Aplica 'funcao' a cada item (caminho ou bloco de caminhos) usando 'concorrencia_lote' threads.
+
+        Os resultados seguem a ordem recebida.
+        """
+        itens = list(itens)
+        if len(itens) <= 1 or self.concorrencia_lote <= 1:
+            return [funcao(c) for c in itens]
+        with ThreadPoolExecutor(max_workers=self.concorrencia_lote) as executor:
+            return list(executor.map(funcao, itens))
+
+    def copiar_lote(self, base_origem: str, caminhos_relativos: Iterable[str], base_destino: str) -> None:
+        """Copia vários arquivos de 'base_origem' para 'base_destino' mantendo os caminhos."""
+        self._executar_em_paralelo(lambda c: self.copiar(base_origem, c, base_destino), caminhos_relativos)
+
+    def existe_lote(self, base: str, caminhos_relativos: Iterable[str]) -> Set[str]:
+        """Retorna o subconjunto dos caminhos informados que existem em 'base'."""
+        caminhos = list(caminhos_relativos)
+        existentes = self._executar_em_paralelo(lambda c: self.existe(base, c), caminhos)
+        return {c for c, existe in zip(caminhos, existentes) if existe}
+
+    def apagar_lote(self, base: str, caminhos_relativos: Iterable[str]) -> None:
+        """Remove vários arquivos de 'base'; caminhos inexistentes são ignorados."""
+        self._executar_em_paralelo(lambda c: self.apagar(base, c), caminhos_relativos)
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Comentários em Português do Brasil
+# Índice de hashes do backend local: caminho, tamanho, mtime, inode e sha256 de cada arquivo
+# gravado em 'backup_dir'. O hash é calculado durante a própria gravação (os bytes já passam
+# pela memória) e consultado depois sem reler o arquivo enquanto tamanho e mtime não mudarem.
+# Snapshots reaproveitados por hardlink compartilham o inode: a primeira consulta de um caminho
+# novo encontra o hash pelo inode, também sem leitura. Arquivos fora do índice (ou alterados por
+# fora do backend) só são relidos quando o chamador pede (verificação); durante o backup a
+# consulta retorna None e a comparação recai sobre tamanho e tags. As chaves são os caminhos
+# relativos à pasta do índice (a raiz do backend), independentes do diretório de trabalho.
+
+NOME_INDICE = "indice_hashes.sqlite"
+_BLOCO = 1024 * 1024
+
+
+def _assinatura(info: os.stat_result) -> Tuple[int, int, int, int]:
+    return info.st_size, info.st_mtime_ns, info.st_dev, info.st_ino
+
+
+class IndiceHashes:
+    """Índice persistente (SQLite em modo WAL) seguro entre threads e entre processos.
+
+    A conexão é aberta sob demanda e não acompanha o objeto quando ele é enviado a outro
+    processo (shards em processos locais): cada processo abre a sua.
+    """
+
+    def __init__(self, caminho: Path):
+        self.caminho = Path(caminho)
+        self._lock = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._raiz = os.path.abspath(self.caminho.parent)
+        self._contadores: Dict[str, int] = {"hashes_do_indice": 0, "hashes_ausentes": 0, "hashes_recalculados": 0}
+
+    def __getstate__(self) -> Dict:
+        return {"caminho": self.caminho}
+
+    def __setstate__(self, estado: Dict) -> None:
+        self.__init__(estado["caminho"])
+
+    def _abrir(self) -> sqlite3.Connection:
+        if self._conexao is None or self._pid != os.getpid():
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            # Cada gravação é uma transação: perder o índice custa apenas recalcular hashes
+            conexao = sqlite3.connect(str(self.caminho), timeout=30, check_same_thread=False, isolation_level=None)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS arquivos (caminho TEXT PRIMARY KEY, tamanho INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, dispositivo INTEGER NOT NULL, inode INTEGER NOT NULL, sha256 TEXT NOT NULL)"
+            )
+            conexao.execute("CREATE INDEX IF NOT EXISTS arquivos_por_inode ON arquivos (dispositivo, inode)")
+            self._conexao, self._pid = conexao, os.getpid()
+        return self._conexao
+
+    def _chave(self, caminho: Path) -> str:
+        """Caminho relativo à raiz, com '/'; fora dela, o caminho absoluto."""
+        absoluto = os.path.abspath(caminho)
+        try:
+            relativo = os.path.relpath(absoluto, self._raiz)
+        except ValueError:  # Windows: outra unidade
+            return absoluto
+        fora = relativo == os.pardir or relativo.startswith(os.pardir + os.sep)
+        return absoluto if fora else Path(relativo).as_posix()
+
+    def registrar(self, caminho: Path, sha256: str) -> None:
+        """Registra o hash de um arquivo recém-gravado (o tamanho e o mtime vêm do stat)."""
+        tamanho, mtime_ns, dispositivo, inode = _assinatura(os.stat(caminho))
+        with self._lock:
+            self._abrir().execute(
+                "INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?, ?, ?)",
+                (self._chave(caminho), tamanho, mtime_ns, dispositivo, inode, sha256),
+            )
+
+    def remover(self, caminho: Path) -> None:
+        with self._lock:
+            self._abrir().execute("DELETE FROM arquivos WHERE caminho = ?", (self._chave(caminho),))
+
+    def obter(self, caminho: Path, recalcular: bool = False) -> Optional[str]:
+        """sha256 do arquivo pelo índice, sem lê-lo.
+
+        Se o arquivo não estiver no índice ou tiver tamanho, mtime ou inode diferentes do
+        registro, retorna None; com 'recalcular' o arquivo é lido e o índice atualizado.
+        Retorna None se o arquivo não existir.
+        """
+        try:
+            assinatura = _assinatura(os.stat(caminho))
+        except FileNotFoundError:
+            return None
+        tamanho, mtime_ns, dispositivo, inode = assinatura
+        chave = self._chave(caminho)
+        with self._lock:
+            conexao = self._abrir()
+            linha = conexao.execute(
+                "SELECT sha256 FROM arquivos WHERE caminho = ? AND tamanho = ? AND mtime_ns = ? "
+                "AND dispositivo = ? AND inode = ?", (chave, *assinatura),
+            ).fetchone()
+            if linha is None:
+                # Hardlink de um arquivo já indexado (snapshot reaproveitado)
+                linha = conexao.execute(
+                    "SELECT sha256 FROM arquivos WHERE dispositivo = ? AND inode = ? AND tamanho = ? "
+                    "AND mtime_ns = ? LIMIT 1", (dispositivo, inode, tamanho, mtime_ns),
+                ).fetchone()
+                if linha is not None:
+                    conexao.execute("INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?, ?, ?)",
+                                    (chave, *assinatura, linha[0]))
+            if linha is not None:
+                self._contadores["hashes_do_indice"] += 1
+                return linha[0]
+            if not recalcular:
+                self._contadores["hashes_ausentes"] += 1
+                return None
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            while True:
+                bloco = f.read(_BLOCO)
+                if not bloco:
+                    break
+                sha.update(bloco)
+        with self._lock:
+            self._contadores["hashes_recalculados"] += 1
+        self.registrar(caminho, sha.hexdigest())
+        return sha.hexdigest()
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._contadores)
+
+    def fechar(self) -> None:
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
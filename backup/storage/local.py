@@ -1,16 +1,23 @@
+import hashlib
+import os
+import shutil
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from .base import BackendArmazenamento
+from .indice_hashes import NOME_INDICE, IndiceHashes
 
 # Comentários em Português do Brasil
 # Implementação de backend local em sistema de arquivos.
 
 
 class ArmazenamentoLocal(BackendArmazenamento):
-    def __init__(self, diretorio_raiz: str):
+    def __init__(self, diretorio_raiz: str, indice_hashes: bool = True):
         # Diretório raiz para backups locais
         self.raiz = Path(diretorio_raiz)
+        # Índice de hashes (caminho, tamanho, mtime, sha256) dos arquivos gravados; None desativa
+        self.indice = IndiceHashes(self.raiz / NOME_INDICE) if indice_hashes else None
 
     def obter_base_snapshot(self, data_str: str) -> str:
         return str(self.raiz / "snapshots" / data_str)
@@ -18,31 +25,158 @@ class ArmazenamentoLocal(BackendArmazenamento):
     def obter_base_apagados(self, data_str: str) -> str:
         return str(self.raiz / "deleted" / data_str)
 
+    def obter_base_blobs(self) -> str:
+        return str(self.raiz / "blobs")
+
     def garantir_diretorio(self, base: str, diretorio_relativo: Optional[str] = None) -> None:
         p = Path(base)
         if diretorio_relativo:
             p = p / diretorio_relativo
         p.mkdir(parents=True, exist_ok=True)
 
-    def escrever_stream(self, base: str, caminho_relativo: str, stream) -> None:
+    def escrever_stream(self, base: str, caminho_relativo: str, stream, tamanho: Optional[int] = None) -> None:
         alvo = Path(base) / caminho_relativo
         alvo.parent.mkdir(parents=True, exist_ok=True)
-        with open(alvo, "wb") as f:
-            # Copia em blocos para evitar carregar tudo em memória
-            while True:
-                chunk = stream.read(1024 * 1024)
-                if not chunk:
-                    break
-                f.write(chunk)
+        # Grava em arquivo temporário e renomeia: nunca trunca um hardlink compartilhado
+        # com snapshots anteriores e não deixa arquivo parcial em caso de falha
+        temporario = alvo.with_name(f"{alvo.name}.{uuid.uuid4().hex}.tmp")
+        sha = hashlib.sha256()
+        try:
+            with open(temporario, "wb") as f:
+                # Copia em blocos para evitar carregar tudo em memória
+                while True:
+                    chunk = stream.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    f.write(chunk)
+            os.replace(temporario, alvo)
+        except BaseException:
+            # Download interrompido ou disco cheio: o temporário não pode ficar no snapshot
+            temporario.unlink(missing_ok=True)
+            raise
+        if self.indice is not None:
+            self.indice.registrar(alvo, sha.hexdigest())
+
+    def ler_stream(self, base: str, caminho_relativo: str):
+        return open(Path(base) / caminho_relativo, "rb")
+
+    def ler_faixa(self, base: str, caminho_relativo: str, inicio: int, tamanho: int) -> bytes:
+        with open(Path(base) / caminho_relativo, "rb") as f:
+            f.seek(inicio)
+            return f.read(tamanho)
+
+    def existe(self, base: str, caminho_relativo: str) -> bool:
+        return (Path(base) / caminho_relativo).is_file()
+
+    def vincular(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
+        origem = Path(base_origem) / caminho_relativo
+        destino = Path(base_destino) / caminho_relativo
+        if not origem.is_file():
+            raise FileNotFoundError(str(origem))
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        if destino.exists():
+            destino.unlink()
+        try:
+            # Hardlink: o snapshot novo compartilha o mesmo conteúdo em disco
+            os.link(origem, destino)
+        except OSError:
+            # Sistema de arquivos sem suporte ou volumes diferentes
+            shutil.copy2(origem, destino)
 
     def copiar(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
         origem = Path(base_origem) / caminho_relativo
         destino = Path(base_destino) / caminho_relativo
         destino.parent.mkdir(parents=True, exist_ok=True)
         if origem.exists():
+            sha = hashlib.sha256()
             with open(origem, "rb") as s, open(destino, "wb") as d:
                 while True:
                     chunk = s.read(1024 * 1024)
                     if not chunk:
                         break
-                    d.write(chunk)
\ No newline at end of file
+                    sha.update(chunk)
+                    d.write(chunk)
+            if self.indice is not None:
+                self.indice.registrar(destino, sha.hexdigest())
+
+    def apagar(self, base: str, caminho_relativo: str) -> None:
+        (Path(base) / caminho_relativo).unlink(missing_ok=True)
+        if self.indice is not None:
+            self.indice.remover(Path(base) / caminho_relativo)
+
+    def hash_conteudo(self, base: str, caminho_relativo: str, recalcular: bool = False) -> Optional[str]:
+        # Pelo índice; o arquivo só é lido com 'recalcular' (ausente do índice ou alterado)
+        if self.indice is None:
+            return None
+        return self.indice.obter(Path(base) / caminho_relativo, recalcular=recalcular)
+
+    def listar_prefixo_com_tamanho(self, base: str, prefixo_relativo: str = "") -> Iterator[Tuple[str, int]]:
+        raiz = Path(base)
+        # O prefixo pode terminar no meio de um nome: lista a pasta-mãe e filtra
+        prefixo = prefixo_relativo.replace("\\", "/").lstrip("/")
+        pasta_inicial = prefixo.rpartition("/")[0]
+        pendentes = [raiz / pasta_inicial if pasta_inicial else raiz]
+        while pendentes:
+            try:
+                entradas = os.scandir(pendentes.pop())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entradas:
+                for entrada in entradas:
+                    relativo = Path(entrada.path).relative_to(raiz).as_posix()
+                    if entrada.is_dir(follow_symlinks=False):
+                        if relativo.startswith(prefixo) or prefixo.startswith(relativo + "/"):
+                            pendentes.append(Path(entrada.path))
+                    elif relativo.startswith(prefixo):
+                        yield relativo, entrada.stat(follow_symlinks=False).st_size
+
+    def listar_subdiretorios(self, base: str) -> List[str]:
+        try:
+            with os.scandir(base) as entradas:
+                return sorted(e.name for e in entradas if e.is_dir(follow_symlinks=False))
+        except FileNotFoundError:
+            return []
+
+    def bytes_recuperaveis(self, itens: Iterable[Tuple[str, str, int]]) -> int:
+        # Com hardlinks o espaço só é liberado quando todos os links do inode são apagados
+        links_apagados: Dict[Tuple[int, int], int] = {}
+        links_totais: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        for base, caminho, _ in itens:
+            try:
+                info = os.stat(Path(base) / caminho, follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            inode = (info.st_dev, info.st_ino)
+            links_apagados[inode] = links_apagados.get(inode, 0) + 1
+            links_totais[inode] = (info.st_nlink, info.st_size)
+        return sum(tamanho for inode, (nlink, tamanho) in links_totais.items() if links_apagados[inode] >= nlink)
+
+    def remover_diretorios_vazios(self, base: str) -> None:
+        # Percorre de baixo para cima removendo apenas diretórios vazios
+        for diretorio, _, _ in sorted(os.walk(base), key=lambda t: len(t[0]), reverse=True):
+            try:
+                os.rmdir(diretorio)
+            except OSError:
+                pass
+
+    def existe_lote(self, base: str, caminhos_relativos: Iterable[str]) -> Set[str]:
+        # Uma leitura de diretório (os.scandir) por pasta em vez de um stat por arquivo
+        grupos: Dict[str, List[str]] = {}
+        for caminho in caminhos_relativos:
+            pasta = caminho.replace("\\", "/").rpartition("/")[0]
+            grupos.setdefault(pasta, []).append(caminho)
+        existentes: Set[str] = set()
+        for pasta, caminhos in grupos.items():
+            try:
+                with os.scandir(Path(base) / pasta) as entradas:
+                    arquivos = {e.name for e in entradas if e.is_file()}
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            existentes.update(c for c in caminhos if c.replace("\\", "/").rpartition("/")[2] in arquivos)
+        return existentes
+
+    def apagar_lote(self, base: str, caminhos_relativos: Iterable[str]) -> None:
+        # No disco local a remoção é barata; não compensa usar threads
+        for caminho in caminhos_relativos:
+            self.apagar(base, caminho)
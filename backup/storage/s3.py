@@ -1,7 +1,25 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config as BotoConfig
+from botocore.exceptions import ClientError
 
 from .base import BackendArmazenamento
+from .spool import spool_em_disco
+
+MB = 1024 * 1024
+# Limite de partes de um upload multipart no S3
+MAXIMO_PARTES_S3 = 10000
+# CopyObject só aceita origens de até 5 GB; acima disso é preciso multipart copy
+LIMITE_COPY_OBJECT = 5 * 1024 * MB
+TAMANHO_PARTE_COPIA = 256 * MB
+# DeleteObjects aceita até 1000 chaves por requisição
+MAXIMO_CHAVES_EXCLUSAO = 1000
+# A partir de quantos caminhos na mesma "pasta" o existe_lote lista a pasta em vez de usar HEAD
+LIMIAR_LISTAGEM_EXISTE = 32
 
 # Comentários em Português do Brasil
 # Implementação de backend para Amazon S3 usando boto3.
@@ -9,15 +27,38 @@ from .base import BackendArmazenamento
 
 class ArmazenamentoS3(BackendArmazenamento):
     def __init__(self, nome_bucket: str, regiao: str | None = None,
-                 chave_acesso_id: str | None = None, chave_secreta: str | None = None):
+                 chave_acesso_id: str | None = None, chave_secreta: str | None = None,
+                 tamanho_parte_mb: int = 8, concorrencia_upload: int = 4,
+                 limiar_multipart_mb: int = 8, limiar_spool_mb: int = 0,
+                 diretorio_spool: str | None = None):
         # Cliente S3 com configuração opcional de região e credenciais explícitas
         self.bucket = nome_bucket
+        self.concorrencia_upload = max(1, int(concorrencia_upload))
         self.client = boto3.client(
             "s3",
             region_name=regiao,
             aws_access_key_id=chave_acesso_id,
             aws_secret_access_key=chave_secreta,
-            config=BotoConfig(s3={"addressing_style": "path"}),
+            # Pool de conexões comporta as partes enviadas em paralelo por vários workers
+            config=BotoConfig(s3={"addressing_style": "path"}, max_pool_connections=max(10, self.concorrencia_upload * 4)),
+        )
+        self.tamanho_parte = max(5, int(tamanho_parte_mb)) * MB  # mínimo do S3: 5 MB
+        self.limiar_multipart = max(5, int(limiar_multipart_mb)) * MB
+        # Arquivos a partir deste tamanho vão para disco antes do upload (0 desativa)
+        self.limiar_spool = int(limiar_spool_mb) * MB if limiar_spool_mb else 0
+        self.diretorio_spool = diretorio_spool
+        self.concorrencia_lote = max(self.concorrencia_lote, self.concorrencia_upload * 2)
+
+    def _config_transferencia(self, tamanho: Optional[int]) -> TransferConfig:
+        """Monta o TransferConfig, aumentando a parte se necessário para caber em 10.000 partes."""
+        parte = self.tamanho_parte
+        if tamanho:
+            parte = max(parte, math.ceil(tamanho / MAXIMO_PARTES_S3))
+        return TransferConfig(
+            multipart_threshold=self.limiar_multipart,
+            multipart_chunksize=parte,
+            max_concurrency=self.concorrencia_upload,
+            use_threads=self.concorrencia_upload > 1,
         )
 
     def obter_base_snapshot(self, data_str: str) -> str:
@@ -27,17 +68,159 @@ class ArmazenamentoS3(BackendArmazenamento):
     def obter_base_apagados(self, data_str: str) -> str:
         return f"deleted/{data_str}"
 
-    def escrever_stream(self, base: str, caminho_relativo: str, stream) -> None:
+    def obter_base_blobs(self) -> str:
+        return "blobs"
+
+    def escrever_stream(self, base: str, caminho_relativo: str, stream, tamanho: Optional[int] = None) -> None:
+        chave = f"{base}/{caminho_relativo}".replace("\\", "/")
+        config = self._config_transferencia(tamanho)
+        if self.limiar_spool and tamanho is not None and tamanho >= self.limiar_spool:
+            # Arquivo grande: spool em disco e upload multipart com partes paralelas por faixa,
+            # cada parte podendo ser repetida isoladamente
+            with spool_em_disco(stream, self.diretorio_spool) as caminho_tmp:
+                self.client.upload_file(caminho_tmp, self.bucket, chave, Config=config)
+            return
+        # upload_fileobj aceita stream file-like; requests Response.raw é file-like.
+        # Acima do limiar o boto3 lê partes em sequência e as envia em paralelo.
+        self.client.upload_fileobj(stream, self.bucket, chave, Config=config)
+
+    def ler_stream(self, base: str, caminho_relativo: str):
+        chave = f"{base}/{caminho_relativo}".replace("\\", "/")
+        # StreamingBody expõe read(n) sem carregar o objeto inteiro
+        return self.client.get_object(Bucket=self.bucket, Key=chave)["Body"]
+
+    def ler_faixa(self, base: str, caminho_relativo: str, inicio: int, tamanho: int) -> bytes:
         chave = f"{base}/{caminho_relativo}".replace("\\", "/")
-        # upload_fileobj aceita stream file-like; requests Response.raw é file-like
-        self.client.upload_fileobj(stream, self.bucket, chave)
+        resposta = self.client.get_object(Bucket=self.bucket, Key=chave, Range=f"bytes={inicio}-{inicio + tamanho - 1}")
+        return resposta["Body"].read()
+
+    def existe(self, base: str, caminho_relativo: str) -> bool:
+        chave = f"{base}/{caminho_relativo}".replace("\\", "/")
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=chave)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                return False
+            raise
+
+    def _copiar_objeto(self, chave_origem: str, chave_destino: str) -> None:
+        """Cópia no servidor; objetos acima de 5 GB usam multipart copy (UploadPartCopy)."""
+        fonte = {"Bucket": self.bucket, "Key": chave_origem}
+        try:
+            self.client.copy_object(Bucket=self.bucket, CopySource=fonte, Key=chave_destino)
+            return
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "InvalidRequest":
+                raise
+            tamanho = self.client.head_object(Bucket=self.bucket, Key=chave_origem)["ContentLength"]
+            if tamanho <= LIMITE_COPY_OBJECT:
+                raise
+        self._copiar_multipart(chave_origem, chave_destino, tamanho)
+
+    def _copiar_multipart(self, chave_origem: str, chave_destino: str, tamanho: int) -> None:
+        """Copia um objeto grande em partes (UploadPartCopy) executadas em paralelo no servidor."""
+        fonte = {"Bucket": self.bucket, "Key": chave_origem}
+        parte = max(TAMANHO_PARTE_COPIA, math.ceil(tamanho / MAXIMO_PARTES_S3))
+        faixas = [(inicio, min(inicio + parte, tamanho) - 1) for inicio in range(0, tamanho, parte)]
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=chave_destino)["UploadId"]
+
+        def copiar_parte(indice: int) -> dict:
+            inicio, fim = faixas[indice]
+            resp = self.client.upload_part_copy(
+                Bucket=self.bucket, Key=chave_destino, UploadId=upload_id, PartNumber=indice + 1,
+                CopySource=fonte, CopySourceRange=f"bytes={inicio}-{fim}",
+            )
+            return {"ETag": resp["CopyPartResult"]["ETag"], "PartNumber": indice + 1}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concorrencia_upload) as executor:
+                partes = list(executor.map(copiar_parte, range(len(faixas))))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=chave_destino, UploadId=upload_id, MultipartUpload={"Parts": partes},
+            )
+        except Exception:
+            # Não deixa partes órfãs cobradas no bucket
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=chave_destino, UploadId=upload_id)
+            raise
+
+    def vincular(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
+        chave_origem = f"{base_origem}/{caminho_relativo}".replace("\\", "/")
+        chave_destino = f"{base_destino}/{caminho_relativo}".replace("\\", "/")
+        # Cópia no servidor; erros (ex.: origem ausente) são propagados ao chamador
+        self._copiar_objeto(chave_origem, chave_destino)
 
     def copiar(self, base_origem: str, caminho_relativo: str, base_destino: str) -> None:
         chave_origem = f"{base_origem}/{caminho_relativo}".replace("\\", "/")
         chave_destino = f"{base_destino}/{caminho_relativo}".replace("\\", "/")
-        fonte = {"Bucket": self.bucket, "Key": chave_origem}
         try:
-            self.client.copy_object(Bucket=self.bucket, CopySource=fonte, Key=chave_destino)
+            self._copiar_objeto(chave_origem, chave_destino)
         except Exception:
             # Se não existir ou falhar, não interrompe o fluxo
-            pass
\ No newline at end of file
+            pass
+
+    def apagar(self, base: str, caminho_relativo: str) -> None:
+        chave = f"{base}/{caminho_relativo}".replace("\\", "/")
+        # DeleteObject é idempotente: não falha para chave inexistente
+        self.client.delete_object(Bucket=self.bucket, Key=chave)
+
+    def _listar_chaves(self, prefixo: str, delimitador: Optional[str] = None) -> Iterator[Tuple[str, int]]:
+        """Itera (chave, tamanho) sob o prefixo usando a paginação de ListObjectsV2 (1000 por página)."""
+        parametros = {"Bucket": self.bucket, "Prefix": prefixo}
+        if delimitador:
+            parametros["Delimiter"] = delimitador
+        for pagina in self.client.get_paginator("list_objects_v2").paginate(**parametros):
+            for objeto in pagina.get("Contents", []):
+                yield objeto["Key"], objeto.get("Size", 0)
+
+    def listar_prefixo_com_tamanho(self, base: str, prefixo_relativo: str = "") -> Iterator[Tuple[str, int]]:
+        raiz = base.replace("\\", "/").rstrip("/") + "/"
+        prefixo = raiz + prefixo_relativo.replace("\\", "/").lstrip("/")
+        for chave, tamanho in self._listar_chaves(prefixo):
+            yield chave[len(raiz):], tamanho
+
+    def listar_subdiretorios(self, base: str) -> List[str]:
+        raiz = base.replace("\\", "/").rstrip("/") + "/"
+        nomes: List[str] = []
+        paginas = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=raiz, Delimiter="/")
+        for pagina in paginas:
+            for comum in pagina.get("CommonPrefixes", []):
+                nomes.append(comum["Prefix"][len(raiz):].rstrip("/"))
+        return sorted(nomes)
+
+    def existe_lote(self, base: str, caminhos_relativos: Iterable[str]) -> Set[str]:
+        # Agrupa por "pasta": pastas com muitos caminhos consultados são listadas (1 requisição
+        # a cada 1000 chaves); as demais usam HEAD em paralelo (implementação padrão)
+        grupos: Dict[str, List[str]] = {}
+        for caminho in caminhos_relativos:
+            pasta = caminho.replace("\\", "/").rpartition("/")[0]
+            grupos.setdefault(pasta, []).append(caminho)
+        existentes: Set[str] = set()
+        avulsos: List[str] = []
+        raiz = base.replace("\\", "/").rstrip("/") + "/"
+        for pasta, caminhos in grupos.items():
+            if len(caminhos) < LIMIAR_LISTAGEM_EXISTE:
+                avulsos.extend(caminhos)
+                continue
+            prefixo = raiz + (pasta + "/" if pasta else "")
+            listados = {chave[len(raiz):] for chave, _ in self._listar_chaves(prefixo, "/")}
+            existentes.update(c for c in caminhos if c.replace("\\", "/") in listados)
+        if avulsos:
+            existentes |= super().existe_lote(base, avulsos)
+        return existentes
+
+    def apagar_lote(self, base: str, caminhos_relativos: Iterable[str]) -> None:
+        chaves = [f"{base}/{c}".replace("\\", "/") for c in caminhos_relativos]
+
+        def apagar_bloco(lote: List[str]) -> None:
+            resp = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in lote], "Quiet": True},
+            )
+            erros = resp.get("Errors") or []
+            if erros:
+                raise RuntimeError(f"Falha ao apagar {len(erros)} objeto(s), ex.: {erros[0].get('Key')}")
+
+        # Blocos de até 1000 chaves enviados em paralelo
+        lotes = [chaves[i:i + MAXIMO_CHAVES_EXCLUSAO] for i in range(0, len(chaves), MAXIMO_CHAVES_EXCLUSAO)]
+        self._executar_em_paralelo(apagar_bloco, lotes)
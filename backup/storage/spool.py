@@ -0,0 +1,24 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Comentários em Português do Brasil
+# Spool em disco: copia um stream não posicionável (ex.: resposta HTTP) para um arquivo
+# temporário, permitindo uploads em partes paralelas por faixas de bytes.
+
+
+@contextmanager
+def spool_em_disco(stream, diretorio: Optional[str] = None) -> Iterator[str]:
+    """Grava o stream em um arquivo temporário e fornece seu caminho; remove o arquivo ao final."""
+    fd, caminho = tempfile.mkstemp(prefix="spool-", suffix=".tmp", dir=diretorio)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+        yield caminho
+    finally:
+        try:
+            os.unlink(caminho)
+        except OSError:
+            pass
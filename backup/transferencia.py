@@ -0,0 +1,91 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Comentários em Português do Brasil
+# Pool de transferências concorrentes: o produtor (varredura do Graph) alimenta uma fila
+# limitada e N workers executam download -> gravação no backend. A fila limitada aplica
+# contrapressão, mantendo o uso de memória estável independente do tamanho da biblioteca.
+
+_FIM = object()
+
+
+class PoolTransferencia:
+    """Executa tarefas em N threads a partir de uma fila limitada, coletando resultados por chave.
+
+    Com 'ao_concluir' cada resultado é entregue à função (na thread do worker) em vez de
+    acumulado em memória; 'finalizar' então retorna um dicionário vazio.
+    """
+
+    def __init__(self, num_workers: int = 4, tamanho_fila: int = 64,
+                 ao_concluir: Optional[Callable[[str, Any], None]] = None):
+        self.num_workers = max(1, int(num_workers))
+        self.ao_concluir = ao_concluir
+        self.fila: queue.Queue = queue.Queue(maxsize=max(1, int(tamanho_fila)))
+        self.resultados: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._erro: Optional[BaseException] = None
+        self._cancelado = threading.Event()
+        self._workers: List[threading.Thread] = [
+            threading.Thread(target=self._executar, name=f"transferencia-{i}", daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for w in self._workers:
+            w.start()
+
+    def _executar(self) -> None:
+        """Laço do worker: consome tarefas até receber o sentinela de fim."""
+        while True:
+            tarefa = self.fila.get()
+            try:
+                if tarefa is _FIM:
+                    return
+                if self._cancelado.is_set():
+                    # Após erro/cancelamento apenas drena a fila para não travar o produtor
+                    continue
+                chave, funcao, args = tarefa
+                try:
+                    resultado = funcao(*args)
+                    if resultado is not None and self.ao_concluir is not None:
+                        self.ao_concluir(chave, resultado)
+                        continue
+                except BaseException as e:
+                    with self._lock:
+                        if self._erro is None:
+                            self._erro = e
+                    self._cancelado.set()
+                    continue
+                if resultado is not None:
+                    with self._lock:
+                        self.resultados[chave] = resultado
+            finally:
+                self.fila.task_done()
+
+    def _verificar_erro(self) -> None:
+        if self._erro is not None:
+            raise self._erro
+
+    def enviar(self, chave: str, funcao: Callable, *args) -> None:
+        """Enfileira uma tarefa; bloqueia enquanto a fila estiver cheia (contrapressão).
+
+        Se algum worker já falhou, relança o erro para interromper o produtor.
+        """
+        self._verificar_erro()
+        self.fila.put((chave, funcao, args))
+
+    def _encerrar_workers(self) -> None:
+        for _ in self._workers:
+            self.fila.put(_FIM)
+        for w in self._workers:
+            w.join()
+
+    def finalizar(self) -> Dict[str, Any]:
+        """Aguarda as tarefas pendentes, encerra os workers e retorna os resultados por chave."""
+        self._encerrar_workers()
+        self._verificar_erro()
+        return self.resultados
+
+    def cancelar(self) -> None:
+        """Descarta tarefas pendentes e encerra os workers (usado quando o produtor falha)."""
+        self._cancelado.set()
+        self._encerrar_workers()
@@ -0,0 +1,125 @@
+import tempfile
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+from backup.storage.base import BackendArmazenamento
+from backup.storage.local import ArmazenamentoLocal
+from backup.storage.s3 import ArmazenamentoS3
+
+
+class TestOperacoesEmLoteLocal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.arm = ArmazenamentoLocal(self.tmp.name)
+        self.base = self.arm.obter_base_snapshot("2024-01-01")
+        for caminho in ("Site/Docs/a.txt", "Site/Docs/b.txt", "Site/Outros/c.txt", "Sitex/d.txt"):
+            self.arm.escrever_stream(self.base, caminho, BytesIO(caminho.encode()))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_listar_prefixo(self):
+        self.assertEqual(sorted(self.arm.listar_prefixo(self.base, "Site/")),
+                         ["Site/Docs/a.txt", "Site/Docs/b.txt", "Site/Outros/c.txt"])
+        # Prefixo parcial de nome também casa
+        self.assertEqual(sorted(self.arm.listar_prefixo(self.base, "Site/Docs/a")), ["Site/Docs/a.txt"])
+        self.assertEqual(len(list(self.arm.listar_prefixo(self.base))), 4)
+
+    def test_existe_copiar_e_apagar_lote(self):
+        consultados = ["Site/Docs/a.txt", "Site/Docs/zz.txt", "Nada/x.txt", "Sitex/d.txt"]
+        self.assertEqual(self.arm.existe_lote(self.base, consultados), {"Site/Docs/a.txt", "Sitex/d.txt"})
+
+        destino = self.arm.obter_base_apagados("2024-01-01")
+        self.arm.copiar_lote(self.base, ["Site/Docs/a.txt", "Site/Outros/c.txt"], destino)
+        self.assertEqual((Path(destino) / "Site/Outros/c.txt").read_bytes(), b"Site/Outros/c.txt")
+
+        self.arm.apagar_lote(self.base, ["Site/Docs/a.txt", "Inexistente.txt"])
+        self.assertFalse(self.arm.existe(self.base, "Site/Docs/a.txt"))
+        self.assertTrue(self.arm.existe(self.base, "Site/Docs/b.txt"))
+
+    def test_falha_na_gravacao_nao_deixa_temporario(self):
+        class StreamInterrompido:
+            def __init__(self):
+                self.lidos = 0
+
+            def read(self, n=-1):
+                self.lidos += 1
+                if self.lidos > 2:
+                    raise ConnectionError("download interrompido")
+                return b"x" * 10
+
+        with self.assertRaises(ConnectionError):
+            self.arm.escrever_stream(self.base, "Site/Docs/parcial.txt", StreamInterrompido())
+        self.assertFalse(self.arm.existe(self.base, "Site/Docs/parcial.txt"))
+        self.assertEqual([p.name for p in Path(self.base).rglob("*.tmp")], [])
+        self.assertEqual(len(list(self.arm.listar_prefixo(self.base))), 4)
+
+
+class BackendMemoria(BackendArmazenamento):
+    """Backend mínimo sem operações em lote nativas, para exercitar a implementação padrão."""
+
+    def __init__(self):
+        self.dados = {}
+
+    def obter_base_snapshot(self, data_str):
+        return f"snapshots/{data_str}"
+
+    def obter_base_apagados(self, data_str):
+        return f"deleted/{data_str}"
+
+    def obter_base_blobs(self):
+        return "blobs"
+
+    def escrever_stream(self, base, caminho_relativo, stream, tamanho=None):
+        self.dados[f"{base}/{caminho_relativo}"] = stream.read()
+
+    def copiar(self, base_origem, caminho_relativo, base_destino):
+        origem = self.dados.get(f"{base_origem}/{caminho_relativo}")
+        if origem is not None:
+            self.dados[f"{base_destino}/{caminho_relativo}"] = origem
+
+    def ler_stream(self, base, caminho_relativo):
+        return BytesIO(self.dados[f"{base}/{caminho_relativo}"])
+
+    def existe(self, base, caminho_relativo):
+        return f"{base}/{caminho_relativo}" in self.dados
+
+    def apagar(self, base, caminho_relativo):
+        self.dados.pop(f"{base}/{caminho_relativo}", None)
+
+
+class TestImplementacaoPadrao(unittest.TestCase):
+    def test_operacoes_em_lote_concorrentes(self):
+        arm = BackendMemoria()
+        caminhos = [f"p/{i}.bin" for i in range(50)]
+        for c in caminhos:
+            arm.escrever_stream("a", c, BytesIO(b"x"))
+        arm.copiar_lote("a", caminhos + ["p/ausente.bin"], "b")
+        self.assertEqual(arm.existe_lote("b", caminhos + ["p/ausente.bin"]), set(caminhos))
+        arm.apagar_lote("b", caminhos[:10])
+        self.assertEqual(len(arm.existe_lote("b", caminhos)), 40)
+
+
+class ClienteS3Exclusao:
+    def __init__(self):
+        self.lotes = []
+
+    def delete_objects(self, Bucket, Delete):
+        self.lotes.append([o["Key"] for o in Delete["Objects"]])
+        return {}
+
+
+class TestApagarLoteS3(unittest.TestCase):
+    def test_delete_objects_em_lotes_de_1000(self):
+        s3 = ArmazenamentoS3.__new__(ArmazenamentoS3)
+        s3.bucket = "bucket"
+        s3.client = ClienteS3Exclusao()
+        s3.apagar_lote("snapshots/2024-01-01", [f"f{i}" for i in range(2500)])
+        # Blocos enviados em paralelo: a ordem de chegada não é garantida
+        self.assertEqual(sorted(len(lote) for lote in s3.client.lotes), [500, 1000, 1000])
+        self.assertIn("snapshots/2024-01-01/f0", [k for lote in s3.client.lotes for k in lote])
+
+
+if __name__ == "__main__":
+    unittest.main()
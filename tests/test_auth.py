@@ -0,0 +1,58 @@
+import threading
+import unittest
+
+from backup.auth import ProvedorToken
+
+
+class AppMsalFalso:
+    """Substitui msal.ConfidentialClientApplication contando as aquisições de token."""
+
+    def __init__(self, expires_in=3600):
+        self.expires_in = expires_in
+        self.aquisicoes = 0
+        self.remocoes = 0
+
+    def acquire_token_for_client(self, scopes):
+        self.aquisicoes += 1
+        return {"access_token": f"token-{self.aquisicoes}", "expires_in": self.expires_in}
+
+    def remove_tokens_for_client(self):
+        self.remocoes += 1
+
+
+class TestProvedorToken(unittest.TestCase):
+    def setUp(self):
+        self.agora = 0.0
+        self.app = AppMsalFalso()
+        self.provedor = ProvedorToken("t", "c", "s", margem_renovacao=300, relogio=lambda: self.agora, app=self.app)
+
+    def test_token_servido_da_memoria(self):
+        self.assertEqual(self.provedor(), "token-1")
+        self.agora = 3000
+        self.assertEqual(self.provedor(), "token-1")
+        self.assertEqual(self.app.aquisicoes, 1)
+
+    def test_renova_antes_de_expirar(self):
+        self.provedor()
+        self.agora = 3301  # dentro da margem de 5 minutos
+        self.assertEqual(self.provedor(), "token-2")
+
+    def test_invalidar_forca_novo_token(self):
+        self.provedor()
+        self.provedor.invalidar()
+        self.assertEqual(self.provedor(), "token-2")
+        self.assertEqual(self.app.remocoes, 1)
+
+    def test_uso_concorrente_adquire_uma_vez(self):
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(self.provedor())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(set(tokens), {"token-1"})
+        self.assertEqual(self.app.aquisicoes, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import shutil
+import json
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from backup import cas, graph_mock
+from backup.runner import executar_backup, graph as graph_real
+from backup.config import ConfigAplicativo
+from backup.storage.local import ArmazenamentoLocal
+
+
+ARQUIVO_ID = graph_mock.ARQUIVO_MOCK["id"]
+
+
+class TestArmazenamentoDeduplicado(unittest.TestCase):
+    def setUp(self):
+        self.dir_saida = Path("backups_mock_cas")
+        self.dir_restauro = Path("restauro_mock_cas")
+        for d in (self.dir_saida, self.dir_restauro):
+            if d.exists():
+                shutil.rmtree(d)
+        self.dir_estado = Path("state")
+        if self.dir_estado.exists():
+            shutil.rmtree(self.dir_estado)
+
+        self.cfg = ConfigAplicativo(
+            tenant_id="TENANT-MOCK",
+            client_id="CLIENT-MOCK",
+            client_secret="SECRET-MOCK",
+            backup_dir=str(self.dir_saida),
+            modo_snapshot="deduplicado",
+        )
+        self.backend = ArmazenamentoLocal(self.cfg.backup_dir)
+
+        import backup.runner as runner_mod
+        runner_mod.graph = graph_mock
+        self.provedor_token_original = runner_mod.ProvedorToken
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+        self.baixar_original = graph_mock.baixar_stream_conteudo_item
+
+    def tearDown(self):
+        import backup.runner as runner_mod
+        runner_mod.graph = graph_real
+        runner_mod.ProvedorToken = self.provedor_token_original
+        graph_mock.baixar_stream_conteudo_item = self.baixar_original
+        for d in (self.dir_saida, self.dir_restauro, self.dir_estado):
+            if d.exists():
+                shutil.rmtree(d)
+
+    def test_snapshot_vira_manifesto_e_restaura_arvore(self):
+        executar_backup(self.cfg, self.backend)
+
+        blobs = [p for p in (self.dir_saida / "blobs").rglob("*") if p.is_file()]
+        self.assertEqual(len(blobs), 1)
+        self.assertTrue(blobs[0].relative_to(self.dir_saida / "blobs").as_posix().startswith("quickxor/"))
+
+        base = (self.dir_estado / "latest_snapshot.txt").read_text(encoding="utf-8")
+        arquivos_snapshot = [p.name for p in Path(base).rglob("*") if p.is_file()]
+        self.assertEqual(arquivos_snapshot, [cas.NOME_MANIFESTO_CAS])
+
+        destino = ArmazenamentoLocal(str(self.dir_restauro))
+        total = cas.restaurar_snapshot(self.backend, base, destino, str(self.dir_restauro))
+        self.assertEqual(total, 1)
+        restaurado = self.dir_restauro / "SiteMock" / "DriveMock" / "docs" / "relatorio.txt"
+        self.assertEqual(restaurado.read_bytes(), b"Conteudo de teste do relatorio.")
+
+    def test_blob_existente_nao_e_baixado_novamente(self):
+        executar_backup(self.cfg, self.backend)
+        # Sem manifesto anterior, a deduplicação depende apenas do hash informado pelo Graph
+        shutil.rmtree(self.dir_estado)
+
+        def download_proibido(drive_id, item_id, token):
+            raise AssertionError("Blob já armazenado não deveria ser baixado")
+
+        graph_mock.baixar_stream_conteudo_item = download_proibido
+        executar_backup(self.cfg, self.backend)
+
+    def test_apagados_do_dia_somados_ao_manifesto_existente(self):
+        executar_backup(self.cfg, self.backend)
+        data = Path((self.dir_estado / "latest_snapshot.txt").read_text(encoding="utf-8")).name
+        base_apagados = self.backend.obter_base_apagados(data)
+        # Apagado registrado por uma execução anterior do mesmo dia, ainda no formato JSON antigo
+        anterior = {"id-antigo": {"path": "SiteMock/DriveMock/velho.txt", "blob": "sha256/aa/x-1", "size": 1}}
+        self.backend.escrever_stream(base_apagados, cas.NOME_MANIFESTO_CAS_LEGADO,
+                                     BytesIO(json.dumps(anterior).encode("utf-8")))
+        listar_original = graph_mock.listar_filhos_paginado
+
+        def listar_sem_arquivo(drive_id, item_id, token):
+            return (f for f in listar_original(drive_id, item_id, token) if f["id"] != ARQUIVO_ID)
+
+        with mock.patch.object(graph_mock, "listar_filhos_paginado", listar_sem_arquivo):
+            executar_backup(self.cfg, self.backend)
+
+        apagados = dict(cas.iterar_manifesto(self.backend, base_apagados))
+        self.assertEqual(sorted(apagados), sorted(["id-antigo", ARQUIVO_ID]))
+        self.assertEqual(apagados[ARQUIVO_ID]["path"], "SiteMock/DriveMock/docs/relatorio.txt")
+        self.assertFalse(self.backend.existe(base_apagados, cas.NOME_MANIFESTO_CAS_LEGADO))
+        self.assertFalse(any(p.name.startswith("apagados_cas") for p in self.dir_estado.iterdir()))
+
+    def test_gravar_blob_calculando_hash_deduplica(self):
+        chave1 = cas.gravar_blob_calculando_hash(self.backend, BytesIO(b"abc"))
+        chave2 = cas.gravar_blob_calculando_hash(self.backend, BytesIO(b"abc"))
+        self.assertEqual(chave1, chave2)
+        self.assertTrue(chave1.startswith("sha256/ba/"))
+        self.assertTrue(chave1.endswith("-3"))
+        self.assertTrue(self.backend.existe(self.backend.obter_base_blobs(), chave1))
+
+    def test_manifesto_lido_em_blocos_pequenos(self):
+        entradas = {f"id{i}": {"path": f"Site/Drive/relatório {i}.txt", "blob": f"sha256/aa/{i}-1", "size": i}
+                    for i in range(50)}
+        base = self.backend.obter_base_snapshot("2024-01-01")
+        cas.salvar_manifesto(self.backend, base, entradas)
+        # Blocos de poucos bytes partem linhas, números e caracteres UTF-8 multibyte
+        with mock.patch.object(cas, "_TAMANHO_BLOCO_LEITURA", 5):
+            self.assertEqual(list(cas.iterar_manifesto(self.backend, base)), list(entradas.items()))
+
+    def test_manifesto_json_antigo_continua_legivel(self):
+        entradas = {"a": {"path": "Site/Drive/ç.txt", "blob": "sha256/aa/a-12", "size": 12},
+                    "b": {"path": "Site/Drive/b.txt", "blob": "sha256/bb/b-3", "size": 3}}
+        base = self.backend.obter_base_snapshot("2024-01-01")
+        self.backend.escrever_stream(base, cas.NOME_MANIFESTO_CAS_LEGADO,
+                                     BytesIO(json.dumps(entradas, indent=1, ensure_ascii=False).encode("utf-8")))
+        self.assertTrue(cas.existe_manifesto(self.backend, base))
+        with mock.patch.object(cas, "_TAMANHO_BLOCO_LEITURA", 3):
+            self.assertEqual(list(cas.iterar_manifesto(self.backend, base)), list(entradas.items()))
+
+        # Regravar converte para JSONL e remove o arquivo antigo
+        cas.salvar_manifesto(self.backend, base, dict(cas.iterar_manifesto(self.backend, base)))
+        self.assertFalse(self.backend.existe(base, cas.NOME_MANIFESTO_CAS_LEGADO))
+        self.assertEqual(dict(cas.iterar_manifesto(self.backend, base)), entradas)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -46,6 +46,14 @@ class TestConfigEnvFallback(unittest.TestCase):
         self.assertEqual(cfg.snapshot_diario, False)
         self.assertEqual(cfg.sites, ["siteA", "siteB"])
 
+    def test_metricas_pelo_env_com_prefixo(self):
+        os.environ.update({"TENANT_ID": "T", "CLIENT_ID": "C", "CLIENT_SECRET": "S",
+                           "METRICAS_PROGRESSO": "json", "METRICAS_PERFIL": "cprofile",
+                           "METRICAS_ARQUIVO_PROMETHEUS": "backup.prom", "PROGRESSO": "barra"})
+        cfg = carregar_configuracao()
+        self.assertEqual((cfg.metricas.progresso, cfg.metricas.perfil, cfg.metricas.arquivo_prometheus),
+                         ("json", "cprofile", "backup.prom"))
+
     def test_sem_arquivo_sem_env_erro(self):
         # Sem arquivo e sem env obrigatórios deve gerar FileNotFoundError
         with self.assertRaises(FileNotFoundError):
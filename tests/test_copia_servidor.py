@@ -0,0 +1,71 @@
+import threading
+import unittest
+
+from botocore.exceptions import ClientError
+
+from backup.storage.s3 import ArmazenamentoS3, LIMITE_COPY_OBJECT, TAMANHO_PARTE_COPIA
+
+
+class ClienteS3Falso:
+    """Simula o cliente boto3: CopyObject recusa origens acima de 5 GB."""
+
+    def __init__(self, tamanho: int):
+        self.tamanho = tamanho
+        self.faixas = []
+        self.concluido = None
+        self.abortado = False
+        self._lock = threading.Lock()
+
+    def copy_object(self, **kwargs):
+        if self.tamanho > LIMITE_COPY_OBJECT:
+            raise ClientError({"Error": {"Code": "InvalidRequest", "Message": "too large"}}, "CopyObject")
+        return {}
+
+    def head_object(self, **kwargs):
+        return {"ContentLength": self.tamanho}
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "up-1"}
+
+    def upload_part_copy(self, **kwargs):
+        with self._lock:
+            self.faixas.append((kwargs["PartNumber"], kwargs["CopySourceRange"]))
+        return {"CopyPartResult": {"ETag": f"etag-{kwargs['PartNumber']}"}}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.concluido = kwargs["MultipartUpload"]["Parts"]
+
+    def abort_multipart_upload(self, **kwargs):
+        self.abortado = True
+
+
+def _armazenamento(cliente) -> ArmazenamentoS3:
+    s3 = ArmazenamentoS3.__new__(ArmazenamentoS3)
+    s3.bucket = "bucket"
+    s3.client = cliente
+    s3.concorrencia_upload = 4
+    return s3
+
+
+class TestCopiaServidorS3(unittest.TestCase):
+    def test_objeto_pequeno_usa_copy_object(self):
+        cliente = ClienteS3Falso(1024)
+        _armazenamento(cliente).vincular("snapshots/a", "x.txt", "snapshots/b")
+        self.assertEqual(cliente.faixas, [])
+        self.assertIsNone(cliente.concluido)
+
+    def test_objeto_acima_de_5gb_usa_multipart_copy(self):
+        tamanho = LIMITE_COPY_OBJECT + TAMANHO_PARTE_COPIA + 10
+        cliente = ClienteS3Falso(tamanho)
+        _armazenamento(cliente).vincular("snapshots/a", "grande.bin", "snapshots/b")
+        faixas = dict(cliente.faixas)
+        self.assertEqual(len(faixas), 22)
+        self.assertEqual(faixas[1], f"bytes=0-{TAMANHO_PARTE_COPIA - 1}")
+        self.assertEqual(faixas[22], f"bytes={21 * TAMANHO_PARTE_COPIA}-{tamanho - 1}")
+        # Partes concluídas em ordem, independentemente da ordem de execução
+        self.assertEqual([p["PartNumber"] for p in cliente.concluido], list(range(1, 23)))
+        self.assertFalse(cliente.abortado)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import shutil
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+
+from backup.runner import executar_backup, graph as graph_real
+from backup import graph_mock
+from backup.config import ConfigAplicativo
+from backup.manifesto import ArmazemManifesto
+from backup.storage.local import ArmazenamentoLocal
+
+
+class TestBackupDelta(unittest.TestCase):
+    def setUp(self):
+        # Diretório isolado para testes
+        self.dir_saida = Path("backups_mock_delta")
+        if self.dir_saida.exists():
+            shutil.rmtree(self.dir_saida)
+        self.dir_saida.mkdir(parents=True, exist_ok=True)
+        self.dir_estado = Path("state")
+        if self.dir_estado.exists():
+            shutil.rmtree(self.dir_estado)
+
+        self.cfg = ConfigAplicativo(
+            tenant_id="TENANT-MOCK",
+            client_id="CLIENT-MOCK",
+            client_secret="SECRET-MOCK",
+            backup_backend="local",
+            backup_dir=str(self.dir_saida),
+            sites=[],
+            modo_delta=True,
+        )
+        self.backend = ArmazenamentoLocal(self.cfg.backup_dir)
+
+        # Monkeypatch do módulo graph e do token no runner
+        import backup.runner as runner_mod
+        runner_mod.graph = graph_mock
+        self.provedor_token_original = runner_mod.ProvedorToken
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+        self.delta_original = graph_mock.listar_delta_paginado
+        self.hoje = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def tearDown(self):
+        import backup.runner as runner_mod
+        runner_mod.graph = graph_real
+        runner_mod.ProvedorToken = self.provedor_token_original
+        graph_mock.listar_delta_paginado = self.delta_original
+        if self.dir_saida.exists():
+            shutil.rmtree(self.dir_saida)
+        if self.dir_estado.exists():
+            shutil.rmtree(self.dir_estado)
+
+    def test_primeira_execucao_grava_delta_link(self):
+        executar_backup(self.cfg, self.backend)
+
+        caminho = self.dir_saida / "snapshots" / self.hoje / "SiteMock" / "DriveMock" / "docs" / "relatorio.txt"
+        self.assertTrue(caminho.exists(), f"Arquivo esperado não foi criado: {caminho}")
+        estado = __import__("json").loads((self.dir_estado / "latest_delta.json").read_text(encoding="utf-8"))
+        self.assertEqual(estado["drive-mock"]["deltaLink"], "delta-mock-1")
+
+    def test_remocao_no_delta_copia_para_apagados(self):
+        executar_backup(self.cfg, self.backend)
+
+        chamadas = []
+
+        def delta_com_remocao(drive_id, token, delta_link=None):
+            chamadas.append(delta_link)
+            yield {"value": [{"id": "file-1", "deleted": {}}], "@odata.deltaLink": "delta-mock-2"}
+
+        graph_mock.listar_delta_paginado = delta_com_remocao
+        executar_backup(self.cfg, self.backend)
+
+        self.assertEqual(chamadas, ["delta-mock-1"])
+        apagado = self.dir_saida / "deleted" / self.hoje / "SiteMock" / "DriveMock" / "docs" / "relatorio.txt"
+        self.assertTrue(apagado.exists(), "Item apagado não foi copiado para deleted/.")
+        manifesto = ArmazemManifesto(self.dir_estado / "latest_manifest.sqlite")
+        self.assertNotIn("file-1", manifesto)
+        manifesto.fechar()
+
+    def test_pasta_apagada_remove_descendentes(self):
+        executar_backup(self.cfg, self.backend)
+
+        def delta_pasta_removida(drive_id, token, delta_link=None):
+            yield {"value": [{"id": "folder-docs", "deleted": {}}], "@odata.deltaLink": "delta-mock-3"}
+
+        graph_mock.listar_delta_paginado = delta_pasta_removida
+        executar_backup(self.cfg, self.backend)
+
+        apagado = self.dir_saida / "deleted" / self.hoje / "SiteMock" / "DriveMock" / "docs" / "relatorio.txt"
+        self.assertTrue(apagado.exists(), "Descendente de pasta apagada não foi copiado para deleted/.")
+
+
+if __name__ == "__main__":
+    unittest.main()
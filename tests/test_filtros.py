@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+import backup.runner as runner_mod
+from backup.config import ConfigAplicativo, ConfigFiltros, ConfigMetricas
+from backup.filtros import FiltroItens
+from backup.graph_sintetico import GraphSintetico, ParametrosArvore
+from backup.runner import executar_backup
+from backup.storage.local import ArmazenamentoLocal
+
+
+class TestFiltroItens(unittest.TestCase):
+    def test_exclusao_por_nome_e_por_caminho(self):
+        filtro = FiltroItens(excluir=["*.mp4", "~$*", "Site/Docs/Arquivo Morto/**"])
+        self.assertFalse(filtro.arquivo_incluido("Site/Docs/video.MP4", 10))
+        self.assertFalse(filtro.arquivo_incluido("Site/Docs/~$plano.docx", 10))
+        self.assertTrue(filtro.arquivo_incluido("Site/Docs/plano.docx", 10))
+        self.assertTrue(filtro.pasta_excluida("Site/Docs/arquivo morto"))
+        self.assertFalse(filtro.pasta_excluida("Outro/Docs/Arquivo Morto"))
+        self.assertFalse(filtro.caminho_incluido("Site/Docs/Arquivo Morto/2019/a.txt", 1))
+
+    def test_inclusao_e_tamanho_maximo(self):
+        filtro = FiltroItens(incluir=["*.docx", "*.xlsx"], tamanho_maximo=100)
+        self.assertTrue(filtro.arquivo_incluido("S/D/a.docx", 100))
+        self.assertFalse(filtro.arquivo_incluido("S/D/a.docx", 101))
+        self.assertFalse(filtro.arquivo_incluido("S/D/a.pdf", 1))
+        # Inclusões não podam pastas
+        self.assertFalse(filtro.pasta_excluida("S/D/pasta"))
+        self.assertFalse(FiltroItens().ativo)
+
+    def test_inclusao_de_pasta_com_glob(self):
+        for padrao in ("Site/Drive/docs/**", "Site/Drive/docs/*", "Site/Drive/docs"):
+            with self.subTest(padrao=padrao):
+                filtro = FiltroItens(incluir=[padrao])
+                self.assertTrue(filtro.arquivo_incluido("Site/Drive/docs/a.txt", 1))
+                self.assertTrue(filtro.arquivo_incluido("Site/Drive/Docs/sub/b.txt", 1))
+                self.assertFalse(filtro.arquivo_incluido("Site/Drive/outros/a.txt", 1))
+                self.assertFalse(filtro.arquivo_incluido("Site/Drive/docs.txt", 1))
+
+
+class GraphRegistrandoListagens(GraphSintetico):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pastas_listadas = []
+
+    def listar_filhos_em_lote(self, drive_id, item_ids, token, tamanho_lote=20):
+        self.pastas_listadas.extend(item_ids)
+        return super().listar_filhos_em_lote(drive_id, item_ids, token, tamanho_lote)
+
+
+class TestVarreduraFiltrada(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        raiz = Path(self.tmp.name)
+        self.arm = ArmazenamentoLocal(str(raiz / "backups"))
+        self.cfg = ConfigAplicativo(
+            tenant_id="t", client_id="c", client_secret="s", backup_dir=str(raiz / "backups"),
+            diretorio_estado=str(raiz / "state"), metricas=ConfigMetricas(progresso="desligado"),
+            filtros=ConfigFiltros(excluir=["Site000/Documentos000/pasta-001", "arquivo-00002.bin"], tamanho_maximo_mb=1),
+        )
+        self.graph = GraphRegistrandoListagens(ParametrosArvore(
+            profundidade=2, pastas_por_pasta=2, arquivos_por_pasta=3, distribuicao="fixo", tamanho_medio=10))
+        self.originais = (runner_mod.graph, runner_mod.ProvedorToken)
+        runner_mod.graph = self.graph
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+
+    def tearDown(self):
+        runner_mod.graph, runner_mod.ProvedorToken = self.originais
+        self.tmp.cleanup()
+
+    def _arquivos_no_snapshot(self):
+        base = Path(self.arm.obter_base_snapshot(runner_mod._data_execucao()))
+        return sorted(str(p.relative_to(base)).replace("\\", "/") for p in base.rglob("*") if p.is_file())
+
+    def test_pasta_excluida_nao_e_listada(self):
+        executar_backup(self.cfg, self.arm)
+        # Raiz, pasta-000 e suas duas subpastas; pasta-001 e descendentes nunca são listados
+        self.assertEqual(sorted(p.split(":")[-1] for p in self.graph.pastas_listadas), ["", "0", "0.0", "0.1"])
+        arquivos = self._arquivos_no_snapshot()
+        self.assertEqual(len(arquivos), 4 * 2)
+        self.assertIn("Site000/Documentos000/pasta-000/pasta-001/arquivo-00000.bin", arquivos)
+        self.assertFalse(any(a.endswith("arquivo-00002.bin") for a in arquivos))
+
+    def test_modo_delta_aplica_filtros_aos_ancestrais(self):
+        executar_backup(replace(self.cfg, modo_delta=True), self.arm)
+        arquivos = self._arquivos_no_snapshot()
+        self.assertEqual(len(arquivos), 4 * 2)
+        self.assertFalse(any(a.startswith("Site000/Documentos000/pasta-001/") for a in arquivos))
+
+    def test_tamanho_maximo(self):
+        self.graph.p.tamanho_medio = 2 * 1024 * 1024
+        executar_backup(self.cfg, self.arm)
+        self.assertEqual(self._arquivos_no_snapshot(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import unittest
+
+import requests
+
+from backup.graph import GRAPH_URL_BASE
+from backup.graph_assincrono import ClienteGraphAssincrono, GraphAssincrono, httpx
+
+
+class TransporteRoteiro:
+    """Transporte httpx falso (MockTransport) que devolve respostas pré-definidas, em ordem."""
+
+    def __init__(self, roteiro):
+        self.roteiro = list(roteiro)
+        self.requisicoes = []
+        self.transporte = httpx.MockTransport(self._responder)
+
+    def _responder(self, request):
+        self.requisicoes.append(request)
+        status, headers, corpo = self.roteiro.pop(0)
+        if isinstance(corpo, dict):
+            corpo = json.dumps(corpo).encode("utf-8")
+        return httpx.Response(status, headers=headers, content=corpo)
+
+
+@unittest.skipUnless(httpx, "requer httpx")
+class TestClienteGraphAssincrono(unittest.TestCase):
+    def _executar(self, roteiro, corrotina, **kwargs):
+        """Executa 'corrotina(api)' num laço novo; retorna (resultado, transporte, esperas, cliente)."""
+        transporte = TransporteRoteiro(roteiro)
+        esperas = []
+
+        async def dormir(segundos):
+            esperas.append(segundos)
+
+        async def principal():
+            cliente = ClienteGraphAssincrono(transporte=transporte.transporte, dormir=dormir, **kwargs)
+            try:
+                return await corrotina(GraphAssincrono(cliente)), cliente
+            finally:
+                await cliente.fechar()
+
+        resultado, cliente = asyncio.run(principal())
+        return resultado, transporte, esperas, cliente
+
+    def test_respeita_retry_after_em_429(self):
+        resultado, transporte, esperas, cliente = self._executar([
+            (429, {"Retry-After": "7"}, b""),
+            (200, {}, {"id": "raiz"}),
+        ], lambda api: api.obter_id_raiz_do_drive("d1", "TOKEN"))
+        self.assertEqual(resultado, "raiz")
+        self.assertEqual(esperas, [7.0])
+        self.assertEqual(transporte.requisicoes[0].headers["Authorization"], "Bearer TOKEN")
+        self.assertEqual(cliente.estatisticas(), {"requisicoes": 2, "retentativas": 1, "throttling": 1})
+
+    def test_erro_nao_transitorio_lanca_http_error(self):
+        with self.assertRaises(requests.HTTPError):
+            self._executar([(404, {}, b"")], lambda api: api.obter_id_raiz_do_drive("d1", "TOKEN"))
+
+    def test_listagem_segue_next_link(self):
+        url_proxima = f"{GRAPH_URL_BASE}/drives/d1/items/a/children?$skiptoken=2"
+
+        async def listar(api):
+            return [item["id"] async for item in api.listar_filhos_paginado("d1", "a", "TOKEN")]
+
+        ids, transporte, _, _ = self._executar([
+            (200, {}, {"value": [{"id": "1"}, {"id": "2"}], "@odata.nextLink": url_proxima}),
+            (503, {}, b""),
+            (200, {}, {"value": [{"id": "3"}]}),
+        ], listar)
+        self.assertEqual(ids, ["1", "2", "3"])
+        self.assertEqual([str(r.url) for r in transporte.requisicoes[1:]], [url_proxima, url_proxima])
+
+    def test_download_em_stream_devolve_a_vaga_ao_fechar(self):
+        corpo = bytes(range(256)) * 40
+
+        async def baixar(api):
+            resposta = await api.abrir_download("d1", "i1", "TOKEN")
+            semaforo = next(iter(api.cliente._semaforos.values()))
+            ocupadas = api.cliente.conexoes_por_host - semaforo._value
+            blocos = [bloco async for bloco in resposta.iterar_bytes(1000)]
+            await resposta.fechar()
+            return blocos, ocupadas, api.cliente.conexoes_por_host - semaforo._value
+
+        (blocos, ocupadas, apos_fechar), transporte, _, _ = self._executar([(200, {}, corpo)], baixar)
+        self.assertEqual(b"".join(blocos), corpo)
+        self.assertTrue(all(len(b) <= 1000 for b in blocos))
+        self.assertEqual((ocupadas, apos_fechar), (1, 0))
+        self.assertEqual(transporte.requisicoes[0].headers["Accept-Encoding"], "identity")
+
+    def test_download_redirecionado_ocupa_a_vaga_do_host_final(self):
+        url_download = "https://contoso.sharepoint.com/_layouts/15/download.aspx?tempauth=x"
+
+        async def baixar(api):
+            resposta = await api.abrir_download("d1", "i1", "TOKEN")
+            livres = {host: s._value for host, s in api.cliente._semaforos.items()}
+            dados = b"".join([bloco async for bloco in resposta.iterar_bytes()])
+            await resposta.fechar()
+            return dados, livres
+
+        (dados, livres), transporte, _, _ = self._executar([
+            (302, {"Location": url_download}, b""),
+            (200, {}, b"conteudo"),
+        ], baixar, conexoes_por_host=2)
+        self.assertEqual(dados, b"conteudo")
+        self.assertEqual(livres, {"graph.microsoft.com": 2, "contoso.sharepoint.com": 1})
+        self.assertEqual(str(transporte.requisicoes[1].url), url_download)
+        self.assertNotIn("Authorization", transporte.requisicoes[1].headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
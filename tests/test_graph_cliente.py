@@ -0,0 +1,322 @@
+import io
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import requests
+from requests.adapters import BaseAdapter
+
+from backup import graph
+from backup.graph import ClienteGraph
+from backup.limitador import LimitadorAdaptativo
+
+
+class AdaptadorRoteiro(BaseAdapter):
+    """Adaptador HTTP falso que devolve respostas pré-definidas, em ordem."""
+
+    def __init__(self, roteiro):
+        super().__init__()
+        self.roteiro = list(roteiro)
+        self.requisicoes = []
+
+    def send(self, request, **kwargs):
+        self.requisicoes.append(request)
+        status, headers, corpo = self.roteiro.pop(0)
+        r = requests.Response()
+        r.status_code = status
+        r.headers.update(headers)
+        r._content = corpo
+        r.url = request.url
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+
+class TestClienteGraph(unittest.TestCase):
+    def _cliente(self, roteiro, **kwargs):
+        esperas = []
+        cliente = ClienteGraph(dormir=esperas.append, **kwargs)
+        adaptador = AdaptadorRoteiro(roteiro)
+        cliente.sessao.mount("https://", adaptador)
+        return cliente, adaptador, esperas
+
+    def test_respeita_retry_after_em_429(self):
+        cliente, adaptador, esperas = self._cliente([
+            (429, {"Retry-After": "7"}, b""),
+            (200, {}, b'{"value": []}'),
+        ])
+        self.assertEqual(cliente.obter_json("https://graph.test/x", "TOKEN"), {"value": []})
+        self.assertEqual(esperas, [7.0])
+        self.assertEqual(adaptador.requisicoes[0].headers["Authorization"], "Bearer TOKEN")
+        self.assertEqual(cliente.estatisticas(), {"requisicoes": 2, "retentativas": 1, "throttling": 1})
+
+    def test_retry_after_longo_respeitado_por_inteiro(self):
+        roteiro = [(429, {"Retry-After": "120"}, b""), (200, {}, b"{}")]
+        cliente, _, esperas = self._cliente(roteiro, backoff_max=60.0)
+        cliente.obter_json("https://graph.test/x", "TOKEN")
+        self.assertEqual(esperas, [120.0])
+        # Teto explícito, independente do backoff
+        cliente, _, esperas = self._cliente(roteiro, backoff_max=60.0, retry_after_max=90.0)
+        cliente.obter_json("https://graph.test/x", "TOKEN")
+        self.assertEqual(esperas, [90.0])
+
+    def test_backoff_exponencial_limitado(self):
+        cliente, _, esperas = self._cliente([
+            (503, {}, b""),
+            (503, {}, b""),
+            (200, {}, b"{}"),
+        ], backoff_base=1.0, backoff_max=1.5)
+        cliente.obter_json("https://graph.test/x", "TOKEN")
+        self.assertEqual(len(esperas), 2)
+        self.assertTrue(all(0 <= e <= 1.5 for e in esperas))
+
+    def test_erro_nao_transitorio_nao_e_repetido(self):
+        cliente, adaptador, esperas = self._cliente([(404, {}, b"")])
+        with self.assertRaises(requests.HTTPError):
+            cliente.obter_json("https://graph.test/x", "TOKEN")
+        self.assertEqual(len(adaptador.requisicoes), 1)
+        self.assertEqual(esperas, [])
+
+    def test_tentativas_esgotadas_lanca_erro(self):
+        cliente, adaptador, _ = self._cliente([(429, {"Retry-After": "1"}, b"")] * 3, max_tentativas=3)
+        with self.assertRaises(requests.HTTPError):
+            cliente.obter_json("https://graph.test/x", "TOKEN")
+        self.assertEqual(len(adaptador.requisicoes), 3)
+
+    def test_401_renova_token_do_provedor(self):
+        class Provedor:
+            def __init__(self):
+                self.atual = "antigo"
+
+            def __call__(self):
+                return self.atual
+
+            def invalidar(self):
+                self.atual = "novo"
+
+        cliente, adaptador, esperas = self._cliente([(401, {}, b""), (200, {}, b"{}")])
+        cliente.obter_json("https://graph.test/x", Provedor())
+        self.assertEqual([r.headers["Authorization"] for r in adaptador.requisicoes], ["Bearer antigo", "Bearer novo"])
+        self.assertEqual(esperas, [])
+
+    def test_limitador_reduz_taxa_e_espaca_a_retentativa(self):
+        relogio = [100.0]
+        limitador = LimitadorAdaptativo(taxa_inicial=10, relogio=lambda: relogio[0])
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            relogio[0] += segundos
+
+        cliente = ClienteGraph(dormir=dormir, limitador=limitador)
+        cliente.sessao.mount("https://", AdaptadorRoteiro([
+            (429, {"Retry-After": "7"}, b""),
+            (200, {}, b"{}"),
+        ]))
+        cliente.obter_json("https://graph.test/x", "TOKEN")
+        # Retry-After e, depois da pausa, o ritmo da taxa reduzida (5 req/s)
+        self.assertEqual(esperas, [7.0, 0.2])
+        estatisticas = cliente.estatisticas()
+        self.assertEqual(estatisticas["taxa_limite"], 5.0)
+        self.assertEqual(estatisticas["reducoes_taxa"], 1)
+
+    def test_download_pede_conteudo_sem_compressao(self):
+        cliente, adaptador, _ = self._cliente([(200, {}, b"dados")])
+        cliente.obter_stream("https://graph.test/content", "TOKEN")
+        self.assertEqual(adaptador.requisicoes[0].headers["Accept-Encoding"], "identity")
+
+
+
+class TestListagemEmLote(unittest.TestCase):
+    def setUp(self):
+        self.cliente_original = graph._cliente_padrao
+
+    def tearDown(self):
+        graph.configurar_cliente(self.cliente_original)
+
+    def test_lote_segue_next_link_e_repete_throttling(self):
+        url_proxima = f"{graph.GRAPH_URL_BASE}/drives/d1/items/a/children?$skiptoken=2"
+        roteiro = [
+            (200, {}, json.dumps({"responses": [
+                {"id": "0", "status": 200, "body": {"value": [{"id": "a1"}], "@odata.nextLink": url_proxima}},
+                {"id": "1", "status": 429, "headers": {"Retry-After": "3"}, "body": {}},
+            ]}).encode()),
+            (200, {}, json.dumps({"responses": [
+                {"id": "0", "status": 200, "body": {"value": [{"id": "a2"}]}},
+                {"id": "1", "status": 200, "body": {"value": [{"id": "b1"}]}},
+            ]}).encode()),
+        ]
+        esperas = []
+        cliente = ClienteGraph(dormir=esperas.append)
+        adaptador = AdaptadorRoteiro(roteiro)
+        cliente.sessao.mount("https://", adaptador)
+        graph.configurar_cliente(cliente)
+
+        pares = list(graph.listar_filhos_em_lote("d1", ["a", "b"], "TOKEN"))
+
+        self.assertEqual(sorted((p, f["id"]) for p, f in pares), [("a", "a1"), ("a", "a2"), ("b", "b1")])
+        self.assertEqual(len(adaptador.requisicoes), 2)
+        self.assertEqual(esperas, [3.0])
+        segundo_lote = json.loads(adaptador.requisicoes[1].body)["requests"]
+        self.assertEqual(segundo_lote[0]["url"], "/drives/d1/items/a/children?$skiptoken=2")
+        self.assertEqual(segundo_lote[1]["url"], "/drives/d1/items/b/children")
+
+    def test_retry_after_em_data_http_no_lote(self):
+        data_http = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        corpo_lote = {"responses": [
+            {"id": "0", "status": 200, "body": {"id": "r0"}},
+            {"id": "1", "status": 429, "headers": {"Retry-After": data_http}, "body": {}},
+        ]}
+        roteiro = [
+            (200, {}, json.dumps(corpo_lote).encode()),
+            (200, {}, json.dumps({"id": "r1"}).encode()),
+        ]
+        esperas = []
+        cliente = ClienteGraph(dormir=esperas.append, backoff_max=60.0)
+        cliente.sessao.mount("https://", AdaptadorRoteiro(roteiro))
+        graph.configurar_cliente(cliente)
+
+        self.assertEqual(graph.obter_ids_raiz_em_lote(["d0", "d1"], "TOKEN"), {"d0": "r0", "d1": "r1"})
+        self.assertEqual(len(esperas), 1)
+        self.assertAlmostEqual(esperas[0], 30.0, delta=2.0)
+
+
+class AdaptadorFaixas(BaseAdapter):
+    """Servidor falso de downloadUrl que atende cabeçalhos Range; a primeira faixa falha uma vez.
+
+    A partir de 'recusar_de', o Range é ignorado ('200', arquivo inteiro) ou respondido com outra
+    faixa ('206').
+    """
+
+    def __init__(self, conteudo, recusar_de=None, recusa="200"):
+        super().__init__()
+        self.conteudo = conteudo
+        self.recusar_de = recusar_de
+        self.recusa = recusa
+        self.falhou = False
+        self.faixas = []
+
+    def _responder(self, request, status, corpo, headers=None):
+        r = requests.Response()
+        r.request = request
+        r.url = request.url
+        r.status_code = status
+        r.headers.update(headers or {})
+        r.raw = io.BytesIO(corpo)
+        return r
+
+    def send(self, request, **kwargs):
+        total = len(self.conteudo)
+        if "Range" not in request.headers:
+            self.faixas.append((None, None, "Authorization" in request.headers))
+            return self._responder(request, 200, self.conteudo)
+        inicio, fim = (int(x) for x in request.headers["Range"].split("=")[1].split("-"))
+        self.faixas.append((inicio, fim, "Authorization" in request.headers))
+        if inicio == 0 and not self.falhou:
+            self.falhou = True
+            return self._responder(request, 503, b"")
+        if self.recusar_de is not None and inicio >= self.recusar_de:
+            if self.recusa == "200":
+                return self._responder(request, 200, self.conteudo)
+            return self._responder(request, 206, self.conteudo, {"Content-Range": f"bytes 0-{total - 1}/{total}"})
+        return self._responder(request, 206, self.conteudo[inicio:fim + 1],
+                               {"Content-Range": f"bytes {inicio}-{fim}/{total}"})
+
+    def close(self):
+        pass
+
+
+class TestDownloadEmFaixas(unittest.TestCase):
+    conteudo = bytes(range(256)) * 40  # 10240 bytes
+
+    def _baixar(self, adaptador, conexoes=3):
+        cliente = ClienteGraph(dormir=lambda s: None)
+        cliente.sessao.mount("https://", adaptador)
+        download = graph.DownloadEmFaixas(lambda: "https://download.test/arquivo", len(self.conteudo),
+                                          tamanho_faixa=1000, conexoes=conexoes, cliente=cliente)
+        lido = bytearray()
+        while True:
+            bloco = download.raw.read(777)
+            if not bloco:
+                break
+            lido += bloco
+        download.close()
+        return bytes(lido), cliente
+
+    def test_reagrupa_faixas_em_ordem_com_retentativa(self):
+        adaptador = AdaptadorFaixas(self.conteudo)
+        lido, cliente = self._baixar(adaptador)
+        self.assertEqual(lido, self.conteudo)
+        # 11 faixas + 1 retentativa (a do próprio cliente); URL pré-autenticada não recebe Authorization
+        self.assertEqual(len(adaptador.faixas), 12)
+        self.assertEqual(cliente.estatisticas()["retentativas"], 1)
+        self.assertFalse(any(auth for _, _, auth in adaptador.faixas))
+
+    def test_range_recusado_passa_para_stream_unico(self):
+        for recusar_de in (0, 3000):
+            for recusa in ("200", "206"):
+                with self.subTest(recusar_de=recusar_de, recusa=recusa):
+                    adaptador = AdaptadorFaixas(self.conteudo, recusar_de=recusar_de, recusa=recusa)
+                    lido, _ = self._baixar(adaptador, conexoes=1)
+                    self.assertEqual(lido, self.conteudo)
+                    self.assertEqual(adaptador.faixas[-1], (None, None, False))
+
+
+class TestEnvioArquivo(unittest.TestCase):
+    def setUp(self):
+        self.cliente_original = graph._cliente_padrao
+
+    def tearDown(self):
+        graph.configurar_cliente(self.cliente_original)
+
+    def _configurar(self, roteiro):
+        cliente = ClienteGraph(dormir=lambda s: None)
+        adaptador = AdaptadorRoteiro(roteiro)
+        cliente.sessao.mount("https://", adaptador)
+        graph.configurar_cliente(cliente)
+        return adaptador
+
+    def test_arquivo_pequeno_usa_put_simples(self):
+        adaptador = self._configurar([(201, {}, b'{"id": "novo"}')])
+        item = graph.enviar_arquivo("d1", "Pasta/a b.txt", io.BytesIO(b"abc"), 3, "TOKEN")
+        self.assertEqual(item, {"id": "novo"})
+        requisicao = adaptador.requisicoes[0]
+        self.assertEqual(requisicao.method, "PUT")
+        self.assertTrue(requisicao.url.endswith("/drives/d1/root:/Pasta/a%20b.txt:/content"))
+        self.assertEqual(requisicao.body, b"abc")
+
+    def test_sessao_de_upload_em_fragmentos_com_retomada(self):
+        fragmento = graph.MULTIPLO_FRAGMENTO_UPLOAD
+        conteudo = bytes(range(256)) * (fragmento * 2 // 256) + b"fim"
+        total = len(conteudo)
+        adaptador = self._configurar([
+            (200, {}, b'{"uploadUrl": "https://upload.test/sessao"}'),
+            (202, {}, b"{}"),
+            # Segundo fragmento: falha transitória e, na nova tentativa, o servidor já o tinha recebido
+            (503, {}, b""),
+            (416, {}, b""),
+            (200, {}, json.dumps({"nextExpectedRanges": [f"{fragmento * 2}-"]}).encode()),
+            (201, {}, b'{"id": "grande"}'),
+        ])
+        item = graph.enviar_arquivo("d1", "grande.bin", io.BytesIO(conteudo), total, "TOKEN",
+                                    limiar_sessao=1024, tamanho_fragmento=fragmento + 1000)
+        self.assertEqual(item, {"id": "grande"})
+        criacao, *fragmentos = adaptador.requisicoes
+        self.assertTrue(criacao.url.endswith("/drives/d1/root:/grande.bin:/createUploadSession"))
+        puts = [r for r in fragmentos if r.method == "PUT"]
+        self.assertEqual([r.headers["Content-Range"] for r in puts], [
+            f"bytes 0-{fragmento - 1}/{total}",
+            f"bytes {fragmento}-{fragmento * 2 - 1}/{total}",
+            f"bytes {fragmento}-{fragmento * 2 - 1}/{total}",
+            f"bytes {fragmento * 2}-{total - 1}/{total}",
+        ])
+        # A uploadUrl é pré-autenticada
+        self.assertFalse(any("Authorization" in r.headers for r in fragmentos))
+        self.assertEqual(puts[0].body + puts[1].body + puts[3].body, conteudo)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from backup.benchmark import ResultadoBenchmark, comparar_com_linha_base, executar_benchmark
+from backup.graph_sintetico import GraphSintetico, ParametrosArvore
+
+
+class TestGraphSintetico(unittest.TestCase):
+    def setUp(self):
+        self.p = ParametrosArvore(sites=2, drives_por_site=2, profundidade=2, pastas_por_pasta=2,
+                                  arquivos_por_pasta=3, tamanho_pagina=4, distribuicao="uniforme")
+
+    def _arquivos_do_drive(self, graph, id_drive):
+        arquivos, pendentes = [], [graph.obter_id_raiz_do_drive(id_drive, "T")]
+        while pendentes:
+            for _, filho in graph.listar_filhos_em_lote(id_drive, [pendentes.pop()], "T"):
+                if filho.get("folder") is not None:
+                    pendentes.append(filho["id"])
+                else:
+                    arquivos.append(filho)
+        return arquivos
+
+    def test_arvore_deterministica(self):
+        graph = GraphSintetico(self.p)
+        sites = graph.resolver_sites("T", [])
+        drives = graph.listar_drives_do_site(sites[1]["id"], "T")
+        self.assertEqual((len(sites), len(drives)), (2, 2))
+        self.assertEqual(graph.resolver_sites("T", ["Site001"]), [sites[1]])
+        arquivos = self._arquivos_do_drive(graph, drives[0]["id"])
+        # Raiz + 2 pastas + 4 subpastas, 3 arquivos em cada
+        self.assertEqual(len(arquivos), self.p.arquivos_por_drive)
+        self.assertEqual(self.p.arquivos_por_drive, 21)
+        self.assertEqual(self.p.total_arquivos, 84)
+        # Mesmo ID, mesmo tamanho e conteúdo em outra instância
+        outro = self._arquivos_do_drive(GraphSintetico(self.p), drives[0]["id"])
+        self.assertEqual([a["size"] for a in arquivos], [a["size"] for a in outro])
+        item = arquivos[5]
+        conteudo = graph.baixar_stream_conteudo_item(drives[0]["id"], item["id"], "T").raw.read()
+        self.assertEqual(len(conteudo), item["size"])
+        self.assertEqual(conteudo, GraphSintetico(self.p).baixar_stream_conteudo_item("d", item["id"], "T").raw.read())
+
+    def test_delta_paginado_e_sem_alteracoes(self):
+        graph = GraphSintetico(self.p)
+        paginas = list(graph.listar_delta_paginado("drive-000-000", "T"))
+        itens = [i for p in paginas for i in p["value"]]
+        # 1 raiz + 6 pastas + 21 arquivos em páginas de 4
+        self.assertEqual(len(itens), 28)
+        self.assertEqual(len(paginas), 7)
+        link = paginas[-1]["@odata.deltaLink"]
+        self.assertEqual(list(graph.listar_delta_paginado("drive-000-000", "T", link))[0]["value"], [])
+        # Nova geração: tudo volta como alterado
+        self.assertEqual(len(list(GraphSintetico(self.p, geracao=2).listar_delta_paginado("drive-000-000", "T", link))), 7)
+
+    def test_latencia_e_throttling_injetados(self):
+        esperas = []
+        p = ParametrosArvore(latencia_s=0.01, taxa_throttling=1.0, retry_after_s=2.0)
+        graph = GraphSintetico(p, dormir=esperas.append)
+        graph.obter_id_raiz_do_drive("d", "T")
+        self.assertEqual(esperas, [0.01, 2.01])
+        self.assertEqual(graph.estatisticas(), {"requisicoes": 2, "retentativas": 1, "throttling": 1})
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_execucao_completa_e_incremental_no_backend_local(self):
+        p = ParametrosArvore(drives_por_site=2, profundidade=1, pastas_por_pasta=2, arquivos_por_pasta=5,
+                             distribuicao="fixo", tamanho_medio=1000)
+        completa, incremental = executar_benchmark("local", p)
+        self.assertIsNone(completa.erro)
+        self.assertEqual((completa.itens, completa.bytes), (30, 30000))
+        self.assertIn("graph.listar_filhos_em_lote", completa.latencias)
+        # Nada mudou: tudo reaproveitado do snapshot anterior, sem download
+        self.assertEqual((incremental.itens, incremental.bytes), (30, 0))
+
+    def test_regressao_acima_da_tolerancia(self):
+        base = [{"backend": "local", "execucao": "completa", "itens_por_s": 100.0, "mb_por_s": 10.0,
+                 "pico_rss_mb": 50.0, "erro": None}]
+        atual = [ResultadoBenchmark("local", "completa", itens_por_s=85.0, mb_por_s=7.0, pico_rss_mb=70.0)]
+        regressoes = comparar_com_linha_base(atual, base, tolerancia=0.2)
+        self.assertEqual(len(regressoes), 2)
+        self.assertTrue(regressoes[0].startswith("local/completa: mb_por_s"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+import backup.runner as runner_mod
+from backup import cas
+from backup.config import ConfigAplicativo, ConfigMetricas
+from backup.graph_sintetico import GraphSintetico, ParametrosArvore, StreamSintetico
+from backup.runner import executar_backup
+from backup.storage.local import ArmazenamentoLocal
+
+
+class GraphComSha256(GraphSintetico):
+    """Itens com 'sha256Hash', como o Graph informa em parte dos tenants."""
+
+    def _arquivo(self, id_drive, caminho, indice):
+        item = super()._arquivo(id_drive, caminho, indice)
+        conteudo = StreamSintetico(item["id"], item["size"]).read()
+        item["file"] = {"hashes": {"sha256Hash": hashlib.sha256(conteudo).hexdigest().upper()}}
+        return item
+
+
+class TestIndiceHashesLocal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.arm = ArmazenamentoLocal(self.tmp.name)
+        self.base = self.arm.obter_base_snapshot("2024-01-01")
+
+    def tearDown(self):
+        self.arm.indice.fechar()
+        self.tmp.cleanup()
+
+    def test_hash_sem_reler_arquivos_inalterados(self):
+        self.arm.escrever_stream(self.base, "a/b.txt", io.BytesIO(b"conteudo"))
+        esperado = hashlib.sha256(b"conteudo").hexdigest()
+        self.assertEqual(self.arm.hash_conteudo(self.base, "a/b.txt"), esperado)
+        # Hardlink no snapshot seguinte: encontrado pelo inode
+        outra = self.arm.obter_base_snapshot("2024-01-02")
+        self.arm.vincular(self.base, "a/b.txt", outra)
+        self.assertEqual(self.arm.hash_conteudo(outra, "a/b.txt"), esperado)
+        self.assertEqual(self.arm.indice.estatisticas(),
+                         {"hashes_do_indice": 2, "hashes_ausentes": 0, "hashes_recalculados": 0})
+
+        # Alterado por fora do backend: tamanho/mtime mudam e o hash só é recalculado a pedido
+        caminho = Path(self.base) / "a" / "b.txt"
+        caminho.write_bytes(b"outro conteudo")
+        self.assertIsNone(self.arm.hash_conteudo(self.base, "a/b.txt"))
+        self.assertEqual(self.arm.hash_conteudo(self.base, "a/b.txt", recalcular=True),
+                         hashlib.sha256(b"outro conteudo").hexdigest())
+        self.assertEqual(self.arm.hash_conteudo(self.base, "a/b.txt"), hashlib.sha256(b"outro conteudo").hexdigest())
+        self.assertEqual(self.arm.indice.estatisticas(),
+                         {"hashes_do_indice": 3, "hashes_ausentes": 1, "hashes_recalculados": 1})
+        self.arm.apagar(self.base, "a/b.txt")
+        self.assertIsNone(self.arm.hash_conteudo(self.base, "a/b.txt"))
+
+    def test_indice_persistente_e_serializavel(self):
+        self.arm.escrever_stream(self.base, "x.bin", io.BytesIO(b"x" * 10))
+        copia = pickle.loads(pickle.dumps(self.arm))
+        self.assertEqual(copia.hash_conteudo(self.base, "x.bin"), hashlib.sha256(b"x" * 10).hexdigest())
+        self.assertEqual(copia.indice.estatisticas()["hashes_recalculados"], 0)
+        copia.indice.fechar()
+
+    def test_chaves_relativas_a_raiz(self):
+        cwd = os.getcwd()
+        try:
+            # backup_dir relativo: as chaves não dependem do diretório de trabalho
+            os.chdir(self.tmp.name)
+            relativo = ArmazenamentoLocal("backups")
+            base_relativa = relativo.obter_base_snapshot("2024-01-01")
+            relativo.escrever_stream(base_relativa, "a/b.txt", io.BytesIO(b"conteudo"))
+            relativo.indice.fechar()
+        finally:
+            os.chdir(cwd)
+        absoluto = ArmazenamentoLocal(str(Path(self.tmp.name) / "backups"))
+        with closing(sqlite3.connect(str(absoluto.indice.caminho))) as conexao:
+            self.assertEqual(conexao.execute("SELECT caminho FROM arquivos").fetchall(),
+                             [("snapshots/2024-01-01/a/b.txt",)])
+        base = absoluto.obter_base_snapshot("2024-01-01")
+        self.assertEqual(absoluto.hash_conteudo(base, "a/b.txt"), hashlib.sha256(b"conteudo").hexdigest())
+        absoluto.apagar(base, "a/b.txt")
+        self.assertEqual(absoluto.indice._abrir().execute("SELECT COUNT(*) FROM arquivos").fetchone(), (0,))
+        absoluto.indice.fechar()
+
+    def test_verificar_blobs(self):
+        base_blobs = self.arm.obter_base_blobs()
+        for dados in (b"um", b"dois"):
+            chave = cas.chave_blob("sha256", hashlib.sha256(dados).hexdigest(), len(dados))
+            self.arm.escrever_stream(base_blobs, chave, io.BytesIO(dados))
+        resultado = cas.verificar_blobs(self.arm)
+        self.assertEqual((resultado.blobs, resultado.hashes_conferidos, resultado.divergentes), (2, 2, []))
+        # Mesmo tamanho, conteúdo diferente: detectado pelo hash, relido mesmo fora do índice
+        (Path(base_blobs) / chave).write_bytes(b"tres")
+        self.assertEqual(cas.verificar_blobs(self.arm).divergentes, [chave])
+        self.arm.indice.fechar()
+        (Path(self.tmp.name) / "indice_hashes.sqlite").unlink()
+        self.assertEqual(cas.verificar_blobs(self.arm).divergentes, [chave])
+
+
+class TestDeduplicacaoPeloIndice(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        raiz = Path(self.tmp.name)
+        self.parametros = ParametrosArvore(profundidade=1, pastas_por_pasta=2, arquivos_por_pasta=3,
+                                           distribuicao="fixo", tamanho_medio=100)
+        self.originais = (runner_mod.graph, runner_mod.ProvedorToken, runner_mod._data_execucao)
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+        self.arm = ArmazenamentoLocal(str(raiz / "backups"))
+        self.cfg = ConfigAplicativo(
+            tenant_id="t", client_id="c", client_secret="s", backup_dir=str(raiz / "backups"),
+            diretorio_estado=str(raiz / "state"), metricas=ConfigMetricas(progresso="desligado"),
+        )
+
+    def tearDown(self):
+        runner_mod.graph, runner_mod.ProvedorToken, runner_mod._data_execucao = self.originais
+        if self.arm.indice is not None:
+            self.arm.indice.fechar()
+        self.tmp.cleanup()
+
+    def _executar(self, graph, data):
+        runner_mod.graph = graph
+        runner_mod._data_execucao = lambda: data
+        executar_backup(self.cfg, self.arm)
+        resumo = json.loads((Path(self.cfg.diretorio_estado) / runner_mod.NOME_RESUMO).read_text(encoding="utf-8"))
+        return resumo["metricas"]
+
+    def _inodes(self, data):
+        base = Path(self.arm.obter_base_snapshot(data))
+        return {p.relative_to(base): os.stat(p).st_ino for p in base.rglob("*") if p.is_file()}
+
+    def test_conteudo_igual_com_tags_novas_vira_hardlink(self):
+        self._executar(GraphSintetico(self.parametros, geracao=1), "2024-01-01")
+        metricas = self._executar(GraphSintetico(self.parametros, geracao=2), "2024-01-02")
+        total = self.parametros.total_arquivos
+        self.assertEqual((metricas["arquivos_baixados"], metricas["arquivos_deduplicados"]), (total, total))
+        self.assertEqual(self._inodes("2024-01-01"), self._inodes("2024-01-02"))
+
+    def test_indice_ausente_nao_rele_o_snapshot_anterior(self):
+        self._executar(GraphSintetico(self.parametros, geracao=1), "2024-01-01")
+        self.arm.indice.fechar()
+        (Path(self.cfg.backup_dir) / "indice_hashes.sqlite").unlink()
+        metricas = self._executar(GraphSintetico(self.parametros, geracao=2), "2024-01-02")
+        self.assertEqual((metricas["arquivos_baixados"], metricas["arquivos_deduplicados"]),
+                         (self.parametros.total_arquivos, 0))
+        self.assertEqual(self.arm.indice.estatisticas()["hashes_recalculados"], 0)
+
+    def test_sha256_do_graph_evita_o_download(self):
+        self._executar(GraphComSha256(self.parametros, geracao=1), "2024-01-01")
+        metricas = self._executar(GraphComSha256(self.parametros, geracao=2), "2024-01-02")
+        self.assertEqual(metricas["arquivos_baixados"], 0)
+        self.assertEqual(metricas["arquivos_reaproveitados"], self.parametros.total_arquivos)
+        self.assertEqual(self._inodes("2024-01-01"), self._inodes("2024-01-02"))
+
+    def test_indice_desativado(self):
+        self.arm = ArmazenamentoLocal(self.cfg.backup_dir, indice_hashes=False)
+        self.assertIsNone(self.arm.hash_conteudo(self.arm.obter_base_snapshot("2024-01-01"), "x"))
+        self._executar(GraphSintetico(self.parametros), "2024-01-01")
+        self.assertFalse((Path(self.cfg.backup_dir) / "indice_hashes.sqlite").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
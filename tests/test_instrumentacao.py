@@ -0,0 +1,102 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from backup.instrumentacao import HistogramaLatencia, RegistroTempos, envolver, perfilar
+
+
+class Alvo:
+    def __init__(self):
+        self.invalidado = False
+
+    def somar(self, a, b):
+        return a + b
+
+    def paginas(self, n):
+        for i in range(n):
+            yield i
+
+    def falhar(self):
+        raise IOError("falha")
+
+    def __call__(self):
+        return "token"
+
+    async def dormir(self):
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def paginas_assincronas(self, n):
+        for i in range(n):
+            yield i
+
+
+class TestHistogramaLatencia(unittest.TestCase):
+    def test_percentis_aproximados(self):
+        h = HistogramaLatencia()
+        for _ in range(90):
+            h.registrar(0.001)
+        for _ in range(10):
+            h.registrar(0.1)
+        resumo = h.resumo()
+        self.assertEqual(resumo["chamadas"], 100)
+        # Erro relativo do bucket logarítmico abaixo de 9%
+        self.assertAlmostEqual(resumo["p50_ms"], 1.0, delta=0.09)
+        self.assertAlmostEqual(resumo["p95_ms"], 100.0, delta=9.0)
+        self.assertEqual(resumo["max_ms"], 100.0)
+        self.assertLessEqual(resumo["p99_ms"], resumo["max_ms"])
+
+    def test_vazio(self):
+        self.assertEqual(HistogramaLatencia().resumo()["p99_ms"], 0.0)
+
+
+class TestProxyMedido(unittest.TestCase):
+    def test_mede_chamadas_geradores_e_excecoes(self):
+        registro = RegistroTempos()
+        proxy = envolver(Alvo(), registro, "alvo")
+        self.assertEqual(proxy.somar(1, 2), 3)
+        self.assertEqual(list(proxy.paginas(3)), [0, 1, 2])
+        self.assertEqual(proxy(), "token")
+        with self.assertRaises(IOError):
+            proxy.falhar()
+        self.assertFalse(proxy.invalidado)
+        resumo = registro.resumo()
+        self.assertEqual({nome: r["chamadas"] for nome, r in resumo.items()},
+                         {"alvo.somar": 1, "alvo.paginas": 1, "alvo": 1, "alvo.falhar": 1})
+
+    def test_mede_corrotinas_e_geradores_assincronos(self):
+        registro = RegistroTempos()
+        proxy = envolver(Alvo(), registro, "alvo")
+
+        async def usar():
+            return await proxy.dormir(), [i async for i in proxy.paginas_assincronas(2)]
+
+        self.assertEqual(asyncio.run(usar()), ("ok", [0, 1]))
+        resumo = registro.resumo()
+        # O tempo da corrotina inclui a espera, não apenas a criação do objeto
+        self.assertGreaterEqual(resumo["alvo.dormir"]["max_ms"], 9.0)
+        self.assertEqual(resumo["alvo.paginas_assincronas"]["chamadas"], 1)
+
+    def test_token_fixo_nao_e_envolvido(self):
+        self.assertEqual(envolver("T", RegistroTempos(), "auth.token"), "T")
+
+
+class TestPerfilar(unittest.TestCase):
+    def test_cprofile_grava_relatorios(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            diretorio = Path(tmp) / "perfil"
+            with perfilar("cprofile", diretorio, "-shard-001"):
+                sum(range(1000))
+            nomes = sorted(p.suffix for p in diretorio.iterdir())
+            self.assertEqual(nomes, [".prof", ".txt"])
+            self.assertTrue(all(p.stem.endswith("-shard-001") for p in diretorio.iterdir()))
+
+    def test_modo_invalido(self):
+        with self.assertRaises(ValueError):
+            with perfilar("gprof", Path(".")):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
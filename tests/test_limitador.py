@@ -0,0 +1,72 @@
+import unittest
+
+from backup.limitador import LimitadorAdaptativo
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestLimitadorAdaptativo(unittest.TestCase):
+    def _limitador(self, **kwargs):
+        relogio = Relogio()
+        return LimitadorAdaptativo(relogio=relogio, **kwargs), relogio
+
+    def test_rajada_de_um_segundo_e_depois_ritmo_da_taxa(self):
+        limitador, _ = self._limitador(taxa_inicial=10)
+        esperas = [limitador.reservar() for _ in range(12)]
+        self.assertEqual(esperas[:10], [0.0] * 10)
+        self.assertAlmostEqual(esperas[10], 0.1)
+        self.assertAlmostEqual(esperas[11], 0.2)
+
+    def test_throttling_reduz_uma_vez_por_episodio_e_pausa_todos(self):
+        limitador, relogio = self._limitador(taxa_inicial=40, taxa_minima=5)
+        for _ in range(3):
+            limitador.registrar_throttling(2.0)
+        self.assertEqual(limitador.taxa_atual, 20)
+        self.assertAlmostEqual(limitador.reservar(), 2.0 + 1 / 20)
+        relogio.agora += 3.0
+        limitador.registrar_throttling(None)
+        relogio.agora += 3.0
+        limitador.registrar_throttling(None)
+        self.assertEqual(limitador.taxa_atual, 5)
+        self.assertEqual(limitador.estatisticas()["reducoes_taxa"], 3)
+
+    def test_aumento_aditivo_apenas_quando_o_limite_e_o_gargalo(self):
+        limitador, relogio = self._limitador(taxa_inicial=10, taxa_maxima=13, incremento=2, intervalo_aumento=1)
+        relogio.agora += 5
+        limitador.registrar_sucesso()
+        # Sem espera no período: a taxa não sobe à toa
+        self.assertEqual(limitador.taxa_atual, 10)
+        for _ in range(11):
+            limitador.reservar()
+        limitador.registrar_sucesso()
+        self.assertEqual(limitador.taxa_atual, 12)
+        limitador.reservar()
+        limitador.registrar_sucesso()
+        # Menos de um intervalo desde o último aumento
+        self.assertEqual(limitador.taxa_atual, 12)
+        relogio.agora += 1
+        for _ in range(20):
+            limitador.reservar()
+        limitador.registrar_sucesso()
+        self.assertEqual(limitador.taxa_atual, 13)
+
+    def test_aumento_so_depois_da_pausa(self):
+        limitador, relogio = self._limitador(taxa_inicial=10, intervalo_aumento=1)
+        limitador.registrar_throttling(5.0)
+        limitador.reservar()
+        relogio.agora += 5.5
+        limitador.registrar_sucesso()
+        self.assertEqual(limitador.taxa_atual, 5)
+        relogio.agora += 1
+        limitador.registrar_sucesso()
+        self.assertEqual(limitador.taxa_atual, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
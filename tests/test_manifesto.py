@@ -0,0 +1,59 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from backup.manifesto import (ArmazemManifesto, NOME_MANIFESTO, abrir_manifesto_anterior, criar_manifesto_novo,
+                              publicar_manifesto)
+
+
+class TestArmazemManifesto(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_grava_consulta_e_detecta_apagados_por_anti_join(self):
+        anterior = criar_manifesto_novo(self.dir / "anterior.sqlite")
+        for i in range(5):
+            anterior.gravar(f"item-{i}", {"path": f"d/{i}.txt", "driveId": "drive-a" if i < 3 else "drive-b"})
+        atual = criar_manifesto_novo(self.dir / "atual.sqlite")
+        for i in (0, 2, 4, 9):
+            atual.gravar(f"item-{i}", {"path": f"d/{i}.txt"})
+
+        self.assertEqual(anterior.obter("item-1")["path"], "d/1.txt")
+        self.assertIsNone(anterior.obter("inexistente"))
+        self.assertEqual([i for i, _ in anterior.itens_do_drive("drive-b")], ["item-3", "item-4"])
+        self.assertEqual([(i, e["path"]) for i, e in anterior.ausentes_em(atual)],
+                         [("item-1", "d/1.txt"), ("item-3", "d/3.txt")])
+        self.assertEqual(len(atual), 4)
+
+        publicar_manifesto(atual, self.dir / NOME_MANIFESTO)
+        anterior.fechar()
+        reaberto = abrir_manifesto_anterior(self.dir)
+        self.assertIn("item-9", reaberto)
+        reaberto.fechar()
+
+    def test_migra_manifesto_json_legado(self):
+        legado = {"file-1": {"path": "a/b.txt", "driveId": "drive-a", "cTag": "c1"}}
+        (self.dir / "latest_manifest.json").write_text(json.dumps(legado), encoding="utf-8")
+        manifesto = abrir_manifesto_anterior(self.dir)
+        self.assertEqual(manifesto.obter("file-1")["cTag"], "c1")
+        manifesto.fechar()
+        self.assertFalse((self.dir / "latest_manifest.json").exists())
+        self.assertTrue((self.dir / NOME_MANIFESTO).exists())
+
+    def test_sem_estado_anterior_retorna_manifesto_vazio(self):
+        manifesto = abrir_manifesto_anterior(self.dir)
+        self.assertEqual(len(manifesto), 0)
+        atual = ArmazemManifesto(self.dir / "atual.sqlite")
+        atual.gravar("x", {"path": "x"})
+        self.assertEqual(list(manifesto.ausentes_em(atual)), [])
+        atual.fechar()
+        manifesto.fechar()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import tempfile
+import unittest
+from collections import Counter
+from dataclasses import replace
+from pathlib import Path
+
+import backup.runner as runner_mod
+from backup.config import ConfigAplicativo, ConfigGraph, ConfigMetricas
+from backup.graph_sintetico import GraphSintetico, ParametrosArvore
+from backup.metadados import CacheMetadados, NOME_CACHE
+from backup.runner import executar_backup
+from backup.storage.local import ArmazenamentoLocal
+
+
+class RelogioFalso:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+class GraphContandoMetadados(GraphSintetico):
+    """Conta as chamadas de metadados (sites, drives e raízes)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chamadas = Counter()
+
+    def resolver_sites(self, token, sites_cfg):
+        self.chamadas["sites"] += 1
+        return super().resolver_sites(token, sites_cfg)
+
+    def listar_drives_do_site(self, site_id, token):
+        self.chamadas["drives"] += 1
+        return super().listar_drives_do_site(site_id, token)
+
+    def obter_ids_raiz_em_lote(self, drive_ids, token, tamanho_lote=20):
+        self.chamadas["raizes"] += len(drive_ids)
+        return super().obter_ids_raiz_em_lote(drive_ids, token, tamanho_lote)
+
+    def obter_id_raiz_do_drive(self, drive_id, token):
+        self.chamadas["raizes"] += 1
+        return super().obter_id_raiz_do_drive(drive_id, token)
+
+
+class TestCacheMetadados(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.caminho = Path(self.tmp.name) / NOME_CACHE
+        self.relogio = RelogioFalso()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _cache(self, **kwargs):
+        return CacheMetadados(self.caminho, 100, relogio=self.relogio, sortear=lambda: 1.0, **kwargs)
+
+    def test_validade_persistencia_e_renovacao(self):
+        cache = self._cache()
+        cache.gravar("raiz:d1", "r1")
+        cache.salvar()
+        self.assertEqual(self._cache().obter("raiz:d1"), "r1")
+        # --atualizar-metadados ignora o que foi gravado
+        self.assertIsNone(self._cache(renovar=True).obter("raiz:d1"))
+        self.relogio.agora += 101
+        self.assertIsNone(self._cache().obter("raiz:d1"))
+
+    def test_validade_sorteada_e_limite_de_entradas(self):
+        cache = CacheMetadados(self.caminho, 100, max_entradas=1, relogio=self.relogio, sortear=lambda: 0.0)
+        cache.gravar("a", 1)
+        self.relogio.agora += 10
+        cache.gravar("b", 2)
+        # Validade mínima de 75% do TTL
+        self.relogio.agora += 64
+        self.assertEqual(cache.obter("a"), 1)
+        self.relogio.agora += 2
+        self.assertIsNone(cache.obter("a"))
+        cache.salvar()
+        recarregado = CacheMetadados(self.caminho, 100, relogio=self.relogio)
+        self.assertEqual((recarregado.obter("a"), recarregado.obter("b")), (None, 2))
+
+    def test_execucao_diaria_seguinte_aproveita_o_cache(self):
+        padrao = ConfigGraph()
+        cache = CacheMetadados(self.caminho, padrao.cache_metadados_horas * 3600, relogio=self.relogio,
+                               sortear=lambda: 0.0)
+        cache.gravar("raiz:d1", "r1")
+        cache.salvar()
+        # Validade mínima sorteada, com a execução seguinte uma hora mais tarde que a anterior
+        self.relogio.agora += 25 * 3600
+        self.assertEqual(CacheMetadados(self.caminho, padrao.cache_metadados_horas * 3600,
+                                        relogio=self.relogio).obter("raiz:d1"), "r1")
+
+    def test_renovacao_completa_periodica(self):
+        cache = self._cache(renovacao_completa_s=250)
+        cache.gravar("raiz:d1", "r1")
+        cache.salvar()
+        # Entradas regravadas ao vencer não adiam a renovação completa
+        for _ in range(2):
+            self.relogio.agora += 101
+            cache = self._cache(renovacao_completa_s=250)
+            self.assertIsNone(cache.obter("raiz:d1"))
+            cache.gravar("raiz:d1", "r1")
+            cache.salvar()
+        self.assertEqual(self._cache(renovacao_completa_s=250).obter("raiz:d1"), "r1")
+        self.relogio.agora += 48
+        self.assertIsNone(self._cache(renovacao_completa_s=250).obter("raiz:d1"))
+        self.assertEqual(self._cache().obter("raiz:d1"), "r1")
+
+    def test_arquivo_corrompido_ou_invalidado(self):
+        self.caminho.write_text("{nao e json", encoding="utf-8")
+        cache = self._cache()
+        self.assertIsNone(cache.obter("raiz:d1"))
+        cache.gravar("raiz:d1", "r1")
+        cache.salvar()
+        cache.invalidar()
+        self.assertFalse(self.caminho.exists())
+
+
+class TestBackupComCacheMetadados(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        raiz = Path(self.tmp.name)
+        self.parametros = ParametrosArvore(sites=2, drives_por_site=3, profundidade=1, pastas_por_pasta=1,
+                                           arquivos_por_pasta=2, distribuicao="fixo", tamanho_medio=10)
+        self.graph = GraphContandoMetadados(self.parametros)
+        self.originais = (runner_mod.graph, runner_mod.ProvedorToken)
+        runner_mod.graph = self.graph
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+        self.arm = ArmazenamentoLocal(str(raiz / "backups"))
+        self.cfg = ConfigAplicativo(
+            tenant_id="t", client_id="c", client_secret="s", backup_dir=str(raiz / "backups"),
+            diretorio_estado=str(raiz / "state"), metricas=ConfigMetricas(progresso="desligado"),
+        )
+
+    def tearDown(self):
+        runner_mod.graph, runner_mod.ProvedorToken = self.originais
+        self.tmp.cleanup()
+
+    def _executar(self, cfg):
+        self.graph.chamadas.clear()
+        executar_backup(cfg, self.arm)
+        return dict(self.graph.chamadas)
+
+    def test_execucao_seguinte_nao_resolve_metadados(self):
+        self.assertEqual(self._executar(self.cfg), {"sites": 1, "drives": 2, "raizes": 6})
+        self.assertTrue((Path(self.cfg.diretorio_estado) / NOME_CACHE).exists())
+        self.assertEqual(self._executar(self.cfg), {})
+        self.assertEqual(self._executar(replace(self.cfg, motor="asyncio")), {})
+        self.assertEqual(self._executar(replace(self.cfg, atualizar_metadados=True)),
+                         {"sites": 1, "drives": 2, "raizes": 6})
+
+    def test_falha_apaga_o_cache(self):
+        self._executar(self.cfg)
+        original = self.graph.listar_filhos_em_lote
+
+        def falhar(*args, **kwargs):
+            raise RuntimeError("falha na listagem")
+
+        self.graph.listar_filhos_em_lote = falhar
+        with self.assertRaises(RuntimeError):
+            self._executar(self.cfg)
+        self.assertFalse((Path(self.cfg.diretorio_estado) / NOME_CACHE).exists())
+        self.graph.listar_filhos_em_lote = original
+        self.assertEqual(self._executar(self.cfg), {"sites": 1, "drives": 2, "raizes": 6})
+
+    def test_cache_desativado(self):
+        cfg = replace(self.cfg, graph=replace(self.cfg.graph, cache_metadados_horas=0))
+        self._executar(cfg)
+        self.assertEqual(self._executar(cfg), {"sites": 1, "drives": 2, "raizes": 6})
+        self.assertFalse((Path(cfg.diretorio_estado) / NOME_CACHE).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
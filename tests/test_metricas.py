@@ -0,0 +1,84 @@
+import json
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from backup.metricas import MetricasExecucao, MonitorExecucao, texto_prometheus
+
+
+class RelogioFalso:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestMetricasExecucao(unittest.TestCase):
+    def test_taxas_e_eta_apos_a_varredura(self):
+        relogio = RelogioFalso()
+        metricas = MetricasExecucao(relogio=relogio)
+        metricas.incrementar("itens_descobertos", 4)
+        metricas.incrementar("bytes_descobertos", 4 * 1024 * 1024)
+        stream = metricas.contar_leitura(BytesIO(b"x" * 1024 * 1024))
+        while stream.read(4096):
+            pass
+        metricas.incrementar("itens_concluidos")
+        metricas.incrementar("bytes_concluidos", 1024 * 1024)
+        metricas.registrar_medidor("fila_transferencia", lambda: 3)
+        relogio.agora += 2
+
+        dados = metricas.instantaneo()
+        self.assertEqual(dados["bytes_baixados"], 1024 * 1024)
+        self.assertEqual(dados["mb_por_s"], 0.5)
+        self.assertEqual(dados["itens_por_s"], 0.5)
+        self.assertEqual(dados["fila_transferencia"], 3)
+        # Enquanto a varredura não termina o total ainda pode crescer
+        self.assertIsNone(dados["eta_s"])
+
+        metricas.varredura_concluida = True
+        self.assertEqual(metricas.instantaneo()["eta_s"], 6.0)
+
+    def test_formato_texto_do_prometheus(self):
+        texto = texto_prometheus({"itens_concluidos": 3, "fila_transferencia": 2, "eta_s": None,
+                                  "sucesso": True}, {"shard": "0/2"})
+        self.assertIn("# TYPE sharepoint_backup_itens_concluidos_total counter\n"
+                      'sharepoint_backup_itens_concluidos_total{shard="0/2"} 3\n', texto)
+        self.assertIn('sharepoint_backup_fila_transferencia{shard="0/2"} 2\n', texto)
+        self.assertIn('sharepoint_backup_sucesso{shard="0/2"} 1\n', texto)
+        self.assertNotIn("eta_s", texto)
+
+
+class TestMonitorExecucao(unittest.TestCase):
+    def test_grava_resumo_e_arquivo_do_prometheus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            metricas = MetricasExecucao()
+            monitor = MonitorExecucao(metricas, Path(tmp) / "resumo.json", progresso="desligado",
+                                      intervalo=0.1, arquivo_prometheus=str(Path(tmp) / "prom" / "backup.prom"))
+            monitor.iniciar()
+            metricas.incrementar("itens_concluidos", 2)
+            resumo = monitor.finalizar(RuntimeError("falha simulada"))
+
+            self.assertFalse(resumo["sucesso"])
+            self.assertEqual(resumo["erro"], "RuntimeError: falha simulada")
+            gravado = json.loads((Path(tmp) / "resumo.json").read_text(encoding="utf-8"))
+            self.assertEqual(gravado["metricas"]["itens_concluidos"], 2)
+            texto = (Path(tmp) / "prom" / "backup.prom").read_text(encoding="utf-8")
+            self.assertIn("sharepoint_backup_sucesso 0\n", texto)
+            self.assertIn("sharepoint_backup_ultima_atualizacao_timestamp", texto)
+
+    def test_auto_fora_de_terminal_nao_imprime_o_resumo(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch("sys.stderr", StringIO()), mock.patch("sys.stdout", StringIO()) as saida:
+            monitor = MonitorExecucao(MetricasExecucao(), Path(tmp) / "resumo.json", progresso="auto")
+            self.assertEqual(monitor.progresso, "desligado")
+            monitor.iniciar()
+            monitor.finalizar()
+            self.assertEqual(saida.getvalue(), "")
+            self.assertTrue((Path(tmp) / "resumo.json").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
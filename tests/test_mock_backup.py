@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import unittest
@@ -7,6 +8,7 @@ from pathlib import Path
 from backup.runner import executar_backup, graph as graph_real
 from backup import graph_mock
 from backup.config import ConfigAplicativo
+from backup.manifesto import ArmazemManifesto
 from backup.storage.local import ArmazenamentoLocal
 
 
@@ -42,15 +44,15 @@ class TestBackupMock(unittest.TestCase):
         import backup.runner as runner_mod
         runner_mod.graph = graph_mock
 
-        # Monkeypatch de obter_token para não chamar MSAL
-        self.obter_token_original = runner_mod.obter_token
-        runner_mod.obter_token = lambda tenant, client, secret: "TOKEN-MOCK"
+        # Monkeypatch do provedor de token para não chamar MSAL
+        self.provedor_token_original = runner_mod.ProvedorToken
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
 
     def tearDown(self):
         # Restaura monkeypatches
         import backup.runner as runner_mod
         runner_mod.graph = self.graph_original
-        runner_mod.obter_token = self.obter_token_original
+        runner_mod.ProvedorToken = self.provedor_token_original
 
         # Limpa diretórios de teste
         if self.dir_saida.exists():
@@ -68,9 +70,113 @@ class TestBackupMock(unittest.TestCase):
         self.assertTrue(caminho_arquivo.exists(), f"Arquivo esperado não foi criado: {caminho_arquivo}")
 
         # Verifica que estado foi gerado
-        manifesto = Path("state") / "latest_manifest.json"
+        manifesto = Path("state") / "latest_manifest.sqlite"
         self.assertTrue(manifesto.exists(), "Manifesto de estado não foi criado.")
 
+        # Resumo estruturado da execução
+        resumo = json.loads((self.dir_estado / "resumo_execucao.json").read_text(encoding="utf-8"))
+        self.assertTrue(resumo["sucesso"])
+        self.assertEqual(resumo["metricas"]["itens_concluidos"], 1)
+        self.assertEqual(resumo["metricas"]["arquivos_baixados"], 1)
+        self.assertEqual(resumo["metricas"]["bytes_baixados"], 31)
+        # Latências por operação: chamadas ao Graph, ao backend e fases da execução
+        for operacao in ("graph.resolver_sites", "graph.listar_filhos_em_lote",
+                         "armazenamento.escrever_stream", "arquivo.processar", "fase.varredura"):
+            self.assertIn(operacao, resumo["latencias"])
+        self.assertEqual(resumo["latencias"]["armazenamento.escrever_stream"]["chamadas"], 1)
+
+    def test_arquivo_inalterado_reaproveitado_sem_download(self):
+        executar_backup(self.cfg, self.backend)
+
+        # Simula que a execução anterior ocorreu em outro dia
+        hoje = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        base_anterior = self.dir_saida / "snapshots" / "2000-01-01"
+        (self.dir_saida / "snapshots" / hoje).rename(base_anterior)
+        (self.dir_estado / "latest_snapshot.txt").write_text(str(base_anterior), encoding="utf-8")
+
+        manifesto = ArmazemManifesto(self.dir_estado / "latest_manifest.sqlite")
+        self.assertEqual(manifesto.obter("file-1")["cTag"], "ctag-mock-1")
+        self.assertEqual(manifesto.obter("file-1")["size"], 31)
+        manifesto.fechar()
+
+        def download_proibido(drive_id, item_id, token):
+            raise AssertionError("Arquivo inalterado não deveria ser baixado")
+
+        baixar_original = graph_mock.baixar_stream_conteudo_item
+        graph_mock.baixar_stream_conteudo_item = download_proibido
+        try:
+            executar_backup(self.cfg, self.backend)
+        finally:
+            graph_mock.baixar_stream_conteudo_item = baixar_original
+
+        rel = Path("SiteMock") / "DriveMock" / "docs" / "relatorio.txt"
+        atual = self.dir_saida / "snapshots" / hoje / rel
+        self.assertTrue(atual.exists(), "Arquivo inalterado não foi materializado no novo snapshot.")
+        self.assertTrue(os.path.samefile(atual, base_anterior / rel), "Esperado hardlink para o snapshot anterior.")
+        resumo = json.loads((self.dir_estado / "resumo_execucao.json").read_text(encoding="utf-8"))
+        self.assertEqual(resumo["metricas"]["arquivos_reaproveitados"], 1)
+        self.assertEqual(resumo["metricas"]["bytes_baixados"], 0)
+
+    def test_execucao_interrompida_retoma_pelo_journal(self):
+        import backup.runner as runner_mod
+
+        def falhar_ao_salvar(*args, **kwargs):
+            raise RuntimeError("queda simulada antes de salvar o estado")
+
+        salvar_original = runner_mod.salvar_estado_atual
+        runner_mod.salvar_estado_atual = falhar_ao_salvar
+        try:
+            with self.assertRaises(RuntimeError):
+                executar_backup(self.cfg, self.backend)
+        finally:
+            runner_mod.salvar_estado_atual = salvar_original
+
+        self.assertFalse((self.dir_estado / "latest_manifest.sqlite").exists())
+        self.assertTrue((self.dir_estado / "journal.jsonl").exists(), "Journal deveria sobreviver à falha.")
+
+        def download_proibido(drive_id, item_id, token):
+            raise AssertionError("Item já concluído não deveria ser baixado novamente")
+
+        baixar_original = graph_mock.baixar_stream_conteudo_item
+        graph_mock.baixar_stream_conteudo_item = download_proibido
+        try:
+            executar_backup(self.cfg, self.backend)
+        finally:
+            graph_mock.baixar_stream_conteudo_item = baixar_original
+
+        manifesto = ArmazemManifesto(self.dir_estado / "latest_manifest.sqlite")
+        self.assertIn("file-1", manifesto)
+        manifesto.fechar()
+        self.assertFalse((self.dir_estado / "journal.jsonl").exists(), "Journal deve ser removido ao concluir.")
+
+    def test_falha_fecha_o_manifesto_anterior(self):
+        import backup.runner as runner_mod
+        executar_backup(self.cfg, self.backend)
+
+        abertos = []
+
+        def carregar_registrando(diretorio_estado):
+            estado = carregar_original(diretorio_estado)
+            abertos.append(estado["manifesto"])
+            return estado
+
+        def falhar(*args, **kwargs):
+            raise RuntimeError("falha na varredura")
+
+        carregar_original = runner_mod.carregar_estado_anterior
+        listar_original = graph_mock.listar_filhos_em_lote
+        runner_mod.carregar_estado_anterior = carregar_registrando
+        graph_mock.listar_filhos_em_lote = falhar
+        try:
+            with self.assertRaises(RuntimeError):
+                executar_backup(self.cfg, self.backend)
+        finally:
+            runner_mod.carregar_estado_anterior = carregar_original
+            graph_mock.listar_filhos_em_lote = listar_original
+
+        self.assertEqual(len(abertos), 1)
+        self.assertIsNone(abertos[0]._conexao)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import asyncio
+import gc
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import backup.runner as runner_mod
+from backup.config import ConfigAplicativo, ConfigMetricas
+from backup.graph_assincrono import LeitorPonte
+from backup.graph_sintetico import GraphSintetico, ParametrosArvore
+from backup.runner import executar_backup
+from backup.storage.local import ArmazenamentoLocal
+
+
+class GraphFalhandoNaListagem(GraphSintetico):
+    def listar_filhos_paginado(self, drive_id, item_id, token):
+        if item_id.endswith(":1"):
+            raise RuntimeError("falha na listagem")
+        return super().listar_filhos_paginado(drive_id, item_id, token)
+
+
+class TestMotorAssincrono(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raiz = Path(self.tmp.name)
+        self.parametros = ParametrosArvore(sites=2, drives_por_site=2, profundidade=2, pastas_por_pasta=2,
+                                           arquivos_por_pasta=3, distribuicao="fixo", tamanho_medio=10)
+        self.originais = (runner_mod.graph, runner_mod.ProvedorToken)
+        runner_mod.graph = GraphSintetico(self.parametros)
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+
+    def tearDown(self):
+        runner_mod.graph, runner_mod.ProvedorToken = self.originais
+        self.tmp.cleanup()
+
+    def _cfg(self, nome, **kwargs):
+        return ConfigAplicativo(
+            tenant_id="t", client_id="c", client_secret="s", backup_dir=str(self.raiz / nome / "backups"),
+            diretorio_estado=str(self.raiz / nome / "state"), metricas=ConfigMetricas(progresso="desligado"),
+            **kwargs,
+        )
+
+    def _executar(self, cfg):
+        arm = ArmazenamentoLocal(cfg.backup_dir)
+        executar_backup(cfg, arm)
+        base = Path(arm.obter_base_snapshot(runner_mod._data_execucao()))
+        return sorted(str(p.relative_to(base)).replace("\\", "/") for p in base.rglob("*")
+                      if p.is_file() and p.name != runner_mod.NOME_MANIFESTO)
+
+    def test_varredura_completa_igual_ao_motor_de_threads(self):
+        esperado = self._executar(self._cfg("threads"))
+        obtido = self._executar(self._cfg("asyncio", motor="asyncio"))
+        self.assertEqual(len(obtido), self.parametros.total_arquivos)
+        self.assertEqual(obtido, esperado)
+
+    def test_modo_delta_com_drives_em_paralelo(self):
+        cfg = self._cfg("delta", motor="asyncio", modo_delta=True)
+        arquivos = self._executar(cfg)
+        self.assertEqual(len(arquivos), self.parametros.total_arquivos)
+        estado = (self.raiz / "delta" / "state").rglob("*")
+        self.assertTrue(any(p.is_file() for p in estado))
+
+    def test_falha_na_listagem_interrompe_a_execucao(self):
+        runner_mod.graph = GraphFalhandoNaListagem(self.parametros)
+        with self.assertRaises(RuntimeError):
+            executar_backup(self._cfg("falha", motor="asyncio"), ArmazenamentoLocal(str(self.raiz / "falha")))
+
+
+class TestAguardarTarefas(unittest.TestCase):
+    def test_falhas_simultaneas_sao_todas_consultadas(self):
+        avisos = []
+
+        async def falhar(mensagem):
+            raise RuntimeError(mensagem)
+
+        async def principal():
+            asyncio.get_running_loop().set_exception_handler(lambda laco, contexto: avisos.append(contexto))
+            bloqueio = asyncio.ensure_future(asyncio.Event().wait())
+            consumidores = [asyncio.ensure_future(falhar(f"falha {i}")) for i in range(3)]
+            await asyncio.sleep(0)
+            with self.assertRaises(RuntimeError):
+                await runner_mod._aguardar_tarefas([bloqueio], consumidores)
+            del consumidores
+            gc.collect()
+
+        asyncio.run(principal())
+        self.assertEqual(avisos, [])
+
+
+class RespostaFalsa:
+    def __init__(self, blocos):
+        self.blocos = blocos
+        self.fechada = False
+
+    async def iterar_bytes(self):
+        for bloco in self.blocos:
+            await asyncio.sleep(0)
+            yield bloco
+
+    async def fechar(self):
+        self.fechada = True
+
+
+class TestLeitorPonte(unittest.TestCase):
+    def test_leitura_sincrona_de_blocos_do_laco(self):
+        laco = asyncio.new_event_loop()
+        thread = threading.Thread(target=laco.run_forever, daemon=True)
+        thread.start()
+        try:
+            resposta = RespostaFalsa([b"abc", b"defgh", b"ij"])
+            leitor = LeitorPonte(resposta, laco)
+            self.assertIs(leitor.raw, leitor)
+            self.assertEqual(leitor.read(4), b"abcd")
+            self.assertEqual(leitor.read(), b"efghij")
+            self.assertEqual(leitor.read(10), b"")
+            leitor.close()
+            self.assertTrue(resposta.fechada)
+        finally:
+            laco.call_soon_threadsafe(laco.stop)
+            thread.join()
+            laco.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
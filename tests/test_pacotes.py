@@ -0,0 +1,105 @@
+import tarfile
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+import backup.runner as runner_mod
+from backup import cas, pacotes
+from backup.config import ConfigAplicativo, ConfigEmpacotamento, ConfigMetricas, ConfigRetencao
+from backup.graph_sintetico import GraphSintetico, ParametrosArvore, StreamSintetico
+from backup.retencao import podar
+from backup.runner import executar_backup
+from backup.storage.local import ArmazenamentoLocal
+
+
+class TestEmpacotadorSegmentos(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.arm = ArmazenamentoLocal(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_segmentos_rotativos_com_leitura_por_faixa(self):
+        empacotador = pacotes.EmpacotadorSegmentos(self.arm, limiar=4096, tamanho_segmento=3000)
+        conteudos = {f"sha256/{i:02d}/{i:064d}-1000": bytes([i]) * 1000 + b"fim" for i in range(5)}
+        localizadores = {chave: empacotador.adicionar(chave, dados) for chave, dados in conteudos.items()}
+        # Conteúdo repetido reaproveita o membro já gravado
+        primeira = next(iter(conteudos))
+        self.assertEqual(empacotador.adicionar(primeira, conteudos[primeira]), localizadores[primeira])
+        empacotador.finalizar()
+
+        segmentos = sorted(Path(self.arm.obter_base_blobs()).rglob("*.tar"))
+        self.assertGreater(len(segmentos), 1)
+        self.assertEqual(empacotador.segmentos_enviados, len(segmentos))
+        for chave, dados in conteudos.items():
+            self.assertEqual(pacotes.ler_membro(self.arm, localizadores[chave]).read(), dados)
+        # Os segmentos são arquivos tar comuns, com cada membro comprimido
+        with tarfile.open(segmentos[0]) as tar:
+            self.assertTrue(all(nome.endswith(".gz") for nome in tar.getnames()))
+
+    def test_segmento_nao_enviado_e_detectado(self):
+        empacotador = pacotes.EmpacotadorSegmentos(self.arm, limiar=4096, tamanho_segmento=1 << 20)
+        localizador = empacotador.adicionar("sha256/aa/aa-1", b"x")
+        empacotador.descartar()
+        entradas = {"item": {"blob": "sha256/aa/aa-1", "pacote": localizador}, "outro": {"blob": "b"}}
+        self.assertEqual(pacotes.segmentos_ausentes(self.arm, entradas), {localizador["segmento"]})
+
+
+class TestBackupEmpacotado(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        raiz = Path(self.tmp.name)
+        self.arm = ArmazenamentoLocal(str(raiz / "backups"))
+        self.cfg = ConfigAplicativo(
+            tenant_id="t", client_id="c", client_secret="s", backup_dir=str(raiz / "backups"),
+            diretorio_estado=str(raiz / "state"), modo_snapshot="deduplicado",
+            metricas=ConfigMetricas(progresso="desligado"),
+            empacotamento=ConfigEmpacotamento(limiar_kb=2, tamanho_segmento_mb=1),
+        )
+        # Tamanhos de 0 a ~4 KiB: parte vai para segmentos, parte fica como objeto próprio
+        self.parametros = ParametrosArvore(profundidade=1, pastas_por_pasta=2, arquivos_por_pasta=10,
+                                           distribuicao="uniforme", tamanho_medio=2048)
+        self.graph = GraphSintetico(self.parametros)
+        self.originais = (runner_mod.graph, runner_mod.ProvedorToken)
+        runner_mod.graph = self.graph
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+        self.raiz = raiz
+
+    def tearDown(self):
+        runner_mod.graph, runner_mod.ProvedorToken = self.originais
+        self.tmp.cleanup()
+
+    def test_arquivos_pequenos_em_segmentos_e_restauracao(self):
+        executar_backup(self.cfg, self.arm)
+        base = self.arm.obter_base_snapshot(runner_mod._data_execucao())
+        entradas = dict(cas.iterar_manifesto(self.arm, base))
+        self.assertEqual(len(entradas), self.parametros.total_arquivos)
+        empacotadas = [e for e in entradas.values() if e.get("pacote")]
+        avulsas = [e for e in entradas.values() if not e.get("pacote")]
+        self.assertTrue(empacotadas and avulsas)
+        self.assertTrue(all(e["size"] <= 2048 for e in empacotadas))
+        objetos = list(self.arm.listar_prefixo(self.arm.obter_base_blobs()))
+        self.assertEqual(len(objetos), len(avulsas) + 1)
+
+        destino = ArmazenamentoLocal(str(self.raiz / "restauro"))
+        self.assertEqual(cas.restaurar_snapshot(self.arm, base, destino, str(self.raiz / "restauro")),
+                         len(entradas))
+        for id_item, entrada in entradas.items():
+            esperado = StreamSintetico(id_item, entrada["size"]).read()
+            self.assertEqual((self.raiz / "restauro" / entrada["path"]).read_bytes(), esperado)
+
+        # Segmento referenciado pelo manifesto retido não é removido pela poda
+        resultado = podar(replace(self.cfg, retencao=ConfigRetencao(diarios=7)), self.arm)
+        self.assertEqual(resultado.blobs, 0)
+
+    def test_execucao_seguinte_reaproveita_os_segmentos(self):
+        executar_backup(self.cfg, self.arm)
+        segmentos = sorted(p.name for p in Path(self.arm.obter_base_blobs()).rglob("*.tar"))
+        executar_backup(self.cfg, self.arm)
+        self.assertEqual(sorted(p.name for p in Path(self.arm.obter_base_blobs()).rglob("*.tar")), segmentos)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import tempfile
+import unittest
+from dataclasses import replace
+from io import BytesIO
+from pathlib import Path
+
+from backup import graph_mock, restauracao
+from backup.config import ConfigAplicativo
+from backup.restauracao import NOME_JOURNAL_RESTAURACAO, OpcoesRestauracao, restaurar
+from backup.storage.local import ArmazenamentoLocal
+
+
+class GraphComFalha:
+    """Graph falso que registra os envios e falha uma vez no arquivo indicado."""
+
+    def __init__(self, falhar_em=None):
+        self.falhar_em = falhar_em
+        self.envios = []
+
+    def enviar_arquivo(self, drive_id, caminho, stream, tamanho, token, *args):
+        if caminho == self.falhar_em:
+            self.falhar_em = None
+            raise IOError("conexão perdida")
+        self.envios.append(caminho)
+        return graph_mock.enviar_arquivo(drive_id, caminho, stream, tamanho, token)
+
+
+class TestRestauracao(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        raiz = Path(self.tmp.name)
+        self.arm = ArmazenamentoLocal(str(raiz / "backups"))
+        self.cfg = ConfigAplicativo(tenant_id="t", client_id="c", client_secret="s",
+                                    diretorio_estado=str(raiz / "state"), concorrencia=2)
+        arquivos = {
+            "2024-05-01": {"SiteA/Documentos/a.txt": b"v1", "SiteA/Documentos/docs/b.txt": b"bbb"},
+            "2024-05-03": {"SiteA/Documentos/a.txt": b"v2", "SiteA/Documentos/docs/b.txt": b"bbb",
+                           "SiteB/Docs/c.txt": b"cccc"},
+        }
+        for data_str, conteudo in arquivos.items():
+            for caminho, dados in conteudo.items():
+                self.arm.escrever_stream(self.arm.obter_base_snapshot(data_str), caminho, BytesIO(dados))
+        self.graph_original = restauracao.graph
+        restauracao.graph = graph_mock
+        graph_mock.ARQUIVOS_ENVIADOS.clear()
+
+    def tearDown(self):
+        restauracao.graph = self.graph_original
+        graph_mock.ARQUIVOS_ENVIADOS.clear()
+        self.tmp.cleanup()
+
+    def test_ponto_no_tempo_para_pasta_de_destino(self):
+        resultado = restaurar(self.cfg, self.arm, OpcoesRestauracao("drv", data="2024-05-02",
+                                                                    pasta_destino="/Restaurado/"), token="T")
+        self.assertEqual(resultado.data, "2024-05-01")
+        self.assertEqual((resultado.arquivos_total, resultado.arquivos, resultado.bytes), (2, 2, 5))
+        self.assertEqual(graph_mock.ARQUIVOS_ENVIADOS, {
+            ("drv", "Restaurado/a.txt"): b"v1",
+            ("drv", "Restaurado/docs/b.txt"): b"bbb",
+        })
+
+    def test_filtros_de_site_e_caminho(self):
+        opcoes = OpcoesRestauracao("drv", site="sitea", caminho="SiteA/Documentos/docs/*.txt")
+        resultado = restaurar(self.cfg, self.arm, opcoes, token="T")
+        self.assertEqual(resultado.data, "2024-05-03")
+        self.assertEqual(list(graph_mock.ARQUIVOS_ENVIADOS), [("drv", "docs/b.txt")])
+
+        graph_mock.ARQUIVOS_ENVIADOS.clear()
+        restaurar(self.cfg, self.arm, replace(opcoes, site=None, caminho="SiteB"), token="T")
+        self.assertEqual(list(graph_mock.ARQUIVOS_ENVIADOS), [("drv", "c.txt")])
+
+    def test_varios_drives_exigem_manter_estrutura(self):
+        with self.assertRaises(ValueError):
+            restaurar(self.cfg, self.arm, OpcoesRestauracao("drv"), token="T")
+        self.assertEqual(graph_mock.ARQUIVOS_ENVIADOS, {})
+
+        resultado = restaurar(self.cfg, self.arm, OpcoesRestauracao("drv", manter_estrutura=True), token="T")
+        self.assertEqual(resultado.arquivos, 3)
+        self.assertIn(("drv", "SiteB/Docs/c.txt"), graph_mock.ARQUIVOS_ENVIADOS)
+
+    def test_retoma_restauracao_interrompida(self):
+        falso = GraphComFalha(falhar_em="docs/b.txt")
+        restauracao.graph = falso
+        opcoes = OpcoesRestauracao("drv", site="SiteA")
+        with self.assertRaises(IOError):
+            restaurar(replace(self.cfg, concorrencia=1), self.arm, opcoes, token="T")
+        journal = Path(self.cfg.diretorio_estado) / NOME_JOURNAL_RESTAURACAO
+        self.assertTrue(journal.exists())
+
+        resultado = restaurar(self.cfg, self.arm, opcoes, token="T")
+        # Cada arquivo é enviado uma única vez somando as duas execuções
+        self.assertEqual(sorted(falso.envios), ["a.txt", "docs/b.txt"])
+        self.assertEqual(resultado.pulados + resultado.arquivos, 2)
+        self.assertFalse(journal.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from io import BytesIO
+from pathlib import Path
+
+from backup.config import ConfigAplicativo, ConfigRetencao
+from backup.retencao import datas_retidas, podar
+from backup.storage.local import ArmazenamentoLocal
+
+
+class TestPoliticaRetencao(unittest.TestCase):
+    def test_diarios_semanais_e_mensais(self):
+        inicio = date(2024, 1, 1)
+        datas = [(inicio + timedelta(days=i)).isoformat() for i in range(120)]
+        retidas = datas_retidas(datas, ConfigRetencao(diarios=7, semanais=4, mensais=3))
+        # Últimos 7 dias
+        for d in datas[-7:]:
+            self.assertIn(d, retidas)
+        # Mais recente de cada mês: abril (último dia disponível), março e fevereiro
+        self.assertTrue({"2024-04-29", "2024-03-31", "2024-02-29"} <= retidas)
+        self.assertNotIn("2024-01-31", retidas)
+        # Semana atual (29/04, segunda) e os domingos (fim da semana ISO) das três anteriores
+        self.assertTrue({"2024-04-28", "2024-04-21", "2024-04-14"} <= retidas)
+        self.assertNotIn("2024-04-07", retidas)
+        self.assertEqual(len(retidas), 7 + 2 + 2)
+
+    def test_sem_regras_mantem_tudo_e_sempre_o_mais_recente(self):
+        datas = ["2024-01-01", "2024-01-02", "lixo"]
+        self.assertEqual(datas_retidas(datas, ConfigRetencao()), {"2024-01-01", "2024-01-02"})
+        self.assertEqual(datas_retidas(datas, ConfigRetencao(mensais=0, semanais=0, diarios=0)),
+                         {"2024-01-01", "2024-01-02"})
+        self.assertEqual(datas_retidas(datas, ConfigRetencao(diarios=1)), {"2024-01-02"})
+
+
+class TestPoda(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.arm = ArmazenamentoLocal(self.tmp.name)
+        self.cfg = ConfigAplicativo(tenant_id="t", client_id="c", client_secret="s",
+                                    retencao=ConfigRetencao(diarios=2, dias_apagados=5))
+        for data_str in ("2024-03-01", "2024-03-02", "2024-03-03"):
+            base = self.arm.obter_base_snapshot(data_str)
+            self.arm.escrever_stream(base, "Site/Drive/compartilhado.bin", BytesIO(b"x" * 100))
+            self.arm.escrever_stream(base, f"Site/Drive/unico-{data_str}.bin", BytesIO(b"y" * 10))
+        for data_str in ("2024-02-01", "2024-03-02"):
+            self.arm.escrever_stream(self.arm.obter_base_apagados(data_str), "a.txt", BytesIO(b"z" * 7))
+        # Arquivo inalterado reaproveitado por hardlink entre snapshots
+        rel = "Site/Drive/compartilhado.bin"
+        for data_str in ("2024-03-02", "2024-03-03"):
+            destino = Path(self.arm.obter_base_snapshot(data_str)) / rel
+            destino.unlink()
+            os.link(Path(self.arm.obter_base_snapshot("2024-03-01")) / rel, destino)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_simulacao_informa_bytes_sem_apagar(self):
+        resultado = podar(self.cfg, self.arm, simular=True, hoje=date(2024, 3, 3))
+        self.assertEqual(resultado.snapshots_removidos, ["2024-03-01"])
+        self.assertEqual(resultado.apagados_removidos, ["2024-02-01"])
+        self.assertEqual(resultado.arquivos, 3)
+        # O conteúdo compartilhado por hardlink continua referenciado pelos snapshots retidos
+        self.assertEqual(resultado.bytes_recuperaveis, 10 + 7)
+        self.assertTrue(Path(self.arm.obter_base_snapshot("2024-03-01")).exists())
+
+    def test_poda_remove_prefixos_expirados(self):
+        podar(self.cfg, self.arm, hoje=date(2024, 3, 3))
+        self.assertFalse(Path(self.arm.obter_base_snapshot("2024-03-01")).exists())
+        self.assertFalse(Path(self.arm.obter_base_apagados("2024-02-01")).exists())
+        self.assertTrue(self.arm.existe(self.arm.obter_base_snapshot("2024-03-02"), "Site/Drive/compartilhado.bin"))
+        self.assertTrue(self.arm.existe(self.arm.obter_base_apagados("2024-03-02"), "a.txt"))
+
+    def test_base_protegida_nao_e_removida(self):
+        protegida = self.arm.obter_base_snapshot("2024-03-01")
+        resultado = podar(self.cfg, self.arm, hoje=date(2024, 3, 3), bases_protegidas=[protegida])
+        self.assertEqual(resultado.snapshots_removidos, [])
+        self.assertTrue(Path(protegida).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import multiprocessing
+import shutil
+import unittest
+from dataclasses import replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+from backup import graph_mock, shards
+from backup.config import ConfigAplicativo
+from backup.manifesto import ArmazemManifesto
+from backup.runner import executar_backup, mesclar_shards, graph as graph_real
+from backup.storage.local import ArmazenamentoLocal
+
+
+class TestAtribuicaoShards(unittest.TestCase):
+    def test_cada_site_cai_em_um_unico_shard(self):
+        sites = [f"contoso.sharepoint.com:/sites/S{i}" for i in range(40)]
+        partes = [shards.filtrar_sites(sites, i, 4) or [] for i in range(4)]
+        self.assertEqual(sorted(s for p in partes for s in p), sorted(sites))
+        # Determinístico entre execuções e máquinas
+        self.assertEqual(partes[2], shards.filtrar_sites(sites, 2, 4) or [])
+
+    def test_site_raiz_fica_no_shard_zero(self):
+        self.assertEqual(shards.filtrar_sites([], 0, 3), [])
+        self.assertIsNone(shards.filtrar_sites([], 1, 3))
+
+
+class TestBackupEmShards(unittest.TestCase):
+    def setUp(self):
+        self.dir_saida = Path("backups_mock_shards")
+        self.dir_estado = Path("state_shards")
+        for d in (self.dir_saida, self.dir_estado):
+            if d.exists():
+                shutil.rmtree(d)
+        self.cfg = ConfigAplicativo(
+            tenant_id="TENANT-MOCK",
+            client_id="CLIENT-MOCK",
+            client_secret="SECRET-MOCK",
+            backup_dir=str(self.dir_saida),
+            diretorio_estado=str(self.dir_estado),
+        )
+        self.backend = ArmazenamentoLocal(self.cfg.backup_dir)
+
+        import backup.runner as runner_mod
+        runner_mod.graph = graph_mock
+        self.provedor_token_original = runner_mod.ProvedorToken
+        runner_mod.ProvedorToken = lambda tenant, client, secret: "TOKEN-MOCK"
+
+    def tearDown(self):
+        import backup.runner as runner_mod
+        runner_mod.graph = graph_real
+        runner_mod.ProvedorToken = self.provedor_token_original
+        for d in (self.dir_saida, self.dir_estado):
+            if d.exists():
+                shutil.rmtree(d)
+
+    def _verificar_estado_global(self):
+        hoje = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        arquivo = self.dir_saida / "snapshots" / hoje / "SiteMock" / "DriveMock" / "docs" / "relatorio.txt"
+        self.assertTrue(arquivo.exists())
+        manifesto = ArmazemManifesto(self.dir_estado / "latest_manifest.sqlite")
+        self.assertIn("file-1", manifesto)
+        manifesto.fechar()
+        self.assertFalse((self.dir_estado / "shards" / hoje).exists(), "Parciais devem ser removidos após a mescla.")
+
+    def test_shards_independentes_e_mescla(self):
+        for shard_por in ("site", "drive"):
+            with self.subTest(shard_por=shard_por):
+                cfg = replace(self.cfg, shard_por=shard_por, total_shards=2)
+                executar_backup(replace(cfg, indice_shard=1), self.backend)
+                # Shard 0 ainda não terminou: a mescla não pode prosseguir
+                with self.assertRaises(FileNotFoundError):
+                    mesclar_shards(cfg, self.backend)
+                self.assertFalse((self.dir_estado / "latest_manifest.sqlite").exists())
+
+                executar_backup(replace(cfg, indice_shard=0), self.backend)
+                mesclar_shards(cfg, self.backend)
+                self._verificar_estado_global()
+                shutil.rmtree(self.dir_estado)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                         "os processos herdam o Graph mock apenas com fork")
+    def test_pool_de_processos(self):
+        executar_backup(replace(self.cfg, processos=2, shard_por="drive"), self.backend)
+        self._verificar_estado_global()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import threading
+import unittest
+
+from backup.transferencia import PoolTransferencia
+
+
+class TestPoolTransferencia(unittest.TestCase):
+    def test_coleta_resultados_por_chave(self):
+        pool = PoolTransferencia(num_workers=3, tamanho_fila=2)
+        for i in range(20):
+            pool.enviar(f"item-{i}", lambda x: x * 2, i)
+        resultados = pool.finalizar()
+        self.assertEqual(len(resultados), 20)
+        self.assertEqual(resultados["item-7"], 14)
+
+    def test_fila_limitada_aplica_contrapressao(self):
+        liberar = threading.Event()
+        pool = PoolTransferencia(num_workers=1, tamanho_fila=1)
+        pool.enviar("a", liberar.wait)  # ocupa o único worker
+        pool.enviar("b", lambda: None)  # ocupa a fila
+        produtor = threading.Thread(target=pool.enviar, args=("c", lambda: None))
+        produtor.start()
+        produtor.join(timeout=0.2)
+        # Com a fila cheia o produtor permanece bloqueado
+        self.assertTrue(produtor.is_alive())
+        liberar.set()
+        produtor.join(timeout=2)
+        self.assertFalse(produtor.is_alive())
+        pool.finalizar()
+
+    def test_erro_em_worker_e_relancado(self):
+        def falhar():
+            raise RuntimeError("falha de download")
+
+        pool = PoolTransferencia(num_workers=2, tamanho_fila=4)
+        pool.enviar("x", falhar)
+        with self.assertRaises(RuntimeError):
+            pool.finalizar()
+
+
+if __name__ == "__main__":
+    unittest.main()